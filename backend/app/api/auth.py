@@ -5,6 +5,7 @@ Handles user login, logout, and token refresh.
 """
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 
 from app.schemas.auth import (
     LoginRequest,
@@ -16,8 +17,10 @@ from app.schemas.auth import (
 from app.services.auth_service import (
     authenticate_user,
     create_user_tokens,
-    validate_refresh_token
+    refresh_user_tokens,
+    refresh_user_tokens_async
 )
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -41,12 +44,13 @@ async def login(request: LoginRequest):
     Raises:
         HTTPException: 400 (validation), 401 (invalid credentials),
                       403 (blocked), 429 (rate limit), 500 (server error)
+        PasswordPoolSaturated: 503 when the hashing pool is saturated
     """
-    logger.info(f"Login attempt for user {request.id}")
+    logger.info("Login attempt for user %s", request.id)
 
-    # Validate credentials
+    # Validate credentials off the event loop (Firestore reads, bcrypt pool)
     # (Rate limiting and account lockout handled in auth_service)
-    user = authenticate_user(request.id, request.password)
+    user = await run_in_threadpool(authenticate_user, request.id, request.password)
 
     if not user:
         raise HTTPException(
@@ -58,7 +62,7 @@ async def login(request: LoginRequest):
         )
 
     # Create tokens
-    access_token, refresh_token, expires_in = create_user_tokens(user)
+    access_token, refresh_token, expires_in = await run_in_threadpool(create_user_tokens, user)
 
     # Build response
     response = LoginResponse(
@@ -72,17 +76,18 @@ async def login(request: LoginRequest):
         )
     )
 
-    logger.info(f"Login successful for user {user.id}")
+    logger.info("Login successful for user %s", user.id)
 
     return response
 
 
-@router.post("/refresh", response_model=RefreshTokenResponse)
+@router.post("/refresh", response_model=RefreshTokenResponse, response_model_exclude_none=True)
 async def refresh_token(request: RefreshTokenRequest):
     """
     Refresh token endpoint
 
-    Validates refresh token and issues new access token.
+    Validates refresh token and issues new access token (and a new refresh
+    token when REFRESH_TOKEN_ROTATION is enabled).
 
     Args:
         request: Refresh token request
@@ -95,24 +100,18 @@ async def refresh_token(request: RefreshTokenRequest):
     """
     logger.info("Refresh token request")
 
-    # Validate refresh token and get user
-    user = validate_refresh_token(request.refreshToken)
-
-    # Create new access token (keep same refresh token)
-    from app.schemas.auth import UserInDB
-    from app.db.firestore_client import get_user_by_id
-
-    # Get full user data for token creation
-    user_data = get_user_by_id(user.id)
-    user_db = UserInDB(**user_data)
-
-    access_token, _, expires_in = create_user_tokens(user_db)
+    # Validate refresh token and mint tokens (one batched Firestore read)
+    if settings.FIRESTORE_ASYNC_ENABLED:
+        access_token, new_refresh_token, expires_in = await refresh_user_tokens_async(request.refreshToken)
+    else:
+        access_token, new_refresh_token, expires_in = await run_in_threadpool(
+            refresh_user_tokens, request.refreshToken
+        )
 
     response = RefreshTokenResponse(
         token=access_token,
-        expiresIn=expires_in
+        expiresIn=expires_in,
+        refreshToken=new_refresh_token
     )
 
-    logger.info(f"Token refreshed for user {user.id}")
-
     return response
@@ -0,0 +1,136 @@
+"""
+Configuration Endpoints
+
+Feature flag sync for the PWA's Configuracion store, served from the
+in-process config snapshot (app.db.config_cache):
+
+- GET /api/config?since=<version>: 304 when the client is current
+- GET /api/config?since=<version>&wait=<seconds>: long-poll until a newer
+  version or the wait elapses
+- GET /api/config/stream: Server-Sent Events, one event per version
+
+Waiting requests are coroutines on the event loop (no thread per waiter).
+"""
+
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
+
+from app.api.dependencies import get_current_active_user
+from app.core.config import settings
+from app.core.deadline import remaining
+from app.core.logging import get_logger
+from app.db.config_cache import ConfigSnapshot, get_config_snapshot_async, wait_for_config_change
+from app.schemas.auth import UserInDB
+from app.schemas.config import ConfigResponse
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+
+def _parse_version(value: Optional[str]) -> Optional[int]:
+    """Version from an ETag / Last-Event-ID header value, if valid"""
+    if not value:
+        return None
+    try:
+        return int(value.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        return None
+
+
+def _config_headers(snapshot: ConfigSnapshot) -> dict:
+    return {"ETag": f'"{snapshot.version}"', "Cache-Control": "no-cache"}
+
+
+@router.get(
+    "/config",
+    response_model=ConfigResponse,
+    responses={304: {"description": "Configuration unchanged since the given version"}}
+)
+async def get_config(
+    response: Response,
+    since: Optional[int] = Query(default=None, description="Version the client already has"),
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for a newer version (long-poll)"),
+    if_none_match: Optional[str] = Header(default=None),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Get configuration values (feature flags)
+
+    Args:
+        since: Version the client has (or an If-None-Match ETag)
+        wait: Long-poll seconds, capped by CONFIG_LONG_POLL_MAX_SECONDS
+        current_user: Current authenticated user
+
+    Returns:
+        ConfigResponse with version and values, or 304 if unchanged
+
+    Raises:
+        HTTPException: 401 (unauthorized), 403 (forbidden)
+    """
+    if since is None:
+        since = _parse_version(if_none_match)
+
+    if since is None:
+        snapshot = await get_config_snapshot_async()
+    else:
+        wait = min(wait, settings.CONFIG_LONG_POLL_MAX_SECONDS)
+        budget = remaining()
+        if budget is not None:
+            wait = min(wait, budget)
+        snapshot = await wait_for_config_change(since, wait)
+
+    if snapshot.version == since:
+        return Response(status_code=304, headers=_config_headers(snapshot))
+
+    response.headers.update(_config_headers(snapshot))
+    return ConfigResponse(version=snapshot.version, values=snapshot.values)
+
+
+@router.get("/config/stream")
+async def stream_config(
+    since: Optional[int] = Query(default=None, description="Version the client already has"),
+    last_event_id: Optional[str] = Header(default=None),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Stream configuration versions as Server-Sent Events
+
+    Sends a `config` event (id = version, data = ConfigResponse JSON) now
+    if the client is not current, then on every change; a comment line
+    every CONFIG_SSE_HEARTBEAT_SECONDS keeps proxies from closing the
+    stream. Reconnecting clients resume from Last-Event-ID.
+
+    Args:
+        since: Version the client has (or Last-Event-ID)
+        current_user: Current authenticated user
+
+    Returns:
+        text/event-stream response
+    """
+    if since is None:
+        since = _parse_version(last_event_id)
+
+    logger.info("Config stream opened for user %s (since %s)", current_user.id, since)
+
+    async def events():
+        # -1 never matches a version: the first wait returns immediately
+        version = since if since is not None else -1
+        while True:
+            snapshot = await wait_for_config_change(version, settings.CONFIG_SSE_HEARTBEAT_SECONDS)
+            if snapshot.version == version:
+                yield ": keep-alive\n\n"
+                continue
+
+            version = snapshot.version
+            data = json.dumps({"version": version, "values": snapshot.values}, default=str)
+            yield f"id: {version}\nevent: config\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
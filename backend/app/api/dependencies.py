@@ -5,11 +5,16 @@ Shared dependencies for API endpoints.
 """
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
 
+from app.core.config import settings
 from app.core.security import verify_token
 from app.core.logging import get_logger, set_request_context
+from app.core.principal_cache import current_generation, get_principal, put_principal
+from app.core.timing import span
+from app.db import firestore_async
 from app.db.firestore_client import get_user_by_id
 from app.schemas.auth import User, UserInDB
 
@@ -25,6 +30,10 @@ async def get_current_user(
     """
     Get current authenticated user from JWT token
 
+    The user is served from the principal cache when possible; on a miss it
+    is read from Firestore (awaiting the async client, or in the threadpool
+    when FIRESTORE_ASYNC_ENABLED is off) and cached.
+
     Args:
         credentials: HTTP Authorization credentials (Bearer token)
 
@@ -38,9 +47,10 @@ async def get_current_user(
 
     # Verify token
     try:
-        payload = verify_token(token)
+        with span("jwt"):
+            payload = verify_token(token)
     except JWTError as e:
-        logger.warn(f"Invalid JWT token: {str(e)}")
+        logger.warning("Invalid JWT token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -63,21 +73,29 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Get user from database
-    user_data = get_user_by_id(user_id)
-    if not user_data:
-        logger.error(f"User {user_id} from valid token not found in database")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={
-                "error": "INVALID_CREDENTIALS",
-                "message": "Usuario no encontrado"
-            },
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    # Create User object
-    user = UserInDB(**user_data)
+    # Get user from cache, or from database on a miss
+    user = get_principal(user_id)
+    if user is None:
+        generation = current_generation(user_id)
+        with span("user"):
+            if settings.FIRESTORE_ASYNC_ENABLED:
+                user_data = await firestore_async.get_user_by_id(user_id)
+            else:
+                user_data = await run_in_threadpool(get_user_by_id, user_id)
+        if not user_data:
+            logger.error("User %s from valid token not found in database", user_id)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail={
+                    "error": "INVALID_CREDENTIALS",
+                    "message": "Usuario no encontrado"
+                },
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        # Create User object
+        user = UserInDB(**user_data)
+        put_principal(user_id, user, generation)
 
     # Set user in logging context
     set_request_context(user_id=user.id)
@@ -0,0 +1,234 @@
+"""
+Metrics Endpoint
+
+Prometheus text-format scrape target at GET /api/metrics:
+
+- request latency by route and status (MetricsMiddleware)
+- SQL Server query latency by query version, Firestore latency by function
+- pool and executor gauges (SQL connections, visit sheet fan-out, bcrypt
+  pool, request threadpool, async Firestore RPCs)
+- cache hit ratios and counters kept by the owning modules
+- log writer queue depth and dropped records, logged and suppressed
+  exceptions by type and raise site (app.core.log_storm)
+
+Histograms and counters live in app.core.metrics; everything else is read
+from its module when scraped (collect_runtime_metrics), so it costs nothing
+between scrapes.
+
+The endpoint is not public: scrapes must come from METRICS_ALLOWED_IPS
+(loopback by default) or carry the METRICS_TOKEN bearer token.
+"""
+
+import hmac
+import ipaddress
+from typing import List, Optional
+
+import anyio.to_thread
+from fastapi import APIRouter, Header, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from app.core import principal_cache, rate_limit
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from app.core.config import settings
+from app.core.logging import log_stats
+from app.core.metrics import CACHE_REQUESTS, REGISTRY, MetricFamily, cache_hit_ratio
+from app.core.password_pool import password_pool_stats
+from app.db import config_cache, firestore_async, mssql_client, visit_sheet
+from app.middleware.rate_limit import rate_limit_counters
+from app.services.token_sweeper import token_sweeper_stats
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _gauge(name: str, documentation: str, value: float) -> MetricFamily:
+    return MetricFamily(name, documentation).add(value)
+
+
+def _cache_ratios() -> MetricFamily:
+    """Hit ratio per cache (caches without reads yet are left out)"""
+    family = MetricFamily("webpv_cache_hit_ratio", "Cache hits over all reads since start", ("cache",))
+
+    principal = principal_cache.principal_cache_stats()
+    ratios = {"principal": cache_hit_ratio(principal["hits"], principal["misses"])}
+
+    counts = {}
+    for (cache, result), value in CACHE_REQUESTS.values().items():
+        counts.setdefault(cache, {"hit": 0.0, "miss": 0.0})[result] = value
+    for cache, count in counts.items():
+        ratios[cache] = cache_hit_ratio(count["hit"], count["miss"])
+
+    for cache, ratio in sorted(ratios.items()):
+        if ratio is not None:
+            family.add(ratio, cache=cache)
+    return family
+
+
+def collect_runtime_metrics() -> List[MetricFamily]:
+    """
+    Gauges and module-owned counters, read at scrape time
+
+    Returns:
+        Metric families to render after the registry's own metrics
+    """
+    families: List[MetricFamily] = []
+
+    # SQL Server connection pool and breaker
+    pool = mssql_client.pool_stats()
+    families.append(_gauge("webpv_mssql_pool_size", "SQL Server connection slots", pool["size"]))
+    families.append(
+        MetricFamily("webpv_mssql_pool_connections", "SQL Server connections by state", ("state",))
+        .add(pool["in_use"], state="in_use")
+        .add(pool["idle"], state="idle")
+    )
+    breaker = mssql_client.mssql_breaker.stats()
+    state = MetricFamily("webpv_circuit_breaker_state", "1 for the breaker's current state", ("breaker", "state"))
+    for name in (CLOSED, HALF_OPEN, OPEN):
+        state.add(1 if breaker["state"] == name else 0, breaker="mssql", state=name)
+    families.append(state)
+    families.append(
+        MetricFamily("webpv_circuit_breaker_window_calls", "Calls in the breaker window", ("breaker", "kind"))
+        .add(breaker["calls"], breaker="mssql", kind="all")
+        .add(breaker["failures"], breaker="mssql", kind="failed")
+        .add(breaker["slow_calls"], breaker="mssql", kind="slow")
+    )
+
+    # Executors
+    executor = visit_sheet.executor_stats()
+    families.append(_gauge("webpv_visit_sheet_executor_threads", "Visit sheet fan-out threads", executor["threads"]))
+    families.append(_gauge("webpv_visit_sheet_executor_queued", "Visit sheet blocks waiting for a thread", executor["queued"]))
+    try:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        families.append(
+            MetricFamily("webpv_threadpool_tokens", "Request threadpool (run_in_threadpool) slots", ("state",))
+            .add(limiter.borrowed_tokens, state="borrowed")
+            .add(limiter.total_tokens, state="total")
+        )
+    except RuntimeError:
+        pass  # Not on an event loop
+
+    # Password hashing pool
+    password = password_pool_stats()
+    families.append(_gauge("webpv_password_pool_workers", "bcrypt worker processes", password["workers"]))
+    families.append(_gauge("webpv_password_pool_in_flight", "Admitted hash operations", password["in_flight"]))
+    families.append(_gauge("webpv_password_pool_queue_depth", "Admitted hash operations beyond the workers", password["queue_depth"]))
+    families.append(
+        MetricFamily("webpv_password_pool_operations_total", "Hash operations by result", ("result",), "counter")
+        .add(password["completed"], result="completed")
+        .add(password["rejected"], result="rejected")
+        .add(password["timeouts"], result="timeout")
+        .add(password["broken"], result="broken")
+    )
+
+    # Async Firestore channel
+    firestore = firestore_async.firestore_async_stats()
+    families.append(_gauge("webpv_firestore_async_in_flight", "Concurrent async Firestore RPCs", firestore["in_flight"]))
+    families.append(
+        MetricFamily("webpv_firestore_async_rpcs_total", "Async Firestore RPCs", type_name="counter").add(firestore["rpcs"])
+    )
+
+    # Caches
+    principal = principal_cache.principal_cache_stats()
+    families.append(_gauge("webpv_principal_cache_entries", "Cached authenticated users", principal["size"]))
+    families.append(
+        MetricFamily("webpv_principal_cache_requests_total", "Principal cache reads by result", ("result",), "counter")
+        .add(principal["hits"], result="hit")
+        .add(principal["misses"], result="miss")
+    )
+    families.append(_cache_ratios())
+    families.append(_gauge("webpv_config_version", "Loaded configuration snapshot version", config_cache.config_version()))
+
+    # Rate limiting
+    limiter = rate_limit._limiter
+    if limiter is not None:
+        stats = limiter.stats()
+        families.append(_gauge("webpv_rate_limiter_keys", "Stored rate limiter keys", stats["keys"]))
+        families.append(
+            MetricFamily("webpv_rate_limiter_evictions_total", "Rate limiter keys evicted", type_name="counter")
+            .add(stats["evictions"])
+        )
+    api_limits = MetricFamily(
+        "webpv_api_rate_limit_requests_total", "Authenticated API requests by limiter decision", ("decision",), "counter"
+    )
+    for decision, count in sorted(rate_limit_counters().items()):
+        api_limits.add(count, decision=decision)
+    families.append(api_limits)
+
+    # Refresh token sweeper
+    sweeper = token_sweeper_stats()
+    families.append(
+        MetricFamily("webpv_token_sweeps_total", "Refresh token sweeps by result", ("result",), "counter")
+        .add(sweeper["runs"], result="completed")
+        .add(sweeper["skipped"], result="skipped")
+        .add(sweeper["failures"], result="failed")
+    )
+    families.append(
+        MetricFamily("webpv_token_sweep_deleted_total", "Expired refresh tokens deleted", type_name="counter")
+        .add(sweeper["deleted_total"])
+    )
+
+    # Log writer
+    logs = log_stats()
+    if logs is not None:
+        families.append(_gauge("webpv_log_queue_depth", "Log records waiting for the writer thread", logs["queued"]))
+        families.append(
+            MetricFamily("webpv_log_records_written_total", "Log records written", type_name="counter")
+            .add(logs["written"])
+        )
+        dropped = MetricFamily(
+            "webpv_log_records_dropped_total", "Log records dropped or sampled out by level", ("level",), "counter"
+        )
+        for level, count in sorted(logs["dropped"].items()):
+            dropped.add(count, level=level)
+        families.append(dropped)
+
+    return families
+
+
+REGISTRY.add_collector(collect_runtime_metrics)
+
+
+def _allowed_address(host: Optional[str]) -> bool:
+    """Whether a client address is in METRICS_ALLOWED_IPS (addresses or networks)"""
+    try:
+        address = ipaddress.ip_address(host or "")
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(allowed, strict=False) for allowed in settings.METRICS_ALLOWED_IPS)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request, authorization: Optional[str] = Header(default=None)):
+    """
+    Metrics in the Prometheus text format
+
+    Served to clients in METRICS_ALLOWED_IPS, and to any client sending
+    `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set.
+
+    Returns:
+        Prometheus text exposition
+
+    Raises:
+        HTTPException: 404 (disabled), 401 (wrong or missing token),
+                      403 (address not allowed and no token configured)
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    if not _allowed_address(request.client.host if request.client else None):
+        if not settings.METRICS_TOKEN:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail={"error": "FORBIDDEN", "message": "Métricas no disponibles desde esta dirección"},
+            )
+
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token, settings.METRICS_TOKEN):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail={"error": "INVALID_CREDENTIALS", "message": "Token de métricas inválido"},
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
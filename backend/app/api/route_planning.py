@@ -5,6 +5,8 @@ Handles route planning and client data retrieval.
 """
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from datetime import date
 
 from app.schemas.route import PlanDeRuta
@@ -12,6 +14,7 @@ from app.schemas.auth import UserInDB
 from app.api.dependencies import get_current_active_user
 from app.services.route_service import get_route_plan
 from app.core.logging import get_logger
+from app.core.timing import span
 
 logger = get_logger(__name__)
 
@@ -37,21 +40,29 @@ async def get_plan_de_ruta(
         PlanDeRuta with clients and recommendations
 
     Raises:
-        HTTPException: 401 (unauthorized), 403 (forbidden), 500 (server error)
+        HTTPException: 401 (unauthorized), 403 (forbidden), 500 (server error),
+            504 (request deadline exceeded)
     """
     # Use today's date if not provided
     if fecha is None:
         fecha = date.today()
 
-    logger.info(f"Getting route plan for user {current_user.id}, route {current_user.ruta}, date {fecha}")
+    logger.info("Getting route plan for user %s, route %s, date %s", current_user.id, current_user.ruta, fecha)
 
-    # Get route plan from service
-    plan = get_route_plan(
+    # Get route plan from service (in the threadpool, so the event loop stays
+    # free and a client disconnect can cancel the request)
+    plan = await run_in_threadpool(
+        get_route_plan,
         asesor_id=current_user.id,
         ruta=current_user.ruta,
         fecha=fecha
     )
 
-    logger.info(f"Route plan retrieved: {len(plan.clientes)} clients")
+    logger.debug("Route plan retrieved: %d clients", len(plan.clientes))
 
-    return plan
+    # Serialized here rather than by FastAPI (which would re-validate the
+    # plan against response_model first), so the stage shows as a span; the
+    # plan is already a PlanDeRuta, and response_model still documents it
+    with span("serialize"):
+        body = plan.model_dump_json()
+    return Response(body, media_type="application/json")
@@ -0,0 +1,206 @@
+"""
+Circuit Breaker
+
+Guards calls to a slow or failing dependency (SQL Server). The breaker
+tracks the outcome of the last calls in a sliding window and opens when the
+failure rate or the slow-call rate crosses its threshold. While open, calls
+fail fast with CircuitOpenError. After a cool-down a limited number of probe
+calls are let through (half-open); if they succeed the breaker closes,
+otherwise it opens again.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Tuple, Type, TypeVar
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and latency circuit breaker
+
+    Thread-safe; calls themselves run outside the lock.
+
+    Args:
+        name: Name used in logs and errors
+        failure_rate_threshold: Failure ratio (0-1) in the window that opens the breaker
+        slow_call_seconds: Calls slower than this count as slow
+        slow_call_rate_threshold: Slow-call ratio (0-1) in the window that opens the breaker
+        window_size: Number of recent calls considered
+        minimum_calls: Calls needed in the window before rates are evaluated
+        open_seconds: Cool-down before probing a half-open breaker
+        half_open_max_calls: Concurrent probe calls allowed while half-open
+        excluded: Exception types that say nothing about the dependency's
+            health (e.g. the caller ran out of time); not recorded
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        excluded: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.excluded = excluded
+
+        self._lock = threading.Lock()
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+
+    # ------------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------------
+
+    @property
+    def state(self) -> str:
+        """Current state (an open breaker past its cool-down reports half_open)"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        """Current state, moving open to half-open after the cool-down (lock held)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info("Circuit '%s' half-open, probing", self.name)
+        return self._state
+
+    def _open(self) -> None:
+        """Open the breaker (lock held)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        logger.warning("Circuit '%s' opened", self.name)
+
+    def _close(self) -> None:
+        """Close the breaker (lock held)"""
+        self._state = CLOSED
+        self._window.clear()
+        logger.info("Circuit '%s' closed", self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the breaker state and window for health/metrics"""
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._window)
+            failures = sum(1 for failed, _ in self._window if failed)
+            slow = sum(1 for _, is_slow in self._window if is_slow)
+        return {"state": state, "calls": calls, "failures": failures, "slow_calls": slow}
+
+    def reset(self) -> None:
+        """Force the breaker closed with an empty window"""
+        with self._lock:
+            self._state = CLOSED
+            self._window.clear()
+            self._probes = 0
+
+    # ------------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------------
+
+    def _before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN:
+                retry_after = self.open_seconds - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(self.name, max(retry_after, 0.0))
+            if state == HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probes += 1
+
+    def _record(self, failed: bool, duration: float) -> None:
+        """Record a call outcome and update the state"""
+        slow = duration >= self.slow_call_seconds
+
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._close()
+                return
+
+            if self._state == OPEN:
+                # Call admitted before the breaker opened
+                return
+
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls < self.minimum_calls:
+                return
+
+            failure_rate = sum(1 for f, _ in self._window if f) / calls
+            slow_rate = sum(1 for _, s in self._window if s) / calls
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open()
+
+    def _discard(self) -> None:
+        """Forget an admitted call without recording an outcome"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def call(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run func through the breaker
+
+        Args:
+            func: Callable to protect
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            Whatever func returns
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+            Exception: Whatever func raises (recorded as a failure)
+        """
+        self._before_call()
+
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except self.excluded:
+            self._discard()
+            raise
+        except Exception:
+            self._record(True, time.monotonic() - start)
+            raise
+
+        self._record(False, time.monotonic() - start)
+        return result
@@ -5,7 +5,7 @@ Uses pydantic-settings to load configuration from environment variables.
 """
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -17,6 +17,15 @@ class Settings(BaseSettings):
     APP_VERSION: str = "0.1.0"
     DEBUG: bool = True
 
+    # Logging (records are formatted and written by a background thread)
+    LOG_ASYNC_ENABLED: bool = True  # False: write each record synchronously
+    LOG_QUEUE_SIZE: int = 10000  # Queued records before new ones are dropped
+    LOG_BATCH_SIZE: int = 256  # Records per write
+    LOG_SAMPLE_THRESHOLD: float = 0.5  # Queue fill above which DEBUG/INFO records are sampled
+    LOG_SAMPLE_RATE: int = 10  # Keep 1 in N sampled records
+    LOG_STORM_BURST: int = 5  # Full logs per exception fingerprint and window (0 disables suppression)
+    LOG_STORM_WINDOW_SECONDS: float = 60.0  # Window after which suppressed repeats are summarized
+
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
@@ -27,17 +36,101 @@ class Settings(BaseSettings):
     MSSQL_USER: str = "sa"
     MSSQL_PASSWORD: str = ""
     MSSQL_DATABASE: str = "mbaFerguez"
+    MSSQL_POOL_SIZE: int = 5  # Max concurrent SQL Server connections per process
+    MSSQL_POOL_TIMEOUT_SECONDS: int = 30
+    MSSQL_LOGIN_TIMEOUT_SECONDS: int = 30
+    MSSQL_QUERY_TIMEOUT_SECONDS: int = 30  # Statement timeout (capped by the request deadline)
+    MSSQL_BACKEND: Literal["mssql", "standin"] = "mssql"  # "standin": local SQLite copy (app.db.mssql_standin)
+    MSSQL_STANDIN_PATH: str = "standin.db"  # Generate with: python -m app.db.seed_standin
+
+    # SQL Server circuit breaker (opens on failure or slow-call rate)
+    MSSQL_BREAKER_FAILURE_RATE: float = 0.5
+    MSSQL_BREAKER_SLOW_CALL_SECONDS: float = 10.0
+    MSSQL_BREAKER_SLOW_CALL_RATE: float = 0.5
+    MSSQL_BREAKER_WINDOW: int = 20  # Recent calls evaluated
+    MSSQL_BREAKER_MIN_CALLS: int = 5
+    MSSQL_BREAKER_OPEN_SECONDS: int = 30  # Cool-down before half-open probing
+
+    # Last good route plan served (marked stale) while SQL Server is unavailable
+    ROUTE_PLAN_STALE_CACHE_SIZE: int = 1000  # (ruta, fecha) entries kept
+    ROUTE_PLAN_REFRESH_MAX_WAIT_SECONDS: int = 600  # Background refresh gives up after this
+
+    # Reference data cache (coolers, HEI shops, promo lona)
+    REFERENCE_CACHE_ENABLED: bool = False  # Join reference flags in Python instead of SQL
+    REFERENCE_CACHE_REFRESH_MINUTES: int = 60
+
+    # Client master / visit calendar index (requires REFERENCE_CACHE_ENABLED)
+    CLIENT_INDEX_ENABLED: bool = False  # Resolve the day's clients in memory
+    CLIENT_INDEX_REFRESH_HOURS: int = 24
+
+    # Hoja de Visita execution: one wide batch, concurrent per-block queries,
+    # or one statement generated for the metrics the route plan reads
+    HOJA_VISITA_STRATEGY: Literal["batch", "fanout", "narrow"] = "batch"
 
     # Firestore (App Database)
     FIRESTORE_EMULATOR_HOST: Optional[str] = None  # Set to "localhost:8910" for local dev
     FIRESTORE_PROJECT_ID: str = "webpv-dev"
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None  # Path to service account JSON for production
+    FIRESTORE_TIMEOUT_SECONDS: float = 10.0  # RPC timeout (capped by the request deadline)
+    FIRESTORE_ASYNC_ENABLED: bool = True  # Auth paths await the AsyncClient instead of using the threadpool
+
+    # Configuration / feature flag cache (configuracion collection)
+    CONFIG_CACHE_ENABLED: bool = True  # Keep the snapshot current in the background
+    CONFIG_CACHE_LISTEN: bool = True  # Push changes via a snapshot listener (not used with the emulator)
+    CONFIG_CACHE_TTL_SECONDS: float = 60.0  # Polling fallback interval
+    CONFIG_LONG_POLL_MAX_SECONDS: float = 25.0  # Cap on GET /api/config?wait= (below proxy idle timeouts)
+    CONFIG_SSE_HEARTBEAT_SECONDS: float = 15.0  # Keep-alive comment interval on /api/config/stream
+
+    # Metrics (GET /api/metrics, Prometheus text format). Not public: a scrape
+    # must come from METRICS_ALLOWED_IPS or send "Authorization: Bearer <METRICS_TOKEN>".
+    # Addresses are the client as uvicorn sees it (X-Forwarded-For only from
+    # --forwarded-allow-ips proxies), so keep a same-host proxy's address out.
+    METRICS_ENABLED: bool = True
+    METRICS_ALLOWED_IPS: List[str] = ["127.0.0.1", "::1"]  # Addresses or CIDR networks
+    METRICS_TOKEN: Optional[str] = None  # Lets scrapers outside METRICS_ALLOWED_IPS in
+    SERVER_TIMING_ENABLED: bool = True  # Per-stage Server-Timing response header (spans are logged regardless)
+
+    # Request deadlines (path prefix overrides, longest prefix wins; 0 = no deadline).
+    # The config long-poll needs more than CONFIG_LONG_POLL_MAX_SECONDS and the
+    # config event stream stays open, so keep both when overriding.
+    REQUEST_TIMEOUT_SECONDS: float = 30.0
+    REQUEST_TIMEOUT_OVERRIDES: Dict[str, float] = {
+        "/api/plan-de-ruta": 60.0,
+        "/api/config": 35.0,
+        "/api/config/stream": 0,
+    }
 
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production-min-32-chars"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REFRESH_TOKEN_ROTATION: bool = False  # Issue a new refresh token on every refresh
+    REFRESH_TOKEN_LEGACY_LOOKUP: bool = True  # Also find tokens stored under unhashed IDs (disable after REFRESH_TOKEN_EXPIRE_DAYS)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 5.0  # Authenticated user cache (0 disables)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+
+    # Expired refresh token sweeper (background task, one process at a time)
+    TOKEN_SWEEP_ENABLED: bool = True
+    TOKEN_SWEEP_INTERVAL_MINUTES: int = 60
+    TOKEN_SWEEP_JITTER_SECONDS: float = 300  # Random extra delay per round
+    TOKEN_SWEEP_BATCH_SIZE: int = 500  # Tokens per page and per batched delete (max 500)
+    TOKEN_SWEEP_LEASE_SECONDS: float = 600  # Lease expiry if a sweeping process dies (renewed at half-life)
+
+    # Password hashing pool (bcrypt in worker processes)
+    PASSWORD_POOL_ENABLED: bool = True
+    PASSWORD_POOL_WORKERS: int = 0  # 0 = one per core
+    PASSWORD_POOL_QUEUE_SIZE: int = 64  # Waiting operations beyond the workers before shedding
+    PASSWORD_POOL_MAX_WAIT_SECONDS: float = 5.0
+
+    # Security headers (empty string disables CSP / HSTS)
+    SECURITY_CSP: str = (
+        "default-src 'self'; img-src 'self' data:; "
+        "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
+        "font-src 'self' https://fonts.gstatic.com; frame-ancestors 'none'"
+    )
+    SECURITY_CSP_EXEMPT: List[str] = ["/docs", "/redoc"]  # Path prefixes (Swagger UI / ReDoc load CDN assets)
+    SECURITY_HSTS: str = "max-age=31536000; includeSubDomains"
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -49,6 +142,16 @@ class Settings(BaseSettings):
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_PER_MINUTE: int = 5
     RATE_LIMIT_LOCKOUT_MINUTES: int = 15
+    RATE_LIMIT_BACKEND: Literal["memory", "sqlite"] = "memory"  # sqlite: shared by all workers on the host
+    RATE_LIMIT_SQLITE_PATH: str = "ratelimit.db"  # e.g., /dev/shm/webpv-ratelimit.db
+    RATE_LIMIT_MAX_KEYS: int = 100000  # Least recently used keys evicted beyond this
+
+    # API rate limiting (token buckets per authenticated user)
+    API_RATE_LIMIT_ENABLED: bool = True
+    API_RATE_LIMIT_USER_RATE: float = 5.0  # Requests per second, all API routes
+    API_RATE_LIMIT_USER_BURST: float = 20
+    API_RATE_LIMIT_ROUTES: Dict[str, List[float]] = {"/api/plan-de-ruta": [0.2, 5]}  # Prefix -> [rate/s, burst]
+    API_RATE_LIMIT_EXEMPT: List[str] = ["/api/health"]
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
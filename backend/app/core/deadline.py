@@ -0,0 +1,110 @@
+"""
+Request Deadlines
+
+Per-request time budget carried in a context variable. The deadline
+middleware (app.middleware.deadline) sets it for each HTTP request; database
+code asks for the remaining budget when acquiring connections and setting
+statement/RPC timeouts, so no call outlives the request that made it.
+
+Work outside a request (background refreshes, scripts) has no deadline and
+falls back to the configured timeouts.
+"""
+
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's budget is spent or its client went away"""
+
+
+class Deadline:
+    """
+    Absolute deadline for one request
+
+    Args:
+        timeout: Seconds from now until the deadline
+    """
+
+    __slots__ = ("expires_at", "cancelled")
+
+    def __init__(self, timeout: float):
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired or cancelled)"""
+        if self.cancelled:
+            return 0.0
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def cancel(self) -> None:
+        """Mark the request as abandoned; pending work stops at its next checkpoint"""
+        self.cancelled = True
+
+
+deadline_var: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def set_deadline(timeout: float) -> Token:
+    """
+    Start a deadline for the current context
+
+    Args:
+        timeout: Seconds from now until the deadline
+
+    Returns:
+        Token to restore the previous deadline with reset_deadline()
+    """
+    return deadline_var.set(Deadline(timeout))
+
+
+def reset_deadline(token: Token) -> None:
+    """Restore the deadline in place before set_deadline()"""
+    deadline_var.reset(token)
+
+
+def get_deadline() -> Optional[Deadline]:
+    """Current request deadline, or None outside a request"""
+    return deadline_var.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline"""
+    deadline = deadline_var.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check_deadline() -> None:
+    """
+    Fail fast if the current request is out of time
+
+    Raises:
+        DeadlineExceeded: If the budget is spent or the client disconnected
+    """
+    deadline = deadline_var.get()
+    if deadline is None:
+        return
+    if deadline.cancelled:
+        raise DeadlineExceeded("Client disconnected")
+    if deadline.remaining() <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def time_budget(cap: float) -> float:
+    """
+    Timeout for the next blocking call
+
+    Args:
+        cap: Configured timeout used when there is no deadline or more time left
+
+    Returns:
+        min(cap, remaining budget) in seconds
+
+    Raises:
+        DeadlineExceeded: If nothing is left of the budget
+    """
+    check_deadline()
+    left = remaining()
+    return cap if left is None else min(cap, left)
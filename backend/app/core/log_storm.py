@@ -0,0 +1,182 @@
+"""
+Exception Log Storm Suppression
+
+During an outage every request logs the same failures (e.g., "Query %s
+execution failed: %s" and an unhandled-exception traceback per plan
+request).
+ExceptionStormFilter, installed on the root handler by setup_logging,
+fingerprints each record that carries an exception (exc_info, or an
+exception passed as a %-style argument) by:
+
+- exception type
+- raise site: innermost traceback frame (file:line)
+- log site: logger name and line of the logging call
+
+The first LOG_STORM_BURST records per fingerprint in each
+LOG_STORM_WINDOW_SECONDS window are logged in full (tagged with the
+fingerprint); the rest are dropped before formatting or queueing and
+reported as one summary warning per fingerprint when the window ends.
+Every occurrence is counted in webpv_exceptions_total and suppressed ones
+in webpv_exceptions_suppressed_total, for alerting.
+
+Summaries are emitted from the logging path itself (checked at most once
+per second as records go by), so a window that ends with no further
+logging is summarized on the next record.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.metrics import REGISTRY
+
+# Fingerprints tracked at once; records with new ones beyond this are
+# logged without suppression (and counted under site="other")
+MAX_FINGERPRINTS = 1000
+
+# Seconds between checks for ended windows
+SWEEP_SECONDS = 1.0
+
+OTHER_SITE = "other"
+
+EXCEPTIONS = REGISTRY.counter(
+    "webpv_exceptions_total",
+    "Logged exceptions by type and raise site",
+    ("exception", "site"),
+)
+
+EXCEPTIONS_SUPPRESSED = REGISTRY.counter(
+    "webpv_exceptions_suppressed_total",
+    "Exception log records suppressed by the storm filter, by type and raise site",
+    ("exception", "site"),
+)
+
+summary_logger = logging.getLogger(__name__)
+
+Fingerprint = Tuple[str, str, str]  # (exception type, raise site, log site)
+
+
+def record_exception(record: logging.LogRecord) -> Optional[BaseException]:
+    """The exception a record carries (exc_info, else the first exception argument)"""
+    if record.exc_info and record.exc_info[1] is not None:
+        return record.exc_info[1]
+    if isinstance(record.args, tuple):
+        for arg in record.args:
+            if isinstance(arg, BaseException):
+                return arg
+    return None
+
+
+def fingerprint(record: logging.LogRecord, exc: BaseException) -> Fingerprint:
+    """
+    Fingerprint of an exception log record
+
+    Args:
+        record: Log record
+        exc: Exception it carries
+
+    Returns:
+        (exception type, raise site, log site)
+    """
+    tb = exc.__traceback__
+    if tb is not None:
+        while tb.tb_next is not None:
+            tb = tb.tb_next
+        raise_site = f"{os.path.basename(tb.tb_frame.f_code.co_filename)}:{tb.tb_lineno}"
+    else:
+        raise_site = OTHER_SITE  # Never raised (constructed and logged)
+    return type(exc).__qualname__, raise_site, f"{record.name}:{record.lineno}"
+
+
+def fingerprint_id(key: Fingerprint) -> str:
+    """Short stable ID of a fingerprint, for grouping log lines"""
+    return hashlib.sha1("|".join(key).encode()).hexdigest()[:12]
+
+
+class _Window:
+    __slots__ = ("started", "logged", "suppressed", "id")
+
+    def __init__(self, started: float, key: Fingerprint):
+        self.started = started
+        self.logged = 0
+        self.suppressed = 0
+        self.id = fingerprint_id(key)
+
+
+class ExceptionStormFilter(logging.Filter):
+    """Handler filter logging the first `burst` records per fingerprint and window"""
+
+    def __init__(self, burst: int = 5, window_seconds: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window_seconds
+        self._windows: Dict[Fingerprint, _Window] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + SWEEP_SECONDS
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Whether to log the record (False: suppressed, counted for the summary)"""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._emit_summaries(self._sweep(now))
+
+        exc = record_exception(record)
+        if exc is None:
+            return True
+
+        key = fingerprint(record, exc)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None and len(self._windows) < MAX_FINGERPRINTS:
+                window = self._windows[key] = _Window(now, key)
+
+            if window is None:
+                allowed = True  # Too many fingerprints to track
+            elif window.logged < self.burst:
+                window.logged += 1
+                allowed = True
+            else:
+                window.suppressed += 1
+                allowed = False
+
+        site = key[1] if window is not None else OTHER_SITE
+        EXCEPTIONS.inc(exception=key[0], site=site)
+        if not allowed:
+            EXCEPTIONS_SUPPRESSED.inc(exception=key[0], site=site)
+            return False
+
+        if window is not None:
+            record.fingerprint = window.id
+        return True
+
+    def _sweep(self, now: float) -> List[Tuple[Fingerprint, _Window]]:
+        """Remove ended windows, returning those with suppressed records"""
+        with self._lock:
+            if now < self._next_sweep:
+                return []  # Another thread swept meanwhile
+            self._next_sweep = now + SWEEP_SECONDS
+            ended = [(key, w) for key, w in self._windows.items() if now - w.started >= self.window]
+            for key, _ in ended:
+                del self._windows[key]
+        return [(key, w) for key, w in ended if w.suppressed]
+
+    def _emit_summaries(self, ended: List[Tuple[Fingerprint, _Window]]) -> None:
+        for (exception, raise_site, log_site), window in ended:
+            summary_logger.warning(
+                "Suppressed %d more %s (raised at %s, logged at %s) in the last %.0f s",
+                window.suppressed, exception, raise_site, log_site, self.window,
+                extra={
+                    "fingerprint": window.id,
+                    "context": {"logged": window.logged, "suppressed": window.suppressed},
+                },
+            )
+
+    def flush(self) -> None:
+        """Summarize and reset every window now"""
+        with self._lock:
+            ended = [(key, w) for key, w in self._windows.items() if w.suppressed]
+            self._windows.clear()
+        self._emit_summaries(ended)
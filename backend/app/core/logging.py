@@ -2,19 +2,38 @@
 Structured Logging Configuration
 
 Provides JSON-formatted logging with context information.
+
+Records are written off the request path: AsyncLogHandler puts each record
+on a bounded queue, and a writer thread formats them (orjson) and writes
+them to stdout in batches. Request and user IDs are captured when the
+record is queued; the message itself is only built on the writer thread,
+so pass %-style arguments (logger.info("... %s", value)) rather than
+f-strings on hot paths. When the queue backs up, DEBUG/INFO records are
+sampled and, once it is full, records are dropped rather than blocking the
+caller; drops are counted (log_stats) and reported in a periodic warning.
 """
 
 import logging
+import queue
 import sys
-import json
+import threading
+import time
+from collections import Counter
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, TextIO
 from contextvars import ContextVar
 
+import orjson
+
 # Context variable for request ID
 request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
 user_id_var: ContextVar[Optional[str]] = ContextVar("user_id", default=None)
 
+# Seconds between "records dropped" warnings while the queue is saturated
+DROP_REPORT_SECONDS = 10.0
+
+_UNSET = object()
+
 
 class StructuredFormatter(logging.Formatter):
     """
@@ -24,22 +43,30 @@ class StructuredFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON"""
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
         }
 
-        # Add request ID if available
-        request_id = request_id_var.get()
+        # Add request / user ID: captured when queued (AsyncLogHandler), else current
+        request_id = record.__dict__.get("request_id", _UNSET)
+        if request_id is _UNSET:
+            request_id = request_id_var.get()
         if request_id:
             log_data["request_id"] = request_id
 
-        # Add user ID if available
-        user_id = user_id_var.get()
+        user_id = record.__dict__.get("user_id", _UNSET)
+        if user_id is _UNSET:
+            user_id = user_id_var.get()
         if user_id:
             log_data["user_id"] = user_id
 
+        # Add exception fingerprint (app.core.log_storm) if set
+        fingerprint = getattr(record, "fingerprint", None)
+        if fingerprint:
+            log_data["fingerprint"] = fingerprint
+
         # Add extra context if provided
         if hasattr(record, "context") and record.context:
             log_data["context"] = record.context
@@ -48,20 +75,209 @@ class StructuredFormatter(logging.Formatter):
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
 
-        return json.dumps(log_data)
+        return orjson.dumps(log_data, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# ============================================================================
+# Asynchronous Handler
+# ============================================================================
+
+_STOP = object()
+
+
+class AsyncLogHandler(logging.Handler):
+    """
+    Handler that queues records for a writer thread
+
+    emit() never blocks: it captures the logging context and enqueues the
+    record. Above sample_threshold (fraction of the queue in use) only one
+    in sample_rate DEBUG/INFO records is kept; with the queue full, any
+    record is dropped.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        sample_threshold: float = 0.5,
+        sample_rate: int = 10
+    ):
+        super().__init__()
+        self.stream = stream
+        self.batch_size = max(1, batch_size)
+        self.sample_above = max(1, int(queue_size * sample_threshold))
+        self.sample_rate = max(1, sample_rate)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._sampled = 0
+        self._dropped: Counter = Counter()
+        self._dropped_reported = 0
+        self._last_report = time.monotonic()
+        self._written = 0
+        self._stats_lock = threading.Lock()
+
+        self._writer = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._writer.start()
+
+    # ------------------------------------------------------------------------
+    # Caller side
+    # ------------------------------------------------------------------------
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Queue a record (or count it as dropped)"""
+        if record.levelno < logging.WARNING and self._queue.qsize() >= self.sample_above:
+            self._sampled += 1  # Racy across threads; only thins the sample
+            if self._sampled % self.sample_rate:
+                self._drop(record)
+                return
+
+        # Context variables are not visible on the writer thread
+        record.request_id = request_id_var.get()
+        record.user_id = user_id_var.get()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._drop(record)
+
+    def _drop(self, record: logging.LogRecord) -> None:
+        with self._stats_lock:
+            self._dropped[record.levelname] += 1
+
+    # ------------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------------
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            batch: List[logging.LogRecord] = []
+            while True:
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._write(batch + self._drop_report(stopping))
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                self._queue.task_done()
+
+    def _drop_report(self, force: bool) -> List[logging.LogRecord]:
+        """A warning record for drops since the last report, if it's time"""
+        now = time.monotonic()
+        with self._stats_lock:
+            total = sum(self._dropped.values())
+            new = total - self._dropped_reported
+            if not new or (not force and now - self._last_report < DROP_REPORT_SECONDS):
+                return []
+            self._dropped_reported = total
+            self._last_report = now
+            dropped = dict(self._dropped)
+
+        return [logging.makeLogRecord({
+            "name": __name__,
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": "Log queue saturated, %d records dropped or sampled out",
+            "args": (new,),
+            "context": {"dropped_total": dropped},
+        })]
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        if not batch:
+            return
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            self.handleError(batch[0])
+        with self._stats_lock:
+            self._written += len(lines)
+
+    # ------------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------------
+
+    def flush(self) -> None:
+        """Wait until every queued record is written"""
+        if self._writer.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write what is queued and stop the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout=5)
+        super().close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and capacity, records written and dropped by level"""
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "written": self._written,
+                "dropped": dict(self._dropped),
+            }
+
+
+_async_handler: Optional[AsyncLogHandler] = None
+
+
+def log_stats() -> Optional[Dict[str, Any]]:
+    """Stats of the asynchronous handler, or None when logging synchronously"""
+    return _async_handler.stats() if _async_handler is not None else None
 
 
 def setup_logging(log_level: str = "INFO") -> None:
     """
     Configure application logging
 
+    Uses AsyncLogHandler when LOG_ASYNC_ENABLED is on (logging.shutdown
+    writes what is still queued at exit), else a plain StreamHandler, with
+    the exception storm filter (app.core.log_storm) unless LOG_STORM_BURST
+    is 0.
+
     Args:
         log_level: Logging level (DEBUG, INFO, WARN, ERROR)
     """
+    global _async_handler
+    from app.core.config import settings
+
     # Create handler for stdout
-    handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_ASYNC_ENABLED:
+        handler = AsyncLogHandler(
+            sys.stdout,
+            queue_size=settings.LOG_QUEUE_SIZE,
+            batch_size=settings.LOG_BATCH_SIZE,
+            sample_threshold=settings.LOG_SAMPLE_THRESHOLD,
+            sample_rate=settings.LOG_SAMPLE_RATE,
+        )
+        _async_handler = handler
+    else:
+        handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(StructuredFormatter())
 
+    # Repeated exceptions are summarized instead of logged in full
+    if settings.LOG_STORM_BURST > 0:
+        from app.core.log_storm import ExceptionStormFilter
+        handler.addFilter(ExceptionStormFilter(settings.LOG_STORM_BURST, settings.LOG_STORM_WINDOW_SECONDS))
+
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, log_level.upper()))
@@ -106,16 +322,19 @@ def clear_request_context() -> None:
 
 
 # Helper function for logging with context
-def log_with_context(logger: logging.Logger, level: str, message: str, **context: Any) -> None:
+def log_with_context(logger: logging.Logger, level: str, message: str, *args: Any, **context: Any) -> None:
     """
     Log a message with additional context
 
     Args:
         logger: Logger instance
         level: Log level (debug, info, warn, error)
-        message: Log message
+        message: Log message (%-style, formatted lazily with args)
+        *args: Message arguments
         **context: Additional context to include
     """
+    if not logger.isEnabledFor(logging.getLevelName(level.upper())):
+        return
     log_method = getattr(logger, level.lower())
     extra = {"context": context} if context else {}
-    log_method(message, extra=extra)
+    log_method(message, *args, extra=extra)
@@ -0,0 +1,371 @@
+"""
+Metrics Registry
+
+In-process counters and histograms rendered in the Prometheus text format
+(served at /api/metrics, see app.api.metrics), without a client library.
+
+Hot-path cost: a labelled series is looked up in a dict without locking
+(created under the metric's lock the first time), and an update takes only
+that series' own lock for a few additions, so concurrent requests on
+different routes or queries never contend.
+
+Gauges (pool sizes, queue depths, cache sizes) are not stored here: they are
+read from the owning modules when the endpoint is scraped.
+"""
+
+import asyncio
+import bisect
+import functools
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; request and SQL buckets extend to the longest request deadline
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+
+
+# ============================================================================
+# Text Format
+# ============================================================================
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ============================================================================
+# Metric Types
+# ============================================================================
+
+class _Metric:
+    """Named metric with a fixed set of label names"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self) -> Any:
+        raise NotImplementedError
+
+    def _get(self, labels: Dict[str, Any]) -> Any:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def labels(self, **labels: Any) -> Any:
+        """Series for these label values (bind once to skip the lookup)"""
+        return self._get(labels)
+
+    def clear(self) -> None:
+        """Zero every series (tests; bound series stay valid)"""
+        with self._lock:
+            for series in self._series.values():
+                series.reset()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, series in sorted(self._series.items()):
+            lines.extend(series.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterSeries:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.value = 0.0
+
+    def render(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def _new_series(self) -> _CounterSeries:
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """Add to the series for these labels"""
+        self._get(labels).inc(amount)
+
+    def value(self, **labels: Any) -> float:
+        """Current value of one series (0 if never incremented)"""
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series.value if series is not None else 0.0
+
+    def values(self) -> Dict[LabelValues, float]:
+        """Current value of every series"""
+        return {key: series.value for key, series in list(self._series.items())}
+
+
+class _HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot: above the largest bound
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def render(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(labelnames + ("le",), key + (_format_value(bound),))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (e.g., durations in seconds)"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record one value in the series for these labels"""
+        self._get(labels).observe(value)
+
+    def count(self, **labels: Any) -> int:
+        """Observations in one series (0 if none)"""
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series.count if series is not None else 0
+
+
+class MetricFamily:
+    """Values collected at scrape time (gauges, or counters kept by other modules)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), type_name: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.type_name = type_name
+        self.samples: List[Tuple[LabelValues, float]] = []
+
+    def add(self, value: float, **labels: Any) -> "MetricFamily":
+        self.samples.append((tuple(str(labels[name]) for name in self.labelnames), value))
+        return self
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, value in self.samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+# ============================================================================
+# Registry
+# ============================================================================
+
+class Registry:
+    """Metrics and scrape-time collectors, rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Add a function returning metric families, called on every scrape"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def clear(self) -> None:
+        """Zero every series (tests)"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (0.0.4)
+
+        A failing collector is skipped, so one broken gauge source doesn't
+        take the whole scrape down.
+        """
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in list(self._collectors):
+            try:
+                families = list(collector())
+            except Exception:
+                continue
+            for family in families:
+                lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ============================================================================
+# Application Metrics
+# ============================================================================
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "webpv_http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ("method", "route", "status"),
+)
+
+SQL_QUERY_SECONDS = REGISTRY.histogram(
+    "webpv_sql_query_duration_seconds",
+    "SQL Server query latency by query (version) and outcome",
+    ("query", "outcome"),
+)
+
+FIRESTORE_OP_SECONDS = REGISTRY.histogram(
+    "webpv_firestore_operation_duration_seconds",
+    "Firestore data layer operation latency by function",
+    ("client", "op", "outcome"),
+    buckets=FAST_BUCKETS,
+)
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "webpv_cache_requests_total",
+    "Snapshot cache reads served from memory (hit) or by loading (miss)",
+    ("cache", "result"),
+)
+
+
+def timed(histogram: Histogram, **labels: Any) -> Callable[[Callable], Callable]:
+    """
+    Decorator observing each call's duration in `histogram`
+
+    The series is labelled with `labels`, op (the function's qualified name)
+    and outcome ("ok" or "error"). Works on plain and async functions.
+
+    Args:
+        histogram: Histogram with labelnames covering labels, op and outcome
+        **labels: Fixed label values (e.g., client="sync")
+
+    Returns:
+        Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        ok = histogram.labels(**labels, op=func.__qualname__, outcome="ok")
+        error = histogram.labels(**labels, op=func.__qualname__, outcome="error")
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    error.observe(time.perf_counter() - started)
+                    raise
+                ok.observe(time.perf_counter() - started)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                error.observe(time.perf_counter() - started)
+                raise
+            ok.observe(time.perf_counter() - started)
+            return result
+        return wrapper
+
+    return decorator
+
+
+def cache_hit_ratio(hits: float, misses: float) -> Optional[float]:
+    """Hits over all reads, or None before the first read"""
+    total = hits + misses
+    return hits / total if total else None
@@ -0,0 +1,279 @@
+"""
+Password Hashing Pool
+
+Runs bcrypt hashing and verification in a process pool sized to the cores,
+so a login storm uses every core and never blocks the event loop or holds
+the GIL for the rest of the app.
+
+Admission is bounded: at most PASSWORD_POOL_WORKERS + PASSWORD_POOL_QUEUE_SIZE
+operations are admitted at once, and each waits at most
+PASSWORD_POOL_MAX_WAIT_SECONDS (capped by the request deadline). Anything
+beyond that is shed with PasswordPoolSaturated (503) instead of queueing
+until clients time out.
+
+A worker that dies (killed, out of memory) breaks the whole pool: the
+operations it affected are shed the same way, and the broken pool is
+dropped so the next operation starts a new one.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import time_budget
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Hash timings kept for percentiles
+TIMING_SAMPLES = 1024
+
+
+class PasswordPoolSaturated(Exception):
+    """The pool's admission queue is full or the wait bound was reached"""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Password pool saturated, retry after {retry_after}s")
+
+
+# ============================================================================
+# Worker Functions (run in the pool processes)
+# ============================================================================
+
+def _timed_verify(plain_password: str, hashed_password: str) -> Tuple[bool, float]:
+    from app.core.security import verify_password
+
+    started = time.perf_counter()
+    result = verify_password(plain_password, hashed_password)
+    return result, time.perf_counter() - started
+
+
+def _timed_hash(plain_password: str) -> Tuple[str, float]:
+    from app.core.security import hash_password
+
+    started = time.perf_counter()
+    result = hash_password(plain_password)
+    return result, time.perf_counter() - started
+
+
+# ============================================================================
+# Pool
+# ============================================================================
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_state_lock = threading.Lock()
+_admitted = 0
+_completed = 0
+_rejected = 0
+_timeouts = 0
+_broken = 0
+_hash_seconds: deque = deque(maxlen=TIMING_SAMPLES)
+
+
+def pool_size() -> int:
+    """Worker processes (PASSWORD_POOL_WORKERS, or one per core when 0)"""
+    return settings.PASSWORD_POOL_WORKERS or os.cpu_count() or 1
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that already runs threads can
+            # inherit locks held by those threads
+            _executor = ProcessPoolExecutor(
+                max_workers=pool_size(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info("Password pool started with %d workers", pool_size())
+        return _executor
+
+
+def _discard_executor(executor: Optional[ProcessPoolExecutor]) -> None:
+    """Drop a broken pool so the next _get_executor() starts a new one"""
+    global _executor
+
+    if executor is None:
+        return
+    with _executor_lock:
+        if _executor is not executor:
+            return  # Already dropped or replaced after another failure
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+    logger.error("Password pool broken (a worker died), starting a new one on next use")
+
+
+def start_password_pool() -> None:
+    """Start the worker processes ahead of the first login"""
+    executor = _get_executor()
+    for future in [executor.submit(os.getpid) for _ in range(pool_size())]:
+        future.result()
+
+
+def shutdown_password_pool() -> None:
+    """Stop the worker processes"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+def _release(future: Future) -> None:
+    global _admitted, _completed
+
+    with _state_lock:
+        _admitted -= 1
+        if not future.cancelled() and future.exception() is None:
+            _completed += 1
+            _hash_seconds.append(future.result()[1])
+
+
+def _run(func: Callable[..., Tuple[Any, float]], *args: Any) -> Any:
+    """
+    Run a worker function with bounded admission and wait
+
+    Raises:
+        PasswordPoolSaturated: If the queue is full, the wait bound expired
+            or the pool broke
+        DeadlineExceeded: If the request has no time left
+    """
+    global _admitted, _rejected, _timeouts, _broken
+
+    wait = time_budget(settings.PASSWORD_POOL_MAX_WAIT_SECONDS)
+    capacity = pool_size() + settings.PASSWORD_POOL_QUEUE_SIZE
+    retry_after = max(1, int(settings.PASSWORD_POOL_MAX_WAIT_SECONDS))
+
+    with _state_lock:
+        if _admitted >= capacity:
+            _rejected += 1
+            raise PasswordPoolSaturated(retry_after)
+        _admitted += 1
+
+    executor = None
+    try:
+        executor = _get_executor()
+        future = executor.submit(func, *args)
+    except BrokenProcessPool as e:
+        with _state_lock:
+            _admitted -= 1
+            _broken += 1
+        _discard_executor(executor)
+        raise PasswordPoolSaturated(retry_after) from e
+    except Exception:
+        with _state_lock:
+            _admitted -= 1
+        raise
+
+    future.add_done_callback(_release)
+
+    try:
+        return future.result(timeout=wait)[0]
+    except (FutureTimeoutError, CancelledError):
+        future.cancel()
+        with _state_lock:
+            _timeouts += 1
+        logger.warning("Password pool wait bound reached, shedding request")
+        raise PasswordPoolSaturated(retry_after)
+    except BrokenProcessPool as e:
+        with _state_lock:
+            _broken += 1
+        _discard_executor(executor)
+        raise PasswordPoolSaturated(retry_after) from e
+
+
+def verify_password_pooled(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password in the pool
+
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Hashed password to compare against
+
+    Returns:
+        True if password matches, False otherwise
+
+    Raises:
+        PasswordPoolSaturated: If the pool cannot take the request in time
+    """
+    if not settings.PASSWORD_POOL_ENABLED:
+        return _timed_verify(plain_password, hashed_password)[0]
+    return _run(_timed_verify, plain_password, hashed_password)
+
+
+def hash_password_pooled(plain_password: str) -> str:
+    """
+    Hash a password in the pool
+
+    Args:
+        plain_password: Plain text password
+
+    Returns:
+        Hashed password
+
+    Raises:
+        PasswordPoolSaturated: If the pool cannot take the request in time
+    """
+    if not settings.PASSWORD_POOL_ENABLED:
+        return _timed_hash(plain_password)[0]
+    return _run(_timed_hash, plain_password)
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+def password_pool_stats() -> Dict[str, Any]:
+    """
+    Pool gauges and counters
+
+    Returns:
+        workers, in_flight (admitted), queue_depth (admitted beyond the
+        workers), completed, rejected, timeouts, broken (operations lost
+        to a dead worker), and hash time p50/p99/max in milliseconds over
+        the last TIMING_SAMPLES operations
+    """
+    with _state_lock:
+        samples = sorted(_hash_seconds)
+        admitted = _admitted
+        stats = {
+            "workers": pool_size(),
+            "in_flight": admitted,
+            "queue_depth": max(admitted - pool_size(), 0),
+            "completed": _completed,
+            "rejected": _rejected,
+            "timeouts": _timeouts,
+            "broken": _broken,
+        }
+
+    def at(q: float) -> float:
+        if not samples:
+            return 0.0
+        return round(samples[min(int(q * len(samples)), len(samples) - 1)] * 1000, 1)
+
+    stats.update(hash_ms_p50=at(0.5), hash_ms_p99=at(0.99), hash_ms_max=at(1.0))
+    return stats
+
+
+def reset_password_pool_stats() -> None:
+    """Reset counters and timings (tests)"""
+    global _completed, _rejected, _timeouts, _broken
+
+    with _state_lock:
+        _completed = 0
+        _rejected = 0
+        _timeouts = 0
+        _broken = 0
+        _hash_seconds.clear()
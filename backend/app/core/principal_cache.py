@@ -0,0 +1,147 @@
+"""
+Principal Cache
+
+Per-process cache of authenticated users (UserInDB) keyed by user ID, so
+authenticated requests don't read the user document from Firestore every
+time after the JWT is verified.
+
+Entries live PRINCIPAL_CACHE_TTL_SECONDS and the cache holds at most
+PRINCIPAL_CACHE_SIZE users (least recently used evicted first). Writes to a
+user through firestore_client invalidate its entry immediately; changes made
+by other processes (or directly in the console) are picked up within the TTL.
+
+A load that raced a write to the same user is not stored: each user has a
+generation (the stamp of its last invalidation), read before the load and
+checked when storing, so writes to other users don't discard it.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# user_id -> (expires_at, user), in LRU order (most recent last)
+_entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+_lock = threading.Lock()
+
+# Bumped on every invalidation
+_clock = 0
+
+# user_id -> _clock at its last invalidation, oldest first (at most
+# PRINCIPAL_CACHE_SIZE users; dropped stamps are folded into _floor)
+_invalidated: "OrderedDict[str, int]" = OrderedDict()
+
+# Generation of users without a stamp in _invalidated
+_floor = 0
+
+_hits = 0
+_misses = 0
+
+
+def get_principal(user_id: str) -> Optional[Any]:
+    """
+    Get a cached user
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Cached user, or None if missing or expired
+    """
+    global _hits, _misses
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del _entries[user_id]
+            _misses += 1
+            return None
+        _entries.move_to_end(user_id)
+        _hits += 1
+        return entry[1]
+
+
+def _generation(user_id: str) -> int:
+    """A user's generation (caller holds _lock)"""
+    return _invalidated.get(user_id, _floor)
+
+
+def current_generation(user_id: str) -> int:
+    """
+    Generation to pass to put_principal, read before loading the user
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        The user's generation
+    """
+    with _lock:
+        return _generation(user_id)
+
+
+def put_principal(user_id: str, user: Any, generation: int) -> None:
+    """
+    Cache a user loaded from the database
+
+    The entry is dropped if the user was invalidated since `generation`
+    was read, since the loaded data may predate that write.
+
+    Args:
+        user_id: User ID
+        user: User to cache
+        generation: Value of current_generation(user_id) taken before the load
+    """
+    ttl = settings.PRINCIPAL_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        return
+
+    with _lock:
+        if generation != _generation(user_id):
+            return
+        _entries[user_id] = (time.monotonic() + ttl, user)
+        _entries.move_to_end(user_id)
+        while len(_entries) > settings.PRINCIPAL_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def invalidate_principal(user_id: str) -> None:
+    """
+    Drop a user's entry after it was written (update, block, deactivation)
+
+    Args:
+        user_id: User ID
+    """
+    global _clock, _floor
+
+    with _lock:
+        _clock += 1
+        _invalidated[user_id] = _clock
+        _invalidated.move_to_end(user_id)
+        while len(_invalidated) > settings.PRINCIPAL_CACHE_SIZE:
+            # Users without a stamp now read as the newest dropped one
+            _, _floor = _invalidated.popitem(last=False)
+        _entries.pop(user_id, None)
+
+
+def clear_principal_cache() -> None:
+    """Drop all entries and reset counters (tests and reseeding)"""
+    global _clock, _floor, _hits, _misses
+
+    with _lock:
+        _clock += 1
+        _floor = _clock
+        _invalidated.clear()
+        _entries.clear()
+        _hits = 0
+        _misses = 0
+
+
+def principal_cache_stats() -> Dict[str, int]:
+    """Current size and hit/miss counters"""
+    with _lock:
+        return {"size": len(_entries), "hits": _hits, "misses": _misses}
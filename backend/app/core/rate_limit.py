@@ -0,0 +1,396 @@
+"""
+Rate Limiting
+
+Constant-memory rate limiting primitives over pluggable state backends:
+
+- Sliding-window counters (two fixed windows, the previous one weighted by
+  its overlap with the sliding window): three numbers per key
+- Token buckets: two numbers per key
+- Locks: one number per key
+
+Every key carries a TTL after which its state is irrelevant (a window pair
+that has fully slid out, a bucket that has refilled, an expired lock), so
+backends can evict it. Backends:
+
+- memory: per-process LRU dict bounded by RATE_LIMIT_MAX_KEYS
+- sqlite: local SQLite file shared by every worker process on the host
+  (put it on /dev/shm to keep it in shared memory), so limits do not
+  multiply with the number of uvicorn workers
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+State = Tuple[float, ...]
+
+# Mutation applied atomically by a backend: old state (or None) -> (new state or None, result)
+Update = Callable[[Optional[State]], Tuple[Optional[State], object]]
+
+
+# ============================================================================
+# Backends
+# ============================================================================
+
+class RateLimitBackend:
+    """Key -> small state tuple store with per-key TTL"""
+
+    def update(self, key: str, func: Update, ttl: float) -> object:
+        """
+        Atomically apply func to a key's state
+
+        Args:
+            key: Limiter key
+            func: Receives the current state (None if missing or expired) and
+                returns (new state, result); a None state deletes the key
+            ttl: Seconds until the new state may be evicted
+
+        Returns:
+            The result returned by func
+        """
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[State]:
+        """Current state of a key (None if missing or expired), without touching its TTL"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop every key"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    In-process backend
+
+    Args:
+        max_keys: Least recently used keys are evicted beyond this count
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.evictions = 0
+        # key -> (expires_at, state), in LRU order (most recent last)
+        self._entries: "OrderedDict[str, Tuple[float, State]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key: str, func: Update, ttl: float) -> object:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            current = entry[1] if entry is not None and entry[0] > now else None
+
+            state, result = func(current)
+
+            if state is None:
+                self._entries.pop(key, None)
+                return result
+
+            self._entries[key] = (now + ttl, state)
+            self._entries.move_to_end(key)
+            # Least recently used first: expired keys are usually among them
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return result
+
+    def get(self, key: str) -> Optional[State]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry is not None and entry[0] > time.monotonic() else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend(RateLimitBackend):
+    """
+    Backend shared across processes through a local SQLite file
+
+    Each update runs in an IMMEDIATE transaction, so concurrent workers
+    serialize on the file lock. Expired keys are swept every SWEEP_EVERY
+    writes, which also trims the table to max_keys (soonest to expire first).
+
+    Args:
+        path: Database file (e.g., /dev/shm/webpv-ratelimit.db)
+        max_keys: Upper bound on stored keys
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path: str, max_keys: int):
+        self.path = path
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "key TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_expires ON rate_limit (expires_at)")
+
+    def update(self, key: str, func: Update, ttl: float) -> object:
+        # Wall clock: the expiry is compared across processes
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT state, expires_at FROM rate_limit WHERE key = ?", (key,)
+                ).fetchone()
+                current = tuple(json.loads(row[0])) if row is not None and row[1] > now else None
+
+                state, result = func(current)
+
+                if state is None:
+                    self._conn.execute("DELETE FROM rate_limit WHERE key = ?", (key,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO rate_limit (key, state, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(state), now + ttl)
+                    )
+                    self._writes += 1
+                    if self._writes % self.SWEEP_EVERY == 0:
+                        self._sweep(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def get(self, key: str) -> Optional[State]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, expires_at FROM rate_limit WHERE key = ?", (key,)
+            ).fetchone()
+        return tuple(json.loads(row[0])) if row is not None and row[1] > now else None
+
+    def _sweep(self, now: float) -> None:
+        self.evictions += self._conn.execute("DELETE FROM rate_limit WHERE expires_at <= ?", (now,)).rowcount
+        excess = len(self) - self.max_keys
+        if excess > 0:
+            self.evictions += self._conn.execute(
+                "DELETE FROM rate_limit WHERE key IN "
+                "(SELECT key FROM rate_limit ORDER BY expires_at LIMIT ?)", (excess,)
+            ).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit")
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+
+
+# ============================================================================
+# Limiter
+# ============================================================================
+
+@dataclass(frozen=True)
+class Decision:
+    """Outcome of a rate-limited action"""
+    allowed: bool
+    retry_after: float  # Seconds until the action would be allowed (0 if allowed)
+    remaining: float  # Hits or tokens left after this action
+
+
+class RateLimiter:
+    """
+    Rate limiting algorithms over a backend
+
+    Args:
+        backend: State store
+    """
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    # ------------------------------------------------------------------
+    # Sliding window
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _window_estimate(state: Optional[State], window: float, now: float) -> Tuple[float, float, float]:
+        """Roll a (window_start, previous, current) state forward to now"""
+        start = math.floor(now / window) * window
+        if state is None:
+            return start, 0.0, 0.0
+
+        old_start, previous, current = state
+        if old_start == start:
+            return start, previous, current
+        if old_start == start - window:
+            return start, current, 0.0
+        return start, 0.0, 0.0
+
+    def window_count(self, key: str, window: float) -> float:
+        """
+        Approximate hits on key in the last `window` seconds
+
+        Args:
+            key: Limiter key
+            window: Window length in seconds
+        """
+        now = time.time()
+        start, previous, current = self._window_estimate(self.backend.get(key), window, now)
+        weight = 1 - (now - start) / window
+        return previous * weight + current
+
+    def window_hit(self, key: str, limit: int, window: float, cost: float = 1) -> Decision:
+        """
+        Record a hit on key if it stays within `limit` per `window`
+
+        Args:
+            key: Limiter key
+            limit: Maximum hits per sliding window
+            window: Window length in seconds
+            cost: Weight of this hit
+
+        Returns:
+            Decision (a denied hit is not recorded)
+        """
+        now = time.time()
+
+        def hit(state):
+            start, previous, current = self._window_estimate(state, window, now)
+            weight = 1 - (now - start) / window
+            count = previous * weight + current
+            if count + cost > limit:
+                # The previous window's share decays linearly until the window ends
+                retry = start + window - now
+                if previous > 0:
+                    retry = min(retry, (count + cost - limit) / previous * window)
+                return (start, previous, current), Decision(False, max(retry, 0.001), max(limit - count, 0))
+            return (start, previous, current + cost), Decision(True, 0.0, limit - count - cost)
+
+        return self.backend.update(key, hit, ttl=2 * window)
+
+    def record(self, key: str, window: float, cost: float = 1) -> float:
+        """
+        Record a hit on key without a limit
+
+        Returns:
+            Approximate hits in the sliding window, this one included
+        """
+        now = time.time()
+
+        def hit(state):
+            start, previous, current = self._window_estimate(state, window, now)
+            weight = 1 - (now - start) / window
+            return (start, previous, current + cost), previous * weight + current + cost
+
+        return self.backend.update(key, hit, ttl=2 * window)
+
+    # ------------------------------------------------------------------
+    # Token bucket
+    # ------------------------------------------------------------------
+
+    def take_token(self, key: str, rate: float, burst: float, cost: float = 1) -> Decision:
+        """
+        Take tokens from key's bucket
+
+        Args:
+            key: Limiter key
+            rate: Refill rate in tokens per second
+            burst: Bucket capacity
+            cost: Tokens needed
+
+        Returns:
+            Decision (nothing is taken when denied)
+        """
+        now = time.time()
+
+        def take(state):
+            if state is None:
+                tokens = burst
+            else:
+                tokens, updated = state
+                tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < cost:
+                return (tokens, now), Decision(False, (cost - tokens) / rate, tokens)
+            return (tokens - cost, now), Decision(True, 0.0, tokens - cost)
+
+        return self.backend.update(key, take, ttl=burst / rate)
+
+    # ------------------------------------------------------------------
+    # Locks and reset
+    # ------------------------------------------------------------------
+
+    def lock(self, key: str, seconds: float) -> None:
+        """Lock key for `seconds`"""
+        until = time.time() + seconds
+        self.backend.update(key, lambda state: ((until,), None), ttl=seconds)
+
+    def locked_for(self, key: str) -> float:
+        """Seconds left on key's lock (0 if not locked)"""
+        state = self.backend.get(key)
+        now = time.time()
+        if state is None or state[0] <= now:
+            return 0.0
+        return state[0] - now
+
+    def reset(self, key: str) -> None:
+        """Forget key"""
+        self.backend.update(key, lambda state: (None, None), ttl=0)
+
+    def clear(self) -> None:
+        """Forget every key"""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Stored keys and evictions"""
+        return {"keys": len(self.backend), "evictions": getattr(self.backend, "evictions", 0)}
+
+
+# ============================================================================
+# Shared Instance
+# ============================================================================
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def create_backend() -> RateLimitBackend:
+    """Backend selected by RATE_LIMIT_BACKEND"""
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        logger.info("Rate limiting shared through %s", settings.RATE_LIMIT_SQLITE_PATH)
+        return SQLiteBackend(settings.RATE_LIMIT_SQLITE_PATH, settings.RATE_LIMIT_MAX_KEYS)
+    return MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get or create the process-wide limiter
+
+    Returns:
+        RateLimiter over the configured backend
+    """
+    global _limiter
+
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(create_backend())
+    return _limiter
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import hashlib
 import secrets
 
 from app.core.config import settings
@@ -103,14 +104,52 @@ def verify_token(token: str) -> Dict[str, Any]:
 # Refresh Token Generation
 # ============================================================================
 
-def generate_refresh_token() -> str:
+def generate_refresh_token(user_id: Optional[str] = None) -> str:
     """
     Generate a secure random refresh token
 
+    With a user ID the token is "<user_id>.<random>", so the refresh flow
+    can read the token and the user documents in one batched read.
+
+    Args:
+        user_id: Owner of the token
+
     Returns:
         Random token string (URL-safe)
     """
-    return secrets.token_urlsafe(32)
+    token = secrets.token_urlsafe(32)
+    return f"{user_id}.{token}" if user_id else token
+
+
+def refresh_token_user_id(token: str) -> Optional[str]:
+    """
+    User ID embedded in a refresh token
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        User ID, or None for tokens issued without one
+    """
+    # The random part never contains ".", the user ID may
+    user_id, separator, _ = token.rpartition(".")
+    return user_id if separator and user_id else None
+
+
+def refresh_token_id(token: str) -> str:
+    """
+    Storage ID of a refresh token
+
+    Tokens are stored under their SHA-256 digest, so the database never
+    holds a usable token and every document ID has the same length.
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        64-character hex digest
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
 # ============================================================================
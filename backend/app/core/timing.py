@@ -0,0 +1,103 @@
+"""
+Request Stage Timing
+
+Lightweight spans around the stages of a request (JWT check, user read,
+Hoja de Visita query, mapping, recommendations, serialization). Spans with
+the same name are summed, so a stage run per row or per block reports one
+total.
+
+RequestContextMiddleware starts a RequestTimings per request and reports the
+spans in the Server-Timing response header (visible in the browser's
+devtools) and in the request's log line. Outside a request, span() does
+nothing.
+
+The timings object is shared by reference through a context variable, so
+threadpool work and fan-out threads started from the request (which run in
+a copy of its context) add to the same totals.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class RequestTimings:
+    """Summed span durations of one request"""
+
+    __slots__ = ("started", "_spans", "_lock")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans: Dict[str, list] = {}  # name -> [seconds, count]
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add one span's duration to the total for name"""
+        with self._lock:
+            entry = self._spans.get(name)
+            if entry is None:
+                self._spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def spans(self) -> Dict[str, Tuple[float, int]]:
+        """Span name -> (total seconds, count), in first-seen order"""
+        with self._lock:
+            return {name: (entry[0], entry[1]) for name, entry in self._spans.items()}
+
+    def elapsed(self) -> float:
+        """Seconds since the request started"""
+        return time.perf_counter() - self.started
+
+
+timings_var: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time the block as a span of the current request
+
+    Args:
+        name: Span name (a Server-Timing metric name: letters, digits, _ or -)
+    """
+    timings = timings_var.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def add_span(name: str, seconds: float) -> None:
+    """Add a duration measured elsewhere (e.g., summed over a loop) as a span"""
+    timings = timings_var.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def server_timing(timings: RequestTimings) -> str:
+    """
+    Server-Timing header value
+
+    Args:
+        timings: Request timings
+
+    Returns:
+        One `name;dur=<ms>` entry per span plus `total` (time so far)
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in timings.spans().items()]
+    entries.append(f"total;dur={timings.elapsed() * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def span_summary(timings: RequestTimings) -> Dict[str, float]:
+    """Span name -> total milliseconds, for the request log line"""
+    return {name: round(seconds * 1000, 1) for name, (seconds, _) in timings.spans().items()}
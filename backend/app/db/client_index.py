@@ -0,0 +1,249 @@
+"""
+Client Master Index
+
+In-memory index of the client master (R_CLIENTES) and the weekday visit
+calendar (R_VISITAS LUNES..SABADO flags), keyed by (ruta, weekday).
+
+Plan generation resolves the day's client set here instead of joining the
+calendar in SQL, and only passes those client ids to the sales aggregation.
+"""
+
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import CACHE_REQUESTS
+from app.db.mssql_client import execute_query
+
+logger = get_logger(__name__)
+
+# ============================================================================
+# Calendar
+# ============================================================================
+
+# R_VISITAS flag column and VISITA letter for each date.weekday() (0 = Monday)
+WEEKDAY_COLUMNS = ("LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO")
+WEEKDAY_LETTERS = ("L", "M", "R", "J", "V", "S")
+
+CLIENT_MASTER_QUERY = """
+SELECT C.CLIENTE_ID, C.NOMBRE_CLIENTE, C.RUTA, C.GECS,
+       V.LUNES, V.MARTES, V.MIERCOLES, V.JUEVES, V.VIERNES, V.SABADO
+FROM mbaFerguez..R_CLIENTES C
+LEFT JOIN mbaFerguez..R_VISITAS V ON C.CLIENTE_ID = V.CLIENTE_ID
+"""
+
+
+# ============================================================================
+# Index
+# ============================================================================
+
+@dataclass(frozen=True, slots=True)
+class ClientRecord:
+    """Client master entry"""
+    cliente_id: str
+    nombre: str
+    ruta: str
+    gecs: Optional[str]
+    visita: str  # Visit days as in HOJA_DE_VISITA (e.g., 'LMJV')
+
+
+@dataclass(frozen=True)
+class ClientIndex:
+    """Immutable client index, swapped atomically on refresh"""
+    version: int
+    loaded_at: datetime
+    clients: Dict[str, ClientRecord] = field(default_factory=dict)
+    by_day: Dict[Tuple[str, int], Tuple[str, ...]] = field(default_factory=dict)
+
+    def clients_for_day(self, ruta: str, fecha: date) -> List[ClientRecord]:
+        """
+        Get the clients scheduled on a route for a date
+
+        Args:
+            ruta: Route code (e.g., '001')
+            fecha: Visit date
+
+        Returns:
+            Client records in master order (empty on Sundays)
+        """
+        ids = self.by_day.get((_route_key(ruta), fecha.weekday()), ())
+        return [self.clients[cliente_id] for cliente_id in ids]
+
+
+_index: Optional[ClientIndex] = None
+_refresh_lock = threading.Lock()
+
+_hits = CACHE_REQUESTS.labels(cache="client_index", result="hit")
+_misses = CACHE_REQUESTS.labels(cache="client_index", result="miss")
+
+
+def _route_key(value: Any) -> str:
+    """Normalize a route code to a lookup key"""
+    return str(value).strip() if value is not None else ""
+
+
+def build_client_index(rows: List[Dict[str, Any]], version: int) -> ClientIndex:
+    """
+    Build a client index from client master rows
+
+    A client with several R_VISITAS rows is scheduled on the union of their days.
+
+    Args:
+        rows: Rows from CLIENT_MASTER_QUERY
+        version: Version stamp for the new index
+
+    Returns:
+        New ClientIndex
+    """
+    days: Dict[str, set] = {}
+    master: Dict[str, Dict[str, Any]] = {}
+
+    for row in rows:
+        cliente_id = str(row["CLIENTE_ID"]).strip()
+        master.setdefault(cliente_id, row)
+        client_days = days.setdefault(cliente_id, set())
+        for weekday, column in enumerate(WEEKDAY_COLUMNS):
+            if row.get(column) == 1:
+                client_days.add(weekday)
+
+    clients: Dict[str, ClientRecord] = {}
+    by_day: Dict[Tuple[str, int], List[str]] = {}
+
+    for cliente_id, row in master.items():
+        ruta = _route_key(row.get("RUTA"))
+        client_days = days[cliente_id]
+        clients[cliente_id] = ClientRecord(
+            cliente_id=cliente_id,
+            nombre=row.get("NOMBRE_CLIENTE") or "",
+            ruta=ruta,
+            gecs=row.get("GECS"),
+            visita="".join(
+                letter for weekday, letter in enumerate(WEEKDAY_LETTERS) if weekday in client_days
+            ),
+        )
+        for weekday in client_days:
+            by_day.setdefault((ruta, weekday), []).append(cliente_id)
+
+    return ClientIndex(
+        version=version,
+        loaded_at=datetime.utcnow(),
+        clients=clients,
+        by_day={key: tuple(ids) for key, ids in by_day.items()},
+    )
+
+
+def _load_and_publish() -> ClientIndex:
+    """Load a new index and publish it (caller holds _refresh_lock)"""
+    global _index
+
+    version = _index.version + 1 if _index else 1
+    index = build_client_index(execute_query(CLIENT_MASTER_QUERY, name="client_master"), version)
+    _index = index
+
+    logger.info(
+        "Client index v%d loaded: %d clients, %d route-days",
+        index.version, len(index.clients), len(index.by_day)
+    )
+    return index
+
+
+def refresh_client_index() -> ClientIndex:
+    """
+    Reload the client index and publish it
+
+    Returns:
+        The freshly loaded index
+
+    Raises:
+        Exception: If loading fails (the previous index stays in place)
+    """
+    with _refresh_lock:
+        return _load_and_publish()
+
+
+def get_client_index() -> ClientIndex:
+    """
+    Get the current client index, loading it on first use
+
+    Returns:
+        Current ClientIndex
+    """
+    index = _index
+    if index is not None:
+        _hits.inc()
+        return index
+
+    _misses.inc()
+    with _refresh_lock:
+        # Another thread may have loaded it while we waited
+        if _index is not None:
+            return _index
+        return _load_and_publish()
+
+
+def clear_client_index() -> None:
+    """Drop the current index (next read reloads it)"""
+    global _index
+    _index = None
+
+
+# ============================================================================
+# Sales Join
+# ============================================================================
+
+def join_client_rows(
+    clients: List[ClientRecord],
+    sales_rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Build Hoja de Visita rows from index clients and their sales aggregates
+
+    Client identity columns come from the index; clients without sales keep
+    their place with no aggregates, as with the LEFT JOINs in SQL.
+
+    Args:
+        clients: Clients scheduled for the day
+        sales_rows: Sales aggregate rows keyed by CLIENTE_ID
+
+    Returns:
+        One row per client, in client order
+    """
+    sales_by_id = {str(row["CLIENTE_ID"]).strip(): row for row in sales_rows}
+
+    rows = []
+    for client in clients:
+        row = dict(sales_by_id.get(client.cliente_id, ()))
+        row["CLIENTE_ID"] = client.cliente_id
+        row["NOMBRE_CLIENTE"] = client.nombre
+        row["GECS"] = client.gecs
+        row["RUTA"] = client.ruta
+        row["VISITA"] = client.visita
+        rows.append(row)
+
+    return rows
+
+
+# ============================================================================
+# Scheduled Refresh
+# ============================================================================
+
+async def run_client_index_refresher() -> None:
+    """
+    Refresh the client index every CLIENT_INDEX_REFRESH_HOURS
+
+    Runs until cancelled. Failures are logged and the previous index is
+    kept until the next attempt.
+    """
+    interval = settings.CLIENT_INDEX_REFRESH_HOURS * 3600
+
+    while True:
+        try:
+            await asyncio.to_thread(refresh_client_index)
+        except Exception as e:
+            logger.error("Client index refresh failed: %s", e)
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,378 @@
+"""
+Configuration Cache
+
+In-process snapshot of the configuracion collection (feature flags such as
+ff_background_sync), so reading a flag is a dict lookup instead of a
+Firestore document read.
+
+The snapshot is immutable and swapped atomically, so readers never take a
+lock. Changes are pushed by a Firestore snapshot listener on the
+collection; a poll every CONFIG_CACHE_TTL_SECONDS is the fallback (and the
+only source against the emulator).
+
+Requests can wait for the next version (wait_for_config_change): waiters on
+an event loop share one asyncio.Event, set from whichever thread publishes,
+so a long-poll or event stream costs no thread.
+
+Each snapshot carries a version: the latest update time of the config
+documents in microseconds. Every process watching the same documents
+computes the same number, so clients can compare versions across workers.
+set_config and delete_config publish their write in the writing process
+at once, versioned by the write's update time; delete_config leaves a
+tombstone document so a deletion has an update time too.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import CACHE_REQUESTS
+from app.db.firestore_client import get_firestore_client
+from app.db.firestore_common import COLLECTION_CONFIGURACION, rpc_timeout
+
+logger = get_logger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+# ============================================================================
+# Snapshot
+# ============================================================================
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Immutable configuration values, swapped atomically on change"""
+    version: int
+    loaded_at: datetime
+    values: Dict[str, Any] = field(default_factory=dict)
+
+
+_snapshot: Optional[ConfigSnapshot] = None
+_refresh_lock = threading.Lock()
+
+_hits = CACHE_REQUESTS.labels(cache="config", result="hit")
+_misses = CACHE_REQUESTS.labels(cache="config", result="miss")
+
+# When the data behind the published snapshot was read (time.monotonic)
+_read_at = 0.0
+
+# Event loop -> event set on the next published change
+_change_events: Dict[asyncio.AbstractEventLoop, asyncio.Event] = {}
+_change_events_lock = threading.Lock()
+
+_stats = {"pushes": 0, "polls": 0, "writes": 0, "changes": 0}
+
+
+def _micros(update_time: Optional[datetime]) -> int:
+    """Microseconds since the epoch of a document update time"""
+    if update_time is None:
+        return 0
+    if update_time.tzinfo is None:
+        update_time = update_time.replace(tzinfo=timezone.utc)
+    return (update_time - _EPOCH) // _MICROSECOND
+
+
+def _swap(values: Dict[str, Any], version: int, source: str) -> ConfigSnapshot:
+    """Swap in a new snapshot and wake waiters (caller holds _refresh_lock)"""
+    global _snapshot
+
+    _snapshot = ConfigSnapshot(version=version, loaded_at=datetime.utcnow(), values=values)
+    _stats["changes"] += 1
+    logger.info("Config snapshot v%d loaded (%d keys, %s)", version, len(values), source)
+    _wake_waiters()
+    return _snapshot
+
+
+def _publish(
+    documents: Iterable[Any],
+    source: str,
+    read_at: float,
+    read_time: Optional[datetime] = None
+) -> ConfigSnapshot:
+    """
+    Publish config documents as the new snapshot if they changed
+    (caller holds _refresh_lock)
+
+    A read older than the published one (a slow poll overtaken by a push)
+    is dropped. Tombstones (delete_config) count for the version only.
+    """
+    global _read_at
+
+    _stats[source] += 1
+    if read_at < _read_at:
+        return _snapshot
+    _read_at = read_at
+
+    values: Dict[str, Any] = {}
+    version = 0
+    read_version = _micros(read_time)
+    for doc in documents:
+        data = doc.to_dict() or {}
+        if not data.get("deleted"):
+            values[doc.id] = data.get("value")
+        version = max(version, _micros(doc.update_time))
+        read_version = max(read_version, _micros(getattr(doc, "read_time", None)))
+
+    current = _snapshot
+    if current is not None and current.values == values:
+        return current
+
+    # A document removed outright (not through delete_config) leaves no
+    # update time: use the server time of the read that saw it
+    if current is not None and version <= current.version:
+        logger.warning("Config document deleted without delete_config, version taken from the read time")
+        version = max(read_version, current.version + 1)
+
+    return _swap(values, version, source)
+
+
+def apply_config_write(key: str, value: Any, update_time: Optional[datetime], deleted: bool = False) -> None:
+    """
+    Publish a committed set_config/delete_config in this process at once
+
+    The version is the write's update time, the one every other process
+    computes when its listener or poll picks the write up. Nothing is
+    published before the first load (it will include the write) or when
+    the snapshot is already as new as the write.
+
+    Args:
+        key: Configuration key
+        value: Value written
+        update_time: Update time of the write
+        deleted: The write was a delete_config tombstone
+    """
+    global _read_at
+
+    version = _micros(update_time)
+    with _refresh_lock:
+        current = _snapshot
+        if current is None or version <= current.version:
+            return
+
+        _stats["writes"] += 1
+        # Reads started before the write no longer apply
+        _read_at = time.monotonic()
+        values = dict(current.values)
+        if deleted:
+            values.pop(key, None)
+        else:
+            values[key] = value
+        _swap(values, version, "writes")
+
+
+def refresh_config_snapshot() -> ConfigSnapshot:
+    """
+    Read the configuracion collection (one query) and publish it if changed
+
+    Returns:
+        Current snapshot
+
+    Raises:
+        Exception: If the read fails (the previous snapshot stays in place)
+    """
+    read_at = time.monotonic()
+    db = get_firestore_client()
+    documents = db.collection(COLLECTION_CONFIGURACION).get(timeout=rpc_timeout())
+
+    with _refresh_lock:
+        return _publish(documents, "polls", read_at)
+
+
+def get_config_snapshot() -> ConfigSnapshot:
+    """
+    Get the current config snapshot, loading it on first use
+
+    Returns:
+        Current ConfigSnapshot
+    """
+    snapshot = _snapshot
+    if snapshot is not None:
+        _hits.inc()
+        return snapshot
+    _misses.inc()
+    return refresh_config_snapshot()
+
+
+async def get_config_snapshot_async() -> ConfigSnapshot:
+    """
+    Get the current config snapshot without blocking the event loop
+
+    Returns:
+        Current ConfigSnapshot (the first load runs in a worker thread)
+    """
+    snapshot = _snapshot
+    if snapshot is not None:
+        _hits.inc()
+        return snapshot
+    return await asyncio.to_thread(get_config_snapshot)
+
+
+def get_flag(key: str, default: Any = None) -> Any:
+    """
+    Get a configuration value (a dict lookup once loaded)
+
+    Args:
+        key: Configuration key (e.g., "ff_background_sync")
+        default: Value if the key is not configured
+
+    Returns:
+        Configured value or default
+    """
+    return get_config_snapshot().values.get(key, default)
+
+
+def config_version() -> int:
+    """Version of the current snapshot (0 before the first load)"""
+    snapshot = _snapshot
+    return snapshot.version if snapshot is not None else 0
+
+
+def clear_config_snapshot() -> None:
+    """Drop the current snapshot and reset counters (next read reloads it)"""
+    global _snapshot, _read_at
+    with _refresh_lock:
+        _snapshot = None
+        _read_at = 0.0
+        _stats.update(pushes=0, polls=0, writes=0, changes=0)
+
+
+def config_cache_stats() -> Dict[str, Any]:
+    """
+    Cache counters
+
+    Returns:
+        version, keys, pushes (listener snapshots), polls, writes
+        (set_config/delete_config in this process), changes (snapshots
+        published with new values)
+    """
+    snapshot = _snapshot
+    return {
+        "version": snapshot.version if snapshot is not None else 0,
+        "keys": len(snapshot.values) if snapshot is not None else 0,
+        **_stats,
+    }
+
+
+# ============================================================================
+# Change Notification
+# ============================================================================
+
+def _set_change_event(loop: asyncio.AbstractEventLoop) -> None:
+    """Wake this loop's waiters (runs on the loop)"""
+    with _change_events_lock:
+        event = _change_events.pop(loop, None)
+    if event is not None:
+        event.set()
+
+
+def _wake_waiters() -> None:
+    """Wake waiters on every loop (any thread)"""
+    with _change_events_lock:
+        loops = list(_change_events)
+
+    for loop in loops:
+        try:
+            loop.call_soon_threadsafe(_set_change_event, loop)
+        except RuntimeError:
+            # Loop closed
+            with _change_events_lock:
+                _change_events.pop(loop, None)
+
+
+def _change_event() -> asyncio.Event:
+    loop = asyncio.get_running_loop()
+    with _change_events_lock:
+        event = _change_events.get(loop)
+        if event is None:
+            event = _change_events[loop] = asyncio.Event()
+        return event
+
+
+async def wait_for_config_change(since: int, timeout: float) -> ConfigSnapshot:
+    """
+    Wait until the config version differs from `since`
+
+    Args:
+        since: Version the caller already has
+        timeout: Maximum seconds to wait
+
+    Returns:
+        Current snapshot: a newer one, or the same version on timeout
+    """
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + max(timeout, 0)
+
+    while True:
+        snapshot = await get_config_snapshot_async()
+        remaining = expires_at - loop.time()
+        if snapshot.version != since or remaining <= 0:
+            return snapshot
+
+        event = _change_event()
+        # Published between the read above and registering: don't wait
+        if config_version() != since:
+            continue
+        try:
+            await asyncio.wait_for(event.wait(), remaining)
+        except asyncio.TimeoutError:
+            return get_config_snapshot()
+
+
+# ============================================================================
+# Push Invalidation
+# ============================================================================
+
+def _on_config_snapshot(documents: Any, changes: Any, read_time: Any) -> None:
+    """Snapshot listener callback (runs on the listener's thread)"""
+    try:
+        with _refresh_lock:
+            _publish(documents, "pushes", time.monotonic(), read_time)
+    except Exception as e:
+        logger.error("Config snapshot listener update failed: %s", e)
+
+
+def start_config_listener() -> Any:
+    """
+    Watch the configuracion collection and publish every change
+
+    Returns:
+        Watch handle (call unsubscribe() to stop)
+    """
+    db = get_firestore_client()
+    watch = db.collection(COLLECTION_CONFIGURACION).on_snapshot(_on_config_snapshot)
+    logger.info("Config snapshot listener started")
+    return watch
+
+
+async def run_config_refresher() -> None:
+    """
+    Keep the config snapshot current until cancelled
+
+    Starts the snapshot listener (unless CONFIG_CACHE_LISTEN is off or the
+    emulator is in use) and polls every CONFIG_CACHE_TTL_SECONDS as a
+    fallback. Failures are logged and the previous snapshot is kept.
+    """
+    watch = None
+    if settings.CONFIG_CACHE_LISTEN and not settings.FIRESTORE_EMULATOR_HOST:
+        try:
+            watch = await asyncio.to_thread(start_config_listener)
+        except Exception as e:
+            logger.error("Config snapshot listener failed to start: %s", e)
+
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(refresh_config_snapshot)
+            except Exception as e:
+                logger.error("Config snapshot refresh failed: %s", e)
+
+            await asyncio.sleep(settings.CONFIG_CACHE_TTL_SECONDS)
+    finally:
+        if watch is not None:
+            watch.unsubscribe()
@@ -0,0 +1,788 @@
+"""
+Async Firestore Client
+
+Async variant of app.db.firestore_client on Firestore's AsyncClient, with
+the same function surface, so handlers can await Firestore RPCs on the
+event loop instead of blocking it (or a threadpool thread) per call.
+Independent reads can be fanned out with asyncio.gather (see get_users).
+Documents, keys and queries come from app.db.firestore_common, shared with
+the sync layer.
+
+The gRPC channel belongs to the event loop it was created on, so one client
+is kept per running loop and reused by every coroutine on it; the channel
+metrics (firestore_async_stats) show how many channels were opened and how
+many RPCs and concurrent RPCs each one carried.
+"""
+
+import asyncio
+import inspect
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from google.cloud import firestore
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import FIRESTORE_OP_SECONDS, timed
+from app.core.principal_cache import invalidate_principal
+from app.core.security import refresh_token_id
+from app.db import config_cache
+from app.db.firestore_common import (
+    COLLECTION_CONFIGURACION,
+    COLLECTION_LOCKS,
+    COLLECTION_REFRESH_TOKENS,
+    COLLECTION_USERS,
+    MAX_BATCH_WRITES,
+    MAX_WRITE_CONFLICT_RETRIES,
+    active_sessions_query,
+    by_path,
+    config_fields,
+    delete_batch,
+    expired_tokens_query,
+    failed_login_fields,
+    lease_fields,
+    lease_released_fields,
+    lease_taken,
+    new_user_fields,
+    refresh_token_fields,
+    resolve_token,
+    revoke_batches,
+    revoked_fields,
+    rpc_timeout,
+    session_fields,
+    sessions_query,
+    token_refs,
+    user_update_fields,
+)
+
+logger = get_logger(__name__)
+
+# Per-function latency in FIRESTORE_OP_SECONDS
+_timed = timed(FIRESTORE_OP_SECONDS, client="async")
+
+T = TypeVar("T")
+
+# ============================================================================
+# Client Initialization
+# ============================================================================
+
+_client: Optional[Any] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None  # None: usable from any loop (fakes)
+_closing: Set[asyncio.Future] = set()  # Close tasks of replaced clients, kept until done
+
+_channels_created = 0
+_rpcs = 0
+_rpcs_on_channel = 0
+_in_flight = 0
+_max_in_flight = 0
+
+
+def _close_client(client: Any, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    Close the gRPC channel of a client being replaced
+
+    The close runs on the client's own loop while that loop is still running
+    (in another thread), otherwise on the running one. A failure is logged,
+    never raised to the caller that needed the new client.
+    """
+    api = getattr(client, "_firestore_api_internal", None)
+    if api is None:
+        return  # No RPC was ever sent, so no channel was opened
+
+    async def close() -> None:
+        try:
+            result = api.transport.close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning("Failed to close the replaced async Firestore channel: %s", e)
+
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(close(), loop)
+        return
+
+    task = asyncio.get_running_loop().create_task(close())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+def get_async_firestore_client() -> firestore.AsyncClient:
+    """
+    Get or create the AsyncClient for the running event loop
+
+    A client left by another loop is closed before it is replaced.
+
+    Returns:
+        Async Firestore client
+
+    Raises:
+        Exception: If initialization fails
+    """
+    global _client, _client_loop, _channels_created, _rpcs_on_channel
+
+    loop = asyncio.get_running_loop()
+    if _client is not None and (_client_loop is None or _client_loop is loop):
+        return _client
+
+    try:
+        if settings.FIRESTORE_EMULATOR_HOST:
+            os.environ["FIRESTORE_EMULATOR_HOST"] = settings.FIRESTORE_EMULATOR_HOST
+
+        if _client is not None:
+            _close_client(_client, _client_loop)
+            _client = None
+
+        _client = firestore.AsyncClient(project=settings.FIRESTORE_PROJECT_ID)
+        _client_loop = loop
+        _channels_created += 1
+        _rpcs_on_channel = 0
+        logger.info("Async Firestore client initialized successfully")
+
+        return _client
+
+    except Exception as e:
+        logger.error("Failed to initialize async Firestore client: %s", e)
+        raise
+
+
+async def _rpc(call: Awaitable[T]) -> T:
+    """Await one RPC, tracking channel reuse and concurrency"""
+    global _rpcs, _rpcs_on_channel, _in_flight, _max_in_flight
+
+    _rpcs += 1
+    _rpcs_on_channel += 1
+    _in_flight += 1
+    _max_in_flight = max(_max_in_flight, _in_flight)
+    try:
+        return await call
+    finally:
+        _in_flight -= 1
+
+
+async def _collect(snapshots) -> List[Any]:
+    return [doc async for doc in snapshots]
+
+
+def firestore_async_stats() -> Dict[str, int]:
+    """
+    Channel reuse and concurrency metrics
+
+    Returns:
+        channels_created, rpcs (total), rpcs_on_channel (current channel),
+        in_flight and max_in_flight (concurrent RPCs)
+    """
+    return {
+        "channels_created": _channels_created,
+        "rpcs": _rpcs,
+        "rpcs_on_channel": _rpcs_on_channel,
+        "in_flight": _in_flight,
+        "max_in_flight": _max_in_flight,
+    }
+
+
+def reset_firestore_async_stats() -> None:
+    """Reset the counters (tests and benchmarks)"""
+    global _channels_created, _rpcs, _rpcs_on_channel, _max_in_flight
+
+    _channels_created = 0
+    _rpcs = 0
+    _rpcs_on_channel = 0
+    _max_in_flight = _in_flight
+
+
+# ============================================================================
+# User Operations
+# ============================================================================
+
+@_timed
+async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get user by ID
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        User document or None if not found
+    """
+    try:
+        db = get_async_firestore_client()
+        doc = await _rpc(db.collection(COLLECTION_USERS).document(user_id).get(timeout=rpc_timeout()))
+
+        if doc.exists:
+            return doc.to_dict()
+        return None
+
+    except Exception as e:
+        logger.error("Failed to get user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+async def get_users(user_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Get several users with concurrent reads
+
+    Args:
+        user_ids: User IDs
+
+    Returns:
+        User documents (None if not found), in user_ids order
+    """
+    return list(await asyncio.gather(*(get_user_by_id(user_id) for user_id in user_ids)))
+
+
+@_timed
+async def get_user_with_update_time(user_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+    """
+    Get user by ID with its last update time (for record_failed_login)
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Tuple of (user document, update time), (None, None) if not found
+    """
+    try:
+        db = get_async_firestore_client()
+        doc = await _rpc(db.collection(COLLECTION_USERS).document(user_id).get(timeout=rpc_timeout()))
+
+        if doc.exists:
+            return doc.to_dict(), doc.update_time
+        return None, None
+
+    except Exception as e:
+        logger.error("Failed to get user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+async def record_failed_login(
+    user_id: str,
+    max_attempts: int,
+    user_data: Optional[Dict[str, Any]] = None,
+    update_time: Optional[datetime] = None
+) -> int:
+    """
+    Count a failed login, blocking the user once the count reaches max_attempts
+
+    The new count is written with a last-update-time precondition, so the
+    threshold is checked against the committed count: of two concurrent
+    failures from the same count, one write fails, re-reads the user and
+    retries.
+
+    Args:
+        user_id: User ID
+        max_attempts: Failed attempts that block the account
+        user_data: User document already read by the caller (skips a read)
+        update_time: Its update time (from get_user_with_update_time)
+
+    Returns:
+        Committed failed attempt count (0 if the user doesn't exist)
+
+    Raises:
+        FailedPrecondition: If the user kept changing for every retry
+    """
+    db = get_async_firestore_client()
+    ref = db.collection(COLLECTION_USERS).document(user_id)
+
+    for _ in range(MAX_WRITE_CONFLICT_RETRIES):
+        if user_data is None or update_time is None:
+            snapshot = await _rpc(ref.get(timeout=rpc_timeout()))
+            if not snapshot.exists:
+                return 0
+            user_data, update_time = snapshot.to_dict(), snapshot.update_time
+
+        count, updates = failed_login_fields(user_data, max_attempts)
+        try:
+            await _rpc(ref.update(
+                updates,
+                option=db.write_option(last_update_time=update_time),
+                timeout=rpc_timeout()
+            ))
+        except FailedPrecondition:
+            # Another write landed since the read: re-read and count again
+            user_data = update_time = None
+            continue
+
+        invalidate_principal(user_id)
+        return count
+
+    logger.error("Failed to record failed login for %s: user kept changing", user_id)
+    raise FailedPrecondition(f"User {user_id} changed on every retry")
+
+
+@_timed
+async def create_user(user_id: str, user_data: Dict[str, Any]) -> None:
+    """
+    Create a new user
+
+    Args:
+        user_id: User ID
+        user_data: User data dictionary
+    """
+    try:
+        db = get_async_firestore_client()
+        await _rpc(db.collection(COLLECTION_USERS).document(user_id).set(
+            new_user_fields(user_data), timeout=rpc_timeout()
+        ))
+        invalidate_principal(user_id)
+        logger.info("User %s created successfully", user_id)
+
+    except Exception as e:
+        logger.error("Failed to create user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+async def update_user(user_id: str, updates: Dict[str, Any]) -> None:
+    """
+    Update user data
+
+    Invalidates the cached principal, so blocking or deactivating a user
+    takes effect on its next request.
+
+    Args:
+        user_id: User ID
+        updates: Dictionary with fields to update
+    """
+    try:
+        db = get_async_firestore_client()
+        await _rpc(db.collection(COLLECTION_USERS).document(user_id).update(
+            user_update_fields(updates), timeout=rpc_timeout()
+        ))
+        invalidate_principal(user_id)
+        logger.info("User %s updated successfully", user_id)
+
+    except Exception as e:
+        logger.error("Failed to update user %s: %s", user_id, e)
+        raise
+
+
+# ============================================================================
+# Refresh Token Operations
+# ============================================================================
+
+async def _resolve_token(db: Any, refs: List[Any], snapshots: Dict[str, Any]) -> Tuple[Any, Any]:
+    """
+    Pick the token document from a batched read, moving a legacy document
+    to its hashed ID (one commit, once per legacy token)
+
+    Returns:
+        Tuple of (token document, its update time)
+    """
+    token_data, update_time, move = resolve_token(db, refs, snapshots)
+    if move is not None:
+        await _rpc(move.commit(timeout=rpc_timeout()))
+        logger.info("Legacy refresh token moved to hashed ID for user %s", token_data.get("user_id"))
+    return token_data, update_time
+
+
+@_timed
+async def save_refresh_token(token: str, user_id: str, expires_at: datetime) -> None:
+    """
+    Save refresh token (under its hashed ID)
+
+    Args:
+        token: Refresh token string
+        user_id: Associated user ID
+        expires_at: Token expiration datetime
+    """
+    try:
+        db = get_async_firestore_client()
+        await _rpc(db.collection(COLLECTION_REFRESH_TOKENS).document(refresh_token_id(token)).set(
+            refresh_token_fields(user_id, expires_at), timeout=rpc_timeout()
+        ))
+
+        logger.info("Refresh token saved for user %s", user_id)
+
+    except Exception as e:
+        logger.error("Failed to save refresh token: %s", e)
+        raise
+
+
+@_timed
+async def get_refresh_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Get refresh token data
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        Token document or None if not found
+    """
+    try:
+        db = get_async_firestore_client()
+        refs = token_refs(db, token)
+
+        snapshots = by_path(await _rpc(_collect(db.get_all(refs, timeout=rpc_timeout()))))
+        return (await _resolve_token(db, refs, snapshots))[0]
+
+    except Exception as e:
+        logger.error("Failed to get refresh token: %s", e)
+        raise
+
+
+@_timed
+async def get_refresh_token_and_user(
+    token: str,
+    user_id: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[datetime]]:
+    """
+    Get refresh token data and its user in one batched read
+
+    Args:
+        token: Refresh token string
+        user_id: Owner of the token (embedded in the token string)
+
+    Returns:
+        Tuple of (token document, user document, token update time for
+        rotate_refresh_token), None for missing documents (and for the
+        update time of a legacy token moved by this read)
+    """
+    try:
+        db = get_async_firestore_client()
+        refs = token_refs(db, token)
+        user_ref = db.collection(COLLECTION_USERS).document(user_id)
+
+        snapshots = by_path(await _rpc(_collect(db.get_all(refs + [user_ref], timeout=rpc_timeout()))))
+        token_data, update_time = await _resolve_token(db, refs, snapshots)
+        user = snapshots.get(user_ref.path)
+        return token_data, user.to_dict() if user is not None and user.exists else None, update_time
+
+    except Exception as e:
+        logger.error("Failed to get refresh token and user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+async def rotate_refresh_token(
+    old_token: str,
+    new_token: str,
+    user_id: str,
+    expires_at: datetime,
+    last_update_time: Optional[datetime] = None
+) -> None:
+    """
+    Replace a refresh token: save the new one and revoke the old one in one commit
+
+    The old token is revoked with a last-update-time precondition, so of two
+    concurrent refreshes with the same token only one commits.
+
+    Args:
+        old_token: Token being exchanged
+        new_token: Token replacing it
+        user_id: Associated user ID
+        expires_at: New token expiration datetime
+        last_update_time: Old token's update time when it was validated
+            (read here, checking it is not revoked, if not given)
+
+    Raises:
+        FailedPrecondition: If the old token was revoked or changed meanwhile
+    """
+    try:
+        db = get_async_firestore_client()
+        collection = db.collection(COLLECTION_REFRESH_TOKENS)
+        old_ref = collection.document(refresh_token_id(old_token))
+        now = datetime.utcnow()
+
+        if last_update_time is None:
+            snapshot = await _rpc(old_ref.get(timeout=rpc_timeout()))
+            if not snapshot.exists or (snapshot.to_dict() or {}).get("revoked", False):
+                raise FailedPrecondition("Refresh token already revoked")
+            last_update_time = snapshot.update_time
+
+        batch = db.batch()
+        batch.set(collection.document(refresh_token_id(new_token)), refresh_token_fields(user_id, expires_at, now))
+        batch.update(old_ref, revoked_fields(now), option=db.write_option(last_update_time=last_update_time))
+        await _rpc(batch.commit(timeout=rpc_timeout()))
+
+        logger.info("Refresh token rotated for user %s", user_id)
+
+    except FailedPrecondition:
+        logger.warning("Refresh token for user %s already rotated or revoked", user_id)
+        raise
+
+    except Exception as e:
+        logger.error("Failed to rotate refresh token: %s", e)
+        raise
+
+
+@_timed
+async def revoke_refresh_token(token: str) -> None:
+    """
+    Revoke a refresh token
+
+    Args:
+        token: Refresh token to revoke
+    """
+    try:
+        db = get_async_firestore_client()
+        await _rpc(db.collection(COLLECTION_REFRESH_TOKENS).document(refresh_token_id(token)).update(
+            revoked_fields(), timeout=rpc_timeout()
+        ))
+
+        logger.info("Refresh token revoked")
+
+    except Exception as e:
+        logger.error("Failed to revoke refresh token: %s", e)
+        raise
+
+
+@_timed
+async def list_sessions(user_id: str) -> List[Dict[str, Any]]:
+    """
+    List a user's refresh tokens (one query on the user_id field index)
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Sessions with id (hashed token ID, not usable as a token),
+        created_at, expires_at and revoked
+    """
+    try:
+        db = get_async_firestore_client()
+        return [session_fields(doc) for doc in await _rpc(sessions_query(db, user_id).get(timeout=rpc_timeout()))]
+
+    except Exception as e:
+        logger.error("Failed to list sessions for user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+async def revoke_all_sessions(user_id: str) -> int:
+    """
+    Revoke every active refresh token of a user
+
+    One query (equality filters only, no composite index needed), then
+    batched writes of up to MAX_BATCH_WRITES, committed concurrently.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Number of tokens revoked
+    """
+    try:
+        db = get_async_firestore_client()
+        docs = await _rpc(active_sessions_query(db, user_id).get(timeout=rpc_timeout()))
+
+        await asyncio.gather(*(_rpc(batch.commit(timeout=rpc_timeout())) for batch in revoke_batches(db, docs)))
+
+        logger.info("Revoked %d refresh tokens for user %s", len(docs), user_id)
+        return len(docs)
+
+    except Exception as e:
+        logger.error("Failed to revoke sessions for user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+async def delete_expired_tokens(
+    batch_size: int = MAX_BATCH_WRITES,
+    keep_going: Optional[Callable[[], Awaitable[bool]]] = None
+) -> int:
+    """
+    Delete expired refresh tokens (cleanup task)
+
+    Pages through expired tokens in expires_at order with a cursor and
+    deletes each page in one batched write.
+
+    Args:
+        batch_size: Tokens per page and per commit (at most MAX_BATCH_WRITES)
+        keep_going: Awaited before every page after the first; returning
+            False stops the cleanup there (e.g., a lease was lost)
+
+    Returns:
+        Number of tokens deleted
+    """
+    try:
+        db = get_async_firestore_client()
+        batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+        query = expired_tokens_query(db, batch_size)
+
+        deleted_count = 0
+        page_query = query
+        while True:
+            page = await _rpc(page_query.get(timeout=rpc_timeout()))
+            if not page:
+                break
+
+            await _rpc(delete_batch(db, page).commit(timeout=rpc_timeout()))
+            deleted_count += len(page)
+
+            if len(page) < batch_size or (keep_going is not None and not await keep_going()):
+                break
+            page_query = query.start_after(page[-1])
+
+        logger.info("Deleted %d expired refresh tokens", deleted_count)
+        return deleted_count
+
+    except Exception as e:
+        logger.error("Failed to delete expired tokens: %s", e)
+        raise
+
+
+# ============================================================================
+# Leases
+# ============================================================================
+
+@_timed
+async def acquire_lease(name: str, holder: str, seconds: float) -> bool:
+    """
+    Take or renew a named lease, so one process runs a job at a time
+
+    The lease document is written with a create or last-update-time
+    precondition, so two processes racing for an expired lease cannot
+    both win.
+
+    Args:
+        name: Lease name (document ID in the locks collection)
+        holder: Identity of the caller (e.g., host:pid)
+        seconds: Lease duration
+
+    Returns:
+        True if the caller holds the lease
+    """
+    db = get_async_firestore_client()
+    ref = db.collection(COLLECTION_LOCKS).document(name)
+
+    snapshot = await _rpc(ref.get(timeout=rpc_timeout()))
+    try:
+        if not snapshot.exists:
+            await _rpc(ref.create(lease_fields(holder, seconds), timeout=rpc_timeout()))
+            return True
+
+        if lease_taken(snapshot, holder):
+            return False
+
+        await _rpc(ref.update(
+            lease_fields(holder, seconds),
+            option=db.write_option(last_update_time=snapshot.update_time),
+            timeout=rpc_timeout()
+        ))
+        return True
+
+    except (AlreadyExists, FailedPrecondition):
+        # Another process took it first
+        return False
+
+
+@_timed
+async def release_lease(name: str, holder: str) -> None:
+    """
+    Release a lease held by the caller (no-op if another process holds it)
+
+    Args:
+        name: Lease name
+        holder: Identity used to acquire it
+    """
+    db = get_async_firestore_client()
+    ref = db.collection(COLLECTION_LOCKS).document(name)
+
+    snapshot = await _rpc(ref.get(timeout=rpc_timeout()))
+    if not snapshot.exists or snapshot.get("holder") != holder:
+        return
+
+    try:
+        await _rpc(ref.update(
+            lease_released_fields(),
+            option=db.write_option(last_update_time=snapshot.update_time),
+            timeout=rpc_timeout()
+        ))
+    except FailedPrecondition:
+        pass
+
+
+# ============================================================================
+# Configuration Operations
+# ============================================================================
+
+async def get_config(key: str) -> Optional[Any]:
+    """
+    Get configuration value
+
+    Served from the config snapshot (app.db.config_cache); Firestore is only
+    read, in a worker thread, to load it on first use.
+
+    Args:
+        key: Configuration key
+
+    Returns:
+        Configuration value or None if not found
+    """
+    snapshot = await config_cache.get_config_snapshot_async()
+    return snapshot.values.get(key)
+
+
+@_timed
+async def set_config(key: str, value: Any) -> None:
+    """
+    Set configuration value (published to this process's config snapshot)
+
+    Args:
+        key: Configuration key
+        value: Configuration value
+    """
+    try:
+        db = get_async_firestore_client()
+        result = await _rpc(db.collection(COLLECTION_CONFIGURACION).document(key).set(
+            config_fields(value), timeout=rpc_timeout()
+        ))
+        config_cache.apply_config_write(key, value, result.update_time)
+
+        logger.info("Configuration %s updated", key)
+
+    except Exception as e:
+        logger.error("Failed to set config %s: %s", key, e)
+        raise
+
+
+@_timed
+async def delete_config(key: str) -> None:
+    """
+    Delete a configuration value
+
+    Writes a tombstone instead of removing the document, so the deletion
+    has an update time to version the config snapshot by.
+
+    Args:
+        key: Configuration key
+    """
+    try:
+        db = get_async_firestore_client()
+        result = await _rpc(db.collection(COLLECTION_CONFIGURACION).document(key).set(
+            config_fields(None, deleted=True), timeout=rpc_timeout()
+        ))
+        config_cache.apply_config_write(key, None, result.update_time, deleted=True)
+
+        logger.info("Configuration %s deleted", key)
+
+    except Exception as e:
+        logger.error("Failed to delete config %s: %s", key, e)
+        raise
+
+
+# ============================================================================
+# Connection Test
+# ============================================================================
+
+async def test_connection() -> bool:
+    """
+    Test Firestore connection
+
+    Returns:
+        True if connection successful, False otherwise
+    """
+    try:
+        db = get_async_firestore_client()
+        await _rpc(_collect(db.collection(COLLECTION_USERS).limit(1).stream(timeout=rpc_timeout())))
+        logger.info("Async Firestore connection test successful")
+        return True
+    except Exception as e:
+        logger.error("Async Firestore connection test failed: %s", e)
+        return False
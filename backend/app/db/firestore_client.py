@@ -5,16 +5,49 @@ Provides connection and CRUD operations for Firestore database.
 """
 
 import os
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from datetime import datetime
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
 from google.cloud import firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
 
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.metrics import FIRESTORE_OP_SECONDS, timed
+from app.core.principal_cache import invalidate_principal
+from app.core.security import refresh_token_id
+from app.db.firestore_common import (
+    COLLECTION_CONFIGURACION,
+    COLLECTION_LOCKS,
+    COLLECTION_REFRESH_TOKENS,
+    COLLECTION_USERS,
+    MAX_BATCH_WRITES,
+    MAX_WRITE_CONFLICT_RETRIES,
+    active_sessions_query,
+    by_path,
+    config_fields,
+    delete_batch,
+    expired_tokens_query,
+    failed_login_fields,
+    lease_fields,
+    lease_released_fields,
+    lease_taken,
+    new_user_fields,
+    refresh_token_fields,
+    resolve_token,
+    revoke_batches,
+    revoked_fields,
+    rpc_timeout,
+    session_fields,
+    sessions_query,
+    token_refs,
+    user_update_fields,
+)
 
 logger = get_logger(__name__)
 
+# Per-function latency in FIRESTORE_OP_SECONDS
+_timed = timed(FIRESTORE_OP_SECONDS, client="sync")
+
 # ============================================================================
 # Client Initialization
 # ============================================================================
@@ -41,7 +74,7 @@ def get_firestore_client() -> firestore.Client:
         # Check if using emulator
         if settings.FIRESTORE_EMULATOR_HOST:
             os.environ["FIRESTORE_EMULATOR_HOST"] = settings.FIRESTORE_EMULATOR_HOST
-            logger.info(f"Using Firestore emulator at {settings.FIRESTORE_EMULATOR_HOST}")
+            logger.info("Using Firestore emulator at %s", settings.FIRESTORE_EMULATOR_HOST)
 
         # Initialize Firestore client
         _db_instance = firestore.Client(project=settings.FIRESTORE_PROJECT_ID)
@@ -50,23 +83,15 @@ def get_firestore_client() -> firestore.Client:
         return _db_instance
 
     except Exception as e:
-        logger.error(f"Failed to initialize Firestore client: {str(e)}")
+        logger.error("Failed to initialize Firestore client: %s", e)
         raise
 
 
-# ============================================================================
-# Collection References
-# ============================================================================
-
-COLLECTION_USERS = "users"
-COLLECTION_REFRESH_TOKENS = "refresh_tokens"
-COLLECTION_CONFIGURACION = "configuracion"
-
-
 # ============================================================================
 # User Operations
 # ============================================================================
 
+@_timed
 def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
     Get user by ID
@@ -80,17 +105,118 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     try:
         db = get_firestore_client()
         doc_ref = db.collection(COLLECTION_USERS).document(user_id)
-        doc = doc_ref.get()
+        doc = doc_ref.get(timeout=rpc_timeout())
 
         if doc.exists:
             return doc.to_dict()
         return None
 
     except Exception as e:
-        logger.error(f"Failed to get user {user_id}: {str(e)}")
+        logger.error("Failed to get user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+def get_users(user_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Get several users in one batched read
+
+    Args:
+        user_ids: User IDs
+
+    Returns:
+        User documents (None if not found), in user_ids order
+    """
+    try:
+        db = get_firestore_client()
+        refs = [db.collection(COLLECTION_USERS).document(user_id) for user_id in user_ids]
+        snapshots = by_path(db.get_all(refs, timeout=rpc_timeout())) if refs else {}
+
+        docs = [snapshots.get(ref.path) for ref in refs]
+        return [doc.to_dict() if doc is not None and doc.exists else None for doc in docs]
+
+    except Exception as e:
+        logger.error("Failed to get %d users: %s", len(user_ids), e)
+        raise
+
+
+@_timed
+def get_user_with_update_time(user_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+    """
+    Get user by ID with its last update time (for record_failed_login)
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Tuple of (user document, update time), (None, None) if not found
+    """
+    try:
+        db = get_firestore_client()
+        doc = db.collection(COLLECTION_USERS).document(user_id).get(timeout=rpc_timeout())
+
+        if doc.exists:
+            return doc.to_dict(), doc.update_time
+        return None, None
+
+    except Exception as e:
+        logger.error("Failed to get user %s: %s", user_id, e)
         raise
 
 
+@_timed
+def record_failed_login(
+    user_id: str,
+    max_attempts: int,
+    user_data: Optional[Dict[str, Any]] = None,
+    update_time: Optional[datetime] = None
+) -> int:
+    """
+    Count a failed login, blocking the user once the count reaches max_attempts
+
+    The new count is written with a last-update-time precondition, so the
+    threshold is checked against the committed count: of two concurrent
+    failures from the same count, one write fails, re-reads the user and
+    retries.
+
+    Args:
+        user_id: User ID
+        max_attempts: Failed attempts that block the account
+        user_data: User document already read by the caller (skips a read)
+        update_time: Its update time (from get_user_with_update_time)
+
+    Returns:
+        Committed failed attempt count (0 if the user doesn't exist)
+
+    Raises:
+        FailedPrecondition: If the user kept changing for every retry
+    """
+    db = get_firestore_client()
+    ref = db.collection(COLLECTION_USERS).document(user_id)
+
+    for _ in range(MAX_WRITE_CONFLICT_RETRIES):
+        if user_data is None or update_time is None:
+            snapshot = ref.get(timeout=rpc_timeout())
+            if not snapshot.exists:
+                return 0
+            user_data, update_time = snapshot.to_dict(), snapshot.update_time
+
+        count, updates = failed_login_fields(user_data, max_attempts)
+        try:
+            ref.update(updates, option=db.write_option(last_update_time=update_time), timeout=rpc_timeout())
+        except FailedPrecondition:
+            # Another write landed since the read: re-read and count again
+            user_data = update_time = None
+            continue
+
+        invalidate_principal(user_id)
+        return count
+
+    logger.error("Failed to record failed login for %s: user kept changing", user_id)
+    raise FailedPrecondition(f"User {user_id} changed on every retry")
+
+
+@_timed
 def create_user(user_id: str, user_data: Dict[str, Any]) -> None:
     """
     Create a new user
@@ -103,22 +229,23 @@ def create_user(user_id: str, user_data: Dict[str, Any]) -> None:
         db = get_firestore_client()
         doc_ref = db.collection(COLLECTION_USERS).document(user_id)
 
-        # Add metadata
-        user_data["created_at"] = datetime.utcnow()
-        user_data["updated_at"] = datetime.utcnow()
-
-        doc_ref.set(user_data)
-        logger.info(f"User {user_id} created successfully")
+        doc_ref.set(new_user_fields(user_data), timeout=rpc_timeout())
+        invalidate_principal(user_id)
+        logger.info("User %s created successfully", user_id)
 
     except Exception as e:
-        logger.error(f"Failed to create user {user_id}: {str(e)}")
+        logger.error("Failed to create user %s: %s", user_id, e)
         raise
 
 
+@_timed
 def update_user(user_id: str, updates: Dict[str, Any]) -> None:
     """
     Update user data
 
+    Invalidates the cached principal, so blocking or deactivating a user
+    takes effect on its next request.
+
     Args:
         user_id: User ID
         updates: Dictionary with fields to update
@@ -127,14 +254,12 @@ def update_user(user_id: str, updates: Dict[str, Any]) -> None:
         db = get_firestore_client()
         doc_ref = db.collection(COLLECTION_USERS).document(user_id)
 
-        # Add update timestamp
-        updates["updated_at"] = datetime.utcnow()
-
-        doc_ref.update(updates)
-        logger.info(f"User {user_id} updated successfully")
+        doc_ref.update(user_update_fields(updates), timeout=rpc_timeout())
+        invalidate_principal(user_id)
+        logger.info("User %s updated successfully", user_id)
 
     except Exception as e:
-        logger.error(f"Failed to update user {user_id}: {str(e)}")
+        logger.error("Failed to update user %s: %s", user_id, e)
         raise
 
 
@@ -142,13 +267,29 @@ def update_user(user_id: str, updates: Dict[str, Any]) -> None:
 # Refresh Token Operations
 # ============================================================================
 
+def _resolve_token(db: firestore.Client, refs: List[Any], snapshots: Dict[str, Any]) -> Tuple[Any, Any]:
+    """
+    Pick the token document from a batched read, moving a legacy document
+    to its hashed ID (one commit, once per legacy token)
+
+    Returns:
+        Tuple of (token document, its update time)
+    """
+    token_data, update_time, move = resolve_token(db, refs, snapshots)
+    if move is not None:
+        move.commit(timeout=rpc_timeout())
+        logger.info("Legacy refresh token moved to hashed ID for user %s", token_data.get("user_id"))
+    return token_data, update_time
+
+
+@_timed
 def save_refresh_token(
     token: str,
     user_id: str,
     expires_at: datetime
 ) -> None:
     """
-    Save refresh token
+    Save refresh token (under its hashed ID)
 
     Args:
         token: Refresh token string
@@ -157,22 +298,18 @@ def save_refresh_token(
     """
     try:
         db = get_firestore_client()
-        doc_ref = db.collection(COLLECTION_REFRESH_TOKENS).document(token)
+        doc_ref = db.collection(COLLECTION_REFRESH_TOKENS).document(refresh_token_id(token))
 
-        doc_ref.set({
-            "user_id": user_id,
-            "expires_at": expires_at,
-            "created_at": datetime.utcnow(),
-            "revoked": False
-        })
+        doc_ref.set(refresh_token_fields(user_id, expires_at), timeout=rpc_timeout())
 
-        logger.info(f"Refresh token saved for user {user_id}")
+        logger.info("Refresh token saved for user %s", user_id)
 
     except Exception as e:
-        logger.error(f"Failed to save refresh token: {str(e)}")
+        logger.error("Failed to save refresh token: %s", e)
         raise
 
 
+@_timed
 def get_refresh_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Get refresh token data
@@ -185,18 +322,102 @@ def get_refresh_token(token: str) -> Optional[Dict[str, Any]]:
     """
     try:
         db = get_firestore_client()
-        doc_ref = db.collection(COLLECTION_REFRESH_TOKENS).document(token)
-        doc = doc_ref.get()
+        refs = token_refs(db, token)
 
-        if doc.exists:
-            return doc.to_dict()
-        return None
+        snapshots = by_path(db.get_all(refs, timeout=rpc_timeout()))
+        return _resolve_token(db, refs, snapshots)[0]
+
+    except Exception as e:
+        logger.error("Failed to get refresh token: %s", e)
+        raise
+
+
+@_timed
+def get_refresh_token_and_user(
+    token: str,
+    user_id: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[datetime]]:
+    """
+    Get refresh token data and its user in one batched read
+
+    Args:
+        token: Refresh token string
+        user_id: Owner of the token (embedded in the token string)
+
+    Returns:
+        Tuple of (token document, user document, token update time for
+        rotate_refresh_token), None for missing documents (and for the
+        update time of a legacy token moved by this read)
+    """
+    try:
+        db = get_firestore_client()
+        refs = token_refs(db, token)
+        user_ref = db.collection(COLLECTION_USERS).document(user_id)
+
+        snapshots = by_path(db.get_all(refs + [user_ref], timeout=rpc_timeout()))
+        token_data, update_time = _resolve_token(db, refs, snapshots)
+        user = snapshots.get(user_ref.path)
+        return token_data, user.to_dict() if user is not None and user.exists else None, update_time
+
+    except Exception as e:
+        logger.error("Failed to get refresh token and user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+def rotate_refresh_token(
+    old_token: str,
+    new_token: str,
+    user_id: str,
+    expires_at: datetime,
+    last_update_time: Optional[datetime] = None
+) -> None:
+    """
+    Replace a refresh token: save the new one and revoke the old one in one commit
+
+    The old token is revoked with a last-update-time precondition, so of two
+    concurrent refreshes with the same token only one commits.
+
+    Args:
+        old_token: Token being exchanged
+        new_token: Token replacing it
+        user_id: Associated user ID
+        expires_at: New token expiration datetime
+        last_update_time: Old token's update time when it was validated
+            (read here, checking it is not revoked, if not given)
+
+    Raises:
+        FailedPrecondition: If the old token was revoked or changed meanwhile
+    """
+    try:
+        db = get_firestore_client()
+        collection = db.collection(COLLECTION_REFRESH_TOKENS)
+        old_ref = collection.document(refresh_token_id(old_token))
+        now = datetime.utcnow()
+
+        if last_update_time is None:
+            snapshot = old_ref.get(timeout=rpc_timeout())
+            if not snapshot.exists or (snapshot.to_dict() or {}).get("revoked", False):
+                raise FailedPrecondition("Refresh token already revoked")
+            last_update_time = snapshot.update_time
+
+        batch = db.batch()
+        batch.set(collection.document(refresh_token_id(new_token)), refresh_token_fields(user_id, expires_at, now))
+        batch.update(old_ref, revoked_fields(now), option=db.write_option(last_update_time=last_update_time))
+        batch.commit(timeout=rpc_timeout())
+
+        logger.info("Refresh token rotated for user %s", user_id)
+
+    except FailedPrecondition:
+        logger.warning("Refresh token for user %s already rotated or revoked", user_id)
+        raise
 
     except Exception as e:
-        logger.error(f"Failed to get refresh token: {str(e)}")
+        logger.error("Failed to rotate refresh token: %s", e)
         raise
 
 
+@_timed
 def revoke_refresh_token(token: str) -> None:
     """
     Revoke a refresh token
@@ -206,49 +427,184 @@ def revoke_refresh_token(token: str) -> None:
     """
     try:
         db = get_firestore_client()
-        doc_ref = db.collection(COLLECTION_REFRESH_TOKENS).document(token)
+        doc_ref = db.collection(COLLECTION_REFRESH_TOKENS).document(refresh_token_id(token))
 
-        doc_ref.update({
-            "revoked": True,
-            "revoked_at": datetime.utcnow()
-        })
+        doc_ref.update(revoked_fields(), timeout=rpc_timeout())
 
         logger.info("Refresh token revoked")
 
     except Exception as e:
-        logger.error(f"Failed to revoke refresh token: {str(e)}")
+        logger.error("Failed to revoke refresh token: %s", e)
+        raise
+
+
+@_timed
+def list_sessions(user_id: str) -> List[Dict[str, Any]]:
+    """
+    List a user's refresh tokens (one query on the user_id field index)
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Sessions with id (hashed token ID, not usable as a token),
+        created_at, expires_at and revoked
+    """
+    try:
+        db = get_firestore_client()
+        return [session_fields(doc) for doc in sessions_query(db, user_id).get(timeout=rpc_timeout())]
+
+    except Exception as e:
+        logger.error("Failed to list sessions for user %s: %s", user_id, e)
+        raise
+
+
+@_timed
+def revoke_all_sessions(user_id: str) -> int:
+    """
+    Revoke every active refresh token of a user
+
+    One query (equality filters only, no composite index needed), then
+    batched writes of up to MAX_BATCH_WRITES.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Number of tokens revoked
+    """
+    try:
+        db = get_firestore_client()
+        docs = active_sessions_query(db, user_id).get(timeout=rpc_timeout())
+
+        for batch in revoke_batches(db, docs):
+            batch.commit(timeout=rpc_timeout())
+
+        logger.info("Revoked %d refresh tokens for user %s", len(docs), user_id)
+        return len(docs)
+
+    except Exception as e:
+        logger.error("Failed to revoke sessions for user %s: %s", user_id, e)
         raise
 
 
-def delete_expired_tokens() -> int:
+@_timed
+def delete_expired_tokens(
+    batch_size: int = MAX_BATCH_WRITES,
+    keep_going: Optional[Callable[[], bool]] = None
+) -> int:
     """
     Delete expired refresh tokens (cleanup task)
 
+    Pages through expired tokens in expires_at order with a cursor and
+    deletes each page in one batched write.
+
+    Args:
+        batch_size: Tokens per page and per commit (at most MAX_BATCH_WRITES)
+        keep_going: Called before every page after the first; returning
+            False stops the cleanup there (e.g., a lease was lost)
+
     Returns:
         Number of tokens deleted
     """
     try:
         db = get_firestore_client()
-        now = datetime.utcnow()
-
-        # Query expired tokens
-        query = db.collection(COLLECTION_REFRESH_TOKENS).where(
-            filter=FieldFilter("expires_at", "<", now)
-        )
+        batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+        query = expired_tokens_query(db, batch_size)
 
         deleted_count = 0
-        for doc in query.stream():
-            doc.reference.delete()
-            deleted_count += 1
+        page_query = query
+        while True:
+            page = page_query.get(timeout=rpc_timeout())
+            if not page:
+                break
 
-        logger.info(f"Deleted {deleted_count} expired refresh tokens")
+            delete_batch(db, page).commit(timeout=rpc_timeout())
+            deleted_count += len(page)
+
+            if len(page) < batch_size or (keep_going is not None and not keep_going()):
+                break
+            page_query = query.start_after(page[-1])
+
+        logger.info("Deleted %d expired refresh tokens", deleted_count)
         return deleted_count
 
     except Exception as e:
-        logger.error(f"Failed to delete expired tokens: {str(e)}")
+        logger.error("Failed to delete expired tokens: %s", e)
         raise
 
 
+# ============================================================================
+# Leases
+# ============================================================================
+
+@_timed
+def acquire_lease(name: str, holder: str, seconds: float) -> bool:
+    """
+    Take or renew a named lease, so one process runs a job at a time
+
+    The lease document is written with a create or last-update-time
+    precondition, so two processes racing for an expired lease cannot
+    both win.
+
+    Args:
+        name: Lease name (document ID in the locks collection)
+        holder: Identity of the caller (e.g., host:pid)
+        seconds: Lease duration
+
+    Returns:
+        True if the caller holds the lease
+    """
+    db = get_firestore_client()
+    ref = db.collection(COLLECTION_LOCKS).document(name)
+
+    snapshot = ref.get(timeout=rpc_timeout())
+    try:
+        if not snapshot.exists:
+            ref.create(lease_fields(holder, seconds), timeout=rpc_timeout())
+            return True
+
+        if lease_taken(snapshot, holder):
+            return False
+
+        ref.update(
+            lease_fields(holder, seconds),
+            option=db.write_option(last_update_time=snapshot.update_time),
+            timeout=rpc_timeout()
+        )
+        return True
+
+    except (AlreadyExists, FailedPrecondition):
+        # Another process took it first
+        return False
+
+
+@_timed
+def release_lease(name: str, holder: str) -> None:
+    """
+    Release a lease held by the caller (no-op if another process holds it)
+
+    Args:
+        name: Lease name
+        holder: Identity used to acquire it
+    """
+    db = get_firestore_client()
+    ref = db.collection(COLLECTION_LOCKS).document(name)
+
+    snapshot = ref.get(timeout=rpc_timeout())
+    if not snapshot.exists or snapshot.get("holder") != holder:
+        return
+
+    try:
+        ref.update(
+            lease_released_fields(),
+            option=db.write_option(last_update_time=snapshot.update_time),
+            timeout=rpc_timeout()
+        )
+    except FailedPrecondition:
+        pass
+
+
 # ============================================================================
 # Configuration Operations
 # ============================================================================
@@ -257,48 +613,71 @@ def get_config(key: str) -> Optional[Any]:
     """
     Get configuration value
 
+    Served from the config snapshot (app.db.config_cache); Firestore is only
+    read to load it on first use. A set_config() is visible at once in the
+    process that made it, and in the others once their snapshot listener
+    or poll picks it up.
+
     Args:
         key: Configuration key
 
     Returns:
         Configuration value or None if not found
     """
+    from app.db.config_cache import get_flag  # config_cache imports this module
+
+    return get_flag(key)
+
+
+@_timed
+def set_config(key: str, value: Any) -> None:
+    """
+    Set configuration value (published to this process's config snapshot)
+
+    Args:
+        key: Configuration key
+        value: Configuration value
+    """
+    from app.db.config_cache import apply_config_write
+
     try:
         db = get_firestore_client()
         doc_ref = db.collection(COLLECTION_CONFIGURACION).document(key)
-        doc = doc_ref.get()
 
-        if doc.exists:
-            data = doc.to_dict()
-            return data.get("value")
-        return None
+        result = doc_ref.set(config_fields(value), timeout=rpc_timeout())
+        apply_config_write(key, value, result.update_time)
+
+        logger.info("Configuration %s updated", key)
 
     except Exception as e:
-        logger.error(f"Failed to get config {key}: {str(e)}")
+        logger.error("Failed to set config %s: %s", key, e)
         raise
 
 
-def set_config(key: str, value: Any) -> None:
+@_timed
+def delete_config(key: str) -> None:
     """
-    Set configuration value
+    Delete a configuration value
+
+    Writes a tombstone instead of removing the document, so the deletion
+    has an update time to version the config snapshot by.
 
     Args:
         key: Configuration key
-        value: Configuration value
     """
+    from app.db.config_cache import apply_config_write
+
     try:
         db = get_firestore_client()
         doc_ref = db.collection(COLLECTION_CONFIGURACION).document(key)
 
-        doc_ref.set({
-            "value": value,
-            "updated_at": datetime.utcnow()
-        })
+        result = doc_ref.set(config_fields(None, deleted=True), timeout=rpc_timeout())
+        apply_config_write(key, None, result.update_time, deleted=True)
 
-        logger.info(f"Configuration {key} updated")
+        logger.info("Configuration %s deleted", key)
 
     except Exception as e:
-        logger.error(f"Failed to set config {key}: {str(e)}")
+        logger.error("Failed to delete config %s: %s", key, e)
         raise
 
 
@@ -316,9 +695,9 @@ def test_connection() -> bool:
     try:
         db = get_firestore_client()
         # Try to read from a collection (will work even if empty)
-        list(db.collection(COLLECTION_USERS).limit(1).stream())
+        list(db.collection(COLLECTION_USERS).limit(1).stream(timeout=rpc_timeout()))
         logger.info("Firestore connection test successful")
         return True
     except Exception as e:
-        logger.error(f"Firestore connection test failed: {str(e)}")
+        logger.error("Firestore connection test failed: %s", e)
         return False
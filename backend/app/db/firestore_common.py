@@ -0,0 +1,234 @@
+"""
+Firestore Common
+
+Collection names, document mapping, refresh token keys and queries shared
+by the sync (app.db.firestore_client) and async (app.db.firestore_async)
+data layers, so both read and write exactly the same documents.
+
+Nothing here sends an RPC: the helpers build references, queries, write
+batches and field dicts, and each layer runs them on its own client.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.core.config import settings
+from app.core.deadline import time_budget
+from app.core.security import refresh_token_id
+
+# ============================================================================
+# Collections and Limits
+# ============================================================================
+
+COLLECTION_USERS = "users"
+COLLECTION_REFRESH_TOKENS = "refresh_tokens"
+COLLECTION_CONFIGURACION = "configuracion"
+COLLECTION_LOCKS = "locks"
+
+# Firestore limit on writes per commit
+MAX_BATCH_WRITES = 500
+
+# Re-reads of a document whose conditional write lost to a concurrent one
+MAX_WRITE_CONFLICT_RETRIES = 10
+
+
+def rpc_timeout() -> float:
+    """RPC timeout for the next Firestore call, capped by the request budget"""
+    return time_budget(settings.FIRESTORE_TIMEOUT_SECONDS)
+
+
+# ============================================================================
+# User Documents
+# ============================================================================
+
+def new_user_fields(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Add creation metadata to a new user document (in place)"""
+    user_data["created_at"] = datetime.utcnow()
+    user_data["updated_at"] = datetime.utcnow()
+    return user_data
+
+
+def user_update_fields(updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the update timestamp to a user update (in place)"""
+    updates["updated_at"] = datetime.utcnow()
+    return updates
+
+
+def failed_login_fields(user_data: Dict[str, Any], max_attempts: int) -> Tuple[int, Dict[str, Any]]:
+    """
+    Update counting one more failed login
+
+    Args:
+        user_data: User document the count is based on
+        max_attempts: Failed attempts that block the account
+
+    Returns:
+        Tuple of (new count, fields to update)
+    """
+    count = (user_data.get("intentos_fallidos") or 0) + 1
+    updates: Dict[str, Any] = {"intentos_fallidos": count, "updated_at": datetime.utcnow()}
+    if count >= max_attempts:
+        updates["bloqueado"] = True
+    return count, updates
+
+
+# ============================================================================
+# Refresh Token Documents
+# ============================================================================
+
+def token_refs(db: Any, token: str) -> List[Any]:
+    """
+    Document references a refresh token may be stored under
+
+    The hashed ID first; then, with REFRESH_TOKEN_LEGACY_LOOKUP, the raw
+    token used as ID before tokens were hashed.
+    """
+    collection = db.collection(COLLECTION_REFRESH_TOKENS)
+    refs = [collection.document(refresh_token_id(token))]
+    if settings.REFRESH_TOKEN_LEGACY_LOOKUP:
+        refs.append(collection.document(token))
+    return refs
+
+
+def refresh_token_fields(user_id: str, expires_at: datetime, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """New (not revoked) refresh token document"""
+    return {
+        "user_id": user_id,
+        "expires_at": expires_at,
+        "created_at": now or datetime.utcnow(),
+        "revoked": False
+    }
+
+
+def revoked_fields(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Update revoking a refresh token"""
+    return {"revoked": True, "revoked_at": now or datetime.utcnow()}
+
+
+def by_path(snapshots: Iterable[Any]) -> Dict[str, Any]:
+    """Snapshots of a batched read keyed by document path"""
+    return {doc.reference.path: doc for doc in snapshots}
+
+
+def resolve_token(
+    db: Any,
+    refs: List[Any],
+    snapshots: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], Optional[datetime], Optional[Any]]:
+    """
+    Pick the token document from a batched read of token_refs()
+
+    Args:
+        db: Firestore client (sync or async)
+        refs: References from token_refs()
+        snapshots: Batched read results (from by_path)
+
+    Returns:
+        Tuple of (token document, its update time, write batch moving a
+        legacy document to its hashed ID, to be committed by the caller).
+        The update time is None for a legacy document, the batch is None
+        unless one was found.
+    """
+    hashed_ref, legacy_refs = refs[0], refs[1:]
+    hashed = snapshots.get(hashed_ref.path)
+    if hashed is not None and hashed.exists:
+        return hashed.to_dict(), hashed.update_time, None
+    if not legacy_refs:
+        return None, None, None
+
+    legacy = snapshots.get(legacy_refs[0].path)
+    if legacy is None or not legacy.exists:
+        return None, None, None
+
+    token_data = legacy.to_dict()
+    batch = db.batch()
+    batch.set(hashed_ref, token_data)
+    batch.delete(legacy_refs[0])
+    return token_data, None, batch
+
+
+def session_fields(doc: Any) -> Dict[str, Any]:
+    """Session listing entry (id is the hashed token ID, not usable as a token)"""
+    return {
+        "id": doc.id,
+        "created_at": doc.get("created_at"),
+        "expires_at": doc.get("expires_at"),
+        "revoked": doc.get("revoked"),
+    }
+
+
+def sessions_query(db: Any, user_id: str) -> Any:
+    """A user's refresh tokens (one query on the user_id field index)"""
+    return db.collection(COLLECTION_REFRESH_TOKENS).where(filter=FieldFilter("user_id", "==", user_id))
+
+
+def active_sessions_query(db: Any, user_id: str) -> Any:
+    """A user's unrevoked refresh tokens (equality filters only, no composite index)"""
+    return (
+        sessions_query(db, user_id)
+        .where(filter=FieldFilter("revoked", "==", False))
+        .select(["revoked"])
+    )
+
+
+def revoke_batches(db: Any, docs: List[Any]) -> List[Any]:
+    """Write batches of up to MAX_BATCH_WRITES revoking the given tokens"""
+    now = datetime.utcnow()
+    batches = []
+    for start in range(0, len(docs), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for doc in docs[start:start + MAX_BATCH_WRITES]:
+            batch.update(doc.reference, revoked_fields(now))
+        batches.append(batch)
+    return batches
+
+
+def expired_tokens_query(db: Any, batch_size: int) -> Any:
+    """
+    Expired refresh tokens in expires_at order, a page of batch_size at a
+    time (only the cursor field is returned)
+    """
+    return (
+        db.collection(COLLECTION_REFRESH_TOKENS)
+        .where(filter=FieldFilter("expires_at", "<", datetime.utcnow()))
+        .order_by("expires_at")
+        .select(["expires_at"])
+        .limit(batch_size)
+    )
+
+
+def delete_batch(db: Any, docs: List[Any]) -> Any:
+    """Write batch deleting the given documents"""
+    batch = db.batch()
+    for doc in docs:
+        batch.delete(doc.reference)
+    return batch
+
+
+# ============================================================================
+# Leases and Configuration
+# ============================================================================
+
+def lease_fields(holder: str, seconds: float) -> Dict[str, Any]:
+    """Lease document held by `holder` for `seconds` from now"""
+    return {"holder": holder, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=seconds)}
+
+
+def lease_taken(snapshot: Any, holder: str) -> bool:
+    """Whether an existing lease is held, unexpired, by someone else"""
+    return snapshot.get("holder") != holder and snapshot.get("expires_at") > datetime.now(timezone.utc)
+
+
+def lease_released_fields() -> Dict[str, Any]:
+    """Update expiring a lease now"""
+    return {"expires_at": datetime.now(timezone.utc)}
+
+
+def config_fields(value: Any, deleted: bool = False) -> Dict[str, Any]:
+    """Configuration document (a tombstone when deleted)"""
+    fields = {"value": value, "updated_at": datetime.utcnow()}
+    if deleted:
+        fields["deleted"] = True
+    return fields
@@ -0,0 +1,354 @@
+"""
+Visit Sheet Metric Registry
+
+Named metric definitions for the Hoja de Visita. Each consumer declares the
+metrics it actually reads, and the registry generates the SQL (or the
+in-memory replica computation) for just those metrics.
+
+Metrics are grouped in blocks: a block is one scan of one legacy source,
+and a metric is one aggregate expression over that scan. Requesting fewer
+metrics drops whole blocks, and narrows the select list and week range of
+the blocks that remain.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.db.reference_cache import PROMO_LONA_DESC, ReferenceSnapshot
+
+# ============================================================================
+# Blocks
+# ============================================================================
+
+@dataclass(frozen=True)
+class MetricBlock:
+    """One scan of a legacy source, keyed by client"""
+    name: str
+    key: str  # Expression for CLIENTE_ID in this source
+    source: str  # FROM ... WHERE ... (must filter on %(clientes)s)
+    group_by: bool = True
+    distinct: bool = False
+    reference: bool = False  # Served by the reference cache when enabled
+
+
+# Parameters available to every block:
+#   fecha, anio, mes, mes_inicio, mes_fin, semana (week of fecha),
+#   semanas (weeks needed by the requested weekly metrics), clientes
+# Note: '%' must be written '%%' in block sources (pyformat parameters).
+BLOCKS: Dict[str, MetricBlock] = {
+    block.name: block for block in (
+        MetricBlock(
+            name="weekly_beer",
+            key="CLIENTE_ID",
+            source="""
+FROM MBAFERGUEZ..vwVentasFerguez
+WHERE GRUPO = 'CERVEZA' AND ANIOVTA = %(anio)s
+  AND SEMANA IN %(semanas)s
+  AND CLIENTE_ID IN %(clientes)s""",
+        ),
+        MetricBlock(
+            name="non_beer",
+            key="CLIENTE_ID",
+            source="""
+FROM MBAFERGUEZ..vwVentasFerguez
+WHERE GRUPO NOT IN ('CERVEZA','HIELO','PROMOCIONAL','PROMOCIONALES','VASO ENCERADO','ENVASE','PAQUETE')
+  AND SEMANA = %(semana)s AND ANIOVTA = %(anio)s
+  AND CLIENTE_ID IN %(clientes)s""",
+        ),
+        MetricBlock(
+            name="monthly_beer",
+            key="CLIENTE_ID",
+            source="""
+FROM MBAFERGUEZ..vwVentasFerguez
+WHERE GRUPO = 'CERVEZA' AND MESVTA = %(mes)s
+  AND ANIOVTA IN (%(anio)s - 1, %(anio)s)
+  AND CLIENTE_ID IN %(clientes)s""",
+        ),
+        MetricBlock(
+            name="brands",
+            key="CLIENTE_ID",
+            source="""
+FROM MBAFERGUEZ..vwVentasFerguez
+WHERE GRUPO = 'CERVEZA' AND FECHAVTA BETWEEN %(mes_inicio)s AND %(mes_fin)s
+  AND MARCA IN ('MILLER HIGH', 'INDIO', 'TECATE', 'XX Lager')
+  AND CLIENTE_ID IN %(clientes)s""",
+        ),
+        MetricBlock(
+            name="gecs_compliance",
+            key="BD.CLIENTE_ID",
+            group_by=False,
+            source="""
+FROM (
+    SELECT C.CLIENTE_ID, GN.VTA,
+           CASE COALESCE(C.GECS, 'BRONCE')
+                WHEN 'BRONCE' THEN 3 WHEN 'PLATA' THEN 5 WHEN 'ORO' THEN 14
+                WHEN 'PLATINO' THEN 37 WHEN 'TITANIO' THEN 75
+           END OBJETIVOXSEMANA
+    FROM MBAFERGUEZ..R_CLIENTES C
+    LEFT JOIN (
+        SELECT CLIENTE_ID, SUM(CARTONES) VTA
+        FROM MBAFERGUEZ..vwVentasFerguez
+        WHERE ANIOVTA = %(anio)s AND GRUPO = 'CERVEZA' AND SEMANA = %(semana)s
+          AND CLIENTE_ID IN %(clientes)s
+        GROUP BY CLIENTE_ID
+    ) GN ON C.CLIENTE_ID = GN.CLIENTE_ID
+    WHERE C.CLIENTE_ID IN %(clientes)s
+) BD""",
+        ),
+        MetricBlock(
+            name="coolers",
+            key="idCliente",
+            group_by=False,
+            reference=True,
+            source="""
+FROM MBAFERGUEZ..bdenf
+WHERE idCliente IN %(clientes)s""",
+        ),
+        MetricBlock(
+            name="hei",
+            key="CLIENTE_ID",
+            group_by=False,
+            distinct=True,
+            reference=True,
+            source="""
+FROM (
+    SELECT CLIENTE_ID FROM mbaFerguez..R_HEISHOP
+    UNION ALL
+    SELECT CLIENTE_ID
+    FROM MBAFERGUEZ..VWVENTASDETALLECAP
+    WHERE OBSERVACIONES LIKE '%%HIP%%' AND FECHAVTA >= '2025-04-21'
+    UNION ALL
+    SELECT clave
+    FROM MBAFERGUEZ..vwPreventaDetallea
+    WHERE FOLIO LIKE '%%HI%%' AND f_preventa >= '2025-04-21'
+) HEI
+WHERE CLIENTE_ID IN %(clientes)s""",
+        ),
+        MetricBlock(
+            name="promo_lona",
+            key="SUBSTRING(CLIENTECLAVE, 3, 6) COLLATE Modern_Spanish_CI_AS",
+            group_by=False,
+            distinct=True,
+            reference=True,
+            source="""
+FROM dbGpoFernandez..ClienteEsquema
+WHERE esquemaid = 'LPG008' AND SUBSTRING(CLIENTECLAVE, 3, 6) IN %(clientes)s""",
+        ),
+    )
+}
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+@dataclass(frozen=True)
+class MetricDefinition:
+    """A named Hoja de Visita column and how to compute it"""
+    name: str
+    block: str
+    expression: str  # SQL expression over the block source
+    week_offset: Optional[int] = None  # Weeks before fecha (weekly_beer only)
+    replica: Optional[Callable[[ReferenceSnapshot, str], Any]] = None
+
+
+def _beer_week(name: str, offset: int) -> MetricDefinition:
+    """Beer cartons for the week `offset` weeks before the plan date"""
+    return MetricDefinition(
+        name=name,
+        block="weekly_beer",
+        expression=f"SUM(CASE WHEN SEMANA = %(semana)s - {offset} THEN CARTONES END)",
+        week_offset=offset,
+    )
+
+
+def _brand(name: str, condition: str) -> MetricDefinition:
+    """Cartons of a brand in the month of the plan date"""
+    return MetricDefinition(
+        name=name,
+        block="brands",
+        expression=f"SUM(CASE WHEN {condition} THEN CARTONES END)",
+    )
+
+
+METRICS: Dict[str, MetricDefinition] = {
+    metric.name: metric for metric in (
+        _beer_week("CERVEZA_SANT3", 3),
+        _beer_week("CERVEZA_SANT2", 2),
+        _beer_week("CERVEZA_SANT", 1),
+        _beer_week("CERVEZA_SACT", 0),
+        MetricDefinition("BRUME_SACT", "non_beer", "SUM(CARTONES)"),
+        MetricDefinition(
+            "CERVEZA_MANT", "monthly_beer",
+            "SUM(CASE WHEN ANIOVTA = %(anio)s - 1 THEN CARTONES END)"
+        ),
+        MetricDefinition(
+            "CERVEZA_MACT", "monthly_beer",
+            "SUM(CASE WHEN ANIOVTA = %(anio)s THEN CARTONES END)"
+        ),
+        _brand("MILLER", "MARCA = 'MILLER HIGH'"),
+        _brand("INDIO", "MARCA = 'INDIO' AND CUPO = 'NR'"),
+        _brand("INDIOM", "MARCA = 'INDIO'"),
+        _brand("TECATE", "MARCA = 'TECATE'"),
+        _brand("XX", "MARCA = 'XX Lager'"),
+        MetricDefinition("OBJETIVOXSEMANA", "gecs_compliance", "BD.OBJETIVOXSEMANA"),
+        MetricDefinition(
+            "CTECUMPLIDO", "gecs_compliance",
+            "CASE WHEN BD.VTA >= BD.OBJETIVOXSEMANA THEN 1 ELSE 0 END"
+        ),
+        MetricDefinition(
+            "ENFRIADORES", "coolers", "ENFRIADORES",
+            replica=lambda snapshot, key: snapshot.coolers.get(key)
+        ),
+        MetricDefinition(
+            "IDSHOP", "hei", "CLIENTE_ID",
+            replica=lambda snapshot, key: key if key in snapshot.hei_shops else None
+        ),
+        MetricDefinition(
+            "DESCLP", "promo_lona", f"'{PROMO_LONA_DESC}'",
+            replica=lambda snapshot, key: PROMO_LONA_DESC if key in snapshot.promo_lona else None
+        ),
+    )
+}
+
+# Client identity columns, always present (from the client master)
+IDENTITY_COLUMNS = ("CLIENTE_ID", "NOMBRE_CLIENTE", "GECS", "RUTA", "VISITA")
+
+ALL_METRICS: Tuple[str, ...] = tuple(METRICS)
+
+
+def resolve_metrics(names: Iterable[str]) -> List[MetricDefinition]:
+    """
+    Look up metric definitions by name
+
+    Args:
+        names: Metric names (identity columns are accepted and ignored)
+
+    Returns:
+        Metric definitions, in registry order
+
+    Raises:
+        ValueError: If a name is not a registered metric
+    """
+    requested = set(names) - set(IDENTITY_COLUMNS)
+    unknown = requested - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown visit sheet metrics: {', '.join(sorted(unknown))}")
+
+    return [metric for name, metric in METRICS.items() if name in requested]
+
+
+def group_by_block(metrics: List[MetricDefinition]) -> List[Tuple[MetricBlock, List[MetricDefinition]]]:
+    """
+    Group metrics by the block that computes them
+
+    Args:
+        metrics: Resolved metric definitions
+
+    Returns:
+        (block, metrics) pairs, in block registry order
+    """
+    grouped: Dict[str, List[MetricDefinition]] = {}
+    for metric in metrics:
+        grouped.setdefault(metric.block, []).append(metric)
+
+    return [(block, grouped[name]) for name, block in BLOCKS.items() if name in grouped]
+
+
+# ============================================================================
+# Query Generation
+# ============================================================================
+
+def build_block_query(block: MetricBlock, metrics: List[MetricDefinition]) -> str:
+    """
+    Generate the query for one block, selecting only the given metrics
+
+    Args:
+        block: Block to query
+        metrics: Metrics of that block to compute
+
+    Returns:
+        SQL returning CLIENTE_ID plus one column per metric
+    """
+    select = ",\n       ".join(
+        [f"{block.key} CLIENTE_ID"] + [f"{metric.expression} {metric.name}" for metric in metrics]
+    )
+    distinct = "DISTINCT " if block.distinct else ""
+    group_by = f"\nGROUP BY {block.key}" if block.group_by else ""
+
+    return f"SELECT {distinct}{select}{block.source}{group_by}"
+
+
+def build_visit_sheet_query(blocks: List[Tuple[MetricBlock, List[MetricDefinition]]]) -> str:
+    """
+    Generate a single statement joining only the given blocks
+
+    Args:
+        blocks: (block, metrics) pairs, as returned by group_by_block
+
+    Returns:
+        SQL returning CLIENTE_ID plus one column per metric
+    """
+    columns = ["CTES.CLIENTE_ID"]
+    joins = []
+
+    for position, (block, metrics) in enumerate(blocks):
+        alias = f"B{position}"
+        columns.extend(f"{alias}.{metric.name}" for metric in metrics)
+        joins.append(
+            f"LEFT JOIN (\n{build_block_query(block, metrics)}\n) {alias} "
+            f"ON CTES.CLIENTE_ID = {alias}.CLIENTE_ID"
+        )
+
+    return "\n".join(
+        [
+            "SELECT " + ", ".join(columns),
+            "FROM (SELECT CLIENTE_ID FROM MBAFERGUEZ..R_CLIENTES WHERE CLIENTE_ID IN %(clientes)s) CTES",
+        ]
+        + joins
+    )
+
+
+def week_numbers(semana: Optional[int], metrics: List[MetricDefinition]) -> Tuple[int, ...]:
+    """
+    Get the week numbers the requested weekly metrics need
+
+    Args:
+        semana: Week number of the plan date
+        metrics: Resolved metric definitions
+
+    Returns:
+        Week numbers for the %(semanas)s parameter (never empty, so the
+        generated IN list stays valid)
+    """
+    if semana is None:
+        return (None,)
+    return tuple(sorted({semana - m.week_offset for m in metrics if m.week_offset is not None}))
+
+
+# ============================================================================
+# Replica Computation
+# ============================================================================
+
+def apply_replica_metrics(
+    rows: List[Dict[str, Any]],
+    metrics: List[MetricDefinition],
+    snapshot: ReferenceSnapshot
+) -> List[Dict[str, Any]]:
+    """
+    Compute reference metrics from the in-memory snapshot (in place)
+
+    Args:
+        rows: One row per client
+        metrics: Metrics with a replica computation
+        snapshot: Reference snapshot
+
+    Returns:
+        The same list of rows, with the metrics set
+    """
+    for row in rows:
+        key = str(row.get("CLIENTE_ID")).strip()
+        for metric in metrics:
+            row[metric.name] = metric.replica(snapshot, key)
+
+    return rows
@@ -4,13 +4,22 @@ SQL Server Client
 Provides connection and query execution for legacy SQL Server database.
 """
 
+import math
 import pymssql
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
 from datetime import date
 from pathlib import Path
 
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.db import mssql_standin
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.metrics import SQL_QUERY_SECONDS
+from app.core.deadline import DeadlineExceeded, check_deadline, time_budget
 
 logger = get_logger(__name__)
 
@@ -18,16 +27,30 @@ logger = get_logger(__name__)
 # Connection Management
 # ============================================================================
 
+def _timeout_seconds(cap: float) -> int:
+    """Whole-second pymssql timeout within the request budget (0 would mean none)"""
+    return max(1, math.ceil(time_budget(cap)))
+
+
 def get_connection() -> pymssql.Connection:
     """
     Create SQL Server connection using pymssql
 
+    Login and statement timeouts are capped by the remaining request budget.
+    With MSSQL_BACKEND=standin, connects to the local SQLite stand-in instead.
+
     Returns:
         Active database connection
 
     Raises:
         Exception: If connection fails
     """
+    if settings.MSSQL_BACKEND == "standin":
+        return mssql_standin.connect(
+            settings.MSSQL_STANDIN_PATH,
+            timeout=_timeout_seconds(settings.MSSQL_QUERY_TIMEOUT_SECONDS)
+        )
+
     try:
         connection = pymssql.connect(
             server=settings.MSSQL_SERVER,
@@ -35,37 +58,125 @@ def get_connection() -> pymssql.Connection:
             user=settings.MSSQL_USER,
             password=settings.MSSQL_PASSWORD,
             database=settings.MSSQL_DATABASE,
-            timeout=30,
-            login_timeout=30
+            timeout=_timeout_seconds(settings.MSSQL_QUERY_TIMEOUT_SECONDS),
+            login_timeout=_timeout_seconds(settings.MSSQL_LOGIN_TIMEOUT_SECONDS)
         )
         logger.info("SQL Server connection established")
         return connection
     except Exception as e:
-        logger.error(f"Failed to connect to SQL Server: {str(e)}")
+        logger.error("Failed to connect to SQL Server: %s", e)
         raise
 
 
-# ============================================================================
-# Query Execution
-# ============================================================================
+# Idle connections (LIFO keeps the warmest ones in use) and checkout slots
+_pool: "queue.LifoQueue[pymssql.Connection]" = queue.LifoQueue()
+_pool_slots = threading.BoundedSemaphore(settings.MSSQL_POOL_SIZE)
 
-def execute_query(query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+
+@contextmanager
+def pooled_connection() -> Iterator[pymssql.Connection]:
     """
-    Execute SQL query and return results as list of dictionaries
+    Check out a connection from the pool
 
-    Args:
-        query: SQL query to execute
-        params: Optional dictionary of parameters
+    At most MSSQL_POOL_SIZE connections are checked out at once. Idle
+    connections are reused; a connection that raised is closed instead of
+    being returned to the pool.
 
-    Returns:
-        List of row dictionaries
+    Yields:
+        Active database connection
 
     Raises:
-        Exception: If query execution fails
+        TimeoutError: If no connection frees up within MSSQL_POOL_TIMEOUT_SECONDS
+            (or the remaining request budget)
+        DeadlineExceeded: If the request ran out of time or was abandoned
+        Exception: If connection fails
     """
+    if not _pool_slots.acquire(timeout=time_budget(settings.MSSQL_POOL_TIMEOUT_SECONDS)):
+        raise TimeoutError("Timed out waiting for a SQL Server connection")
+
     connection = None
     try:
-        connection = get_connection()
+        # The client may have gone away while we waited for a slot
+        check_deadline()
+        try:
+            connection = _pool.get_nowait()
+        except queue.Empty:
+            connection = get_connection()
+
+        yield connection
+
+    except Exception:
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            connection = None
+        raise
+    finally:
+        if connection is not None:
+            _pool.put(connection)
+        _pool_slots.release()
+
+
+def pool_stats() -> Dict[str, int]:
+    """
+    Connection pool gauges
+
+    Returns:
+        size (MSSQL_POOL_SIZE), in_use (checked out, or waiting to connect)
+        and idle (open connections ready for reuse)
+    """
+    # BoundedSemaphore keeps its free slots in _value
+    free_slots = getattr(_pool_slots, "_value", settings.MSSQL_POOL_SIZE)
+    return {
+        "size": settings.MSSQL_POOL_SIZE,
+        "in_use": settings.MSSQL_POOL_SIZE - free_slots,
+        "idle": _pool.qsize(),
+    }
+
+
+def close_pool() -> None:
+    """Close all idle pooled connections"""
+    while True:
+        try:
+            connection = _pool.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+# ============================================================================
+# Query Execution
+# ============================================================================
+
+# Shared by every query against the legacy server
+mssql_breaker = CircuitBreaker(
+    "mssql",
+    failure_rate_threshold=settings.MSSQL_BREAKER_FAILURE_RATE,
+    slow_call_seconds=settings.MSSQL_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate_threshold=settings.MSSQL_BREAKER_SLOW_CALL_RATE,
+    window_size=settings.MSSQL_BREAKER_WINDOW,
+    minimum_calls=settings.MSSQL_BREAKER_MIN_CALLS,
+    open_seconds=settings.MSSQL_BREAKER_OPEN_SECONDS,
+    excluded=(DeadlineExceeded,),
+)
+
+
+def _set_statement_timeout(connection: pymssql.Connection, seconds: int) -> None:
+    """Set the statement timeout of a (pooled) connection"""
+    # pymssql keeps it on the underlying _mssql connection; the stand-in on itself
+    getattr(connection, "_conn", connection).query_timeout = seconds
+
+
+def _fetch_rows(query: str, params: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run a query on a pooled connection and convert rows to dictionaries"""
+    with pooled_connection() as connection:
+        # Pooled connections outlive requests: set this statement's timeout
+        _set_statement_timeout(connection, _timeout_seconds(settings.MSSQL_QUERY_TIMEOUT_SECONDS))
         cursor = connection.cursor()
 
         if params:
@@ -88,34 +199,72 @@ def execute_query(query: str, params: Optional[Dict[str, Any]] = None) -> List[D
                 row_dict[column] = value
             rows.append(row_dict)
 
-        logger.info(f"Query executed successfully, returned {len(rows)} rows")
+    return rows
+
+
+def execute_query(
+    query: str,
+    params: Optional[Dict[str, Any]] = None,
+    name: str = "adhoc"
+) -> List[Dict[str, Any]]:
+    """
+    Execute SQL query and return results as list of dictionaries
+
+    Calls go through mssql_breaker: while SQL Server is failing or slow they
+    are rejected immediately instead of holding a connection slot. Each call
+    is timed in SQL_QUERY_SECONDS under its name.
+
+    Args:
+        query: SQL query to execute
+        params: Optional dictionary of parameters
+        name: Query (version) label for metrics, e.g. "hoja_de_visita_ventas"
+
+    Returns:
+        List of row dictionaries
+
+    Raises:
+        CircuitOpenError: If the breaker is open
+        Exception: If query execution fails
+    """
+    started = time.perf_counter()
+    try:
+        rows = mssql_breaker.call(_fetch_rows, query, params)
+
+        SQL_QUERY_SECONDS.observe(time.perf_counter() - started, query=name, outcome="ok")
+        logger.debug("Query %s executed successfully, returned %d rows", name, len(rows))
         return rows
 
     except Exception as e:
-        logger.error(f"Query execution failed: {str(e)}")
+        outcome = "rejected" if isinstance(e, CircuitOpenError) else "error"
+        SQL_QUERY_SECONDS.observe(time.perf_counter() - started, query=name, outcome=outcome)
+        logger.error("Query %s execution failed: %s", name, e)
         raise
-    finally:
-        if connection:
-            connection.close()
 
 
 # ============================================================================
 # Hoja de Visita Query
 # ============================================================================
 
-def get_hoja_visita_query(ruta: str, fecha: date) -> str:
+QUERIES_DIR = Path(__file__).parent.parent.parent.parent / "docs" / "queries"
+
+HOJA_DE_VISITA_FILE = "HOJA_DE_VISITA.sql"
+HOJA_DE_VISITA_VENTAS_FILE = "HOJA_DE_VISITA_VENTAS.sql"
+
+
+def get_hoja_visita_query(ruta: str, fecha: date, query_file_name: str = HOJA_DE_VISITA_FILE) -> str:
     """
     Build the Hoja de Visita query with parameters
 
     Args:
         ruta: Route code (e.g., '001')
         fecha: Date for the route plan
+        query_file_name: Query file under docs/queries (defaults to the full query)
 
     Returns:
         Parameterized SQL query string
     """
     # Read the base query from file
-    query_file = Path(__file__).parent.parent.parent.parent / "docs" / "queries" / "HOJA_DE_VISITA.sql"
+    query_file = QUERIES_DIR / query_file_name
 
     if not query_file.exists():
         raise FileNotFoundError(f"Query file not found: {query_file}")
@@ -149,16 +298,69 @@ def execute_hoja_visita_query(ruta: str, fecha: date) -> List[Dict[str, Any]]:
         Exception: If query execution fails
     """
     try:
-        logger.info(f"Executing Hoja de Visita query for route {ruta} on {fecha}")
+        logger.debug("Executing Hoja de Visita query for route %s on %s", ruta, fecha)
 
         query = get_hoja_visita_query(ruta, fecha)
-        results = execute_query(query)
+        results = execute_query(query, name="hoja_de_visita")
+
+        logger.info("Hoja de Visita query returned %d clients for route %s", len(results), ruta)
+        return results
 
-        logger.info(f"Hoja de Visita query returned {len(results)} clients for route {ruta}")
+    except Exception as e:
+        logger.error("Failed to execute Hoja de Visita query: %s", e)
+        raise
+
+
+def _sql_in_list(values: List[str]) -> str:
+    """Render values as a quoted SQL IN list"""
+    return ", ".join("'" + str(value).replace("'", "''") + "'" for value in values)
+
+
+def execute_hoja_visita_ventas_query(
+    ruta: str,
+    fecha: date,
+    cliente_ids: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Execute the sales-only variant of the Hoja de Visita query
+
+    Same clients and sales aggregates as the full query, without the
+    coolers, HEI and promo lona joins (see app.db.reference_cache).
+
+    Args:
+        ruta: Route code (e.g., '001')
+        fecha: Date for the route plan
+        cliente_ids: Clients to aggregate, already resolved for the day
+            (see app.db.client_index). If None, the visit calendar is
+            joined in SQL.
+
+    Returns:
+        List of client records with sales data (no ENFRIADORES/IDSHOP/DESCLP)
+
+    Raises:
+        Exception: If query execution fails
+    """
+    if cliente_ids is not None and not cliente_ids:
+        return []
+
+    try:
+        logger.debug("Executing Hoja de Visita sales query for route %s on %s", ruta, fecha)
+
+        query = get_hoja_visita_query(ruta, fecha, HOJA_DE_VISITA_VENTAS_FILE)
+        name = "hoja_de_visita_ventas"
+        if cliente_ids is not None:
+            query = query.replace(
+                "where LUNES=1)CTES",
+                f"where C.CLIENTE_ID IN ({_sql_in_list(cliente_ids)}))CTES"
+            )
+            name = "hoja_de_visita_ventas_clientes"
+        results = execute_query(query, name=name)
+
+        logger.info("Hoja de Visita sales query returned %d clients for route %s", len(results), ruta)
         return results
 
     except Exception as e:
-        logger.error(f"Failed to execute Hoja de Visita query: {str(e)}")
+        logger.error("Failed to execute Hoja de Visita sales query: %s", e)
         raise
 
 
@@ -181,5 +383,5 @@ def test_connection() -> bool:
         connection.close()
         return result[0] == 1
     except Exception as e:
-        logger.error(f"Connection test failed: {str(e)}")
+        logger.error("Connection test failed: %s", e)
         return False
@@ -0,0 +1,381 @@
+"""
+SQL Server Stand-in
+
+Local SQLite stand-in for the legacy mbaFerguez / dbGpoFernandez schema, so
+route planning can be benchmarked and checked for equivalence without the
+production ERP. Enabled with MSSQL_BACKEND=standin; populate it with
+app.db.seed_standin.
+
+The connection mimics the part of the pymssql API used by mssql_client and
+translates the T-SQL the app sends:
+
+- pyformat parameters (%(name)s, tuples expanded for IN lists, %% escapes)
+- database prefixes (MBAFERGUEZ..vwVentasFerguez) and COLLATE clauses
+- CONVERT(VARCHAR, x) and + string concatenation, MONTH() and YEAR()
+- SELECT alias = expression column aliases
+- DECLARE / SET @variable batches (Hoja de Visita query files): each SET is
+  evaluated and the variable is substituted into the final SELECT
+"""
+
+import re
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# ============================================================================
+# Schema
+# ============================================================================
+
+# Only the columns the app reads. Ids are 6-character strings as in ERP.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS R_CLIENTES (
+    CLIENTE_ID TEXT PRIMARY KEY,
+    NOMBRE_CLIENTE TEXT,
+    RUTA TEXT,
+    RUTA_REP TEXT,
+    GECS TEXT
+);
+CREATE TABLE IF NOT EXISTS R_VISITAS (
+    CLIENTE_ID TEXT,
+    LUNES INTEGER, MARTES INTEGER, MIERCOLES INTEGER,
+    JUEVES INTEGER, VIERNES INTEGER, SABADO INTEGER
+);
+CREATE TABLE IF NOT EXISTS R_SEMANAS (
+    FECHA TEXT PRIMARY KEY,
+    SEMANA INTEGER
+);
+CREATE TABLE IF NOT EXISTS vwVentasFerguez (
+    CLIENTE_ID TEXT,
+    FECHAVTA TEXT,
+    ANIOVTA INTEGER,
+    MESVTA INTEGER,
+    SEMANA INTEGER,
+    GRUPO TEXT,
+    MARCA TEXT,
+    CUPO TEXT,
+    GECS TEXT,
+    CARTONES INTEGER
+);
+CREATE TABLE IF NOT EXISTS bdenf (
+    idCliente TEXT PRIMARY KEY,
+    ENFRIADORES INTEGER
+);
+CREATE TABLE IF NOT EXISTS R_HEISHOP (
+    CLIENTE_ID TEXT
+);
+CREATE TABLE IF NOT EXISTS VWVENTASDETALLECAP (
+    CLIENTE_ID TEXT,
+    OBSERVACIONES TEXT,
+    FECHAVTA TEXT
+);
+CREATE TABLE IF NOT EXISTS vwPreventaDetallea (
+    clave TEXT,
+    FOLIO TEXT,
+    f_preventa TEXT
+);
+CREATE TABLE IF NOT EXISTS ClienteEsquema (
+    CLIENTECLAVE TEXT,
+    esquemaid TEXT
+);
+"""
+
+# Created after bulk loading (see seed_standin)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS ix_clientes_ruta ON R_CLIENTES (RUTA);
+CREATE INDEX IF NOT EXISTS ix_visitas_cliente ON R_VISITAS (CLIENTE_ID);
+CREATE INDEX IF NOT EXISTS ix_ventas_cliente_semana ON vwVentasFerguez (CLIENTE_ID, ANIOVTA, SEMANA);
+CREATE INDEX IF NOT EXISTS ix_ventas_cliente_fecha ON vwVentasFerguez (CLIENTE_ID, FECHAVTA);
+CREATE INDEX IF NOT EXISTS ix_ventas_anio_semana ON vwVentasFerguez (ANIOVTA, SEMANA);
+CREATE INDEX IF NOT EXISTS ix_ventas_anio_mes ON vwVentasFerguez (ANIOVTA, MESVTA);
+"""
+
+
+def create_schema(connection: sqlite3.Connection) -> None:
+    """Create the stand-in tables"""
+    connection.executescript(SCHEMA)
+
+
+def create_indexes(connection: sqlite3.Connection) -> None:
+    """Create the stand-in indexes"""
+    connection.executescript(INDEXES)
+
+
+# ============================================================================
+# T-SQL Translation
+# ============================================================================
+
+_PARAM = re.compile(r"%\((\w+)\)s|%%")
+_DB_PREFIX = re.compile(r"\b[A-Za-z_]\w*\.\.")
+_COLLATE = re.compile(r"\bCOLLATE\s+\w+", re.IGNORECASE)
+_CONVERT_VARCHAR = re.compile(r"\bCONVERT\s*\(\s*VARCHAR\s*,", re.IGNORECASE)
+_CONCAT = re.compile(r"\+\s*CONVERT_VARCHAR\(", re.IGNORECASE)
+_DECLARE = re.compile(r"\bDECLARE\b.*?;", re.IGNORECASE | re.DOTALL)
+_SET = re.compile(r"\bSET\s+@(\w+)\s*=\s*", re.IGNORECASE)
+_ALIAS_ASSIGN = re.compile(r"\bSELECT\s+(\w+)\s*=(?!=)", re.IGNORECASE)
+
+
+def bind_params(query: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Translate pyformat parameters to SQLite named parameters
+
+    Tuples are expanded to a parenthesized list, as pymssql does for IN.
+
+    Args:
+        query: Query with %(name)s placeholders
+        params: pymssql parameter dictionary
+
+    Returns:
+        (query with :name placeholders, SQLite parameter dictionary)
+    """
+    bound: Dict[str, Any] = {}
+
+    def replace(match: "re.Match[str]") -> str:
+        name = match.group(1)
+        if name is None:
+            return "%"
+        value = params[name]
+        if isinstance(value, (tuple, list)):
+            names = [f"{name}_{i}" for i in range(len(value))]
+            bound.update(zip(names, value))
+            return "(" + ", ".join(f":{n}" for n in names) + ")"
+        bound[name] = value
+        return f":{name}"
+
+    return _PARAM.sub(replace, query), bound
+
+
+def translate(query: str) -> str:
+    """
+    Rewrite T-SQL syntax the stand-in does not understand
+
+    Args:
+        query: T-SQL statement (no DECLARE/SET; see split_batch)
+
+    Returns:
+        SQLite statement
+    """
+    query = _DB_PREFIX.sub("", query)
+    query = _COLLATE.sub("COLLATE NOCASE", query)
+    query = _CONVERT_VARCHAR.sub("CONVERT_VARCHAR(", query)
+    query = _CONCAT.sub("|| CONVERT_VARCHAR(", query)
+    return _rewrite_alias_assignments(query)
+
+
+def _expression_end(query: str, start: int) -> int:
+    """Offset of the first top-level comma (or FROM) after start"""
+    depth = 0
+    for position in range(start, len(query)):
+        char = query[position]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and (char == "," or query[position:position + 5].upper() == " FROM"):
+            return position
+    return len(query)
+
+
+def _rewrite_alias_assignments(query: str) -> str:
+    """Rewrite 'SELECT alias = expr' as 'SELECT expr AS alias'"""
+    match = _ALIAS_ASSIGN.search(query)
+    while match:
+        end = _expression_end(query, match.end())
+        expression = query[match.end():end].strip()
+        replacement = f"SELECT {expression} AS {match.group(1)}"
+        query = query[:match.start()] + replacement + query[end:]
+        match = _ALIAS_ASSIGN.search(query, match.start() + len(replacement))
+    return query
+
+
+def _read_value(query: str, start: int) -> int:
+    """End offset of a SET value: a quoted literal or a parenthesized expression"""
+    if query[start] == "'":
+        return query.index("'", start + 1) + 1
+
+    depth = 0
+    for position in range(start, len(query)):
+        char = query[position]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return position + 1
+    raise ValueError("Unbalanced SET expression")
+
+
+def split_batch(query: str) -> Tuple[List[Tuple[str, str]], str]:
+    """
+    Split a T-SQL batch into variable assignments and the final statement
+
+    Args:
+        query: Batch with optional DECLARE and SET @name=... statements
+
+    Returns:
+        ([(variable, value expression)], remaining statement)
+    """
+    query = _DECLARE.sub("", query)
+    assignments = []
+    parts = []
+    position = 0
+
+    for match in _SET.finditer(query):
+        if match.start() < position:
+            continue
+        end = _read_value(query, match.end())
+        assignments.append((match.group(1).upper(), query[match.end():end]))
+        parts.append(query[position:match.start()])
+        position = end
+        while position < len(query) and query[position] in " \t;":
+            position += 1
+
+    parts.append(query[position:])
+    return assignments, "".join(parts)
+
+
+def _sql_literal(value: Any) -> str:
+    """Render a variable value as a SQL literal"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _substitute(query: str, variables: Dict[str, str]) -> str:
+    """Replace @variables with their literal values"""
+    for name in sorted(variables, key=len, reverse=True):
+        query = re.sub(rf"@{name}\b", lambda _, value=variables[name]: value, query, flags=re.IGNORECASE)
+    return query
+
+
+# ============================================================================
+# SQL Functions
+# ============================================================================
+
+def _month(value: Optional[str]) -> Optional[int]:
+    return date.fromisoformat(str(value)[:10]).month if value is not None else None
+
+
+def _year(value: Optional[str]) -> Optional[int]:
+    return date.fromisoformat(str(value)[:10]).year if value is not None else None
+
+
+def _convert_varchar(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+# ============================================================================
+# Connection
+# ============================================================================
+
+class StandInCursor:
+    """pymssql-like cursor over a SQLite cursor"""
+
+    def __init__(self, connection: "StandInConnection"):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Execute a T-SQL statement or batch
+
+        Raises:
+            sqlite3.OperationalError: On SQL errors, or when the statement
+                runs longer than the connection's query_timeout
+        """
+        bound: Dict[str, Any] = {}
+        if params:
+            query, bound = bind_params(query, params)
+
+        assignments, statement = split_batch(query)
+
+        self._connection.start_statement()
+        try:
+            variables: Dict[str, str] = {}
+            for name, expression in assignments:
+                expression = translate(_substitute(expression, variables))
+                if expression.startswith("("):
+                    self._cursor.execute(f"SELECT {expression}", bound)
+                    variables[name] = _sql_literal(self._cursor.fetchone()[0])
+                else:
+                    variables[name] = expression
+
+            self._cursor.execute(translate(_substitute(statement, variables)), bound)
+        finally:
+            self._connection.end_statement()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class StandInConnection:
+    """pymssql-like connection to the SQLite stand-in"""
+
+    def __init__(self, path: str, query_timeout: int = 0):
+        # Pooled connections are handed between threads, one at a time
+        self.raw = sqlite3.connect(path, check_same_thread=False)
+        self.raw.create_function("MONTH", 1, _month, deterministic=True)
+        self.raw.create_function("YEAR", 1, _year, deterministic=True)
+        self.raw.create_function("CONVERT_VARCHAR", 1, _convert_varchar, deterministic=True)
+        self.query_timeout = query_timeout  # Seconds, 0 = none (as in pymssql)
+        self._statement_deadline = 0.0
+
+    def _check_timeout(self) -> int:
+        """SQLite progress handler: non-zero aborts the running statement"""
+        return 1 if time.monotonic() > self._statement_deadline else 0
+
+    def start_statement(self) -> None:
+        """Arm the statement timeout"""
+        if self.query_timeout:
+            self._statement_deadline = time.monotonic() + self.query_timeout
+            self.raw.set_progress_handler(self._check_timeout, 10000)
+
+    def end_statement(self) -> None:
+        """Disarm the statement timeout"""
+        self.raw.set_progress_handler(None, 0)
+
+    def cursor(self) -> StandInCursor:
+        return StandInCursor(self)
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+def connect(path: str, timeout: int = 0, login_timeout: int = 0) -> StandInConnection:
+    """
+    Open the stand-in database
+
+    Args:
+        path: SQLite database file (see app.db.seed_standin)
+        timeout: Statement timeout in seconds (0 = none)
+        login_timeout: Accepted for pymssql compatibility
+
+    Returns:
+        Stand-in connection
+
+    Raises:
+        FileNotFoundError: If the database has not been generated
+    """
+    if path != ":memory:" and not Path(path).exists():
+        raise FileNotFoundError(
+            f"SQL Server stand-in not found: {path} (generate it with python -m app.db.seed_standin)"
+        )
+    logger.info("Using SQL Server stand-in at %s", path)
+    return StandInConnection(path, query_timeout=timeout)
@@ -0,0 +1,226 @@
+"""
+Reference Data Cache
+
+In-memory snapshot of the slow-changing legacy reference sets used by the
+Hoja de Visita: coolers (bdenf), HEI shops and promo lona (ClienteEsquema).
+
+These sets change at most daily, so they are loaded once into compact
+sets/maps keyed by CLIENTE_ID and refreshed on a schedule. The route query
+then only fetches sales aggregates and the flags are joined in Python.
+"""
+
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import CACHE_REQUESTS
+from app.db.mssql_client import execute_query
+
+logger = get_logger(__name__)
+
+# ============================================================================
+# Reference Queries
+# ============================================================================
+
+COOLERS_QUERY = """
+SELECT idCliente, ENFRIADORES
+FROM MBAFERGUEZ..bdenf
+"""
+
+HEI_SHOPS_QUERY = """
+SELECT DISTINCT CLIENTE_ID
+FROM (
+    SELECT CLIENTE_ID FROM mbaFerguez..R_HEISHOP
+    UNION ALL
+    SELECT DISTINCT CLIENTE_ID
+    FROM MBAFERGUEZ..VWVENTASDETALLECAP
+    WHERE OBSERVACIONES LIKE '%HIP%' AND FECHAVTA >= '2025-04-21'
+    UNION ALL
+    SELECT clave
+    FROM MBAFERGUEZ..vwPreventaDetallea
+    WHERE FOLIO LIKE '%HI%' AND f_preventa >= '2025-04-21'
+) HEI
+"""
+
+PROMO_LONA_QUERY = """
+SELECT DISTINCT SUBSTRING(CLIENTECLAVE, 3, 6) ID
+FROM dbGpoFernandez..ClienteEsquema
+WHERE esquemaid = 'LPG008'
+"""
+
+PROMO_LONA_DESC = "PROMLONA"
+
+
+# ============================================================================
+# Snapshot
+# ============================================================================
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """Immutable set of reference flags, swapped atomically on refresh"""
+    version: int
+    loaded_at: datetime
+    coolers: Dict[str, Any] = field(default_factory=dict)
+    hei_shops: FrozenSet[str] = frozenset()
+    promo_lona: FrozenSet[str] = frozenset()
+
+
+_snapshot: Optional[ReferenceSnapshot] = None
+_refresh_lock = threading.Lock()
+
+_hits = CACHE_REQUESTS.labels(cache="reference", result="hit")
+_misses = CACHE_REQUESTS.labels(cache="reference", result="miss")
+
+
+def _client_key(value: Any) -> str:
+    """Normalize a CLIENTE_ID from any legacy source to a lookup key"""
+    return str(value).strip() if value is not None else ""
+
+
+def load_reference_snapshot(version: int) -> ReferenceSnapshot:
+    """
+    Load all reference sets from SQL Server
+
+    Args:
+        version: Version stamp for the new snapshot
+
+    Returns:
+        New ReferenceSnapshot
+
+    Raises:
+        Exception: If any reference query fails
+    """
+    coolers = {
+        _client_key(row["idCliente"]): row["ENFRIADORES"]
+        for row in execute_query(COOLERS_QUERY, name="coolers")
+    }
+    hei_shops = frozenset(
+        _client_key(row["CLIENTE_ID"]) for row in execute_query(HEI_SHOPS_QUERY, name="hei_shops")
+    )
+    promo_lona = frozenset(
+        _client_key(row["ID"]) for row in execute_query(PROMO_LONA_QUERY, name="promo_lona")
+    )
+
+    return ReferenceSnapshot(
+        version=version,
+        loaded_at=datetime.utcnow(),
+        coolers=coolers,
+        hei_shops=hei_shops,
+        promo_lona=promo_lona,
+    )
+
+
+def _load_and_publish() -> ReferenceSnapshot:
+    """Load a new snapshot and publish it (caller holds _refresh_lock)"""
+    global _snapshot
+
+    version = _snapshot.version + 1 if _snapshot else 1
+    snapshot = load_reference_snapshot(version)
+    _snapshot = snapshot
+
+    logger.info(
+        "Reference snapshot v%d loaded: %d coolers, %d HEI shops, %d promo lona",
+        snapshot.version, len(snapshot.coolers), len(snapshot.hei_shops), len(snapshot.promo_lona)
+    )
+    return snapshot
+
+
+def refresh_reference_snapshot() -> ReferenceSnapshot:
+    """
+    Reload the reference snapshot and publish it
+
+    Returns:
+        The freshly loaded snapshot
+
+    Raises:
+        Exception: If loading fails (the previous snapshot stays in place)
+    """
+    with _refresh_lock:
+        return _load_and_publish()
+
+
+def get_reference_snapshot() -> ReferenceSnapshot:
+    """
+    Get the current reference snapshot, loading it on first use
+
+    Readers never block once a snapshot exists; refreshes swap it atomically.
+
+    Returns:
+        Current ReferenceSnapshot
+    """
+    snapshot = _snapshot
+    if snapshot is not None:
+        _hits.inc()
+        return snapshot
+
+    _misses.inc()
+    with _refresh_lock:
+        # Another thread may have loaded it while we waited
+        if _snapshot is not None:
+            return _snapshot
+        return _load_and_publish()
+
+
+def clear_reference_snapshot() -> None:
+    """Drop the current snapshot (next read reloads it)"""
+    global _snapshot
+    _snapshot = None
+
+
+# ============================================================================
+# Flag Join
+# ============================================================================
+
+def apply_reference_flags(
+    rows: List[Dict[str, Any]],
+    snapshot: ReferenceSnapshot
+) -> List[Dict[str, Any]]:
+    """
+    Add ENFRIADORES, IDSHOP and DESCLP to sales rows (in place)
+
+    Produces the same columns the full Hoja de Visita query returns.
+
+    Args:
+        rows: Rows from the sales-only Hoja de Visita query
+        snapshot: Reference snapshot to join against
+
+    Returns:
+        The same list of rows, with the reference flags set
+    """
+    coolers = snapshot.coolers
+    hei_shops = snapshot.hei_shops
+    promo_lona = snapshot.promo_lona
+
+    for row in rows:
+        key = _client_key(row.get("CLIENTE_ID"))
+        row["ENFRIADORES"] = coolers.get(key)
+        row["IDSHOP"] = row.get("CLIENTE_ID") if key in hei_shops else None
+        row["DESCLP"] = PROMO_LONA_DESC if key in promo_lona else None
+
+    return rows
+
+
+# ============================================================================
+# Scheduled Refresh
+# ============================================================================
+
+async def run_reference_refresher() -> None:
+    """
+    Refresh the reference snapshot every REFERENCE_CACHE_REFRESH_MINUTES
+
+    Runs until cancelled. Failures are logged and the previous snapshot is
+    kept until the next attempt.
+    """
+    interval = settings.REFERENCE_CACHE_REFRESH_MINUTES * 60
+
+    while True:
+        try:
+            await asyncio.to_thread(refresh_reference_snapshot)
+        except Exception as e:
+            logger.error("Reference snapshot refresh failed: %s", e)
+
+        await asyncio.sleep(interval)
@@ -56,7 +56,7 @@ def seed_users():
 
         # Create user
         create_user(user_data["id"], user_data)
-        logger.info(f"✓ Created user: {user_data['id']} ({user_data['nombre']})")
+        logger.info("✓ Created user: %s (%s)", user_data["id"], user_data["nombre"])
 
 
 def seed_config():
@@ -74,7 +74,7 @@ def seed_config():
 
     for config in configs:
         set_config(config["key"], config["value"])
-        logger.info(f"✓ Created config: {config['key']} = {config['value']}")
+        logger.info("✓ Created config: %s = %s", config["key"], config["value"])
 
 
 def clear_collections():
@@ -94,7 +94,7 @@ def clear_collections():
             deleted += 1
 
         if deleted > 0:
-            logger.info(f"✓ Deleted {deleted} documents from {collection_name}")
+            logger.info("✓ Deleted %d documents from %s", deleted, collection_name)
 
 
 def main():
@@ -128,7 +128,7 @@ def main():
         logger.info("=" * 60)
 
     except Exception as e:
-        logger.error(f"✗ Seed failed: {str(e)}", exc_info=True)
+        logger.error("✗ Seed failed: %s", e, exc_info=True)
         sys.exit(1)
 
 
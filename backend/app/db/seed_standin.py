@@ -0,0 +1,240 @@
+"""
+SQL Server Stand-in Seed Data
+
+Generates a synthetic legacy database for the SQL Server stand-in
+(app.db.mssql_standin): client master and visit calendar, week calendar,
+weekly sales history, coolers, HEI shops and promo lona schemes.
+
+Data is deterministic for a given seed. Sales follow each client's GECS
+segment and visit days, so routes look like production ones: a few hundred
+clients per route, most of them buying beer every visit week.
+
+Usage:
+    python -m app.db.seed_standin
+    python -m app.db.seed_standin --routes 500 --clients 200000 --years 3 --path /tmp/erp.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from typing import Iterator, List, Tuple
+
+# Add parent directory to path to allow imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from app.core.config import settings
+from app.core.logging import get_logger, setup_logging
+from app.db.mssql_standin import create_indexes, create_schema
+
+logger = get_logger(__name__)
+
+# ============================================================================
+# Distributions
+# ============================================================================
+
+# (segment, share of clients, mean beer cartons per visit week)
+GECS_SEGMENTS = (
+    ("BRONCE", 0.44, 3),
+    ("PLATA", 0.25, 6),
+    ("ORO", 0.18, 15),
+    ("PLATINO", 0.08, 38),
+    ("TITANIO", 0.03, 80),
+    (None, 0.02, 2),
+)
+
+BEER_BRANDS = ("TECATE", "INDIO", "XX Lager", "MILLER HIGH", "HEINEKEN", "AMSTEL", "SOL", "CARTA BLANCA")
+BEER_BRAND_WEIGHTS = (25, 20, 12, 8, 15, 8, 7, 5)
+CUPOS = ("NR", "RET")
+OTHER_GROUPS = ("REFRESCO", "AGUA", "BOTANA", "HIELO", "ENVASE")
+
+# Visit patterns as weekday sets (0 = Monday)
+VISIT_PATTERNS = ((0,), (1,), (2,), (3,), (4,), (5,), (0, 3), (1, 4), (2, 5))
+
+HEI_PROGRAM_START = date(2025, 4, 21)
+PROMO_LONA_SCHEME = "LPG008"
+
+BATCH_SIZE = 50000
+
+
+# ============================================================================
+# Generators
+# ============================================================================
+
+def week_number(day: date) -> int:
+    """R_SEMANAS week number: weeks start on Monday, week 1 holds January 1st"""
+    return int(day.strftime("%W")) + (0 if date(day.year, 1, 1).weekday() == 0 else 1)
+
+
+def client_id(n: int) -> str:
+    """Six-character CLIENTE_ID"""
+    return f"{n:06d}"
+
+
+def _pick_segment(rng: random.Random) -> Tuple[str, int]:
+    """Random GECS segment and its mean weekly volume"""
+    roll = rng.random()
+    for segment, share, volume in GECS_SEGMENTS:
+        if roll < share:
+            return segment, volume
+        roll -= share
+    return GECS_SEGMENTS[0][0], GECS_SEGMENTS[0][2]
+
+
+def generate_clients(rng: random.Random, routes: int, clients: int) -> List[Tuple]:
+    """
+    Generate the client master with visit days
+
+    Returns:
+        (cliente_id, nombre, ruta, gecs, volume, visit_days) per client
+    """
+    result = []
+    for n in range(1, clients + 1):
+        ruta = f"{(n - 1) % routes + 1:03d}"
+        gecs, volume = _pick_segment(rng)
+        result.append((client_id(n), f"Tienda {n}", ruta, gecs, volume, rng.choice(VISIT_PATTERNS)))
+    return result
+
+
+def generate_sales(
+    rng: random.Random,
+    clients: List[Tuple],
+    start: date,
+    end: date
+) -> Iterator[Tuple]:
+    """
+    Generate weekly sales lines (one purchase per visit day)
+
+    Yields:
+        vwVentasFerguez rows
+    """
+    monday = start - timedelta(days=start.weekday())
+    while monday <= end:
+        for cliente_id, _, _, gecs, volume, visit_days in clients:
+            for weekday in visit_days:
+                day = monday + timedelta(days=weekday)
+                if day < start or day > end or rng.random() > 0.85:
+                    continue
+
+                fecha = day.isoformat()
+                semana = week_number(day)
+                cartons = max(1, int(rng.gauss(volume, volume * 0.3) / len(visit_days)))
+
+                for marca in set(rng.choices(BEER_BRANDS, BEER_BRAND_WEIGHTS, k=rng.randint(1, 3))):
+                    yield (cliente_id, fecha, day.year, day.month, semana, "CERVEZA", marca,
+                           rng.choice(CUPOS), gecs, max(1, cartons // 2))
+
+                if rng.random() < 0.35:
+                    yield (cliente_id, fecha, day.year, day.month, semana, rng.choice(OTHER_GROUPS),
+                           None, None, gecs, rng.randint(1, 5))
+        monday += timedelta(days=7)
+
+
+def _insert(connection: sqlite3.Connection, table: str, rows: Iterator[Tuple], columns: int) -> int:
+    """Bulk insert rows in batches, returning the row count"""
+    sql = f"INSERT INTO {table} VALUES ({', '.join('?' * columns)})"
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            connection.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def generate(
+    path: str,
+    routes: int = 20,
+    clients: int = 8000,
+    years: int = 3,
+    end: date = date(2025, 12, 31),
+    seed: int = 42
+) -> None:
+    """
+    Generate a stand-in database
+
+    Args:
+        path: SQLite file to create (replaced if it exists)
+        routes: Number of routes ('001', '002', ...)
+        clients: Number of clients, spread evenly over routes
+        years: Years of weekly sales history ending at `end`
+        end: Last sales date
+        seed: Random seed
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    rng = random.Random(seed)
+    start = date(end.year - years + 1, 1, 1)
+    started = time.perf_counter()
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    create_schema(connection)
+
+    master = generate_clients(rng, routes, clients)
+    _insert(connection, "R_CLIENTES", ((c[0], c[1], c[2], c[2], c[3]) for c in master), 5)
+    _insert(connection, "R_VISITAS", (
+        (c[0],) + tuple(1 if weekday in c[5] else 0 for weekday in range(6)) for c in master
+    ), 7)
+
+    days = (start + timedelta(days=n) for n in range((end - start).days + 1))
+    _insert(connection, "R_SEMANAS", ((day.isoformat(), week_number(day)) for day in days), 2)
+
+    sales = _insert(connection, "vwVentasFerguez", generate_sales(rng, master, start, end), 10)
+
+    ids = [c[0] for c in master]
+    _insert(connection, "bdenf", ((i, rng.randint(1, 3)) for i in ids if rng.random() < 0.3), 2)
+    _insert(connection, "R_HEISHOP", ((i,) for i in ids if rng.random() < 0.05), 1)
+    _insert(connection, "VWVENTASDETALLECAP", (
+        (i, "ALTA HIP", (HEI_PROGRAM_START + timedelta(days=rng.randint(0, 90))).isoformat())
+        for i in ids if rng.random() < 0.02
+    ), 3)
+    _insert(connection, "vwPreventaDetallea", (
+        (i, f"HI{rng.randint(1000, 9999)}", (HEI_PROGRAM_START + timedelta(days=rng.randint(0, 90))).isoformat())
+        for i in ids if rng.random() < 0.01
+    ), 3)
+    _insert(connection, "ClienteEsquema", (
+        ("01" + i, PROMO_LONA_SCHEME if rng.random() < 0.7 else "LPG001")
+        for i in ids if rng.random() < 0.15
+    ), 2)
+
+    connection.commit()
+    create_indexes(connection)
+    connection.execute("ANALYZE")
+    connection.commit()
+    connection.close()
+
+    logger.info(
+        "Stand-in generated at %s: %d routes, %d clients, %d sales lines (%s to %s) in %.1fs",
+        path, routes, clients, sales, start, end, time.perf_counter() - started
+    )
+
+
+def main():
+    """Main seed function"""
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Generate the SQL Server stand-in database")
+    parser.add_argument("--path", default=settings.MSSQL_STANDIN_PATH)
+    parser.add_argument("--routes", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=8000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2025, 12, 31))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.path, args.routes, args.clients, args.years, args.end, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Visit Sheet Execution
+
+Alternative execution strategies for the Hoja de Visita, generated from the
+metric registry (app.db.metric_registry) for just the metrics a caller uses:
+
+- fanout: each metric block runs as its own small parameterized query over
+  the pooled connections, concurrently, and the results are hash-joined by
+  CLIENTE_ID in Python. Per-block timings are logged.
+- narrow: a single generated statement joining only the needed blocks.
+
+Selected with HOJA_VISITA_STRATEGY, so the strategies can be compared
+against the same server.
+"""
+
+import calendar
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger, log_with_context
+from app.db.mssql_client import execute_query
+from app.db.client_index import (
+    CLIENT_MASTER_QUERY,
+    ClientRecord,
+    build_client_index,
+    get_client_index,
+    join_client_rows,
+)
+from app.db.metric_registry import (
+    ALL_METRICS,
+    MetricBlock,
+    MetricDefinition,
+    apply_replica_metrics,
+    build_block_query,
+    build_visit_sheet_query,
+    group_by_block,
+    resolve_metrics,
+    week_numbers,
+)
+from app.db.reference_cache import get_reference_snapshot
+
+logger = get_logger(__name__)
+
+# ============================================================================
+# Queries
+# ============================================================================
+
+WEEK_QUERY = """
+SELECT DISTINCT SEMANA FROM MBAFERGUEZ..R_SEMANAS WHERE FECHA = %(fecha)s
+"""
+
+ROUTE_CLIENTS_QUERY = CLIENT_MASTER_QUERY + """
+WHERE C.RUTA = %(ruta)s
+"""
+
+
+# ============================================================================
+# Execution
+# ============================================================================
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get the shared fan-out executor (one worker per pooled connection)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.MSSQL_POOL_SIZE,
+            thread_name_prefix="visit-sheet"
+        )
+    return _executor
+
+
+def executor_stats() -> Dict[str, int]:
+    """
+    Fan-out executor gauges
+
+    Returns:
+        workers (max), threads (started) and queued (blocks waiting for a
+        worker); all 0 before the first fan-out
+    """
+    executor = _executor
+    if executor is None:
+        return {"workers": 0, "threads": 0, "queued": 0}
+    return {
+        "workers": executor._max_workers,
+        "threads": len(executor._threads),
+        "queued": executor._work_queue.qsize(),
+    }
+
+
+def _run_block(name: str, query: str, params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float]:
+    """Run one block query, returning its rows and elapsed milliseconds"""
+    start = time.perf_counter()
+    rows = execute_query(query, params, name=f"visit_sheet_{name}")
+    return rows, (time.perf_counter() - start) * 1000
+
+
+def build_block_params(
+    fecha: date,
+    semana: Optional[int],
+    cliente_ids: List[str],
+    metrics: List[MetricDefinition]
+) -> Dict[str, Any]:
+    """
+    Build the parameters shared by all metric blocks
+
+    Args:
+        fecha: Date for the route plan
+        semana: Week number of fecha (from R_SEMANAS)
+        cliente_ids: Clients to aggregate
+        metrics: Requested metrics (they decide which weeks are scanned)
+
+    Returns:
+        Parameter dictionary for pymssql
+    """
+    last_day = calendar.monthrange(fecha.year, fecha.month)[1]
+    return {
+        "fecha": fecha.isoformat(),
+        "anio": fecha.year,
+        "mes": fecha.month,
+        "mes_inicio": fecha.replace(day=1).isoformat(),
+        "mes_fin": fecha.replace(day=last_day).isoformat(),
+        "semana": semana,
+        "semanas": week_numbers(semana, metrics),
+        "clientes": tuple(cliente_ids),
+    }
+
+
+def _resolve_clients(ruta: str, fecha: date) -> List[ClientRecord]:
+    """Resolve the day's clients from the index, or from SQL Server"""
+    if settings.CLIENT_INDEX_ENABLED:
+        return get_client_index().clients_for_day(ruta, fecha)
+
+    rows = execute_query(ROUTE_CLIENTS_QUERY, {"ruta": ruta}, name="route_clients")
+    return build_client_index(rows, version=0).clients_for_day(ruta, fecha)
+
+
+def _resolve_week(fecha: date) -> Optional[int]:
+    """Get the R_SEMANAS week number for a date"""
+    rows = execute_query(WEEK_QUERY, {"fecha": fecha.isoformat()}, name="week")
+    return rows[0]["SEMANA"] if rows else None
+
+
+def hash_join_metrics(
+    rows: List[Dict[str, Any]],
+    metrics: List[MetricDefinition],
+    metric_rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Join metric rows onto client rows by CLIENTE_ID
+
+    Every metric column is present on every row (None when there was no
+    row for that client), like the LEFT JOINs of the monolithic query.
+
+    Args:
+        rows: One row per client
+        metrics: Metrics carried by metric_rows
+        metric_rows: Rows with CLIENTE_ID plus one column per metric
+
+    Returns:
+        The same list of client rows, with metric columns set
+    """
+    by_id = {str(row["CLIENTE_ID"]).strip(): row for row in rows}
+    names = [metric.name for metric in metrics]
+
+    for row in rows:
+        for name in names:
+            row[name] = None
+
+    for metric_row in metric_rows:
+        target = by_id.get(str(metric_row["CLIENTE_ID"]).strip())
+        if target is None:
+            continue
+        for name in names:
+            target[name] = metric_row.get(name)
+
+    return rows
+
+
+def _plan_blocks(
+    metric_names: Iterable[str]
+) -> Tuple[List[MetricDefinition], List[Tuple[MetricBlock, List[MetricDefinition]]], List[MetricDefinition]]:
+    """
+    Split requested metrics into SQL blocks and in-memory replica metrics
+
+    Returns:
+        (all metrics, SQL (block, metrics) pairs, replica metrics)
+    """
+    metrics = resolve_metrics(metric_names)
+    sql_blocks = group_by_block(metrics)
+    replica_metrics: List[MetricDefinition] = []
+
+    if settings.REFERENCE_CACHE_ENABLED:
+        replica_metrics = [metric for metric in metrics if metric.replica is not None]
+        sql_blocks = [(block, block_metrics) for block, block_metrics in sql_blocks if not block.reference]
+
+    return metrics, sql_blocks, replica_metrics
+
+
+def execute_visit_sheet(
+    ruta: str,
+    fecha: date,
+    metric_names: Iterable[str] = ALL_METRICS,
+    strategy: str = "fanout"
+) -> List[Dict[str, Any]]:
+    """
+    Build Hoja de Visita rows for just the requested metrics
+
+    Args:
+        ruta: Route code (e.g., '001')
+        fecha: Date for the route plan
+        metric_names: Metrics the caller reads (see metric_registry.METRICS)
+        strategy: "fanout" (concurrent per-block queries) or "narrow"
+            (one generated statement)
+
+    Returns:
+        List of client rows with identity columns plus the requested metrics
+
+    Raises:
+        ValueError: If the strategy or a metric name is unknown
+        Exception: If any query fails
+    """
+    if strategy not in ("fanout", "narrow"):
+        raise ValueError(f"Unknown visit sheet strategy: {strategy}")
+
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    metrics, sql_blocks, replica_metrics = _plan_blocks(metric_names)
+
+    clients = _resolve_clients(ruta, fecha)
+    timings["clients"] = (time.perf_counter() - start) * 1000
+    if not clients:
+        return []
+
+    rows = join_client_rows(clients, [])
+    cliente_ids = [client.cliente_id for client in clients]
+
+    if sql_blocks:
+        week_start = time.perf_counter()
+        semana = _resolve_week(fecha)
+        timings["week"] = (time.perf_counter() - week_start) * 1000
+
+        params = build_block_params(fecha, semana, cliente_ids, metrics)
+
+        if strategy == "narrow":
+            query = build_visit_sheet_query(sql_blocks)
+            metric_rows, timings["narrow"] = _run_block("narrow", query, params)
+            hash_join_metrics(
+                rows, [metric for _, block_metrics in sql_blocks for metric in block_metrics], metric_rows
+            )
+        else:
+            executor = _get_executor()
+            # Each block runs in the caller's context, so it sees the request deadline
+            futures = [
+                (block, block_metrics, executor.submit(
+                    contextvars.copy_context().run, _run_block,
+                    block.name, build_block_query(block, block_metrics), params
+                ))
+                for block, block_metrics in sql_blocks
+            ]
+            for block, block_metrics, future in futures:
+                block_rows, timings[block.name] = future.result()
+                hash_join_metrics(rows, block_metrics, block_rows)
+
+    if replica_metrics:
+        apply_replica_metrics(rows, replica_metrics, get_reference_snapshot())
+
+    total_ms = (time.perf_counter() - start) * 1000
+    log_with_context(
+        logger, "info",
+        "Visit sheet %s for route %s on %s: %d clients, %d metrics in %.1f ms",
+        strategy, ruta, fecha, len(rows), len(metrics), total_ms,
+        strategy=strategy,
+        total_ms=round(total_ms, 1),
+        block_ms={name: round(ms, 1) for name, ms in timings.items()},
+    )
+    return rows
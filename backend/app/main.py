@@ -4,6 +4,7 @@ FastAPI Main Application
 Serves both API endpoints and PWA frontend (production mode).
 """
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -15,12 +16,18 @@ from pathlib import Path
 
 from app.core.config import settings
 from app.core.logging import setup_logging, get_logger
-from app.api import auth, health, route_planning
-from app.middleware.request_id import RequestIDMiddleware
-from app.middleware.security import SecurityHeadersMiddleware
+from app.api import auth, config, health, metrics, route_planning
+from app.middleware.request_context import RequestContextMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.core.deadline import DeadlineExceeded
+from app.core.password_pool import PasswordPoolSaturated
 from app.middleware.error_handler import (
     http_exception_handler,
     validation_exception_handler,
+    deadline_exceeded_handler,
+    password_pool_saturated_handler,
     generic_exception_handler
 )
 
@@ -39,11 +46,17 @@ app = FastAPI(
 # Middleware
 # ============================================================================
 
-# Request ID middleware (first, so all requests have ID)
-app.add_middleware(RequestIDMiddleware)
+# Request deadline (innermost, so the endpoint and its threadpool work see it)
+app.add_middleware(DeadlineMiddleware)
 
-# Security headers middleware
-app.add_middleware(SecurityHeadersMiddleware)
+# API rate limiting (rejects before the deadline and endpoint work start)
+app.add_middleware(RateLimitMiddleware)
+
+# Request ID and security headers (outside the limiter, so 429s carry them too)
+app.add_middleware(RequestContextMiddleware)
+
+# Request latency histograms (times everything inside CORS)
+app.add_middleware(MetricsMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -61,6 +74,8 @@ app.add_middleware(
 
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(PasswordPoolSaturated, password_pool_saturated_handler)
 app.add_exception_handler(Exception, generic_exception_handler)
 
 # ============================================================================
@@ -70,17 +85,23 @@ app.add_exception_handler(Exception, generic_exception_handler)
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(route_planning.router, prefix="/api", tags=["route-planning"])
+app.include_router(config.router, prefix="/api", tags=["config"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
 
 # ============================================================================
 # Startup Event
 # ============================================================================
 
+# Long-running background tasks, cancelled on shutdown
+_background_tasks: list = []
+
+
 @app.on_event("startup")
 async def startup_event():
     """Application startup tasks"""
-    logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
-    logger.info(f"Environment: {settings.APP_ENV}")
-    logger.info(f"Debug mode: {settings.DEBUG}")
+    logger.info("Starting %s v%s", settings.APP_NAME, settings.APP_VERSION)
+    logger.info("Environment: %s", settings.APP_ENV)
+    logger.info("Debug mode: %s", settings.DEBUG)
 
     # Test database connections
     try:
@@ -100,9 +121,48 @@ async def startup_event():
             logger.error("✗ Firestore connection failed")
 
     except Exception as e:
-        logger.error(f"Database connection test failed: {str(e)}")
+        logger.error("Database connection test failed: %s", e)
+
+    # Reference data cache (coolers, HEI shops, promo lona)
+    if settings.REFERENCE_CACHE_ENABLED:
+        from app.db.reference_cache import run_reference_refresher
+        _background_tasks.append(asyncio.create_task(run_reference_refresher()))
+
+        # Client master / visit calendar index
+        if settings.CLIENT_INDEX_ENABLED:
+            from app.db.client_index import run_client_index_refresher
+            _background_tasks.append(asyncio.create_task(run_client_index_refresher()))
+
+    # Configuration / feature flag snapshot
+    if settings.CONFIG_CACHE_ENABLED:
+        from app.db.config_cache import run_config_refresher
+        _background_tasks.append(asyncio.create_task(run_config_refresher()))
+
+    # Expired refresh token cleanup
+    if settings.TOKEN_SWEEP_ENABLED:
+        from app.services.token_sweeper import run_token_sweeper
+        _background_tasks.append(asyncio.create_task(run_token_sweeper()))
+
+    # Password hashing workers (spawned now rather than on the first login)
+    if settings.PASSWORD_POOL_ENABLED:
+        from app.core.password_pool import start_password_pool
+        await asyncio.get_running_loop().run_in_executor(None, start_password_pool)
+
+    logger.info("%s started successfully", settings.APP_NAME)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Application shutdown tasks"""
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+
+    from app.db.mssql_client import close_pool
+    close_pool()
 
-    logger.info(f"{settings.APP_NAME} started successfully")
+    from app.core.password_pool import shutdown_password_pool
+    shutdown_password_pool()
 
 
 # ============================================================================
@@ -0,0 +1,101 @@
+"""
+Deadline Middleware
+
+Sets the per-request deadline (app.core.deadline) and cancels the request
+when the client disconnects before the response is complete.
+
+Pure ASGI so the deadline context variable is visible to the endpoint and
+to the threadpool work it starts.
+"""
+
+import asyncio
+import math
+from typing import Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.deadline import Deadline, deadline_var
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def timeout_for_path(path: str, overrides: Dict[str, float], default: float) -> float:
+    """
+    Resolve the request timeout for a path
+
+    Args:
+        path: Request path
+        overrides: Path prefix -> timeout in seconds (longest prefix wins);
+            0 for no timeout (long-lived streams)
+        default: Timeout when no prefix matches
+
+    Returns:
+        Timeout in seconds (math.inf for no timeout)
+    """
+    best = None
+    for prefix in overrides:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    timeout = overrides[best] if best is not None else default
+    return timeout if timeout > 0 else math.inf
+
+
+class DeadlineMiddleware:
+    """Middleware to give each request a deadline and cancel abandoned ones"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(timeout_for_path(
+            scope["path"], settings.REQUEST_TIMEOUT_OVERRIDES, settings.REQUEST_TIMEOUT_SECONDS
+        ))
+        token = deadline_var.set(deadline)
+        try:
+            await self._run(scope, receive, send, deadline)
+        finally:
+            deadline_var.reset(token)
+
+    async def _run(self, scope: Scope, receive: Receive, send: Send, deadline: Deadline) -> None:
+        """Run the app while watching for a client disconnect"""
+        messages: "asyncio.Queue[Message]" = asyncio.Queue()
+        response_complete = False
+
+        async def app_receive() -> Message:
+            return await messages.get()
+
+        async def app_send(message: Message) -> None:
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        # Created after the deadline is set, so the app task sees it
+        app_task = asyncio.ensure_future(self.app(scope, app_receive, app_send))
+
+        async def watch_disconnect() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect" and not response_complete:
+                    deadline.cancel()
+                    app_task.cancel()
+                    return
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not deadline.cancelled:
+                raise
+            logger.info("Client disconnected, cancelled %s %s", scope["method"], scope["path"])
+        finally:
+            watcher.cancel()
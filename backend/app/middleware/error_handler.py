@@ -9,7 +9,9 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
+from app.core.password_pool import PasswordPoolSaturated
 
 logger = get_logger(__name__)
 
@@ -49,7 +51,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         field = ".".join(str(loc) for loc in error["loc"] if loc != "body")
         details[field] = error["msg"]
 
-    logger.warn(f"Validation error: {details}")
+    logger.warning("Validation error: %s", details)
 
     return JSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -61,13 +63,49 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """
+    Handler for requests that ran out of time
+
+    Returns 504 error
+    """
+    logger.warning("Request deadline exceeded: %s %s (%s)", request.method, request.url.path, exc)
+
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={
+            "error": "DEADLINE_EXCEEDED",
+            "message": "La solicitud tardó demasiado. Intente nuevamente"
+        }
+    )
+
+
+async def password_pool_saturated_handler(request: Request, exc: PasswordPoolSaturated):
+    """
+    Handler for logins shed by the password hashing pool
+
+    Returns 503 error with Retry-After
+    """
+    logger.warning("Password pool saturated: %s %s", request.method, request.url.path)
+
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "error": "SERVICE_BUSY",
+            "message": "Servicio ocupado. Intente nuevamente en unos segundos",
+            "retryAfter": exc.retry_after
+        },
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 async def generic_exception_handler(request: Request, exc: Exception):
     """
     Handler for unhandled exceptions
 
     Returns 500 error with generic message
     """
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
 
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
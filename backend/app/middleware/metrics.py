@@ -0,0 +1,54 @@
+"""
+Metrics Middleware
+
+Records each HTTP request's latency in the request histogram
+(app.core.metrics.REQUEST_SECONDS), labelled by method, route template
+(e.g., /api/plan-de-ruta, not the raw path, so label cardinality stays
+bounded) and response status.
+
+Pure ASGI: one clock read at each end and one histogram update per request.
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import REQUEST_SECONDS
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_label(scope: Scope) -> str:
+    """Route template the router matched, or "unmatched" (404s, mounts)"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Middleware to time requests by route and status"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500  # If the app raises before starting a response
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the (shared) scope
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=route_label(scope), status=status
+            )
@@ -0,0 +1,166 @@
+"""
+Rate Limit Middleware
+
+Token-bucket limiting of authenticated API requests, so a runaway client
+(e.g., a PWA sync loop) cannot push unbounded load onto SQL Server:
+
+- one bucket per user across all API routes
+  (API_RATE_LIMIT_USER_RATE / API_RATE_LIMIT_USER_BURST)
+- one bucket per user per configured route prefix
+  (API_RATE_LIMIT_ROUTES, longest prefix wins)
+
+Over-limit requests get 429 with Retry-After before reaching the endpoint.
+Anonymous requests are not limited here (login has its own per-account
+lockout in auth_service). Bucket state lives in the shared rate limiter
+(app.core.rate_limit), so limits hold across workers with the sqlite backend.
+
+Pure ASGI: one JWT decode and at most two bucket updates per request.
+Updates on the in-memory backend run inline; the sqlite backend (file I/O
+under a lock) is called from the threadpool, off the event loop.
+"""
+
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from jose import JWTError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.rate_limit import Decision, MemoryBackend, RateLimiter, get_rate_limiter
+from app.core.security import verify_token
+from app.core.timing import span
+
+logger = get_logger(__name__)
+
+_counters: Counter = Counter()
+_counters_lock = threading.Lock()
+
+
+def route_for_path(path: str, routes: Dict[str, List[float]]) -> Optional[str]:
+    """
+    Find the configured route prefix for a path
+
+    Args:
+        path: Request path
+        routes: Path prefix -> [rate per second, burst]
+
+    Returns:
+        Longest matching prefix, or None
+    """
+    best = None
+    for prefix in routes:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return best
+
+
+def _user_id(scope: Scope) -> Optional[str]:
+    """Subject of a valid Bearer token, or None"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                with span("jwt"):
+                    return verify_token(token).get("sub")
+            except JWTError:
+                return None
+    return None
+
+
+async def _take_token(limiter: RateLimiter, key: str, rate: float, burst: float) -> Decision:
+    """Take a token, in the threadpool unless the backend is in-memory"""
+    if isinstance(limiter.backend, MemoryBackend):
+        return limiter.take_token(key, rate, burst)
+    return await run_in_threadpool(limiter.take_token, key, rate, burst)
+
+
+def _count(name: str) -> None:
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def rate_limit_counters() -> Dict[str, int]:
+    """Allowed and limited request counters (limited:user, limited:<route prefix>)"""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def reset_rate_limit_counters() -> None:
+    """Reset the counters (tests)"""
+    with _counters_lock:
+        _counters.clear()
+
+
+class RateLimitMiddleware:
+    """Middleware to limit authenticated API requests per user and route"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.API_RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if not path.startswith("/api/") or any(path.startswith(p) for p in settings.API_RATE_LIMIT_EXEMPT):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = _user_id(scope)
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_rate_limiter()
+
+        # Route bucket first: a denied route request doesn't spend the user's budget
+        route = route_for_path(path, settings.API_RATE_LIMIT_ROUTES)
+        if route is not None:
+            rate, burst = settings.API_RATE_LIMIT_ROUTES[route]
+            decision = await _take_token(limiter, f"api-route:{user_id}:{route}", rate, burst)
+            if not decision.allowed:
+                await self._reject(scope, receive, send, user_id, f"limited:{route}", decision.retry_after)
+                return
+
+        decision = await _take_token(
+            limiter, f"api-user:{user_id}", settings.API_RATE_LIMIT_USER_RATE, settings.API_RATE_LIMIT_USER_BURST
+        )
+        if not decision.allowed:
+            await self._reject(scope, receive, send, user_id, "limited:user", decision.retry_after)
+            return
+
+        _count("allowed")
+        await self.app(scope, receive, send)
+
+    async def _reject(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        user_id: str,
+        counter: str,
+        retry_after: float
+    ) -> None:
+        """Send 429 with Retry-After"""
+        _count(counter)
+        seconds = max(1, math.ceil(retry_after))
+        logger.warning("Rate limited %s %s for user %s (%s)", scope["method"], scope["path"], user_id, counter)
+
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "error": "RATE_LIMIT_EXCEEDED",
+                "message": "Demasiadas solicitudes. Intente nuevamente en unos segundos",
+                "retryAfter": seconds
+            },
+            headers={"Retry-After": str(seconds)}
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,121 @@
+"""
+Request Context Middleware
+
+Per-request ID, security headers and stage timings in one pure-ASGI
+middleware:
+
+- generates a request ID, stores it in request.state and the logging context
+- starts the request's stage timings (app.core.timing)
+- adds X-Request-ID and the security headers (X-Content-Type-Options,
+  X-Frame-Options, X-XSS-Protection, Content-Security-Policy,
+  Strict-Transport-Security) to the http.response.start message, plus
+  Server-Timing with the spans recorded so far (SERVER_TIMING_ENABLED)
+- logs one line per request with its status, duration and spans, then
+  clears the logging context
+
+Replaces RequestIDMiddleware and SecurityHeadersMiddleware, which were
+BaseHTTPMiddleware subclasses: those run the downstream app in a separate
+task and re-stream every response body through a memory channel. Here the
+only per-request work is the ID and one header list concatenation, and
+streaming responses pass through untouched.
+"""
+
+import uuid
+from typing import List, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import clear_request_context, get_logger, log_with_context, set_request_context
+from app.core.timing import RequestTimings, server_timing, span_summary, timings_var
+from app.middleware.metrics import route_label
+
+logger = get_logger(__name__)
+
+Header = Tuple[bytes, bytes]
+
+
+def security_headers(csp: str, hsts: str) -> List[Header]:
+    """
+    Security headers added to every response
+
+    Args:
+        csp: Content-Security-Policy value (empty to omit)
+        hsts: Strict-Transport-Security value (empty to omit)
+
+    Returns:
+        Raw (lowercase name, value) header pairs
+    """
+    headers = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+    ]
+    if csp:
+        headers.append((b"content-security-policy", csp.encode("latin-1")))
+    if hsts:
+        headers.append((b"strict-transport-security", hsts.encode("latin-1")))
+    return headers
+
+
+class RequestContextMiddleware:
+    """Middleware to tag each request with an ID and add security headers"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Built once: settings are read at startup
+        self.headers = security_headers(settings.SECURITY_CSP, settings.SECURITY_HSTS)
+        self.headers_without_csp = [h for h in self.headers if h[0] != b"content-security-policy"]
+        self.csp_exempt = tuple(settings.SECURITY_CSP_EXEMPT)
+        self.server_timing = settings.SERVER_TIMING_ENABLED
+        if self.server_timing and settings.CORS_ORIGINS:
+            # Lets the PWA (another origin in development) read the header
+            self.headers.append((b"timing-allow-origin", ", ".join(settings.CORS_ORIGINS).encode("latin-1")))
+            self.headers_without_csp = [h for h in self.headers if h[0] != b"content-security-policy"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        extra = self.headers_without_csp if scope["path"].startswith(self.csp_exempt) else self.headers
+        extra = extra + [(b"x-request-id", request_id.encode("latin-1"))]
+        names = {name for name, _ in extra}
+        if self.server_timing:
+            names.add(b"server-timing")
+
+        timings = RequestTimings()
+        status = 500  # If the app raises before starting a response
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Replace, not duplicate, headers the endpoint already set
+                headers = [h for h in message.get("headers", []) if h[0].lower() not in names]
+                headers += extra
+                if self.server_timing:
+                    headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        set_request_context(request_id=request_id)
+        token = timings_var.set(timings)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            duration_ms = timings.elapsed() * 1000
+            log_with_context(
+                logger, "info",
+                "%s %s %d in %.1f ms", scope["method"], scope["path"], status, duration_ms,
+                method=scope["method"],
+                route=route_label(scope),
+                status=status,
+                duration_ms=round(duration_ms, 1),
+                timings=span_summary(timings),
+            )
+            timings_var.reset(token)
+            clear_request_context()
@@ -48,3 +48,4 @@ class RefreshTokenResponse(BaseModel):
     """Refresh token response"""
     token: str
     expiresIn: int
+    refreshToken: Optional[str] = None  # Only with REFRESH_TOKEN_ROTATION
@@ -0,0 +1,14 @@
+"""
+Configuration Pydantic Schemas
+
+Models for feature flag sync.
+"""
+
+from pydantic import BaseModel
+from typing import Any, Dict
+
+
+class ConfigResponse(BaseModel):
+    """Configuration values at a version"""
+    version: int
+    values: Dict[str, Any]
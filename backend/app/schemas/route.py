@@ -46,3 +46,5 @@ class PlanDeRuta(BaseModel):
     asesorId: str
     clientes: List[Cliente]
     recomendaciones: List[Recomendacion]
+    generadoEn: Optional[str] = None  # ISO datetime the plan was built from SQL Server
+    stale: bool = False  # True when served from the last good plan (SQL Server unavailable)
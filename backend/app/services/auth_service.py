@@ -4,32 +4,42 @@ Authentication Service
 Business logic for user authentication and token management.
 """
 
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Tuple
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 from fastapi import HTTPException, status
+from google.api_core.exceptions import FailedPrecondition
 
 from app.core.security import (
-    verify_password,
     create_access_token,
     generate_refresh_token,
-    get_refresh_token_expiration
+    get_refresh_token_expiration,
+    refresh_token_user_id
 )
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.password_pool import verify_password_pooled
+from app.core.rate_limit import get_rate_limiter
+from app.db import firestore_async
 from app.db.firestore_client import (
     get_user_by_id,
+    get_user_with_update_time,
+    record_failed_login,
     update_user,
     save_refresh_token,
     get_refresh_token,
-    revoke_refresh_token
+    get_refresh_token_and_user,
+    rotate_refresh_token
 )
-from app.schemas.auth import UserInDB, User
+from app.schemas.auth import UserInDB
 
 logger = get_logger(__name__)
 
-# In-memory rate limiting (simple implementation for M1)
-_login_attempts: Dict[str, list] = {}
-_locked_accounts: Dict[str, datetime] = {}
+# Login attempt limiter keys (state lives in the shared rate limiter backend)
+LOGIN_ATTEMPTS_KEY = "login-attempts:{}"
+LOGIN_LOCK_KEY = "login-lock:{}"
+
+# Failed password attempts (stored on the user) that block the account
+MAX_FAILED_PASSWORD_ATTEMPTS = 5
 
 
 # ============================================================================
@@ -49,65 +59,51 @@ def check_rate_limit(user_id: str) -> None:
     if not settings.RATE_LIMIT_ENABLED:
         return
 
+    limiter = get_rate_limiter()
+    lockout_seconds = settings.RATE_LIMIT_LOCKOUT_MINUTES * 60
+
     # Check if account is locked
-    if user_id in _locked_accounts:
-        locked_until = _locked_accounts[user_id]
-        if datetime.utcnow() < locked_until:
-            remaining = int((locked_until - datetime.utcnow()).total_seconds())
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={
-                    "error": "RATE_LIMIT_EXCEEDED",
-                    "message": f"Cuenta bloqueada temporalmente. Intente nuevamente en {remaining // 60} minutos",
-                    "retryAfter": remaining
-                }
-            )
-        else:
-            # Lock expired, remove it
-            del _locked_accounts[user_id]
-            if user_id in _login_attempts:
-                del _login_attempts[user_id]
+    remaining = limiter.locked_for(LOGIN_LOCK_KEY.format(user_id))
+    if remaining > 0:
+        remaining = int(remaining)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "RATE_LIMIT_EXCEEDED",
+                "message": f"Cuenta bloqueada temporalmente. Intente nuevamente en {remaining // 60} minutos",
+                "retryAfter": remaining
+            }
+        )
 
-    # Check rate limit
-    now = datetime.utcnow()
-    cutoff = now - timedelta(minutes=settings.RATE_LIMIT_LOCKOUT_MINUTES)
-
-    if user_id in _login_attempts:
-        # Remove old attempts
-        _login_attempts[user_id] = [
-            attempt for attempt in _login_attempts[user_id]
-            if attempt > cutoff
-        ]
-
-        # Check if limit exceeded
-        if len(_login_attempts[user_id]) >= settings.RATE_LIMIT_PER_MINUTE:
-            # Lock account
-            lockout_duration = timedelta(minutes=settings.RATE_LIMIT_LOCKOUT_MINUTES)
-            _locked_accounts[user_id] = now + lockout_duration
-
-            logger.warn(f"Account {user_id} locked due to too many failed attempts")
-
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={
-                    "error": "RATE_LIMIT_EXCEEDED",
-                    "message": f"Demasiados intentos fallidos. Cuenta bloqueada por {settings.RATE_LIMIT_LOCKOUT_MINUTES} minutos",
-                    "retryAfter": settings.RATE_LIMIT_LOCKOUT_MINUTES * 60
-                }
-            )
+    # Check failed attempts within the lockout window
+    attempts = limiter.window_count(LOGIN_ATTEMPTS_KEY.format(user_id), lockout_seconds)
+    if attempts >= settings.RATE_LIMIT_PER_MINUTE:
+        # Lock account; attempts start over once the lock expires
+        limiter.lock(LOGIN_LOCK_KEY.format(user_id), lockout_seconds)
+        limiter.reset(LOGIN_ATTEMPTS_KEY.format(user_id))
+
+        logger.warning("Account %s locked due to too many failed attempts", user_id)
+
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "RATE_LIMIT_EXCEEDED",
+                "message": f"Demasiados intentos fallidos. Cuenta bloqueada por {settings.RATE_LIMIT_LOCKOUT_MINUTES} minutos",
+                "retryAfter": lockout_seconds
+            }
+        )
 
 
 def record_failed_attempt(user_id: str) -> None:
     """Record a failed login attempt"""
-    if user_id not in _login_attempts:
-        _login_attempts[user_id] = []
-    _login_attempts[user_id].append(datetime.utcnow())
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    get_rate_limiter().record(LOGIN_ATTEMPTS_KEY.format(user_id), settings.RATE_LIMIT_LOCKOUT_MINUTES * 60)
 
 
 def clear_failed_attempts(user_id: str) -> None:
     """Clear failed login attempts for user"""
-    if user_id in _login_attempts:
-        del _login_attempts[user_id]
+    get_rate_limiter().reset(LOGIN_ATTEMPTS_KEY.format(user_id))
 
 
 # ============================================================================
@@ -127,15 +123,16 @@ def authenticate_user(user_id: str, password: str) -> Optional[UserInDB]:
 
     Raises:
         HTTPException: If rate limit exceeded
+        PasswordPoolSaturated: If the hashing pool is saturated
     """
     # Check rate limit
     check_rate_limit(user_id)
 
-    # Get user from database
-    user_data = get_user_by_id(user_id)
+    # Get user from database (with its update time, for record_failed_login)
+    user_data, update_time = get_user_with_update_time(user_id)
 
     if not user_data:
-        logger.info(f"Login failed: User {user_id} not found")
+        logger.info("Login failed: User %s not found", user_id)
         record_failed_attempt(user_id)
         return None
 
@@ -143,7 +140,7 @@ def authenticate_user(user_id: str, password: str) -> Optional[UserInDB]:
 
     # Check if user is blocked
     if user.bloqueado:
-        logger.warn(f"Login attempt for blocked user {user_id}")
+        logger.warning("Login attempt for blocked user %s", user_id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -154,7 +151,7 @@ def authenticate_user(user_id: str, password: str) -> Optional[UserInDB]:
 
     # Check if user is active
     if not user.activo:
-        logger.warn(f"Login attempt for inactive user {user_id}")
+        logger.warning("Login attempt for inactive user %s", user_id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -163,27 +160,21 @@ def authenticate_user(user_id: str, password: str) -> Optional[UserInDB]:
             }
         )
 
-    # Verify password
-    if not verify_password(password, user.password_hash):
-        logger.info(f"Login failed: Invalid password for user {user_id}")
+    # Verify password (in the hashing pool; may raise PasswordPoolSaturated)
+    if not verify_password_pooled(password, user.password_hash):
+        logger.info("Login failed: Invalid password for user %s", user_id)
         record_failed_attempt(user_id)
 
-        # Update failed attempts in database
-        update_user(user_id, {
-            "intentos_fallidos": user.intentos_fallidos + 1
-        })
-
-        # Check if should block account (5 failed attempts)
-        if user.intentos_fallidos + 1 >= 5:
-            update_user(user_id, {
-                "bloqueado": True
-            })
-            logger.warn(f"Account {user_id} blocked due to too many failed password attempts")
+        # Count the failure (and block) in one conditional write, so the
+        # threshold is checked against the committed count
+        attempts = record_failed_login(user_id, MAX_FAILED_PASSWORD_ATTEMPTS, user_data, update_time)
+        if attempts >= MAX_FAILED_PASSWORD_ATTEMPTS:
+            logger.warning("Account %s blocked due to too many failed password attempts", user_id)
 
         return None
 
     # Authentication successful
-    logger.info(f"User {user_id} authenticated successfully")
+    logger.info("User %s authenticated successfully", user_id)
 
     # Clear failed attempts
     clear_failed_attempts(user_id)
@@ -197,72 +188,86 @@ def authenticate_user(user_id: str, password: str) -> Optional[UserInDB]:
     return user
 
 
-def create_user_tokens(user: UserInDB) -> Tuple[str, str, int]:
+def create_access_token_for_user(user: UserInDB) -> Tuple[str, int]:
     """
-    Create access and refresh tokens for user
+    Create an access token for user
 
     Args:
         user: User object
 
     Returns:
-        Tuple of (access_token, refresh_token, expires_in_seconds)
+        Tuple of (access_token, expires_in_seconds)
     """
-    # Create access token
     token_data = {
         "sub": user.id,
         "rol": user.rol,
         "ruta": user.ruta
     }
-    access_token = create_access_token(token_data)
+    return create_access_token(token_data), settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def create_user_tokens(user: UserInDB) -> Tuple[str, str, int]:
+    """
+    Create access and refresh tokens for user
+
+    Args:
+        user: User object
+
+    Returns:
+        Tuple of (access_token, refresh_token, expires_in_seconds)
+    """
+    # Create access token
+    access_token, expires_in = create_access_token_for_user(user)
 
     # Create refresh token
-    refresh_token = generate_refresh_token()
+    refresh_token = generate_refresh_token(user.id)
     refresh_expires_at = get_refresh_token_expiration()
 
     # Save refresh token to database
     save_refresh_token(refresh_token, user.id, refresh_expires_at)
 
-    logger.info(f"Tokens created for user {user.id}")
+    logger.info("Tokens created for user %s", user.id)
+
+    return access_token, refresh_token, expires_in
+
 
-    return access_token, refresh_token, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+def _invalid_refresh_token(message: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail={
+            "error": "INVALID_CREDENTIALS",
+            "message": message
+        }
+    )
 
 
-def validate_refresh_token(token: str) -> Optional[User]:
+def _check_refresh_token(token_data: Optional[dict], user_id: Optional[str]) -> str:
     """
-    Validate refresh token and return user
+    Check a stored refresh token
 
     Args:
-        token: Refresh token string
+        token_data: Token document (None if not found)
+        user_id: User ID embedded in the token string, if any
 
     Returns:
-        User object if token valid, None otherwise
+        ID of the user the token belongs to
 
     Raises:
-        HTTPException: If token is invalid or revoked
+        HTTPException: If token is missing, revoked or expired
     """
-    # Get token from database
-    token_data = get_refresh_token(token)
-
     if not token_data:
-        logger.warn("Refresh token not found")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={
-                "error": "INVALID_CREDENTIALS",
-                "message": "Token de actualización inválido"
-            }
-        )
+        logger.warning("Refresh token not found")
+        raise _invalid_refresh_token("Token de actualización inválido")
+
+    # Check the embedded user ID against the stored owner
+    if user_id is not None and token_data.get("user_id") != user_id:
+        logger.warning("Refresh token owner mismatch")
+        raise _invalid_refresh_token("Token de actualización inválido")
 
     # Check if token is revoked
     if token_data.get("revoked", False):
-        logger.warn("Attempted use of revoked refresh token")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={
-                "error": "INVALID_CREDENTIALS",
-                "message": "Token de actualización revocado"
-            }
-        )
+        logger.warning("Attempted use of revoked refresh token")
+        raise _invalid_refresh_token("Token de actualización revocado")
 
     # Check if token is expired
     expires_at = token_data.get("expires_at")
@@ -270,35 +275,157 @@ def validate_refresh_token(token: str) -> Optional[User]:
     now = datetime.utcnow()
     if expires_at.tzinfo is not None:
         # expires_at is offset-aware, make now also aware
-        from datetime import timezone
         now = now.replace(tzinfo=timezone.utc)
     if now > expires_at:
-        logger.warn("Refresh token expired")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={
-                "error": "INVALID_CREDENTIALS",
-                "message": "Token de actualización expirado"
-            }
-        )
+        logger.warning("Refresh token expired")
+        raise _invalid_refresh_token("Token de actualización expirado")
 
-    # Get user
-    user_id = token_data.get("user_id")
-    user_data = get_user_by_id(user_id)
+    return token_data.get("user_id")
 
+
+def _refresh_token_owner(user_id: str, user_data: Optional[dict]) -> UserInDB:
     if not user_data:
-        logger.error(f"User {user_id} not found for valid refresh token")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={
-                "error": "INVALID_CREDENTIALS",
-                "message": "Usuario no encontrado"
-            }
-        )
+        logger.error("User %s not found for valid refresh token", user_id)
+        raise _invalid_refresh_token("Usuario no encontrado")
 
-    # Return user (not UserInDB, we don't need password hash)
-    return User(
-        id=user_data["id"],
-        nombre=user_data["nombre"],
-        rol=user_data["rol"]
-    )
+    return UserInDB(**user_data)
+
+
+def _validate_refresh_token(token: str) -> Tuple[UserInDB, Optional[datetime]]:
+    """validate_refresh_token, plus the token's update time (None if not read)"""
+    # Get token (and user) from database
+    user_id = refresh_token_user_id(token)
+    if user_id is not None:
+        token_data, user_data, update_time = get_refresh_token_and_user(token, user_id)
+    else:
+        token_data, user_data, update_time = get_refresh_token(token), None, None
+
+    owner_id = _check_refresh_token(token_data, user_id)
+
+    # Get user (already read for tokens carrying their user ID)
+    if user_data is None:
+        user_data = get_user_by_id(owner_id)
+
+    return _refresh_token_owner(owner_id, user_data), update_time
+
+
+def validate_refresh_token(token: str) -> UserInDB:
+    """
+    Validate refresh token and return its user
+
+    Tokens carrying their user ID are read together with the user in one
+    batched read; older tokens fall back to two reads.
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        User the token belongs to
+
+    Raises:
+        HTTPException: If token is invalid, revoked or expired
+    """
+    return _validate_refresh_token(token)[0]
+
+
+async def _validate_refresh_token_async(token: str) -> Tuple[UserInDB, Optional[datetime]]:
+    """validate_refresh_token_async, plus the token's update time (None if not read)"""
+    user_id = refresh_token_user_id(token)
+    if user_id is not None:
+        token_data, user_data, update_time = await firestore_async.get_refresh_token_and_user(token, user_id)
+    else:
+        token_data, user_data, update_time = await firestore_async.get_refresh_token(token), None, None
+
+    owner_id = _check_refresh_token(token_data, user_id)
+
+    if user_data is None:
+        user_data = await firestore_async.get_user_by_id(owner_id)
+
+    return _refresh_token_owner(owner_id, user_data), update_time
+
+
+async def validate_refresh_token_async(token: str) -> UserInDB:
+    """
+    Validate refresh token and return its user, awaiting the async Firestore client
+
+    Same checks and reads as validate_refresh_token.
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        User the token belongs to
+
+    Raises:
+        HTTPException: If token is invalid, revoked or expired
+    """
+    return (await _validate_refresh_token_async(token))[0]
+
+
+def refresh_user_tokens(token: str) -> Tuple[str, Optional[str], int]:
+    """
+    Exchange a refresh token for a new access token
+
+    Only an access token is minted, unless REFRESH_TOKEN_ROTATION is set:
+    then a new refresh token replaces the old one (revoked in the same commit,
+    on condition it is unchanged since validated, so a token is exchanged
+    at most once).
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        Tuple of (access_token, new refresh_token or None, expires_in_seconds)
+
+    Raises:
+        HTTPException: If token is invalid, revoked or expired
+    """
+    user, update_time = _validate_refresh_token(token)
+    access_token, expires_in = create_access_token_for_user(user)
+
+    new_refresh_token = None
+    if settings.REFRESH_TOKEN_ROTATION:
+        new_refresh_token = generate_refresh_token(user.id)
+        try:
+            rotate_refresh_token(token, new_refresh_token, user.id, get_refresh_token_expiration(), update_time)
+        except FailedPrecondition:
+            # A concurrent refresh exchanged the token first
+            raise _invalid_refresh_token("Token de actualización revocado")
+
+    logger.info("Token refreshed for user %s", user.id)
+
+    return access_token, new_refresh_token, expires_in
+
+
+async def refresh_user_tokens_async(token: str) -> Tuple[str, Optional[str], int]:
+    """
+    Exchange a refresh token for a new access token on the event loop
+
+    Async variant of refresh_user_tokens (same reads, writes and result).
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        Tuple of (access_token, new refresh_token or None, expires_in_seconds)
+
+    Raises:
+        HTTPException: If token is invalid, revoked or expired
+    """
+    user, update_time = await _validate_refresh_token_async(token)
+    access_token, expires_in = create_access_token_for_user(user)
+
+    new_refresh_token = None
+    if settings.REFRESH_TOKEN_ROTATION:
+        new_refresh_token = generate_refresh_token(user.id)
+        try:
+            await firestore_async.rotate_refresh_token(
+                token, new_refresh_token, user.id, get_refresh_token_expiration(), update_time
+            )
+        except FailedPrecondition:
+            # A concurrent refresh exchanged the token first
+            raise _invalid_refresh_token("Token de actualización revocado")
+
+    logger.info("Token refreshed for user %s", user.id)
+
+    return access_token, new_refresh_token, expires_in
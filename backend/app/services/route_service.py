@@ -4,11 +4,21 @@ Route Planning Service
 Business logic for route planning and recommendations.
 """
 
+import threading
+import time
 import uuid
-from datetime import date
-from typing import List, Dict, Any
-from app.core.logging import get_logger
-from app.db.mssql_client import execute_hoja_visita_query
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger, log_with_context
+from app.core.timing import add_span, span
+from app.core.circuit_breaker import OPEN
+from app.db.mssql_client import execute_hoja_visita_query, execute_hoja_visita_ventas_query, mssql_breaker
+from app.db.reference_cache import get_reference_snapshot, apply_reference_flags
+from app.db.client_index import get_client_index, join_client_rows
+from app.db.visit_sheet import execute_visit_sheet
 from app.schemas.route import PlanDeRuta, Cliente, Recomendacion, Coordenadas
 
 logger = get_logger(__name__)
@@ -17,6 +27,20 @@ logger = get_logger(__name__)
 DEFAULT_LAT = 19.4326
 DEFAULT_LNG = -99.1332
 
+# Hoja de Visita metrics read by map_to_cliente / generate_recomendaciones
+ROUTE_PLAN_METRICS = (
+    "CTECUMPLIDO",
+    "CERVEZA_SANT",
+    "CERVEZA_SACT",
+    "IDSHOP",
+    "ENFRIADORES",
+    "DESCLP",
+    "MILLER",
+    "INDIO",
+    "TECATE",
+    "XX",
+)
+
 
 # ============================================================================
 # Data Transformation
@@ -235,13 +259,167 @@ def generate_recomendaciones(cliente: Cliente, row: Dict[str, Any]) -> List[Reco
     return recomendaciones
 
 
+# ============================================================================
+# Data Retrieval
+# ============================================================================
+
+def _fetch_batch_rows(ruta: str, fecha: date) -> List[Dict[str, Any]]:
+    """
+    Fetch Hoja de Visita rows with a single SQL batch
+
+    With REFERENCE_CACHE_ENABLED, only sales aggregates come from SQL Server
+    and the coolers/HEI/promo flags are joined from the in-memory snapshot.
+    With CLIENT_INDEX_ENABLED as well, the day's clients are resolved from the
+    in-memory client index and only their ids are sent to SQL Server.
+    """
+    if not settings.REFERENCE_CACHE_ENABLED:
+        return execute_hoja_visita_query(ruta, fecha)
+
+    snapshot = get_reference_snapshot()
+
+    if settings.CLIENT_INDEX_ENABLED:
+        clients = get_client_index().clients_for_day(ruta, fecha)
+        sales_rows = execute_hoja_visita_ventas_query(
+            ruta, fecha, [client.cliente_id for client in clients]
+        )
+        rows = join_client_rows(clients, sales_rows)
+    else:
+        rows = execute_hoja_visita_ventas_query(ruta, fecha)
+
+    return apply_reference_flags(rows, snapshot)
+
+
+def fetch_route_rows(ruta: str, fecha: date) -> List[Dict[str, Any]]:
+    """
+    Fetch Hoja de Visita rows for a route and date
+
+    HOJA_VISITA_STRATEGY selects the monolithic batch ("batch"), or queries
+    generated for ROUTE_PLAN_METRICS only: concurrent per-block queries
+    ("fanout") or a single narrow statement ("narrow"), see app.db.visit_sheet.
+
+    Args:
+        ruta: Route code (e.g., '001')
+        fecha: Date for the route plan
+
+    Returns:
+        List of client rows with the Hoja de Visita columns
+    """
+    if settings.HOJA_VISITA_STRATEGY != "batch":
+        # Logs its own per-block timings
+        return execute_visit_sheet(ruta, fecha, ROUTE_PLAN_METRICS, settings.HOJA_VISITA_STRATEGY)
+
+    start = time.perf_counter()
+    rows = _fetch_batch_rows(ruta, fecha)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    log_with_context(
+        logger, "info",
+        "Visit sheet batch for route %s on %s: %d clients in %.1f ms", ruta, fecha, len(rows), total_ms,
+        strategy="batch",
+        total_ms=round(total_ms, 1),
+    )
+    return rows
+
+
+# ============================================================================
+# Last Good Plans (stale-while-revalidate)
+# ============================================================================
+
+# Seconds between background refresh attempts while SQL Server is down
+REFRESH_POLL_SECONDS = 5
+
+PlanKey = Tuple[str, date]
+
+_last_good_plans: "OrderedDict[PlanKey, PlanDeRuta]" = OrderedDict()
+_in_flight: set = set()
+_plans_lock = threading.Lock()
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    """Get the executor for background plan refreshes"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        _refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="route-plan-refresh")
+    return _refresh_executor
+
+
+def _remember_plan(key: PlanKey, plan: PlanDeRuta) -> None:
+    """Store a freshly built plan as the last good one for its key"""
+    with _plans_lock:
+        _last_good_plans[key] = plan
+        _last_good_plans.move_to_end(key)
+        while len(_last_good_plans) > settings.ROUTE_PLAN_STALE_CACHE_SIZE:
+            _last_good_plans.popitem(last=False)
+
+
+def _claim(key: PlanKey) -> bool:
+    """Mark a refresh of key as in flight; False if one already is"""
+    with _plans_lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+        return True
+
+
+def _release(key: PlanKey) -> None:
+    """Clear the in-flight mark of key"""
+    with _plans_lock:
+        _in_flight.discard(key)
+
+
+def _serve_stale(plan: PlanDeRuta, asesor_id: str) -> PlanDeRuta:
+    """Copy of a last good plan marked as stale for the requesting asesor"""
+    return plan.model_copy(update={"asesorId": asesor_id, "stale": True})
+
+
+def _schedule_refresh(key: PlanKey, asesor_id: str) -> None:
+    """Refresh a plan in the background unless a refresh is already in flight"""
+    if _claim(key):
+        _get_refresh_executor().submit(_background_refresh, key, asesor_id)
+
+
+def _background_refresh(key: PlanKey, asesor_id: str) -> None:
+    """
+    Rebuild a plan once SQL Server recovers
+
+    Waits while the breaker is open and retries failed builds, for at most
+    ROUTE_PLAN_REFRESH_MAX_WAIT_SECONDS.
+    """
+    ruta, fecha = key
+    deadline = time.monotonic() + settings.ROUTE_PLAN_REFRESH_MAX_WAIT_SECONDS
+
+    try:
+        while True:
+            if mssql_breaker.state != OPEN:
+                try:
+                    _remember_plan(key, build_route_plan(asesor_id, ruta, fecha))
+                    logger.info("Route plan for route %s, date %s refreshed in background", ruta, fecha)
+                    return
+                except Exception as e:
+                    logger.warning("Background refresh for route %s, date %s failed: %s", ruta, fecha, e)
+
+            if time.monotonic() >= deadline:
+                logger.error("Giving up background refresh for route %s, date %s", ruta, fecha)
+                return
+            time.sleep(REFRESH_POLL_SECONDS)
+    finally:
+        _release(key)
+
+
+def clear_route_plan_cache() -> None:
+    """Forget all last good plans"""
+    with _plans_lock:
+        _last_good_plans.clear()
+
+
 # ============================================================================
 # Main Service Function
 # ============================================================================
 
-def get_route_plan(asesor_id: str, ruta: str, fecha: date) -> PlanDeRuta:
+def build_route_plan(asesor_id: str, ruta: str, fecha: date) -> PlanDeRuta:
     """
-    Get route plan for a specific route and date
+    Build a route plan from SQL Server
 
     Args:
         asesor_id: Asesor user ID
@@ -254,23 +432,31 @@ def get_route_plan(asesor_id: str, ruta: str, fecha: date) -> PlanDeRuta:
     Raises:
         Exception: If query fails
     """
-    logger.info(f"Getting route plan for asesor {asesor_id}, route {ruta}, date {fecha}")
-
     # Execute SQL query
-    results = execute_hoja_visita_query(ruta, fecha)
+    with span("sql"):
+        results = fetch_route_rows(ruta, fecha)
 
-    # Transform data
+    # Transform data (per-row stage times summed into one span each)
     clientes: List[Cliente] = []
     recomendaciones: List[Recomendacion] = []
+    map_seconds = 0.0
+    recs_seconds = 0.0
 
     for row in results:
         # Map to Cliente
+        started = time.perf_counter()
         cliente = map_to_cliente(row)
         clientes.append(cliente)
+        mapped = time.perf_counter()
+        map_seconds += mapped - started
 
         # Generate recommendations
         cliente_recomendaciones = generate_recomendaciones(cliente, row)
         recomendaciones.extend(cliente_recomendaciones)
+        recs_seconds += time.perf_counter() - mapped
+
+    add_span("map", map_seconds)
+    add_span("recs", recs_seconds)
 
     # Build plan
     plan = PlanDeRuta(
@@ -278,9 +464,65 @@ def get_route_plan(asesor_id: str, ruta: str, fecha: date) -> PlanDeRuta:
         fecha=fecha.isoformat(),
         asesorId=asesor_id,
         clientes=clientes,
-        recomendaciones=recomendaciones
+        recomendaciones=recomendaciones,
+        generadoEn=datetime.utcnow().isoformat()
     )
 
-    logger.info(f"Route plan generated: {len(clientes)} clients, {len(recomendaciones)} recommendations")
+    logger.info("Route plan generated: %d clients, %d recommendations", len(clientes), len(recomendaciones))
 
     return plan
+
+
+def get_route_plan(asesor_id: str, ruta: str, fecha: date) -> PlanDeRuta:
+    """
+    Get route plan for a specific route and date
+
+    The last good plan for (ruta, fecha) is kept. While the SQL Server
+    breaker is open, or another refresh of the same plan is in flight, that
+    plan is returned with stale=True and refreshed in the background; the
+    same happens when building a fresh plan fails.
+
+    Args:
+        asesor_id: Asesor user ID
+        ruta: Route code (e.g., '001')
+        fecha: Date for the route plan
+
+    Returns:
+        PlanDeRuta object with clients and recommendations
+
+    Raises:
+        Exception: If query fails and there is no previous plan to serve
+    """
+    logger.debug("Getting route plan for asesor %s, route %s, date %s", asesor_id, ruta, fecha)
+
+    key = (ruta, fecha)
+    with _plans_lock:
+        cached = _last_good_plans.get(key)
+
+    if cached is not None and mssql_breaker.state == OPEN:
+        logger.warning("SQL Server circuit open, serving stale plan for route %s, date %s", ruta, fecha)
+        _schedule_refresh(key, asesor_id)
+        return _serve_stale(cached, asesor_id)
+
+    owner = _claim(key)
+    if not owner and cached is not None:
+        logger.info("Refresh in flight, serving stale plan for route %s, date %s", ruta, fecha)
+        return _serve_stale(cached, asesor_id)
+
+    try:
+        plan = build_route_plan(asesor_id, ruta, fecha)
+    except Exception as e:
+        if cached is None:
+            raise
+        logger.warning("Serving stale plan for route %s, date %s: %s", ruta, fecha, e)
+        if owner:
+            _release(key)
+            owner = False
+        _schedule_refresh(key, asesor_id)
+        return _serve_stale(cached, asesor_id)
+    finally:
+        if owner:
+            _release(key)
+
+    _remember_plan(key, plan)
+    return plan
@@ -0,0 +1,185 @@
+"""
+Refresh Token Sweeper
+
+Background job deleting expired refresh tokens, so the refresh_tokens
+collection doesn't grow forever. Each sweep pages through expired tokens
+with a cursor and deletes them in batched writes of up to 500
+(firestore_async.delete_expired_tokens).
+
+The job runs in-process every TOKEN_SWEEP_INTERVAL_MINUTES plus a random
+jitter (so workers started together don't sweep together). A Firestore
+lease lets only one worker or instance sweep at a time; the others skip
+that round. A long sweep renews the lease between pages once half of it
+has run out, and stops if the renewal fails (another process took the
+lease after it expired).
+"""
+
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db import firestore_async
+
+logger = get_logger(__name__)
+
+LEASE_NAME = "refresh_token_sweeper"
+
+# Identity of this process in the lease document
+_holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Held while this process sweeps (acquired without blocking)
+_sweep_lock = threading.Lock()
+
+_stats: Dict[str, Any] = {
+    "runs": 0,
+    "skipped": 0,
+    "failures": 0,
+    "deleted_total": 0,
+    "last_deleted": 0,
+    "last_duration_ms": 0.0,
+    "last_run_at": None,
+}
+_stats_lock = threading.Lock()
+
+
+# ============================================================================
+# Sweep
+# ============================================================================
+
+async def sweep_expired_tokens() -> Optional[int]:
+    """
+    Run one sweep if no other sweep (here or in another process) is running
+
+    Returns:
+        Number of tokens deleted, or None if the sweep was skipped
+
+    Raises:
+        Exception: If the sweep fails (the lease is released either way)
+    """
+    if not _sweep_lock.acquire(blocking=False):
+        _record(skipped=True)
+        return None
+
+    try:
+        lease_seconds = settings.TOKEN_SWEEP_LEASE_SECONDS
+        if not await firestore_async.acquire_lease(LEASE_NAME, _holder, lease_seconds):
+            logger.info("Refresh token sweep skipped: another process holds the lease")
+            _record(skipped=True)
+            return None
+
+        renew_at = time.monotonic() + lease_seconds / 2
+
+        async def renew_lease() -> bool:
+            nonlocal renew_at
+
+            if time.monotonic() < renew_at:
+                return True
+            if not await firestore_async.acquire_lease(LEASE_NAME, _holder, lease_seconds):
+                logger.warning("Refresh token sweep stopped: lease lost to another process")
+                return False
+            renew_at = time.monotonic() + lease_seconds / 2
+            return True
+
+        started = time.perf_counter()
+        try:
+            deleted = await firestore_async.delete_expired_tokens(settings.TOKEN_SWEEP_BATCH_SIZE, renew_lease)
+        finally:
+            await firestore_async.release_lease(LEASE_NAME, _holder)
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        _record(deleted=deleted, duration_ms=duration_ms)
+        logger.info("Refresh token sweep deleted %d tokens in %.0f ms", deleted, duration_ms)
+        return deleted
+
+    except Exception:
+        _record(failed=True)
+        raise
+
+    finally:
+        _sweep_lock.release()
+
+
+def next_delay(interval: float, jitter: float) -> float:
+    """
+    Seconds until the next sweep
+
+    Args:
+        interval: Base interval in seconds
+        jitter: Maximum random extra delay in seconds
+
+    Returns:
+        interval plus a uniform random delay in [0, jitter]
+    """
+    return interval + random.uniform(0, max(jitter, 0))
+
+
+async def run_token_sweeper() -> None:
+    """
+    Sweep expired refresh tokens every TOKEN_SWEEP_INTERVAL_MINUTES (plus jitter)
+
+    Runs until cancelled. The first sweep waits only for the jitter, so a
+    restart doesn't postpone cleanup by a full interval. Failures are logged
+    and retried on the next round.
+    """
+    interval = settings.TOKEN_SWEEP_INTERVAL_MINUTES * 60
+    jitter = settings.TOKEN_SWEEP_JITTER_SECONDS
+
+    await asyncio.sleep(next_delay(0, jitter))
+    while True:
+        try:
+            await sweep_expired_tokens()
+        except Exception as e:
+            logger.error("Refresh token sweep failed: %s", e)
+
+        await asyncio.sleep(next_delay(interval, jitter))
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+def _record(
+    deleted: int = 0,
+    duration_ms: float = 0.0,
+    skipped: bool = False,
+    failed: bool = False
+) -> None:
+    with _stats_lock:
+        if skipped:
+            _stats["skipped"] += 1
+            return
+        if failed:
+            _stats["failures"] += 1
+            return
+        _stats["runs"] += 1
+        _stats["deleted_total"] += deleted
+        _stats["last_deleted"] = deleted
+        _stats["last_duration_ms"] = round(duration_ms, 1)
+        _stats["last_run_at"] = datetime.utcnow().isoformat()
+
+
+def token_sweeper_stats() -> Dict[str, Any]:
+    """
+    Sweep counters
+
+    Returns:
+        runs, skipped (lease held elsewhere), failures, deleted_total,
+        last_deleted, last_duration_ms and last_run_at (ISO UTC)
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_token_sweeper_stats() -> None:
+    """Reset the counters (tests)"""
+    with _stats_lock:
+        _stats.update(runs=0, skipped=0, failures=0, deleted_total=0,
+                      last_deleted=0, last_duration_ms=0.0, last_run_at=None)
@@ -0,0 +1,627 @@
+"""
+Benchmark Fakes
+
+In-process stand-ins for the external services, so benchmarks and load
+tests exercise the app's own code without a Firestore emulator or the ERP:
+
+- FakeFirestoreClient: in-memory subset of google.cloud.firestore.Client
+  used by app.db.firestore_client, with optional per-RPC latency and an
+  operation counter
+- FakeAsyncFirestoreClient: the AsyncClient counterpart used by
+  app.db.firestore_async, sharing a FakeFirestoreClient's data and counter
+  (latency is awaited, so concurrent RPCs overlap)
+- FakeSQLConnection: pymssql-like connection returning canned rows, with
+  optional query latency
+
+install_fakes() wires them into the app.
+"""
+
+import asyncio
+import copy
+import operator
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from google.cloud.firestore_v1.transforms import Increment
+
+# ============================================================================
+# Firestore
+# ============================================================================
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    ">": operator.gt,
+    "in": lambda value, options: value in options,
+}
+
+
+class FakeDocumentSnapshot:
+    """Read result of a document"""
+
+    def __init__(
+        self,
+        reference: "FakeDocumentReference",
+        data: Optional[Dict[str, Any]],
+        update_time: Optional[datetime] = None
+    ):
+        self.reference = reference
+        self.id = reference.id
+        self.update_time = update_time
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    """Reference to one document"""
+
+    def __init__(self, client: "FakeFirestoreClient", collection: str, doc_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection}/{self.id}"
+
+    def get(self, **kwargs: Any) -> FakeDocumentSnapshot:
+        data, update_time = self._client._read(self._collection, self.id)
+        return FakeDocumentSnapshot(self, data, update_time)
+
+    def create(self, data: Dict[str, Any], **kwargs: Any) -> "FakeWriteResult":
+        return self._client._write("create", self._collection, self.id, data, merge=False)
+
+    def set(self, data: Dict[str, Any], merge: bool = False, **kwargs: Any) -> "FakeWriteResult":
+        return self._client._write("set", self._collection, self.id, data, merge=merge)
+
+    def update(
+        self,
+        updates: Dict[str, Any],
+        option: Optional["FakeWriteOption"] = None,
+        **kwargs: Any
+    ) -> "FakeWriteResult":
+        return self._client._write("update", self._collection, self.id, updates, merge=True, option=option)
+
+    def delete(self, **kwargs: Any) -> None:
+        self._client._delete(self._collection, self.id)
+
+
+class FakeQuery:
+    """Filtered, ordered, limited view of a collection"""
+
+    def __init__(
+        self,
+        client: "FakeFirestoreClient",
+        collection: str,
+        filters: Tuple[Tuple[str, str, Any], ...] = (),
+        limit: Optional[int] = None,
+        order: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        after: Optional[Tuple[Any, str]] = None
+    ):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._limit = limit
+        self._order = order
+        self._fields = fields
+        self._after = after
+
+    def _derive(self, **changes: Any) -> "FakeQuery":
+        state = {
+            "filters": self._filters, "limit": self._limit, "order": self._order,
+            "fields": self._fields, "after": self._after,
+        }
+        state.update(changes)
+        return FakeQuery(self._client, self._collection, **state)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None,
+              value: Any = None, *, filter: Any = None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._derive(filters=self._filters + ((field_path, op_string, value),))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._derive(limit=count)
+
+    def order_by(self, field_path: str, **kwargs: Any) -> "FakeQuery":
+        return self._derive(order=field_path)
+
+    def select(self, field_paths: List[str]) -> "FakeQuery":
+        return self._derive(fields=list(field_paths))
+
+    def start_after(self, snapshot: FakeDocumentSnapshot) -> "FakeQuery":
+        """Cursor after a snapshot, by the order field then document ID"""
+        return self._derive(after=(snapshot.get(self._order) if self._order else None, snapshot.id))
+
+    def _sort_key(self, doc_id: str, data: Dict[str, Any]) -> Tuple[Any, str]:
+        return (data.get(self._order) if self._order else None, doc_id)
+
+    def stream(self, **kwargs: Any) -> Iterator[FakeDocumentSnapshot]:
+        documents = self._client._scan(self._collection)
+        if self._order is not None:
+            documents.sort(key=lambda item: self._sort_key(item[0], item[1]))
+        matched = 0
+        for doc_id, data, update_time in documents:
+            if self._after is not None and self._sort_key(doc_id, data) <= self._after:
+                continue
+            if all(
+                field in data and _OPERATORS[op](data[field], value)
+                for field, op, value in self._filters
+            ):
+                if self._fields is not None:
+                    data = {field: data[field] for field in self._fields if field in data}
+                reference = FakeDocumentReference(self._client, self._collection, doc_id)
+                yield FakeDocumentSnapshot(reference, data, update_time)
+                matched += 1
+                if self._limit is not None and matched >= self._limit:
+                    return
+
+    def get(self, **kwargs: Any) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    """Reference to a collection"""
+
+    def document(self, doc_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._collection, doc_id)
+
+    def on_snapshot(self, callback: Callable[[List[FakeDocumentSnapshot], List[Any], datetime], None]) -> "FakeWatch":
+        """Call back with the whole collection now and after every write to it"""
+        return self._client._watch(self._collection, callback)
+
+
+class FakeWatch:
+    """Snapshot listener registration"""
+
+    def __init__(self, client: "FakeFirestoreClient", collection: str, callback: Callable[..., None]):
+        self._client = client
+        self._collection = collection
+        self._callback = callback
+
+    def unsubscribe(self) -> None:
+        watchers = self._client._watchers.get(self._collection, [])
+        if self in watchers:
+            watchers.remove(self)
+
+
+class FakeFirestoreClient:
+    """
+    In-memory Firestore client
+
+    `ops` counts RPCs by kind: read, batch_get, query, write, delete, commit.
+    Documents carry an increasing update_time, checked by write_option()
+    preconditions. on_snapshot() listeners are called synchronously after
+    each write to their collection.
+
+    Args:
+        latency_ms: Simulated round-trip time added to every RPC
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.ops: Counter = Counter()
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._update_times: Dict[Tuple[str, str], datetime] = {}
+        self._clock = [datetime.now(timezone.utc)]
+        self._watchers: Dict[str, List[FakeWatch]] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def get_all(self, references: List[FakeDocumentReference], **kwargs: Any) -> Iterator[FakeDocumentSnapshot]:
+        """Read several documents in one RPC (BatchGetDocuments)"""
+        self._rpc("batch_get")
+        with self._lock:
+            found = [
+                (
+                    ref,
+                    copy.deepcopy(self._collections.get(ref._collection, {}).get(ref.id)),
+                    self._update_times.get((ref._collection, ref.id)),
+                )
+                for ref in references
+            ]
+        for ref, data, update_time in found:
+            yield FakeDocumentSnapshot(ref, data, update_time)
+
+    def batch(self) -> "FakeWriteBatch":
+        return FakeWriteBatch(self)
+
+    def write_option(self, last_update_time: datetime) -> "FakeWriteOption":
+        return FakeWriteOption(last_update_time)
+
+    def reset_ops(self) -> None:
+        self.ops.clear()
+
+    def _rpc(self, kind: str) -> None:
+        self.ops[kind] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _read(self, collection: str, doc_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+        self._rpc("read")
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return copy.deepcopy(data), self._update_times.get((collection, doc_id))
+
+    def _scan(self, collection: str) -> List[Tuple[str, Dict[str, Any], datetime]]:
+        self._rpc("query")
+        return self._documents(collection)
+
+    def _documents(self, collection: str) -> List[Tuple[str, Dict[str, Any], datetime]]:
+        with self._lock:
+            return [
+                (doc_id, copy.deepcopy(data), self._update_times[(collection, doc_id)])
+                for doc_id, data in self._collections.get(collection, {}).items()
+            ]
+
+    def _watch(self, collection: str, callback: Callable[..., None]) -> FakeWatch:
+        watch = FakeWatch(self, collection, callback)
+        self._watchers.setdefault(collection, []).append(watch)
+        self._notify([collection])
+        return watch
+
+    def _notify(self, collections: List[str]) -> None:
+        """Call the snapshot listeners of the written collections"""
+        for collection in set(collections):
+            watchers = list(self._watchers.get(collection, []))
+            if not watchers:
+                continue
+            snapshots = [
+                FakeDocumentSnapshot(FakeDocumentReference(self, collection, doc_id), data, update_time)
+                for doc_id, data, update_time in self._documents(collection)
+            ]
+            for watch in watchers:
+                watch._callback(snapshots, [], datetime.now(timezone.utc))
+
+    def _write(
+        self,
+        kind: str,
+        collection: str,
+        doc_id: str,
+        data: Dict[str, Any],
+        merge: bool,
+        option: Optional["FakeWriteOption"] = None
+    ) -> "FakeWriteResult":
+        self._rpc("write")
+        with self._lock:
+            if kind == "create" and doc_id in self._collections.get(collection, {}):
+                raise AlreadyExists(f"Document already exists: {collection}/{doc_id}")
+            if option is not None and self._update_times.get((collection, doc_id)) != option.last_update_time:
+                raise FailedPrecondition(f"Document changed: {collection}/{doc_id}")
+            self._apply(kind, collection, doc_id, data, merge)
+            result = FakeWriteResult(self._update_times[(collection, doc_id)])
+        self._notify([collection])
+        return result
+
+    def _apply(self, kind: str, collection: str, doc_id: str, data: Dict[str, Any], merge: bool) -> None:
+        """Apply one write (caller holds the lock)"""
+        if kind == "delete":
+            self._collections.get(collection, {}).pop(doc_id, None)
+            self._update_times.pop((collection, doc_id), None)
+            return
+        documents = self._collections.setdefault(collection, {})
+        if kind == "update" and doc_id not in documents:
+            raise KeyError(f"No document to update: {collection}/{doc_id}")
+        current = documents.get(doc_id, {}) if merge else {}
+        for field, value in data.items():
+            if isinstance(value, Increment):
+                current[field] = current.get(field, 0) + value.value
+            else:
+                current[field] = copy.deepcopy(value)
+        documents[doc_id] = current
+        # Strictly increasing, like commit times
+        self._clock[0] = max(datetime.now(timezone.utc), self._clock[0] + timedelta(microseconds=1))
+        self._update_times[(collection, doc_id)] = self._clock[0]
+
+    def _delete(self, collection: str, doc_id: str) -> None:
+        self._rpc("delete")
+        with self._lock:
+            self._apply("delete", collection, doc_id, {}, merge=False)
+        self._notify([collection])
+
+
+class FakeWriteResult:
+    """Result of a single-document write"""
+
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+
+class FakeWriteOption:
+    """Last-update-time precondition for a write"""
+
+    def __init__(self, last_update_time: datetime):
+        self.last_update_time = last_update_time
+
+
+class FakeWriteBatch:
+    """Writes applied atomically in one commit RPC"""
+
+    def __init__(self, client: FakeFirestoreClient):
+        self._client = client
+        self._writes: List[Tuple[str, FakeDocumentReference, Optional[Dict[str, Any]], bool]] = []
+        self._options: List[Tuple[FakeDocumentReference, FakeWriteOption]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", reference, data, merge))
+
+    def update(
+        self,
+        reference: FakeDocumentReference,
+        updates: Dict[str, Any],
+        option: Optional[FakeWriteOption] = None
+    ) -> None:
+        self._writes.append(("update", reference, updates, True))
+        if option is not None:
+            self._options.append((reference, option))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._writes.append(("delete", reference, None, False))
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def commit(self, **kwargs: Any) -> None:
+        self._client._rpc("commit")
+        with self._client._lock:
+            for reference, option in self._options:
+                key = (reference._collection, reference.id)
+                if self._client._update_times.get(key) != option.last_update_time:
+                    raise FailedPrecondition(f"Document changed: {reference.path}")
+            for kind, reference, data, merge in self._writes:
+                self._client._apply(kind, reference._collection, reference.id, data, merge)
+        self._client._notify([reference._collection for _, reference, _, _ in self._writes])
+        self._writes = []
+        self._options = []
+
+
+class FakeAsyncDocumentReference:
+    """Async reference to one document"""
+
+    def __init__(self, client: "FakeAsyncFirestoreClient", reference: FakeDocumentReference):
+        self._client = client
+        self._reference = reference
+        self.id = reference.id
+        self.path = reference.path
+
+    async def get(self, **kwargs: Any) -> FakeDocumentSnapshot:
+        await self._client._latency()
+        return self._client._wrap(self._reference.get())
+
+    async def create(self, data: Dict[str, Any], **kwargs: Any) -> FakeWriteResult:
+        await self._client._latency()
+        return self._reference.create(data)
+
+    async def set(self, data: Dict[str, Any], merge: bool = False, **kwargs: Any) -> FakeWriteResult:
+        await self._client._latency()
+        return self._reference.set(data, merge=merge)
+
+    async def update(
+        self,
+        updates: Dict[str, Any],
+        option: Optional[FakeWriteOption] = None,
+        **kwargs: Any
+    ) -> FakeWriteResult:
+        await self._client._latency()
+        return self._reference.update(updates, option=option)
+
+    async def delete(self, **kwargs: Any) -> None:
+        await self._client._latency()
+        self._reference.delete()
+
+
+class FakeAsyncQuery:
+    """Async filtered, limited view of a collection"""
+
+    def __init__(self, client: "FakeAsyncFirestoreClient", query: FakeQuery):
+        self._client = client
+        self._query = query
+
+    def where(self, *args: Any, **kwargs: Any) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._client, self._query.where(*args, **kwargs))
+
+    def limit(self, count: int) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._client, self._query.limit(count))
+
+    def order_by(self, field_path: str, **kwargs: Any) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._client, self._query.order_by(field_path))
+
+    def select(self, field_paths: List[str]) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._client, self._query.select(field_paths))
+
+    def start_after(self, snapshot: FakeDocumentSnapshot) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._client, self._query.start_after(snapshot))
+
+    async def stream(self, **kwargs: Any) -> AsyncIterator[FakeDocumentSnapshot]:
+        await self._client._latency()
+        for snapshot in list(self._query.stream()):
+            yield self._client._wrap(snapshot)
+
+    async def get(self, **kwargs: Any) -> List[FakeDocumentSnapshot]:
+        return [snapshot async for snapshot in self.stream()]
+
+
+class FakeAsyncCollectionReference(FakeAsyncQuery):
+    """Async reference to a collection"""
+
+    def document(self, doc_id: str) -> FakeAsyncDocumentReference:
+        return FakeAsyncDocumentReference(self._client, self._query.document(doc_id))
+
+
+class FakeAsyncWriteBatch:
+    """Async writes applied atomically in one commit RPC"""
+
+    def __init__(self, client: "FakeAsyncFirestoreClient"):
+        self._client = client
+        self._batch = client._view.batch()
+
+    def set(self, reference: FakeAsyncDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._batch.set(reference._reference, data, merge=merge)
+
+    def update(
+        self,
+        reference: FakeAsyncDocumentReference,
+        updates: Dict[str, Any],
+        option: Optional[FakeWriteOption] = None
+    ) -> None:
+        self._batch.update(reference._reference, updates, option=option)
+
+    def delete(self, reference: FakeAsyncDocumentReference) -> None:
+        self._batch.delete(reference._reference)
+
+    def __len__(self) -> int:
+        return len(self._batch)
+
+    async def commit(self, **kwargs: Any) -> None:
+        await self._client._latency()
+        self._batch.commit()
+
+
+class FakeAsyncFirestoreClient:
+    """
+    In-memory Firestore AsyncClient over a FakeFirestoreClient's data
+
+    Operations are counted in the sync client's `ops`; its latency_ms is
+    awaited instead of slept.
+
+    Args:
+        client: Fake sync client whose documents and counter are shared
+    """
+
+    def __init__(self, client: FakeFirestoreClient):
+        self._sync = client
+        # Shallow copy: same documents, counter and lock, no blocking sleep
+        self._view = copy.copy(client)
+        self._view.latency_ms = 0.0
+
+    def collection(self, name: str) -> FakeAsyncCollectionReference:
+        return FakeAsyncCollectionReference(self, self._view.collection(name))
+
+    async def get_all(
+        self,
+        references: List[FakeAsyncDocumentReference],
+        **kwargs: Any
+    ) -> AsyncIterator[FakeDocumentSnapshot]:
+        """Read several documents in one RPC (BatchGetDocuments)"""
+        await self._latency()
+        for snapshot in list(self._view.get_all([ref._reference for ref in references])):
+            yield self._wrap(snapshot)
+
+    def batch(self) -> FakeAsyncWriteBatch:
+        return FakeAsyncWriteBatch(self)
+
+    def write_option(self, last_update_time: datetime) -> FakeWriteOption:
+        return self._view.write_option(last_update_time)
+
+    async def _latency(self) -> None:
+        if self._sync.latency_ms:
+            await asyncio.sleep(self._sync.latency_ms / 1000)
+
+    def _wrap(self, snapshot: FakeDocumentSnapshot) -> FakeDocumentSnapshot:
+        """Point a snapshot's reference at the async wrapper"""
+        snapshot.reference = FakeAsyncDocumentReference(self, snapshot.reference)
+        return snapshot
+
+
+# ============================================================================
+# SQL Server
+# ============================================================================
+
+class FakeSQLCursor:
+    def __init__(self, connection: "FakeSQLConnection"):
+        self._connection = connection
+        self.description = [(column,) for column in connection.columns]
+
+    def execute(self, query: str, params: Any = None) -> None:
+        if self._connection.latency_ms:
+            time.sleep(self._connection.latency_ms / 1000)
+
+    def fetchall(self) -> List[Tuple]:
+        return self._connection.rows
+
+
+class FakeSQLConnection:
+    """
+    pymssql-like connection returning canned rows for every query
+
+    Args:
+        columns: Column names
+        rows: Row tuples returned by every query
+        latency_ms: Simulated query time
+    """
+
+    def __init__(self, columns: Tuple[str, ...], rows: List[Tuple], latency_ms: float = 0.0):
+        self.columns = columns
+        self.rows = rows
+        self.latency_ms = latency_ms
+        self.query_timeout = 0
+
+    def cursor(self) -> FakeSQLCursor:
+        return FakeSQLCursor(self)
+
+    def close(self) -> None:
+        pass
+
+
+# ============================================================================
+# Wiring
+# ============================================================================
+
+@contextmanager
+def install_fakes(
+    firestore: FakeFirestoreClient,
+    sql_factory: Optional[Callable[[], Any]] = None
+) -> Iterator[FakeFirestoreClient]:
+    """
+    Point the app at the fakes for the duration of the block
+
+    Args:
+        firestore: Fake Firestore client to use
+        sql_factory: Callable returning a new SQL connection (FakeSQLConnection
+            or a stand-in connection); None leaves SQL Server untouched
+    """
+    from app.core.principal_cache import clear_principal_cache
+    from app.db import firestore_async, firestore_client, mssql_client
+    from app.db.config_cache import clear_config_snapshot
+
+    previous = firestore_client._db_instance
+    previous_async = firestore_async._client, firestore_async._client_loop
+    firestore_client._db_instance = firestore
+    # No loop binding: the fake serves every event loop
+    firestore_async._client, firestore_async._client_loop = FakeAsyncFirestoreClient(firestore), None
+    mssql_client.close_pool()
+    clear_principal_cache()
+    clear_config_snapshot()
+    try:
+        if sql_factory is None:
+            yield firestore
+        else:
+            with patch("app.db.mssql_client.get_connection", side_effect=lambda: sql_factory()):
+                yield firestore
+    finally:
+        mssql_client.close_pool()
+        clear_principal_cache()
+        clear_config_snapshot()
+        firestore_client._db_instance = previous
+        firestore_async._client, firestore_async._client_loop = previous_async
@@ -0,0 +1,212 @@
+"""
+Benchmark Harness
+
+Shared timing, reporting and baseline comparison for the benchmarks in this
+package. Each benchmark produces StageResults; p50 timings are compared with
+a stored baseline JSON and the run fails when a stage regresses by more than
+the tolerance.
+"""
+
+import argparse
+import json
+import math
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+
+# ============================================================================
+# Measurement
+# ============================================================================
+
+@dataclass
+class StageResult:
+    """Timings of one benchmark stage at one input size"""
+    stage: str
+    size: int  # Items processed per run (e.g., clients)
+    runs: int
+    p50_ms: float
+    p99_ms: float
+    throughput: float  # Items per second at p50
+    peak_kib: float  # Peak traced allocation during one run
+
+    @property
+    def key(self) -> str:
+        return f"{self.stage}[{self.size}]"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile
+
+    Args:
+        samples: Measurements (any order)
+        q: Percentile in [0, 100]
+
+    Returns:
+        The sample at that rank (0.0 for no samples)
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(
+    stage: str,
+    size: int,
+    func: Callable[[], Any],
+    min_runs: int = 5,
+    min_seconds: float = 0.5,
+    max_runs: int = 1000,
+) -> StageResult:
+    """
+    Time a stage until both min_runs and min_seconds are reached
+
+    Peak memory is taken from a separate run under tracemalloc, so tracing
+    does not inflate the timings.
+
+    Args:
+        stage: Stage name
+        size: Items processed per call
+        func: Zero-argument callable running the stage once
+        min_runs: Minimum timed runs
+        min_seconds: Minimum total timed duration
+        max_runs: Upper bound on timed runs
+
+    Returns:
+        StageResult
+    """
+    func()  # Warm-up
+
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_seconds):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50 = percentile(samples, 50)
+    return StageResult(
+        stage=stage,
+        size=size,
+        runs=len(samples),
+        p50_ms=round(p50, 3),
+        p99_ms=round(percentile(samples, 99), 3),
+        throughput=round(size / (p50 / 1000), 1) if p50 > 0 else 0.0,
+        peak_kib=round(peak / 1024, 1),
+    )
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+def print_report(title: str, results: List[StageResult], unit: str = "items") -> None:
+    """Print results as a table"""
+    print(f"\n{title}")
+    print(f"{'stage':<28}{'size':>7}{'runs':>7}{'p50 ms':>11}{'p99 ms':>11}{unit + '/s':>14}{'peak KiB':>11}")
+    for r in results:
+        print(
+            f"{r.stage:<28}{r.size:>7}{r.runs:>7}{r.p50_ms:>11.3f}{r.p99_ms:>11.3f}"
+            f"{r.throughput:>14,.0f}{r.peak_kib:>11,.1f}"
+        )
+
+
+# ============================================================================
+# Baselines
+# ============================================================================
+
+def load_baseline(path: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Load a baseline file, or None if there is none"""
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path: Path, results: List[StageResult]) -> None:
+    """Store results as the new baseline"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"results": {r.key: asdict(r) for r in results}}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_to_baseline(
+    results: List[StageResult],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float
+) -> List[str]:
+    """
+    Find stages slower than their baseline
+
+    Args:
+        results: Current results
+        baseline: Baseline results keyed by StageResult.key
+        tolerance: Allowed slowdown of p50 (0.25 = 25%)
+
+    Returns:
+        One message per regressed stage (empty if none)
+    """
+    regressions = []
+    for r in results:
+        reference = baseline.get(r.key)
+        if reference is None or reference["p50_ms"] <= 0:
+            continue
+        ratio = r.p50_ms / reference["p50_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{r.key}: p50 {r.p50_ms:.3f} ms vs baseline {reference['p50_ms']:.3f} ms (+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def add_baseline_args(parser: argparse.ArgumentParser, default_name: str) -> None:
+    """Add --baseline / --save-baseline / --tolerance options"""
+    parser.add_argument("--baseline", type=Path, default=BASELINES_DIR / default_name,
+                        help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed p50 slowdown before failing (0.5 = 50%%)")
+
+
+def check_baseline(args: argparse.Namespace, results: List[StageResult]) -> int:
+    """
+    Save or compare against the baseline, per the command-line options
+
+    Returns:
+        Process exit code (1 on regression)
+    """
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline} (run with --save-baseline)")
+        return 0
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
@@ -0,0 +1,241 @@
+"""
+Shift-Start Load Test
+
+Boots app.main:app in-process (httpx ASGITransport, no sockets) against the
+benchmark fakes for Firestore and SQL Server, and replays the traffic of a
+shift start: every simulated asesor logs in, fetches their route plan, and
+a share of them refresh their token and fetch the plan again.
+
+Per endpoint it reports throughput, latency percentiles, error rate, and the
+event-loop lag observed while requests to that endpoint were in flight
+(blocking work on the loop shows up there).
+
+Usage (from backend/):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 2000 --concurrency 300 --sql-latency-ms 80
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+from passlib.hash import bcrypt
+
+from app.core.config import settings
+from benchmarks.fakes import FakeFirestoreClient, FakeSQLConnection, install_fakes
+from benchmarks.harness import percentile
+from benchmarks.route_plan import COLUMNS, synthetic_rows
+
+PASSWORD = "demo123"
+
+
+# ============================================================================
+# Recording
+# ============================================================================
+
+@dataclass
+class EndpointStats:
+    """Samples for one endpoint"""
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    loop_lag_ms: List[float] = field(default_factory=list)
+    in_flight: int = 0
+
+
+class Recorder:
+    """Collects request samples and event-loop lag per endpoint"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.loop_lag_ms: List[float] = []
+
+    async def request(self, name: str, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Send a request and record its latency and outcome"""
+        stats = self.endpoints[name]
+        stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            stats.errors += 1
+            stats.statuses[0] += 1
+            return None
+        finally:
+            stats.in_flight -= 1
+            stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+        stats.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            stats.errors += 1
+        return response
+
+    async def monitor_loop(self, interval: float = 0.01) -> None:
+        """Measure how late the loop wakes up, attributing lag to in-flight endpoints"""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max((time.perf_counter() - started - interval) * 1000, 0.0)
+            self.loop_lag_ms.append(lag)
+            for stats in self.endpoints.values():
+                if stats.in_flight:
+                    stats.loop_lag_ms.append(lag)
+
+
+# ============================================================================
+# Scenario
+# ============================================================================
+
+def seed_users(firestore: FakeFirestoreClient, users: int, routes: int, rounds: int) -> List[str]:
+    """Create asesores in the fake Firestore (one shared bcrypt hash)"""
+    password_hash = bcrypt.using(rounds=rounds).hash(PASSWORD)
+    ids = []
+    for n in range(users):
+        user_id = f"A{n:06d}"
+        firestore.collection("users").document(user_id).set({
+            "id": user_id,
+            "nombre": f"Asesor {n}",
+            "rol": "asesor",
+            "ruta": f"{n % routes + 1:03d}",
+            "password_hash": password_hash,
+            "activo": True,
+            "bloqueado": False,
+            "intentos_fallidos": 0,
+        })
+        ids.append(user_id)
+    firestore.reset_ops()
+    return ids
+
+
+async def asesor_session(
+    recorder: Recorder,
+    client: httpx.AsyncClient,
+    user_id: str,
+    arrival: float,
+    refresh_ratio: float,
+    gate: asyncio.Semaphore,
+    rng: random.Random
+) -> None:
+    """One asesor's shift start: login, plan, maybe refresh and plan again"""
+    await asyncio.sleep(arrival)
+    async with gate:
+        response = await recorder.request(
+            "login", client, "POST", "/api/auth/login",
+            json={"id": user_id, "password": PASSWORD, "rememberMe": True}
+        )
+        if response is None or response.status_code != 200:
+            return
+        tokens = response.json()
+
+        await recorder.request(
+            "plan-de-ruta", client, "GET", "/api/plan-de-ruta",
+            params={"fecha": "2025-09-01"}, headers={"Authorization": f"Bearer {tokens['token']}"}
+        )
+
+        if rng.random() >= refresh_ratio:
+            return
+
+        response = await recorder.request(
+            "refresh", client, "POST", "/api/auth/refresh", json={"refreshToken": tokens["refreshToken"]}
+        )
+        if response is None or response.status_code != 200:
+            return
+
+        await recorder.request(
+            "plan-de-ruta", client, "GET", "/api/plan-de-ruta",
+            params={"fecha": "2025-09-01"}, headers={"Authorization": f"Bearer {response.json()['token']}"}
+        )
+
+
+async def run_load(args: argparse.Namespace) -> Recorder:
+    """Run the scenario and return the recorded samples"""
+    from app.main import app
+
+    firestore = FakeFirestoreClient(latency_ms=args.firestore_latency_ms)
+    user_ids = seed_users(firestore, args.users, args.routes, args.bcrypt_rounds)
+    rows = synthetic_rows(args.clients_per_route)
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    gate = asyncio.Semaphore(args.concurrency)
+
+    with install_fakes(firestore, lambda: FakeSQLConnection(COLUMNS, rows, args.sql_latency_ms)):
+        monitor = asyncio.ensure_future(recorder.monitor_loop())
+        transport = httpx.ASGITransport(app=app)
+        started = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            await asyncio.gather(*(
+                asesor_session(recorder, client, user_id, rng.uniform(0, args.ramp_seconds),
+                               args.refresh_ratio, gate, rng)
+                for user_id in user_ids
+            ))
+        recorder.elapsed = time.perf_counter() - started
+        recorder.firestore_ops = dict(firestore.ops)
+        monitor.cancel()
+
+    return recorder
+
+
+# ============================================================================
+# Report
+# ============================================================================
+
+def print_load_report(recorder: Recorder) -> None:
+    """Print per-endpoint results"""
+    elapsed = recorder.elapsed
+    print(f"\nShift-start load test ({elapsed:.1f}s)")
+    print(f"{'endpoint':<14}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'max ms':>10}{'errors':>8}{'lag p99':>10}{'lag max':>10}")
+    for name, stats in sorted(recorder.endpoints.items()):
+        samples = stats.latencies_ms
+        count = len(samples)
+        print(
+            f"{name:<14}{count:>9}{count / elapsed:>9.1f}{percentile(samples, 50):>10.1f}"
+            f"{percentile(samples, 95):>10.1f}{percentile(samples, 99):>10.1f}{max(samples, default=0):>10.1f}"
+            f"{stats.errors / count if count else 0:>8.1%}"
+            f"{percentile(stats.loop_lag_ms, 99):>10.1f}{max(stats.loop_lag_ms, default=0):>10.1f}"
+        )
+        failures = {code: n for code, n in stats.statuses.items() if code >= 400 or code == 0}
+        if failures:
+            print(f"{'':<14}status counts: {dict(sorted(failures.items()))}")
+
+    print(f"\nEvent loop lag: p50 {percentile(recorder.loop_lag_ms, 50):.1f} ms, "
+          f"p99 {percentile(recorder.loop_lag_ms, 99):.1f} ms, max {max(recorder.loop_lag_ms, default=0):.1f} ms")
+    print(f"Firestore ops: {recorder.firestore_ops}")
+
+
+def main() -> int:
+    """Run the load test"""
+    parser = argparse.ArgumentParser(description="In-process shift-start load test")
+    parser.add_argument("--users", type=int, default=300, help="Simulated asesores")
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument("--clients-per-route", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100, help="Asesores active at once")
+    parser.add_argument("--ramp-seconds", type=float, default=5.0, help="Arrival window")
+    parser.add_argument("--refresh-ratio", type=float, default=0.3, help="Share of asesores that refresh")
+    parser.add_argument("--firestore-latency-ms", type=float, default=5.0)
+    parser.add_argument("--sql-latency-ms", type=float, default=50.0)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Cost of the seeded password hash")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    settings.RATE_LIMIT_ENABLED = False
+    settings.API_RATE_LIMIT_ENABLED = False
+
+    recorder = asyncio.run(run_load(args))
+    print_load_report(recorder)
+
+    errors = sum(stats.errors for stats in recorder.endpoints.values())
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Logging Pipeline Benchmark
+
+Caller-side cost of logging (what a request handler pays) for a burst of
+records like those of a plan request, written to a sink with a per-write
+latency (a slow stdout pipe or log collector):
+
+- legacy: StreamHandler + the former json.dumps formatter, f-string messages
+- sync: StreamHandler + the orjson formatter, %-style messages
+- async: AsyncLogHandler (background writer, batched writes)
+
+Records the async writer has not written yet when a run ends are not part
+of its timing; dropped and sampled-out records are reported separately.
+
+Usage (from backend/):
+    python -m benchmarks.log_pipeline
+    python -m benchmarks.log_pipeline --records 5000 --sink-latency-ms 0.2
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from app.core.logging import (
+    AsyncLogHandler,
+    StructuredFormatter,
+    clear_request_context,
+    log_with_context,
+    set_request_context,
+)
+from benchmarks.harness import StageResult, measure, print_report
+
+
+class SlowSink:
+    """Discards writes after sleeping for a fixed latency per write"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.writes = 0
+
+    def write(self, data: str) -> None:
+        self.writes += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def flush(self) -> None:
+        pass
+
+
+class LegacyFormatter(logging.Formatter):
+    """StructuredFormatter as it was before the async pipeline"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_data = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+        }
+        if hasattr(record, "context") and record.context:
+            log_data["context"] = record.context
+        return json.dumps(log_data)
+
+
+def _burst(logger: logging.Logger, records: int, lazy: bool) -> Callable[[], None]:
+    """Log `records` lines shaped like a plan request's"""
+    def run():
+        set_request_context(request_id="bench", user_id="A012345")
+        for n in range(records):
+            if n % 4 == 3:
+                log_with_context(
+                    logger, "info", "Visit sheet %s for route %s: %d clients in %.1f ms",
+                    "fanout", "001", 500, 42.0, strategy="fanout", block_ms={"ventas": 30.1, "hei": 12.4}
+                )
+            elif lazy:
+                logger.info("Hoja de Visita query returned %d clients for route %s", 500, "001")
+            else:
+                logger.info(f"Hoja de Visita query returned {500} clients for route {'001'}")
+        clear_request_context()
+    return run
+
+
+def run(records: int, sink_latency_ms: float) -> List[StageResult]:
+    """Measure each pipeline"""
+    pipelines: Dict[str, Callable[[SlowSink], logging.Handler]] = {
+        "legacy": lambda sink: logging.StreamHandler(sink),
+        "sync": lambda sink: logging.StreamHandler(sink),
+        "async": lambda sink: AsyncLogHandler(sink, queue_size=1_000_000),
+    }
+
+    results = []
+    for name, build in pipelines.items():
+        sink = SlowSink(sink_latency_ms)
+        handler = build(sink)
+        handler.setFormatter(LegacyFormatter() if name == "legacy" else StructuredFormatter())
+
+        logger = logging.getLogger(f"benchmarks.log_pipeline.{name}")
+        logger.handlers = [handler]
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+        try:
+            results.append(measure(name, records, _burst(logger, records, lazy=name != "legacy"),
+                                   min_runs=5, max_runs=20))
+        finally:
+            handler.close()
+            logger.handlers = []
+
+        if isinstance(handler, AsyncLogHandler):
+            stats = handler.stats()
+            print(f"async: {stats['written']:,} records in {sink.writes:,} writes, dropped {stats['dropped']}")
+
+    return results
+
+
+def main() -> int:
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Logging pipeline caller-side cost")
+    parser.add_argument("--records", type=int, default=1000, help="Log calls per timed run")
+    parser.add_argument("--sink-latency-ms", type=float, default=0.05, help="Latency of each sink write")
+    args = parser.parse_args()
+
+    results = run(args.records, args.sink_latency_ms)
+    print_report(
+        f"Logging, {args.records:,} records per run, {args.sink_latency_ms} ms per sink write",
+        results, unit="rec"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
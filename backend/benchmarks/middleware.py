@@ -0,0 +1,174 @@
+"""
+Middleware Overhead Benchmark
+
+Per-request cost of the request ID / security headers layer, calling the
+ASGI stack directly (no HTTP client or server in the measurement) around a
+trivial endpoint:
+
+- bare: the endpoint alone
+- legacy: the former RequestIDMiddleware + SecurityHeadersMiddleware pair
+  (BaseHTTPMiddleware, reproduced here for comparison)
+- fused: RequestContextMiddleware
+
+Each stack serves a small JSON response and a 100-chunk streaming response
+(where BaseHTTPMiddleware re-streams every chunk through a memory channel).
+
+Usage (from backend/):
+    python -m benchmarks.middleware
+    python -m benchmarks.middleware --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import uuid
+from typing import Callable, Dict, List
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.logging import clear_request_context, set_request_context
+from app.middleware.request_context import RequestContextMiddleware
+from benchmarks.harness import StageResult, measure, print_report
+
+STREAM_CHUNKS = 100
+
+
+# ============================================================================
+# Stacks
+# ============================================================================
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """RequestIDMiddleware as it was before the fused middleware"""
+
+    async def dispatch(self, request, call_next):
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        set_request_context(request_id=request_id)
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        clear_request_context()
+        return response
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """SecurityHeadersMiddleware as it was (plus the then-pending CSP/HSTS)"""
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+
+async def endpoint(scope: Scope, receive: Receive, send: Send) -> None:
+    """JSON on /json, a chunked stream on /stream"""
+    if scope["path"] == "/stream":
+        async def chunks():
+            for _ in range(STREAM_CHUNKS):
+                yield b"x" * 64
+
+        response = StreamingResponse(chunks(), media_type="text/plain")
+    else:
+        response = JSONResponse({"status": "ok"})
+    await response(scope, receive, send)
+
+
+STACKS: Dict[str, Callable[[], ASGIApp]] = {
+    "bare": lambda: endpoint,
+    "legacy": lambda: LegacySecurityHeadersMiddleware(LegacyRequestIDMiddleware(endpoint)),
+    "fused": lambda: RequestContextMiddleware(endpoint),
+}
+
+
+# ============================================================================
+# Driver
+# ============================================================================
+
+def _scope(path: str) -> Scope:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def serve(app: ASGIApp, path: str, requests: int) -> None:
+    """Serve `requests` sequential requests, checking each completes"""
+    disconnect = asyncio.Event()  # Never set: the client stays connected
+
+    for _ in range(requests):
+        done = False
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                await disconnect.wait()
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal done
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                done = True
+
+        await app(_scope(path), receive, send)
+        assert done
+
+
+def run(requests: int) -> List[StageResult]:
+    """Measure every stack on both paths"""
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for path in ("/json", "/stream"):
+            for name, build in STACKS.items():
+                app = build()
+                results.append(measure(
+                    f"{name} {path}", requests,
+                    lambda app=app, path=path: loop.run_until_complete(serve(app, path, requests)),
+                    min_runs=5, max_runs=50,
+                ))
+    finally:
+        loop.close()
+    return results
+
+
+def main() -> int:
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Request ID / security headers middleware overhead")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per timed run")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    results = run(args.requests)
+    print_report(f"Middleware, {args.requests:,} sequential requests per run", results, unit="req")
+
+    print(f"\n{'stack':<20}{'us/request':>12}{'overhead us':>13}")
+    bare = {r.stage.split()[1]: r for r in results if r.stage.startswith("bare")}
+    for r in results:
+        per_request = r.p50_ms * 1000 / r.size
+        overhead = per_request - bare[r.stage.split()[1]].p50_ms * 1000 / r.size
+        print(f"{r.stage:<20}{per_request:>12.1f}{overhead:>13.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
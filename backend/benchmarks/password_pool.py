@@ -0,0 +1,104 @@
+"""
+Password Pool Benchmark
+
+Measures login password verifications per second through the bcrypt
+process pool at each worker count, next to inline verification (one
+verify at a time on the calling thread, as the login handler did before).
+
+Logins/sec/core should stay roughly flat as workers are added up to the
+core count; past it throughput stops growing.
+
+Usage (from backend/):
+    python -m benchmarks.password_pool
+    python -m benchmarks.password_pool --workers 1 2 4 8 --logins 200
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from passlib.hash import bcrypt
+
+from app.core import password_pool
+from app.core.config import settings
+from app.core.security import verify_password
+from benchmarks.harness import percentile
+
+PASSWORD = "demo123"
+
+
+def run_inline(password_hash: str, logins: int) -> float:
+    """Verifications per second on the calling thread"""
+    started = time.perf_counter()
+    for _ in range(logins):
+        verify_password(PASSWORD, password_hash)
+    return logins / (time.perf_counter() - started)
+
+
+def run_pool(password_hash: str, logins: int, workers: int) -> Tuple[float, List[float]]:
+    """
+    Verifications per second through the pool with `workers` processes
+
+    Returns:
+        (logins per second, per-login latency samples in ms)
+    """
+    settings.PASSWORD_POOL_WORKERS = workers
+    password_pool.shutdown_password_pool()
+    password_pool.start_password_pool()
+
+    def login() -> float:
+        t0 = time.perf_counter()
+        assert password_pool.verify_password_pooled(PASSWORD, password_hash)
+        return (time.perf_counter() - t0) * 1000
+
+    # Enough callers to keep every worker busy without being shed
+    callers = min(workers + settings.PASSWORD_POOL_QUEUE_SIZE, workers * 4)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        latencies = list(executor.map(lambda _: login(), range(logins)))
+    elapsed = time.perf_counter() - started
+
+    password_pool.shutdown_password_pool()
+    return logins / elapsed, latencies
+
+
+def main() -> int:
+    """Run the benchmark"""
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="bcrypt pool logins/sec/core")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, max(cores // 2, 1), cores}),
+                        help="Worker counts to measure")
+    parser.add_argument("--logins", type=int, default=64, help="Verifications per worker count")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost of the hash")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    settings.PASSWORD_POOL_ENABLED = True
+    settings.PASSWORD_POOL_MAX_WAIT_SECONDS = 600
+
+    password_hash = bcrypt.using(rounds=args.rounds).hash(PASSWORD)
+
+    print(f"\nbcrypt verification (cost {args.rounds}, {cores} cores)")
+    print(f"{'mode':<14}{'workers':>8}{'logins/s':>11}{'per core':>11}{'p50 ms':>10}{'p99 ms':>10}")
+
+    inline = run_inline(password_hash, max(args.logins // 4, 4))
+    print(f"{'inline':<14}{'-':>8}{inline:>11.1f}{inline:>11.1f}{1000 / inline:>10.1f}{'':>10}")
+
+    for workers in args.workers:
+        rate, latencies = run_pool(password_hash, args.logins, workers)
+        per_core = rate / min(workers, cores)
+        print(
+            f"{'pool':<14}{workers:>8}{rate:>11.1f}{per_core:>11.1f}"
+            f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Rate Limiter Benchmark
+
+Drives the limiter with hits on many distinct keys (a login storm or a
+credential-stuffing run with random user IDs) and reports, per backend:
+
+- hits per second and per-hit latency percentiles
+- stored keys and evictions (memory must stay bounded by max_keys)
+- traced memory per stored key (memory backend, measured in a separate run)
+
+Usage (from backend/):
+    python -m benchmarks.rate_limit
+    python -m benchmarks.rate_limit --keys 1000000 --max-keys 100000 --backends memory sqlite
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+from app.core.rate_limit import MemoryBackend, RateLimiter, SQLiteBackend
+from benchmarks.harness import percentile
+
+
+def memory_per_key(keys: int) -> float:
+    """Traced bytes per stored key in the memory backend"""
+    tracemalloc.start()
+    try:
+        limiter = RateLimiter(MemoryBackend(keys))
+        for n in range(keys):
+            limiter.window_hit(f"login-attempts:A{n:07d}", limit=5, window=900)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current / keys
+
+
+def run_backend(name: str, keys: int, max_keys: int) -> None:
+    """Hit `keys` distinct keys once each and print one report row"""
+    with tempfile.TemporaryDirectory() as tmp:
+        if name == "sqlite":
+            backend = SQLiteBackend(os.path.join(tmp, "ratelimit.db"), max_keys)
+        else:
+            backend = MemoryBackend(max_keys)
+        limiter = RateLimiter(backend)
+
+        samples: List[float] = []
+        started = time.perf_counter()
+        for n in range(keys):
+            t0 = time.perf_counter()
+            limiter.window_hit(f"login-attempts:A{n:07d}", limit=5, window=900)
+            # Sampled so timing overhead stays small
+            if n % 100 == 0:
+                samples.append((time.perf_counter() - t0) * 1_000_000)
+        elapsed = time.perf_counter() - started
+        stats = limiter.stats()
+
+    per_key = memory_per_key(min(keys, max_keys)) if name == "memory" else 0
+    print(
+        f"{name:<10}{keys:>11,}{keys / elapsed:>13,.0f}{percentile(samples, 50):>10.1f}"
+        f"{percentile(samples, 99):>10.1f}{stats['keys']:>11,}{stats['evictions']:>12,}"
+        f"{per_key:>12,.0f}"
+    )
+
+
+def main() -> int:
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Rate limiter throughput and memory")
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Distinct keys hit")
+    parser.add_argument("--max-keys", type=int, default=100_000, help="Backend key bound")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"], choices=["memory", "sqlite"])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"\nRate limiter, {args.keys:,} distinct keys, max {args.max_keys:,} kept")
+    print(f"{'backend':<10}{'hits':>11}{'hits/s':>13}{'p50 us':>10}{'p99 us':>10}"
+          f"{'keys':>11}{'evictions':>12}{'B/key':>12}")
+    for name in args.backends:
+        run_backend(name, args.keys, args.max_keys)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Token Refresh Benchmark
+
+Counts Firestore RPCs and measures latency per POST /api/auth/refresh,
+going through the app in-process against the fake Firestore client:
+
+- legacy: refresh token without an embedded user ID (token read, then user read)
+- batched: token and user in one batched read, access token only
+- rotation: batched read plus one commit saving the new token and revoking the old
+
+Usage (from backend/):
+    python -m benchmarks.refresh
+    python -m benchmarks.refresh --refreshes 500 --firestore-latency-ms 8
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+
+from app.core.config import settings
+from app.core.security import generate_refresh_token, get_refresh_token_expiration
+from app.db.firestore_client import save_refresh_token
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+from benchmarks.harness import percentile
+
+USER = {
+    "id": "A000001",
+    "nombre": "Asesor",
+    "rol": "asesor",
+    "ruta": "001",
+    "password_hash": "unused",
+    "activo": True,
+    "bloqueado": False,
+    "intentos_fallidos": 0,
+}
+
+
+async def run_mode(mode: str, refreshes: int, latency_ms: float) -> None:
+    """Run `refreshes` sequential refreshes and print one report row"""
+    from app.main import app
+
+    firestore = FakeFirestoreClient(latency_ms=latency_ms)
+    firestore.collection("users").document(USER["id"]).set(dict(USER))
+    settings.REFRESH_TOKEN_ROTATION = mode == "rotation"
+
+    with install_fakes(firestore):
+        token = generate_refresh_token(None if mode == "legacy" else USER["id"])
+        save_refresh_token(token, USER["id"], get_refresh_token_expiration())
+        firestore.reset_ops()
+
+        latencies: List[float] = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(refreshes):
+                started = time.perf_counter()
+                response = await client.post("/api/auth/refresh", json={"refreshToken": token})
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+                token = response.json().get("refreshToken") or token
+
+        ops = Counter({kind: count / refreshes for kind, count in firestore.ops.items()})
+
+    total = sum(ops.values())
+    detail = ", ".join(f"{kind} {count:g}" for kind, count in sorted(ops.items()))
+    print(f"{mode:<10}{total:>10.2f}{percentile(latencies, 50):>10.2f}{percentile(latencies, 99):>10.2f}   {detail}")
+
+
+def main() -> int:
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Firestore operations per token refresh")
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--firestore-latency-ms", type=float, default=5.0, help="Simulated RPC round trip")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    settings.API_RATE_LIMIT_ENABLED = False
+
+    print(f"\nToken refresh ({args.refreshes} refreshes, {args.firestore_latency_ms:g} ms per Firestore RPC)")
+    print(f"{'mode':<10}{'RPCs':>10}{'p50 ms':>10}{'p99 ms':>10}   per refresh")
+    for mode in ("legacy", "batched", "rotation"):
+        asyncio.run(run_mode(mode, args.refreshes, args.firestore_latency_ms))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
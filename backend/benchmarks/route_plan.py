@@ -0,0 +1,174 @@
+"""
+Route Plan Pipeline Benchmark
+
+Times each stage of get_route_plan separately on synthetic routes:
+
+- fetch: execute_query over a fake connection (pool checkout, breaker,
+  row-to-dict conversion), so SQL Server time is excluded
+- map: map_to_cliente for every row
+- recomendaciones: generate_recomendaciones for every client
+- plan: PlanDeRuta construction
+- validate: FastAPI response_model validation (serialize_response)
+- json: JSONResponse rendering
+- dump_json: PlanDeRuta.model_dump_json into a Response, which replaces
+  validate + json on /api/plan-de-ruta (the "serialize" span)
+
+Usage (from backend/):
+    python -m benchmarks.route_plan
+    python -m benchmarks.route_plan --sizes 50 500 --save-baseline
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import uuid
+from typing import Any, Dict, List, Tuple
+from unittest.mock import patch
+
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute, serialize_response
+
+from app.db import mssql_client
+from app.schemas.route import PlanDeRuta
+from app.services.route_service import ROUTE_PLAN_METRICS, generate_recomendaciones, map_to_cliente
+from benchmarks.fakes import FakeSQLConnection
+from benchmarks.harness import StageResult, add_baseline_args, check_baseline, measure, print_report
+
+DEFAULT_SIZES = (50, 500, 5000)
+
+COLUMNS = ("CLIENTE_ID", "NOMBRE_CLIENTE", "GECS", "RUTA", "VISITA") + ROUTE_PLAN_METRICS
+GECS = ("BRONCE", "PLATA", "ORO", "PLATINO", "TITANIO", None)
+
+
+# ============================================================================
+# Synthetic Data
+# ============================================================================
+
+def synthetic_rows(size: int, seed: int = 42) -> List[Tuple]:
+    """
+    Raw Hoja de Visita rows as the driver returns them (tuples, COLUMNS order)
+
+    Values are spread so every recommendation branch is exercised.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for n in range(size):
+        sant = rng.choice((None, 0, rng.randint(1, 60)))
+        rows.append((
+            f"{n:06d}",
+            f"Tienda {n}",
+            rng.choice(GECS),
+            "001",
+            "L",
+            rng.choice((0, 1)),                                   # CTECUMPLIDO
+            sant,                                                 # CERVEZA_SANT
+            rng.randint(0, 60) if sant else None,                 # CERVEZA_SACT
+            f"{n:06d}" if rng.random() < 0.05 else None,          # IDSHOP
+            rng.choice((None, None, 1, 2)),                       # ENFRIADORES
+            "PROMLONA" if rng.random() < 0.1 else None,           # DESCLP
+            rng.choice((None, rng.randint(1, 10))),               # MILLER
+            rng.choice((None, rng.randint(1, 10))),               # INDIO
+            rng.choice((None, rng.randint(1, 10))),               # TECATE
+            rng.choice((None, rng.randint(1, 10))),               # XX
+        ))
+    return rows
+
+
+# ============================================================================
+# Stages
+# ============================================================================
+
+def _response_field():
+    """The response_model field FastAPI validates /api/plan-de-ruta against"""
+    from app.main import app
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == "/api/plan-de-ruta":
+            return route.secure_cloned_response_field
+    raise RuntimeError("Route /api/plan-de-ruta not found")
+
+
+def run_size(size: int, min_seconds: float) -> List[StageResult]:
+    """Benchmark every stage for one route size"""
+    raw = synthetic_rows(size)
+    results: List[StageResult] = []
+
+    # Stage inputs are prepared once, outside the timed calls
+    with patch("app.db.mssql_client.get_connection", return_value=FakeSQLConnection(COLUMNS, raw)):
+        mssql_client.close_pool()
+        results.append(measure(
+            "fetch", size, lambda: mssql_client.execute_query("SELECT 1"), min_seconds=min_seconds
+        ))
+        rows: List[Dict[str, Any]] = mssql_client.execute_query("SELECT 1")
+        mssql_client.close_pool()
+
+    results.append(measure("map", size, lambda: [map_to_cliente(row) for row in rows], min_seconds=min_seconds))
+    clientes = [map_to_cliente(row) for row in rows]
+
+    def recomendaciones():
+        out = []
+        for cliente, row in zip(clientes, rows):
+            out.extend(generate_recomendaciones(cliente, row))
+        return out
+
+    results.append(measure("recomendaciones", size, recomendaciones, min_seconds=min_seconds))
+    recs = recomendaciones()
+
+    def build_plan():
+        return PlanDeRuta(
+            id=str(uuid.uuid4()),
+            fecha="2025-09-01",
+            asesorId="A012345",
+            clientes=clientes,
+            recomendaciones=recs,
+        )
+
+    results.append(measure("plan", size, build_plan, min_seconds=min_seconds))
+    plan = build_plan()
+
+    field = _response_field()
+    loop = asyncio.new_event_loop()
+    try:
+        def validate():
+            return loop.run_until_complete(serialize_response(field=field, response_content=plan))
+
+        results.append(measure("validate", size, validate, min_seconds=min_seconds))
+        content = validate()
+    finally:
+        loop.close()
+
+    results.append(measure("json", size, lambda: JSONResponse(content), min_seconds=min_seconds))
+    results.append(measure(
+        "dump_json", size,
+        lambda: Response(plan.model_dump_json(), media_type="application/json"),
+        min_seconds=min_seconds
+    ))
+
+    return results
+
+
+def main() -> int:
+    """Run the benchmark and compare with the baseline"""
+    parser = argparse.ArgumentParser(description="Route plan pipeline benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Clients per synthetic route")
+    parser.add_argument("--min-seconds", type=float, default=0.5,
+                        help="Minimum timed duration per stage")
+    add_baseline_args(parser, "route_plan.json")
+    args = parser.parse_args()
+
+    # Per-query INFO logs would dominate the fetch stage
+    logging.disable(logging.INFO)
+
+    results: List[StageResult] = []
+    for size in args.sizes:
+        results.extend(run_size(size, args.min_seconds))
+
+    print_report("Route plan pipeline", results, unit="clients")
+    return check_baseline(args, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
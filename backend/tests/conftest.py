@@ -199,14 +199,39 @@ def auth_headers(auth_token):
 @pytest.fixture(autouse=True)
 def clear_rate_limits():
     """Clear rate limiting state between tests"""
-    from app.services import auth_service
+    from app.core.rate_limit import get_rate_limiter
 
     # Clear before test
-    auth_service._login_attempts.clear()
-    auth_service._locked_accounts.clear()
+    get_rate_limiter().clear()
 
     yield
 
     # Clear after test
-    auth_service._login_attempts.clear()
-    auth_service._locked_accounts.clear()
+    get_rate_limiter().clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_route_plan_state():
+    """Clear last good route plans and the SQL Server breaker between tests"""
+    from app.services import route_service
+    from app.db.mssql_client import mssql_breaker
+
+    route_service.clear_route_plan_cache()
+    mssql_breaker.reset()
+
+    yield
+
+    route_service.clear_route_plan_cache()
+    mssql_breaker.reset()
+
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    """Clear cached authenticated users between tests"""
+    from app.core import principal_cache
+
+    principal_cache.clear_principal_cache()
+
+    yield
+
+    principal_cache.clear_principal_cache()
@@ -0,0 +1,102 @@
+"""
+Benchmark Harness Tests
+
+Tests for benchmark statistics and baseline regression checks.
+"""
+
+from benchmarks.harness import StageResult, compare_to_baseline, measure, percentile
+
+
+def _result(stage, p50):
+    return StageResult(stage=stage, size=10, runs=5, p50_ms=p50, p99_ms=p50, throughput=0, peak_kib=0)
+
+
+class TestHarness:
+    """Test timing statistics and baseline comparison"""
+
+    def test_percentile_nearest_rank(self):
+        """Test percentiles pick the nearest-rank sample"""
+        samples = list(range(1, 101))
+
+        assert percentile(samples, 50) == 50
+        assert percentile(samples, 99) == 99
+        assert percentile([], 50) == 0.0
+
+    def test_measure_reports_throughput(self):
+        """Test a stage is timed at least min_runs times"""
+        result = measure("noop", 100, lambda: sum(range(100)), min_runs=3, min_seconds=0)
+
+        assert result.runs >= 3
+        assert result.throughput > 0
+
+    def test_regression_detected(self):
+        """Test stages slower than baseline + tolerance are reported"""
+        baseline = {"map[10]": {"p50_ms": 1.0}, "json[10]": {"p50_ms": 1.0}}
+
+        regressions = compare_to_baseline([_result("map", 1.2), _result("json", 2.0)], baseline, 0.5)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith("json[10]")
+
+
+class TestRoutePlanBenchmark:
+    """Smoke test for the route plan benchmark"""
+
+    def test_all_stages_run(self):
+        """Test every pipeline stage is measured"""
+        from benchmarks.route_plan import run_size
+
+        results = run_size(5, min_seconds=0)
+
+        assert [r.stage for r in results] == ["fetch", "map", "recomendaciones", "plan", "validate", "json", "dump_json"]
+
+
+class TestLoadTest:
+    """Smoke test for the in-process load test"""
+
+    def test_shift_start_completes(self, monkeypatch):
+        """Test every endpoint is exercised without errors against the fakes"""
+        import argparse
+        import asyncio
+
+        from app.core.config import settings
+        from benchmarks.load_test import run_load
+
+        monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+        monkeypatch.setattr(settings, "API_RATE_LIMIT_ENABLED", False)
+        args = argparse.Namespace(
+            users=6, routes=2, clients_per_route=5, concurrency=3, ramp_seconds=0,
+            refresh_ratio=1.0, firestore_latency_ms=0, sql_latency_ms=0, bcrypt_rounds=4, seed=1
+        )
+
+        recorder = asyncio.run(run_load(args))
+
+        assert set(recorder.endpoints) == {"login", "plan-de-ruta", "refresh"}
+        assert len(recorder.endpoints["plan-de-ruta"].latencies_ms) == 12
+        assert all(stats.errors == 0 for stats in recorder.endpoints.values())
+
+
+class TestMiddlewareBenchmark:
+    """Smoke test for the middleware overhead benchmark"""
+
+    def test_all_stacks_run(self):
+        """Test every stack serves both response kinds"""
+        from benchmarks.middleware import run
+
+        results = run(requests=5)
+
+        assert [r.stage for r in results] == [
+            "bare /json", "legacy /json", "fused /json", "bare /stream", "legacy /stream", "fused /stream"
+        ]
+
+
+class TestLogPipelineBenchmark:
+    """Smoke test for the logging pipeline benchmark"""
+
+    def test_all_pipelines_run(self):
+        """Test every pipeline logs the burst"""
+        from benchmarks.log_pipeline import run
+
+        results = run(records=20, sink_latency_ms=0)
+
+        assert [r.stage for r in results] == ["legacy", "sync", "async"]
@@ -0,0 +1,147 @@
+"""
+Circuit Breaker Tests
+
+Tests for the SQL Server circuit breaker and stale route plan fallback.
+"""
+
+import pytest
+from unittest.mock import patch
+from datetime import date
+
+from app.core import circuit_breaker
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from app.db.mssql_client import mssql_breaker
+from app.services import route_service
+from app.services.route_service import get_route_plan
+
+
+ROWS = [{"CLIENTE_ID": "C001", "NOMBRE_CLIENTE": "Tienda", "GECS": "ORO", "CTECUMPLIDO": 1}]
+FECHA = date(2025, 9, 1)
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    """Start every test with a closed breaker and no last good plans"""
+    route_service.clear_route_plan_cache()
+    mssql_breaker.reset()
+    yield
+    route_service.clear_route_plan_cache()
+    mssql_breaker.reset()
+
+
+def fail():
+    raise RuntimeError("down")
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions"""
+
+    def test_opens_on_failure_rate(self):
+        """Test the breaker opens once the failure rate crosses the threshold"""
+        breaker = CircuitBreaker("test", failure_rate_threshold=0.5, minimum_calls=4, open_seconds=60)
+
+        breaker.call(lambda: 1)
+        breaker.call(lambda: 1)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                breaker.call(fail)
+
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 1)
+
+    def test_opens_on_slow_calls(self):
+        """Test slow successful calls also open the breaker"""
+        breaker = CircuitBreaker("test", slow_call_seconds=0.0, minimum_calls=2)
+
+        breaker.call(lambda: 1)
+        breaker.call(lambda: 1)
+
+        assert breaker.state == OPEN
+
+    def test_half_open_probe_closes_on_success(self, monkeypatch):
+        """Test a successful probe after the cool-down closes the breaker"""
+        now = [1000.0]
+        monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+        breaker = CircuitBreaker("test", minimum_calls=1, open_seconds=30)
+
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+        assert breaker.state == OPEN
+
+        now[0] += 31
+        assert breaker.state == HALF_OPEN
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_reopens_on_failure(self, monkeypatch):
+        """Test a failed probe opens the breaker again"""
+        now = [1000.0]
+        monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+        breaker = CircuitBreaker("test", minimum_calls=1, open_seconds=30)
+
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+        now[0] += 31
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+
+        assert breaker.state == OPEN
+
+
+class TestStaleRoutePlan:
+    """Test route plans are served stale while SQL Server is unavailable"""
+
+    def test_fresh_plan_is_not_stale(self):
+        """Test a plan built from SQL Server carries its generation time"""
+        with patch("app.services.route_service.execute_hoja_visita_query", return_value=ROWS):
+            plan = get_route_plan("TEST001", "001", FECHA)
+
+        assert plan.stale is False
+        assert plan.generadoEn is not None
+
+    def test_failure_serves_last_good_plan(self):
+        """Test a failing query falls back to the last good plan and schedules a refresh"""
+        with patch("app.services.route_service.execute_hoja_visita_query", return_value=ROWS):
+            good = get_route_plan("TEST001", "001", FECHA)
+
+        with patch("app.services.route_service.execute_hoja_visita_query", side_effect=RuntimeError("down")), \
+             patch("app.services.route_service._schedule_refresh") as schedule:
+            plan = get_route_plan("TEST002", "001", FECHA)
+
+        schedule.assert_called_once_with(("001", FECHA), "TEST002")
+        assert plan.stale is True
+        assert plan.asesorId == "TEST002"
+        assert plan.clientes == good.clientes
+        assert plan.generadoEn == good.generadoEn
+
+    def test_open_breaker_skips_sql(self):
+        """Test an open breaker serves the stale plan without querying"""
+        with patch("app.services.route_service.execute_hoja_visita_query", return_value=ROWS):
+            get_route_plan("TEST001", "001", FECHA)
+
+        with patch.object(mssql_breaker, "_state", OPEN), \
+             patch.object(mssql_breaker, "_opened_at", float("inf")), \
+             patch("app.services.route_service.execute_hoja_visita_query") as query, \
+             patch("app.services.route_service._schedule_refresh"):
+            plan = get_route_plan("TEST001", "001", FECHA)
+
+        query.assert_not_called()
+        assert plan.stale is True
+
+    def test_failure_without_previous_plan_raises(self):
+        """Test errors still propagate when there is nothing to fall back to"""
+        with patch("app.services.route_service.execute_hoja_visita_query", side_effect=RuntimeError("down")):
+            with pytest.raises(RuntimeError):
+                get_route_plan("TEST001", "001", FECHA)
+
+    def test_background_refresh_replaces_plan(self):
+        """Test the background refresh stores a new last good plan"""
+        with patch("app.services.route_service.execute_hoja_visita_query", return_value=ROWS):
+            first = get_route_plan("TEST001", "001", FECHA)
+            route_service._claim(("001", FECHA))
+            route_service._background_refresh(("001", FECHA), "TEST001")
+
+        refreshed = route_service._last_good_plans[("001", FECHA)]
+        assert refreshed.id != first.id
+        assert ("001", FECHA) not in route_service._in_flight
@@ -0,0 +1,118 @@
+"""
+Client Index Tests
+
+Tests for the in-memory client master and weekday visit calendar.
+"""
+
+import pytest
+from unittest.mock import patch
+from datetime import date
+
+from app.core.config import settings
+from app.db import client_index, reference_cache
+from app.db.client_index import build_client_index, join_client_rows
+
+
+MASTER_ROWS = [
+    {"CLIENTE_ID": "C001", "NOMBRE_CLIENTE": "Tienda Lunes", "RUTA": "001", "GECS": "ORO",
+     "LUNES": 1, "MARTES": 0, "MIERCOLES": 0, "JUEVES": 1, "VIERNES": 0, "SABADO": 0},
+    {"CLIENTE_ID": "C002", "NOMBRE_CLIENTE": "Tienda Martes", "RUTA": "001", "GECS": None,
+     "LUNES": 0, "MARTES": 1, "MIERCOLES": 0, "JUEVES": 0, "VIERNES": 0, "SABADO": 0},
+    # Second R_VISITAS row for the same client adds Saturday
+    {"CLIENTE_ID": "C002", "NOMBRE_CLIENTE": "Tienda Martes", "RUTA": "001", "GECS": None,
+     "LUNES": 0, "MARTES": 0, "MIERCOLES": 0, "JUEVES": 0, "VIERNES": 0, "SABADO": 1},
+    {"CLIENTE_ID": "C003", "NOMBRE_CLIENTE": "Otra Ruta", "RUTA": "002", "GECS": "PLATA",
+     "LUNES": 1, "MARTES": 0, "MIERCOLES": 0, "JUEVES": 0, "VIERNES": 0, "SABADO": 0},
+    # Client without calendar (LEFT JOIN miss)
+    {"CLIENTE_ID": "C004", "NOMBRE_CLIENTE": "Sin Visita", "RUTA": "001", "GECS": "BRONCE",
+     "LUNES": None, "MARTES": None, "MIERCOLES": None, "JUEVES": None, "VIERNES": None, "SABADO": None},
+]
+
+MONDAY = date(2025, 9, 1)
+TUESDAY = date(2025, 9, 2)
+SATURDAY = date(2025, 9, 6)
+SUNDAY = date(2025, 9, 7)
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test without loaded caches"""
+    client_index.clear_client_index()
+    reference_cache.clear_reference_snapshot()
+    yield
+    client_index.clear_client_index()
+    reference_cache.clear_reference_snapshot()
+
+
+class TestClientIndex:
+    """Test (ruta, weekday) resolution"""
+
+    def test_clients_for_day(self):
+        """Test clients are resolved by route and weekday"""
+        index = build_client_index(MASTER_ROWS, version=1)
+
+        assert [c.cliente_id for c in index.clients_for_day("001", MONDAY)] == ["C001"]
+        assert [c.cliente_id for c in index.clients_for_day("001", TUESDAY)] == ["C002"]
+        assert [c.cliente_id for c in index.clients_for_day("002", MONDAY)] == ["C003"]
+
+    def test_multiple_visit_rows_are_merged(self):
+        """Test a client with several calendar rows gets all their days"""
+        index = build_client_index(MASTER_ROWS, version=1)
+
+        assert [c.cliente_id for c in index.clients_for_day("001", SATURDAY)] == ["C002"]
+        assert index.clients["C002"].visita == "MS"
+        assert index.clients["C001"].visita == "LJ"
+
+    def test_sunday_and_unknown_route_are_empty(self):
+        """Test days without visits resolve to no clients"""
+        index = build_client_index(MASTER_ROWS, version=1)
+
+        assert index.clients_for_day("001", SUNDAY) == []
+        assert index.clients_for_day("999", MONDAY) == []
+
+    def test_join_client_rows_keeps_clients_without_sales(self):
+        """Test the Python join behaves like the SQL LEFT JOINs"""
+        index = build_client_index(MASTER_ROWS, version=1)
+        clients = index.clients_for_day("001", MONDAY) + [index.clients["C004"]]
+
+        rows = join_client_rows(clients, [{"CLIENTE_ID": "C001", "CERVEZA_SACT": 12}])
+
+        assert rows[0]["CERVEZA_SACT"] == 12
+        assert rows[0]["NOMBRE_CLIENTE"] == "Tienda Lunes"
+        assert rows[0]["GECS"] == "ORO"
+        assert rows[1] == {
+            "CLIENTE_ID": "C004",
+            "NOMBRE_CLIENTE": "Sin Visita",
+            "GECS": "BRONCE",
+            "RUTA": "001",
+            "VISITA": "",
+        }
+
+
+class TestRouteServiceWithIndex:
+    """Test plan generation with the client index enabled"""
+
+    def test_only_day_clients_are_sent_to_sql(self, monkeypatch):
+        """Test the sales query receives the day's client ids"""
+        from app.services.route_service import fetch_route_rows
+
+        monkeypatch.setattr(settings, "REFERENCE_CACHE_ENABLED", True)
+        monkeypatch.setattr(settings, "CLIENT_INDEX_ENABLED", True)
+
+        def fake_execute_query(query, params=None, name=None):
+            if query == client_index.CLIENT_MASTER_QUERY:
+                return MASTER_ROWS
+            return []
+
+        with patch("app.db.client_index.execute_query", side_effect=fake_execute_query), \
+             patch("app.db.reference_cache.execute_query", return_value=[]), \
+             patch(
+                 "app.services.route_service.execute_hoja_visita_ventas_query",
+                 return_value=[{"CLIENTE_ID": "C002", "CERVEZA_SACT": 3}]
+             ) as ventas_query:
+            rows = fetch_route_rows("001", TUESDAY)
+
+        ventas_query.assert_called_once_with("001", TUESDAY, ["C002"])
+        assert rows[0]["CLIENTE_ID"] == "C002"
+        assert rows[0]["CERVEZA_SACT"] == 3
+        assert rows[0]["IDSHOP"] is None
@@ -0,0 +1,137 @@
+"""
+Configuration Cache Tests
+
+Tests for the versioned feature flag snapshot, listener pushes and the
+polling fallback, against the in-memory Firestore fake.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db import config_cache
+from app.db.firestore_client import delete_config, set_config
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def firestore():
+    """Fake Firestore with two feature flags"""
+    fake = FakeFirestoreClient()
+    with install_fakes(fake):
+        set_config("ff_background_sync", True)
+        set_config("ff_geo_validacion_precision_minima", 100)
+        fake.reset_ops()
+        yield fake
+
+
+class TestConfigCache:
+    """Test flag reads and versioning"""
+
+    def test_reads_are_dict_lookups(self, firestore):
+        """Test one query loads the snapshot and later reads hit memory"""
+        assert config_cache.get_flag("ff_background_sync") is True
+        assert config_cache.get_flag("ff_geo_validacion_precision_minima") == 100
+        assert config_cache.get_flag("ff_missing", False) is False
+
+        for _ in range(100):
+            config_cache.get_flag("ff_background_sync")
+
+        assert dict(firestore.ops) == {"query": 1}
+
+    def test_poll_bumps_version_only_on_change(self, firestore):
+        """Test an unchanged poll keeps the version and a change raises it"""
+        version = config_cache.get_config_snapshot().version
+        assert version > 0
+
+        assert config_cache.refresh_config_snapshot().version == version
+
+        set_config("ff_background_sync", False)
+        snapshot = config_cache.refresh_config_snapshot()
+
+        assert snapshot.version > version
+        assert snapshot.values["ff_background_sync"] is False
+        assert config_cache.config_cache_stats()["changes"] == 2
+
+    def test_set_config_published_at_once(self, firestore):
+        """Test a write is visible in the writing process without a read"""
+        config_cache.get_config_snapshot()
+        firestore.reset_ops()
+
+        set_config("ff_inteligencia_competencia", True)
+
+        assert config_cache.get_flag("ff_inteligencia_competencia") is True
+        assert firestore.ops["query"] == 0
+        assert config_cache.config_cache_stats()["writes"] == 1
+
+        # Another process loading the same documents gets the same version
+        version = config_cache.config_version()
+        config_cache.clear_config_snapshot()
+        assert config_cache.get_config_snapshot().version == version
+
+    def test_delete_config_versioned_by_tombstone(self, firestore):
+        """Test a deletion is versioned by its tombstone's update time"""
+        version = config_cache.get_config_snapshot().version
+
+        delete_config("ff_background_sync")
+        tombstone = firestore.collection("configuracion").document("ff_background_sync").get()
+
+        assert config_cache.get_flag("ff_background_sync") is None
+        assert config_cache.config_version() == config_cache._micros(tombstone.update_time) > version
+
+        config_cache.clear_config_snapshot()
+        snapshot = config_cache.get_config_snapshot()
+        assert snapshot.version == config_cache._micros(tombstone.update_time)
+        assert "ff_background_sync" not in snapshot.values
+
+        set_config("ff_background_sync", True)
+        assert config_cache.get_flag("ff_background_sync") is True
+
+    def test_raw_deletion_uses_read_time(self, firestore):
+        """Test a document removed outright is versioned by the read time"""
+        version = config_cache.get_config_snapshot().version
+        firestore.collection("configuracion").document("ff_background_sync").delete()
+        read_time = datetime.now(timezone.utc) + timedelta(seconds=1)
+
+        config_cache._on_config_snapshot(firestore.collection("configuracion").get(), [], read_time)
+
+        assert config_cache.config_version() == config_cache._micros(read_time) > version
+        assert config_cache.get_flag("ff_background_sync") is None
+
+    def test_listener_pushes_changes(self, firestore):
+        """Test a write reaches readers through the listener, without polling"""
+        watch = config_cache.start_config_listener()
+        try:
+            version = config_cache.config_version()
+            firestore.reset_ops()
+
+            set_config("ff_inteligencia_competencia", True)
+
+            assert config_cache.get_flag("ff_inteligencia_competencia") is True
+            assert config_cache.config_version() > version
+            assert firestore.ops["query"] == 0
+            assert config_cache.config_cache_stats()["pushes"] == 2
+        finally:
+            watch.unsubscribe()
+
+    def test_version_same_across_processes(self, firestore):
+        """Test the version depends only on the documents"""
+        version = config_cache.get_config_snapshot().version
+
+        config_cache.clear_config_snapshot()
+
+        assert config_cache.get_config_snapshot().version == version
+
+    def test_stale_read_dropped(self, firestore):
+        """Test a poll that started before a published push is not applied"""
+        config_cache.get_config_snapshot()
+        documents = firestore.collection("configuracion").get()
+
+        config_cache._on_config_snapshot(documents, [], None)
+        set_config("ff_background_sync", False)
+        config_cache._on_config_snapshot(firestore.collection("configuracion").get(), [], None)
+
+        with config_cache._refresh_lock:
+            config_cache._publish(documents, "polls", read_at=0.0)
+
+        assert config_cache.get_flag("ff_background_sync") is False
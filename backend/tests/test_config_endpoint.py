@@ -0,0 +1,225 @@
+"""
+Configuration Endpoint Tests
+
+Tests for GET /api/config (304, long-poll) and the /api/config/stream
+event stream, against the in-memory Firestore fake.
+"""
+
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.deadline import remaining
+from app.core.security import create_access_token
+from app.db import config_cache
+from app.db.firestore_client import set_config
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+HEADERS = {"Authorization": f"Bearer {create_access_token({'sub': 'A000001', 'rol': 'asesor', 'ruta': '001'})}"}
+
+
+@pytest.fixture
+def firestore(monkeypatch):
+    """Fake Firestore with one asesor and one feature flag"""
+    monkeypatch.setattr(settings, "API_RATE_LIMIT_ENABLED", False)
+    fake = FakeFirestoreClient()
+    fake.collection("users").document("A000001").set({
+        "id": "A000001",
+        "nombre": "Asesor 1",
+        "rol": "asesor",
+        "ruta": "001",
+        "password_hash": "x",
+    })
+    with install_fakes(fake):
+        set_config("ff_background_sync", True)
+        yield fake
+
+
+@pytest.fixture
+async def client(firestore):
+    """HTTP client bound to the app"""
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def _publish_change(key, value):
+    """Write a flag and refresh the snapshot from a worker thread (as the listener would)"""
+    await asyncio.to_thread(set_config, key, value)
+    await asyncio.to_thread(config_cache.refresh_config_snapshot)
+
+
+class TestGetConfig:
+    """Test versioned reads and 304"""
+
+    async def test_not_modified(self, client):
+        """Test the version round-trips as since= and If-None-Match"""
+        response = await client.get("/api/config", headers=HEADERS)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["values"] == {"ff_background_sync": True}
+        assert response.headers["etag"] == f'"{body["version"]}"'
+
+        response = await client.get(f"/api/config?since={body['version']}", headers=HEADERS)
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = await client.get("/api/config", headers={**HEADERS, "If-None-Match": f'"{body["version"]}"'})
+        assert response.status_code == 304
+
+        response = await client.get(f"/api/config?since={body['version'] - 1}", headers=HEADERS)
+        assert response.status_code == 200
+
+    async def test_requires_auth(self, client):
+        """Test anonymous requests are rejected"""
+        assert (await client.get("/api/config")).status_code in (401, 403)
+
+
+class TestLongPoll:
+    """Test ?wait= holds the request until a change"""
+
+    async def test_wakes_on_change(self, client):
+        """Test a waiting request returns as soon as a new version is published"""
+        version = config_cache.get_config_snapshot().version
+
+        request = asyncio.create_task(client.get(f"/api/config?since={version}&wait=5", headers=HEADERS))
+        await asyncio.sleep(0.05)
+        assert not request.done()
+
+        await _publish_change("ff_background_sync", False)
+        response = await asyncio.wait_for(request, 1)
+
+        assert response.status_code == 200
+        assert response.json()["version"] > version
+        assert response.json()["values"]["ff_background_sync"] is False
+
+    async def test_timeout_is_not_modified(self, client, monkeypatch):
+        """Test the wait is capped and ends in 304 without a change"""
+        monkeypatch.setattr(settings, "CONFIG_LONG_POLL_MAX_SECONDS", 0.05)
+        version = config_cache.get_config_snapshot().version
+
+        response = await asyncio.wait_for(
+            client.get(f"/api/config?since={version}&wait=60", headers=HEADERS), 1
+        )
+
+        assert response.status_code == 304
+
+    async def test_wait_longer_than_request_timeout(self, client, monkeypatch):
+        """Test a long-poll outlives the default request timeout"""
+        monkeypatch.setattr(settings, "REQUEST_TIMEOUT_SECONDS", 0.05)
+        version = config_cache.get_config_snapshot().version
+
+        request = asyncio.create_task(client.get(f"/api/config?since={version}&wait=5", headers=HEADERS))
+        await asyncio.sleep(0.2)
+        assert not request.done()
+
+        await _publish_change("ff_background_sync", False)
+        response = await asyncio.wait_for(request, 1)
+
+        assert response.status_code == 200
+        assert response.json()["values"]["ff_background_sync"] is False
+
+    async def test_waiters_share_one_event(self, client):
+        """Test many waiting requests need no thread each"""
+        version = config_cache.get_config_snapshot().version
+        threads = threading.active_count()
+
+        requests = [
+            asyncio.create_task(client.get(f"/api/config?since={version}&wait=5", headers=HEADERS))
+            for _ in range(50)
+        ]
+        await asyncio.sleep(0.1)
+        assert not any(request.done() for request in requests)
+        assert threading.active_count() == threads
+
+        await _publish_change("ff_background_sync", False)
+        responses = await asyncio.wait_for(asyncio.gather(*requests), 2)
+
+        assert {response.status_code for response in responses} == {200}
+
+
+class TestStream:
+    """Test the Server-Sent Events stream"""
+
+    async def _events(self, firestore, query, count, during=None):
+        """Call the app directly and collect `count` event-stream chunks, then disconnect"""
+        from app.main import app
+
+        chunks = []
+        done = asyncio.Event()
+
+        async def receive():
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                chunks.append(dict(message["headers"]))
+            elif message.get("body"):
+                chunks.append(message["body"].decode())
+                if len(chunks) > count:
+                    done.set()
+                elif during is not None:
+                    await during()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/api/config/stream",
+            "raw_path": b"/api/config/stream",
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in HEADERS.items()],
+            "client": ("127.0.0.1", 1234),
+            "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), 2)
+        return chunks[0], chunks[1:]
+
+    async def test_initial_event_and_change(self, firestore):
+        """Test a current snapshot is sent first and each change follows"""
+        async def change():
+            await _publish_change("ff_background_sync", False)
+
+        headers, events = await self._events(firestore, "", 2, during=change)
+
+        assert headers[b"content-type"].startswith(b"text/event-stream")
+        first, second = events
+        assert first.startswith("id: ") and "event: config" in first
+        data = json.loads(second.split("data: ", 1)[1])
+        assert data["values"] == {"ff_background_sync": False}
+        assert int(second.split("\n")[0].removeprefix("id: ")) == data["version"]
+
+    async def test_heartbeat_when_current(self, firestore, monkeypatch):
+        """Test a client that is current only receives keep-alive comments"""
+        monkeypatch.setattr(settings, "CONFIG_SSE_HEARTBEAT_SECONDS", 0.02)
+        version = config_cache.get_config_snapshot().version
+
+        _, events = await self._events(firestore, f"since={version}", 1)
+
+        assert events == [": keep-alive\n\n"]
+
+    async def test_stream_has_no_deadline(self, firestore, monkeypatch):
+        """Test the stream stays open past the default request timeout"""
+        monkeypatch.setattr(settings, "REQUEST_TIMEOUT_SECONDS", 0.05)
+        monkeypatch.setattr(settings, "CONFIG_SSE_HEARTBEAT_SECONDS", 0.02)
+        version = config_cache.get_config_snapshot().version
+        budgets = []
+
+        async def record():
+            budgets.append(remaining())
+
+        _, events = await self._events(firestore, f"since={version}", 6, during=record)
+
+        assert len(events) == 6
+        assert budgets[-1] == float("inf")
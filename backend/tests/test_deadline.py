@@ -0,0 +1,163 @@
+"""
+Request Deadline Tests
+
+Tests for deadline propagation and client disconnect cancellation.
+"""
+
+import asyncio
+import math
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.core.deadline import (
+    DeadlineExceeded,
+    check_deadline,
+    get_deadline,
+    remaining,
+    reset_deadline,
+    set_deadline,
+    time_budget,
+)
+from app.db import mssql_client
+from app.middleware.deadline import DeadlineMiddleware, timeout_for_path
+
+
+@pytest.fixture
+def deadline():
+    """Run the test inside a 5 second request deadline"""
+    token = set_deadline(5)
+    yield get_deadline()
+    reset_deadline(token)
+
+
+class TestDeadline:
+    """Test the deadline context variable"""
+
+    def test_no_deadline_uses_cap(self):
+        """Test work outside a request keeps the configured timeout"""
+        assert remaining() is None
+        assert time_budget(30) == 30
+
+    def test_budget_capped_by_deadline(self, deadline):
+        """Test timeouts never exceed what is left of the request"""
+        assert time_budget(30) <= 5
+        assert time_budget(1) == 1
+
+    def test_cancelled_deadline_raises(self, deadline):
+        """Test abandoned requests fail at the next checkpoint"""
+        deadline.cancel()
+
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+        with pytest.raises(DeadlineExceeded):
+            time_budget(30)
+
+    def test_timeout_for_path_longest_prefix(self):
+        """Test per-route overrides pick the most specific prefix"""
+        overrides = {"/api": 10.0, "/api/plan-de-ruta": 60.0}
+
+        assert timeout_for_path("/api/plan-de-ruta", overrides, 30.0) == 60.0
+        assert timeout_for_path("/api/auth/login", overrides, 30.0) == 10.0
+        assert timeout_for_path("/api/stream", {"/api/stream": 0}, 30.0) == math.inf
+        assert timeout_for_path("/", overrides, 30.0) == 30.0
+
+
+class TestDatabaseTimeouts:
+    """Test database calls use the remaining budget"""
+
+    def test_pool_acquisition_uses_budget(self, deadline, monkeypatch):
+        """Test waiting for a pool slot is bounded by the request deadline"""
+        monkeypatch.setattr(mssql_client, "_pool_slots", MagicMock())
+        mssql_client._pool_slots.acquire.return_value = False
+
+        with pytest.raises(TimeoutError):
+            with mssql_client.pooled_connection():
+                pass
+
+        timeout = mssql_client._pool_slots.acquire.call_args.kwargs["timeout"]
+        assert timeout <= 5
+
+    def test_statement_timeout_uses_budget(self, deadline):
+        """Test pooled connections get the request's statement timeout"""
+        connection = MagicMock()
+        connection.cursor.return_value.description = [("X",)]
+        connection.cursor.return_value.fetchall.return_value = [(1,)]
+
+        with patch("app.db.mssql_client.get_connection", return_value=connection):
+            mssql_client.close_pool()
+            rows = mssql_client.execute_query("SELECT 1 AS X")
+            mssql_client.close_pool()
+
+        assert rows == [{"X": 1}]
+        assert 1 <= connection._conn.query_timeout <= 5
+
+    def test_abandoned_request_does_not_trip_breaker(self, deadline):
+        """Test cancelled work is not counted against SQL Server"""
+        mssql_client.mssql_breaker.reset()
+        deadline.cancel()
+
+        with pytest.raises(DeadlineExceeded):
+            mssql_client.execute_query("SELECT 1")
+
+        assert mssql_client.mssql_breaker.stats()["calls"] == 0
+
+
+class TestDeadlineMiddleware:
+    """Test the ASGI middleware"""
+
+    def test_deadline_visible_to_app(self, monkeypatch):
+        """Test the endpoint runs with the route's deadline"""
+        monkeypatch.setattr(settings, "REQUEST_TIMEOUT_OVERRIDES", {"/slow": 60.0})
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["remaining"] = remaining()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        async def receive():
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "GET", "path": "/slow"}
+        asyncio.run(DeadlineMiddleware(app)(scope, receive, send))
+
+        assert 30 < seen["remaining"] <= 60
+
+    def test_config_routes_outlive_default(self):
+        """Test the config long-poll and event stream get longer deadlines by default"""
+        def timeout(path):
+            return timeout_for_path(path, settings.REQUEST_TIMEOUT_OVERRIDES, settings.REQUEST_TIMEOUT_SECONDS)
+
+        assert timeout("/api/config") > settings.CONFIG_LONG_POLL_MAX_SECONDS
+        assert timeout("/api/config/stream") == math.inf
+
+    def test_disconnect_cancels_request(self):
+        """Test the app is cancelled and the deadline marked when the client leaves"""
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["deadline"] = get_deadline()
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                seen["cancelled"] = True
+                raise
+
+        messages = [{"type": "http.request", "body": b"", "more_body": False}, {"type": "http.disconnect"}]
+
+        async def receive():
+            await asyncio.sleep(0.01)
+            return messages.pop(0)
+
+        async def send(message):
+            raise AssertionError("No response expected")
+
+        scope = {"type": "http", "method": "GET", "path": "/api/plan-de-ruta"}
+        asyncio.run(asyncio.wait_for(DeadlineMiddleware(app)(scope, receive, send), timeout=5))
+
+        assert seen["cancelled"] is True
+        assert seen["deadline"].cancelled is True
@@ -0,0 +1,112 @@
+"""
+Failed Login Tests
+
+Tests for the failed-login counter: one conditional write per failure,
+checked against the committed count under concurrency.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from passlib.hash import bcrypt
+
+from app.core import principal_cache
+from app.core.config import settings
+from app.db.firestore_client import (
+    get_user_by_id,
+    get_user_with_update_time,
+    record_failed_login,
+    update_user,
+)
+from app.services import auth_service
+from app.services.auth_service import authenticate_user
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def firestore(monkeypatch):
+    """Fake Firestore with one asesor, password checked inline"""
+    monkeypatch.setattr(settings, "PASSWORD_POOL_ENABLED", False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    fake = FakeFirestoreClient()
+    fake.collection("users").document("A000001").set({
+        "id": "A000001",
+        "nombre": "Asesor",
+        "rol": "asesor",
+        "ruta": "001",
+        "password_hash": bcrypt.using(rounds=4).hash("testpass123"),
+        "activo": True,
+        "bloqueado": False,
+        "intentos_fallidos": 3,
+    })
+    with install_fakes(fake):
+        fake.reset_ops()
+        yield fake
+
+
+class TestFailedLogin:
+    """Test failed-login writes"""
+
+    def test_failure_costs_one_write(self, firestore):
+        """Test a wrong password that blocks the account is one round trip"""
+        update_user("A000001", {"intentos_fallidos": 4})
+        firestore.reset_ops()
+
+        assert authenticate_user("A000001", "wrongpass") is None
+
+        assert dict(firestore.ops) == {"read": 1, "write": 1}
+        user = get_user_by_id("A000001")
+        assert user["intentos_fallidos"] == 5
+        assert user["bloqueado"] is True
+
+    def test_threshold_checked_on_committed_count(self, firestore):
+        """Test two failures read at count 4 commit 5 then 6 (the stale one re-reads)"""
+        update_user("A000001", {"intentos_fallidos": 4})
+        user_data, update_time = get_user_with_update_time("A000001")
+
+        first = record_failed_login("A000001", 5, dict(user_data), update_time)
+        second = record_failed_login("A000001", 5, dict(user_data), update_time)
+
+        assert (first, second) == (5, 6)
+        user = get_user_by_id("A000001")
+        assert user["intentos_fallidos"] == 6
+        assert user["bloqueado"] is True
+
+    def test_concurrent_failures_from_four(self, firestore, monkeypatch):
+        """Test two concurrent wrong passwords that both read count 4 commit 6 and block"""
+        update_user("A000001", {"intentos_fallidos": 4})
+
+        both_read = threading.Barrier(2)
+
+        def read_then_wait(user_id):
+            result = get_user_with_update_time(user_id)
+            both_read.wait(timeout=5)
+            return result
+
+        monkeypatch.setattr(auth_service, "get_user_with_update_time", read_then_wait)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lambda _: authenticate_user("A000001", "wrongpass"), range(2)))
+
+        assert results == [None, None]
+        user = get_user_by_id("A000001")
+        assert user["intentos_fallidos"] == 6
+        assert user["bloqueado"] is True
+
+    def test_concurrent_failures_all_count(self, firestore):
+        """Test concurrent failures are all counted (conflicting writes retry)"""
+        # At most 7 conflicts each, within MAX_WRITE_CONFLICT_RETRIES
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            counts = list(executor.map(lambda _: record_failed_login("A000001", 5), range(8)))
+
+        assert sorted(counts) == list(range(4, 12))
+        assert get_user_by_id("A000001")["intentos_fallidos"] == 11
+
+    def test_failure_invalidates_principal(self, firestore):
+        """Test a recorded failure drops the cached principal"""
+        principal_cache.put_principal("A000001", "cached", principal_cache.current_generation("A000001"))
+
+        record_failed_login("A000001", 5)
+
+        assert principal_cache.get_principal("A000001") is None
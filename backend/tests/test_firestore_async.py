@@ -0,0 +1,245 @@
+"""
+Async Firestore Client Tests
+
+Tests for the async data layer against the in-memory Firestore fake:
+same results as the sync layer, concurrent fan-out and client reuse.
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+
+from app.core.security import generate_refresh_token, get_refresh_token_expiration
+from app.db import config_cache, firestore_async, firestore_client
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def firestore():
+    """Fake Firestore with three asesores"""
+    fake = FakeFirestoreClient()
+    for n in range(1, 4):
+        fake.collection("users").document(f"A00000{n}").set({
+            "id": f"A00000{n}",
+            "nombre": f"Asesor {n}",
+            "rol": "asesor",
+            "ruta": f"00{n}",
+            "password_hash": "x",
+        })
+    with install_fakes(fake):
+        config_cache.clear_config_snapshot()
+        firestore_async.reset_firestore_async_stats()
+        yield fake
+        config_cache.clear_config_snapshot()
+
+
+class TestAsyncDataLayer:
+    """Test the async functions mirror the sync ones"""
+
+    async def test_same_results_as_sync(self, firestore):
+        """Test reads and writes are visible across both layers"""
+        assert await firestore_async.get_user_by_id("A000001") == firestore_client.get_user_by_id("A000001")
+        assert await firestore_async.get_user_by_id("missing") is None
+        assert await firestore_async.get_users(["A000003", "missing"]) == firestore_client.get_users(["A000003", "missing"])
+
+        await firestore_async.update_user("A000002", {"intentos_fallidos": 1})
+        assert firestore_client.get_user_by_id("A000002")["intentos_fallidos"] == 1
+
+        await firestore_async.set_config("version", 3)
+        assert firestore_client.get_config("version") == 3
+        assert await firestore_async.get_config("version") == 3
+
+        await firestore_async.delete_config("version")
+        assert firestore_client.get_config("version") is None
+
+    async def test_config_reads_use_snapshot(self, firestore):
+        """Test get_config reads Firestore only to load the config snapshot"""
+        await firestore_async.set_config("ff_background_sync", True)
+        firestore.reset_ops()
+
+        assert firestore_client.get_config("ff_background_sync") is True
+        assert await firestore_async.get_config("ff_background_sync") is True
+        assert firestore_client.get_config("missing") is None
+
+        assert dict(firestore.ops) == {"query": 1}
+
+    async def test_refresh_token_operations(self, firestore):
+        """Test batched read, rotation and revocation"""
+        token = generate_refresh_token("A000001")
+        await firestore_async.save_refresh_token(token, "A000001", get_refresh_token_expiration())
+        firestore.reset_ops()
+
+        token_data, user_data, update_time = await firestore_async.get_refresh_token_and_user(token, "A000001")
+
+        assert token_data["user_id"] == "A000001"
+        assert user_data["ruta"] == "001"
+        assert dict(firestore.ops) == {"batch_get": 1}
+
+        new_token = generate_refresh_token("A000001")
+        await firestore_async.rotate_refresh_token(
+            token, new_token, "A000001", get_refresh_token_expiration(), update_time
+        )
+
+        assert (await firestore_async.get_refresh_token(token))["revoked"] is True
+        assert (await firestore_async.get_refresh_token(new_token))["revoked"] is False
+
+        # A second exchange validated before the first committed
+        with pytest.raises(FailedPrecondition):
+            await firestore_async.rotate_refresh_token(
+                token, generate_refresh_token("A000001"), "A000001", get_refresh_token_expiration(), update_time
+            )
+
+    async def test_sessions(self, firestore):
+        """Test session listing and revoke-all match the sync layer"""
+        for _ in range(3):
+            await firestore_async.save_refresh_token(
+                generate_refresh_token("A000001"), "A000001", get_refresh_token_expiration()
+            )
+
+        assert len(await firestore_async.list_sessions("A000001")) == 3
+        assert await firestore_async.revoke_all_sessions("A000001") == 3
+        assert all(session["revoked"] for session in firestore_client.list_sessions("A000001"))
+
+    async def test_failed_login(self, firestore):
+        """Test failed logins count and block like the sync layer"""
+        user_data, update_time = await firestore_async.get_user_with_update_time("A000001")
+
+        assert await firestore_async.record_failed_login("A000001", 2, user_data, update_time) == 1
+        # Stale update time: the conditional write fails, re-reads and counts on
+        assert await firestore_async.record_failed_login("A000001", 2, user_data, update_time) == 2
+        assert firestore_client.get_user_by_id("A000001")["bloqueado"] is True
+        assert await firestore_async.record_failed_login("missing", 2) == 0
+
+    def test_same_functions_as_sync(self):
+        """Test the two layers expose the same data functions"""
+        def functions(module, client_specific):
+            return {
+                name for name, value in vars(module).items()
+                if inspect.isfunction(value) and value.__module__ == module.__name__
+                and not name.startswith("_") and name not in client_specific
+            }
+
+        sync = functions(firestore_client, {"get_firestore_client"})
+        async_ = functions(firestore_async, {
+            "get_async_firestore_client", "firestore_async_stats", "reset_firestore_async_stats"
+        })
+
+        assert sync == async_
+        assert all(inspect.iscoroutinefunction(getattr(firestore_async, name)) for name in async_)
+
+    async def test_fan_out_overlaps_latency(self, firestore):
+        """Test gathered reads wait for one round trip, not one per read"""
+        firestore.latency_ms = 50
+
+        started = time.perf_counter()
+        users = await firestore_async.get_users(["A000001", "A000002", "A000003", "missing"])
+        elapsed = time.perf_counter() - started
+
+        assert [user and user["id"] for user in users] == ["A000001", "A000002", "A000003", None]
+        assert elapsed < 0.15
+        stats = firestore_async.firestore_async_stats()
+        assert stats["rpcs"] == 4
+        assert stats["max_in_flight"] == 4
+        assert stats["in_flight"] == 0
+
+    def test_refresh_endpoint_uses_async_layer(self, firestore, monkeypatch):
+        """Test POST /api/auth/refresh awaits the async client"""
+        from app.main import app
+
+        token = generate_refresh_token("A000001")
+        firestore_client.save_refresh_token(token, "A000001", get_refresh_token_expiration())
+
+        async def refresh():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/api/auth/refresh", json={"refreshToken": token})
+
+        response = asyncio.run(refresh())
+
+        assert response.status_code == 200
+        assert firestore_async.firestore_async_stats()["rpcs"] == 1
+
+
+class TestClientReuse:
+    """Test one client (channel) per event loop"""
+
+    def test_client_per_loop(self, monkeypatch):
+        """Test coroutines on a loop share a client and a new loop gets its own"""
+        created = []
+        monkeypatch.setattr(firestore_async.firestore, "AsyncClient", lambda **kwargs: created.append(kwargs) or object())
+        monkeypatch.setattr(firestore_async, "_client", None)
+        monkeypatch.setattr(firestore_async, "_client_loop", None)
+        firestore_async.reset_firestore_async_stats()
+
+        async def clients():
+            return {id(firestore_async.get_async_firestore_client()) for _ in range(5)}
+
+        assert len(asyncio.run(clients())) == 1
+        assert len(created) == 1
+
+        asyncio.run(clients())
+        assert len(created) == 2
+        assert firestore_async.firestore_async_stats()["channels_created"] == 2
+
+    def test_replaced_client_closed(self, monkeypatch):
+        """Test a client left by a closed loop has its channel closed on the new loop"""
+        closed = []
+
+        async def close():
+            closed.append(True)
+
+        def client(**kwargs):
+            return SimpleNamespace(_firestore_api_internal=SimpleNamespace(transport=SimpleNamespace(close=close)))
+
+        monkeypatch.setattr(firestore_async.firestore, "AsyncClient", client)
+        monkeypatch.setattr(firestore_async, "_client", None)
+        monkeypatch.setattr(firestore_async, "_client_loop", None)
+
+        async def use():
+            firestore_async.get_async_firestore_client()
+            await asyncio.sleep(0)
+
+        asyncio.run(use())
+        assert closed == []
+
+        asyncio.run(use())
+        assert closed == [True]
+
+    def test_replaced_client_closed_on_its_loop(self, monkeypatch):
+        """Test a client whose loop still runs is closed on that loop"""
+        closed_on = []
+        done = threading.Event()
+
+        async def close():
+            closed_on.append(asyncio.get_running_loop())
+            done.set()
+
+        def client(**kwargs):
+            return SimpleNamespace(_firestore_api_internal=SimpleNamespace(transport=SimpleNamespace(close=close)))
+
+        monkeypatch.setattr(firestore_async.firestore, "AsyncClient", client)
+        monkeypatch.setattr(firestore_async, "_client", None)
+        monkeypatch.setattr(firestore_async, "_client_loop", None)
+
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever, daemon=True)
+        thread.start()
+        try:
+            async def create():
+                return firestore_async.get_async_firestore_client()
+
+            asyncio.run_coroutine_threadsafe(create(), other).result(timeout=5)
+            asyncio.run(create())
+
+            assert done.wait(timeout=5)
+            assert closed_on == [other]
+        finally:
+            other.call_soon_threadsafe(other.stop)
+            thread.join(timeout=5)
+            other.close()
@@ -0,0 +1,144 @@
+"""
+Log Storm Tests
+
+Tests for exception fingerprinting, burst-then-suppress per window, the
+summary warnings and the exception counters.
+"""
+
+import logging
+import time
+
+import pytest
+
+from app.core import log_storm
+from app.core.log_storm import EXCEPTIONS, EXCEPTIONS_SUPPRESSED, ExceptionStormFilter, fingerprint
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _raise_timeout():
+    raise TimeoutError("SQL Server did not answer")
+
+
+def _raise_value():
+    raise ValueError("bad row")
+
+
+def _caught(raiser):
+    try:
+        raiser()
+    except Exception as e:
+        return e
+
+
+@pytest.fixture
+def storm(monkeypatch):
+    """Logger whose handler has a storm filter (burst 2), plus its summary logger"""
+    monkeypatch.setattr(log_storm, "SWEEP_SECONDS", 0.0)
+    EXCEPTIONS.clear()
+    EXCEPTIONS_SUPPRESSED.clear()
+
+    handler = ListHandler()
+    storm_filter = ExceptionStormFilter(burst=2, window_seconds=0.05)
+    handler.addFilter(storm_filter)
+
+    loggers = [logging.getLogger("tests.log_storm"), log_storm.summary_logger]
+    for logger in loggers:
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    yield loggers[0], handler, storm_filter
+    for logger in loggers:
+        logger.removeHandler(handler)
+        logger.propagate = True
+        logger.setLevel(logging.NOTSET)
+
+
+class TestFingerprint:
+    """Test exceptions are fingerprinted by type, raise site and log site"""
+
+    def test_same_type_and_sites_match(self):
+        """Test repeats of one failure share a fingerprint; other raise sites don't"""
+        record = logging.makeLogRecord({"name": "app.db.mssql_client", "lineno": 240})
+
+        first = fingerprint(record, _caught(_raise_timeout))
+        again = fingerprint(record, _caught(_raise_timeout))
+        other = fingerprint(record, _caught(_raise_value))
+
+        assert first == again
+        assert first[0] == "TimeoutError"
+        assert first[1].startswith("test_log_storm.py:")
+        assert first[2] == "app.db.mssql_client:240"
+        assert other[0] == "ValueError" and other[1] != first[1]
+
+
+class TestStormFilter:
+    """Test the first records per window are logged and the rest summarized"""
+
+    def test_burst_then_suppressed(self, storm):
+        """Test only `burst` records per fingerprint pass, all are counted"""
+        logger, handler, _ = storm
+
+        for _ in range(5):
+            logger.error("Query %s execution failed: %s", "hoja_de_visita", _caught(_raise_timeout))
+        for _ in range(3):
+            try:
+                _raise_value()
+            except ValueError:
+                logger.error("Unhandled exception", exc_info=True)
+
+        assert len(handler.records) == 4
+        assert handler.records[0].fingerprint == handler.records[1].fingerprint
+        assert handler.records[0].fingerprint != handler.records[2].fingerprint
+
+        totals = {key[0]: value for key, value in EXCEPTIONS.values().items() if value}
+        suppressed = {key[0]: value for key, value in EXCEPTIONS_SUPPRESSED.values().items() if value}
+        assert totals == {"TimeoutError": 5, "ValueError": 3}
+        assert suppressed == {"TimeoutError": 3, "ValueError": 1}
+
+    def test_records_without_exceptions_pass(self, storm):
+        """Test plain records are never suppressed"""
+        logger, handler, _ = storm
+
+        for n in range(10):
+            logger.error("Route %s has no clients", n)
+
+        assert len(handler.records) == 10
+        assert sum(EXCEPTIONS.values().values()) == 0
+
+    def test_summary_when_window_ends(self, storm):
+        """Test suppressed repeats are summarized once the window ends, then logged again"""
+        logger, handler, _ = storm
+
+        for _ in range(4):
+            logger.error("Query failed: %s", _caught(_raise_timeout))
+        time.sleep(0.06)
+        logger.info("next request")
+        logger.error("Query failed: %s", _caught(_raise_timeout))
+
+        messages = [r.getMessage() for r in handler.records]
+        assert len(messages) == 2 + 1 + 1 + 1
+        summary = handler.records[2]
+        assert summary.levelno == logging.WARNING
+        assert messages[2].startswith("Suppressed 2 more TimeoutError (raised at test_log_storm.py:")
+        assert summary.fingerprint == handler.records[0].fingerprint
+        assert summary.context == {"logged": 2, "suppressed": 2}
+        assert messages[3] == "next request"
+        assert messages[4].startswith("Query failed:")
+
+    def test_flush_summarizes_open_windows(self, storm):
+        """Test flush() reports suppressed counts without waiting for the window"""
+        logger, handler, storm_filter = storm
+
+        for _ in range(3):
+            logger.error("Query failed: %s", _caught(_raise_timeout))
+        storm_filter.flush()
+
+        assert handler.records[-1].getMessage().startswith("Suppressed 1 more TimeoutError")
@@ -0,0 +1,163 @@
+"""
+Logging Tests
+
+Tests for the structured formatter, the asynchronous batched handler
+(context capture, sampling and drops under backpressure) and lazy message
+formatting.
+"""
+
+import json
+import logging
+import threading
+
+from app.core.logging import (
+    AsyncLogHandler,
+    StructuredFormatter,
+    clear_request_context,
+    log_with_context,
+    set_request_context,
+)
+
+
+class BlockingStream:
+    """Stream whose writes wait until released, to back the queue up"""
+
+    def __init__(self, blocked=False):
+        self.writes = []
+        self.writing = threading.Event()
+        self.released = threading.Event()
+        if not blocked:
+            self.released.set()
+
+    def write(self, data):
+        self.writing.set()
+        self.released.wait(timeout=5)
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+    def lines(self):
+        return [json.loads(line) for data in self.writes for line in data.splitlines()]
+
+
+def _logger(name, handler, level=logging.DEBUG):
+    handler.setFormatter(StructuredFormatter())
+    logger = logging.getLogger(f"tests.logging.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+class TestAsyncLogHandler:
+    """Test records are written by the background thread"""
+
+    def test_context_captured_when_queued(self):
+        """Test request/user IDs are those current at the log call, not at write time"""
+        stream = BlockingStream()
+        handler = AsyncLogHandler(stream)
+        logger = _logger("context", handler)
+
+        set_request_context(request_id="req-1", user_id="A012345")
+        logger.info("Route %s has %d clients", "001", 42)
+        clear_request_context()
+        handler.close()
+
+        [line] = stream.lines()
+        assert line["message"] == "Route 001 has 42 clients"
+        assert line["request_id"] == "req-1"
+        assert line["user_id"] == "A012345"
+
+    def test_records_written_in_batches(self):
+        """Test records queued while the writer is busy go out in one write"""
+        stream = BlockingStream(blocked=True)
+        handler = AsyncLogHandler(stream, batch_size=100)
+        logger = _logger("batches", handler)
+
+        logger.info("first")
+        assert stream.writing.wait(timeout=5)
+        for n in range(10):
+            logger.info("queued %d", n)
+        stream.released.set()
+        handler.flush()
+
+        assert len(stream.writes) == 2
+        assert len(stream.lines()) == 11
+        assert handler.stats()["written"] == 11
+        handler.close()
+
+    def test_backpressure_samples_then_drops(self):
+        """Test DEBUG/INFO are sampled above the threshold and anything is dropped when full"""
+        stream = BlockingStream(blocked=True)
+        handler = AsyncLogHandler(stream, queue_size=10, batch_size=1, sample_threshold=0.5, sample_rate=5)
+        logger = _logger("backpressure", handler)
+
+        logger.info("in the writer")
+        assert stream.writing.wait(timeout=5)
+        for n in range(5):
+            logger.info("queued %d", n)  # Fills the queue to the threshold
+        for n in range(10):
+            logger.info("sampled %d", n)  # 2 of 10 kept
+        for n in range(5):
+            logger.error("error %d", n)  # 3 fit, 2 dropped
+
+        stats = handler.stats()
+        assert stats["queued"] == 10
+        assert stats["dropped"] == {"INFO": 8, "ERROR": 2}
+
+        stream.released.set()
+        handler.close()
+
+        lines = stream.lines()
+        assert len(lines) == 11 + 1
+        assert lines[-1]["level"] == "WARNING"
+        assert lines[-1]["context"]["dropped_total"] == {"INFO": 8, "ERROR": 2}
+
+    def test_close_writes_queued_records(self):
+        """Test closing the handler drains the queue and stops the writer"""
+        stream = BlockingStream()
+        handler = AsyncLogHandler(stream)
+        logger = _logger("close", handler)
+
+        for n in range(50):
+            logger.warning("record %d", n)
+        handler.close()
+
+        assert len(stream.lines()) == 50
+        assert not handler._writer.is_alive()
+
+
+class TestLazyFormatting:
+    """Test disabled levels cost no message formatting"""
+
+    def test_disabled_level_not_formatted(self):
+        """Test %-style arguments are not rendered below the logger level"""
+        rendered = []
+
+        class Expensive:
+            def __str__(self):
+                rendered.append(True)
+                return "expensive"
+
+        stream = BlockingStream()
+        handler = AsyncLogHandler(stream)
+        logger = _logger("lazy", handler, level=logging.INFO)
+
+        logger.debug("value %s", Expensive())
+        log_with_context(logger, "debug", "value %s", Expensive(), strategy="batch")
+        log_with_context(logger, "info", "value %s", Expensive(), strategy="batch")
+        handler.close()
+
+        [line] = stream.lines()
+        assert line["message"] == "value expensive"
+        assert line["context"] == {"strategy": "batch"}
+        assert len(rendered) == 1
+
+    def test_formatter_handles_non_json_context(self):
+        """Test context values orjson can't encode natively are stringified"""
+        record = logging.makeLogRecord({"msg": "plan", "context": {"fecha": object, 1: "x"}})
+
+        line = json.loads(StructuredFormatter().format(record))
+
+        assert line["context"] == {"fecha": str(object), "1": "x"}
@@ -0,0 +1,190 @@
+"""
+Metrics Tests
+
+Tests for the metrics registry, its Prometheus text rendering, the request
+latency middleware and the /api/metrics endpoint.
+"""
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import (
+    FIRESTORE_OP_SECONDS,
+    REQUEST_SECONDS,
+    SQL_QUERY_SECONDS,
+    Registry,
+    timed,
+)
+from app.db import firestore_async, firestore_client, mssql_client
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def registry():
+    """Empty registry with one histogram and one counter"""
+    registry = Registry()
+    histogram = registry.histogram("t_seconds", "Test histogram", ("op", "outcome"), buckets=(0.1, 1.0))
+    counter = registry.counter("t_total", "Test counter", ("kind",))
+    return registry, histogram, counter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """App client with fresh request metrics"""
+    from app.main import app
+
+    monkeypatch.setattr(settings, "API_RATE_LIMIT_ENABLED", False)
+    REQUEST_SECONDS.clear()
+    return TestClient(app)
+
+
+class TestRegistry:
+    """Test metric types and the text format"""
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        """Test buckets, sum and count render in the Prometheus format"""
+        registry, histogram, _ = registry
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, op="read", outcome="ok")
+
+        text = registry.render()
+
+        assert "# TYPE t_seconds histogram" in text
+        assert 't_seconds_bucket{op="read",outcome="ok",le="0.1"} 1' in text
+        assert 't_seconds_bucket{op="read",outcome="ok",le="1"} 2' in text
+        assert 't_seconds_bucket{op="read",outcome="ok",le="+Inf"} 3' in text
+        assert 't_seconds_count{op="read",outcome="ok"} 3' in text
+        assert 't_seconds_sum{op="read",outcome="ok"} 5.55' in text
+
+    def test_counter_and_label_escaping(self, registry):
+        """Test counters add up and label values are escaped"""
+        registry, _, counter = registry
+        counter.inc(kind='say "hi"\n')
+        counter.inc(2, kind='say "hi"\n')
+
+        assert 't_total{kind="say \\"hi\\"\\n"} 3' in registry.render()
+
+    def test_clear_keeps_bound_series(self, registry):
+        """Test a series bound before clear() still records afterwards"""
+        registry, histogram, _ = registry
+        series = histogram.labels(op="read", outcome="ok")
+        series.observe(0.5)
+
+        registry.clear()
+        series.observe(0.5)
+
+        assert histogram.count(op="read", outcome="ok") == 1
+
+    async def test_timed_decorator(self, registry):
+        """Test sync and async functions are timed with op and outcome"""
+        _, histogram, _ = registry
+
+        @timed(histogram)
+        def read():
+            return 1
+
+        @timed(histogram)
+        async def write():
+            raise RuntimeError("down")
+
+        assert read() == 1
+        with pytest.raises(RuntimeError):
+            await write()
+
+        assert histogram.count(op="TestRegistry.test_timed_decorator.<locals>.read", outcome="ok") == 1
+        assert histogram.count(op="TestRegistry.test_timed_decorator.<locals>.write", outcome="error") == 1
+
+
+class TestInstrumentation:
+    """Test SQL Server and Firestore timings are recorded"""
+
+    def test_sql_query_by_name(self):
+        """Test queries are timed under their name and outcome"""
+        SQL_QUERY_SECONDS.clear()
+        mssql_client.mssql_breaker.reset()
+
+        with patch("app.db.mssql_client._fetch_rows", return_value=[]):
+            mssql_client.execute_query("SELECT 1", name="probe")
+        with patch("app.db.mssql_client._fetch_rows", side_effect=RuntimeError("down")), \
+                pytest.raises(RuntimeError):
+            mssql_client.execute_query("SELECT 1", name="probe")
+        mssql_client.mssql_breaker.reset()
+
+        assert SQL_QUERY_SECONDS.count(query="probe", outcome="ok") == 1
+        assert SQL_QUERY_SECONDS.count(query="probe", outcome="error") == 1
+
+    async def test_firestore_by_function(self):
+        """Test sync and async data layer calls are timed per function"""
+        FIRESTORE_OP_SECONDS.clear()
+
+        with install_fakes(FakeFirestoreClient()):
+            firestore_client.get_user_by_id("A000001")
+            await firestore_async.get_user_by_id("A000001")
+
+        assert FIRESTORE_OP_SECONDS.count(client="sync", op="get_user_by_id", outcome="ok") == 1
+        assert FIRESTORE_OP_SECONDS.count(client="async", op="get_user_by_id", outcome="ok") == 1
+
+
+class TestMetricsEndpoint:
+    """Test the scrape endpoint and request histograms"""
+
+    def test_request_latency_by_route_template(self, client):
+        """Test requests are labelled by route template and status"""
+        client.get("/api/health")
+        client.get("/api/health")
+        client.get("/api/no-such-route")
+
+        assert REQUEST_SECONDS.count(method="GET", route="/api/health", status=200) == 2
+        assert REQUEST_SECONDS.count(method="GET", route="unmatched", status=404) == 1
+
+    def test_scrape(self, client, monkeypatch):
+        """Test the endpoint serves histograms and runtime gauges as text"""
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+        client.get("/api/health")
+
+        response = client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert 'webpv_http_request_duration_seconds_count{method="GET",route="/api/health",status="200"} 1' in text
+        assert "# TYPE webpv_sql_query_duration_seconds histogram" in text
+        assert 'webpv_mssql_pool_connections{state="in_use"} 0' in text
+        assert 'webpv_circuit_breaker_state{breaker="mssql",state="closed"} 1' in text
+        assert 'webpv_threadpool_tokens{state="total"}' in text
+
+    def test_token_required_when_configured(self, client, monkeypatch):
+        """Test METRICS_TOKEN gates the endpoint"""
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+
+        assert client.get("/api/metrics").status_code == 401
+        assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+    def test_not_public_by_default(self, client):
+        """Test a client outside METRICS_ALLOWED_IPS is refused without a token"""
+        response = client.get("/api/metrics")
+
+        assert response.status_code == 403
+        assert "webpv_" not in response.text
+
+    async def test_allowed_addresses(self, client, monkeypatch):
+        """Test loopback scrapes by default and METRICS_ALLOWED_IPS takes networks"""
+        from app.main import app
+
+        async def scrape(host):
+            transport = httpx.ASGITransport(app=app, client=(host, 1234))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return (await http.get("/api/metrics")).status_code
+
+        assert await scrape("127.0.0.1") == 200
+        assert await scrape("::1") == 200
+        assert await scrape("10.0.0.5") == 403
+
+        monkeypatch.setattr(settings, "METRICS_ALLOWED_IPS", ["10.0.0.0/8"])
+        assert await scrape("10.0.0.5") == 200
+        assert await scrape("127.0.0.1") == 403
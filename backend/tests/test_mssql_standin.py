@@ -0,0 +1,104 @@
+"""
+SQL Server Stand-in Tests
+
+Tests for the SQLite stand-in, its T-SQL translation, and equivalence of
+the Hoja de Visita execution strategies on synthetic data.
+"""
+
+import pytest
+from datetime import date
+
+from app.core.config import settings
+from app.db import client_index, mssql_client, reference_cache
+from app.db.mssql_standin import bind_params, split_batch, translate
+from app.db.seed_standin import generate
+from app.services.route_service import ROUTE_PLAN_METRICS, fetch_route_rows
+
+# The monolithic query file is hardwired to Monday, route '001', September 2025
+MONDAY = date(2025, 9, 1)
+
+
+@pytest.fixture(scope="module")
+def standin_path(tmp_path_factory):
+    """Small synthetic legacy database"""
+    path = str(tmp_path_factory.mktemp("standin") / "erp.db")
+    generate(path, routes=2, clients=300, years=1, end=date(2025, 12, 31), seed=7)
+    return path
+
+
+@pytest.fixture
+def standin(standin_path, monkeypatch):
+    """Point mssql_client at the stand-in with empty caches"""
+    monkeypatch.setattr(settings, "MSSQL_BACKEND", "standin")
+    monkeypatch.setattr(settings, "MSSQL_STANDIN_PATH", standin_path)
+    mssql_client.close_pool()
+    mssql_client.mssql_breaker.reset()
+    reference_cache.clear_reference_snapshot()
+    client_index.clear_client_index()
+    yield
+    mssql_client.close_pool()
+    reference_cache.clear_reference_snapshot()
+    client_index.clear_client_index()
+
+
+def _metrics_by_client(rows):
+    return {row["CLIENTE_ID"]: {name: row.get(name) for name in ROUTE_PLAN_METRICS} for row in rows}
+
+
+class TestTranslation:
+    """Test T-SQL to SQLite rewriting"""
+
+    def test_tuple_params_expand(self):
+        """Test IN lists are expanded like pymssql and %% is unescaped"""
+        sql, bound = bind_params(
+            "SELECT 1 WHERE A IN %(ids)s AND B = %(b)s AND C LIKE '%%X%%'",
+            {"ids": ("1", "2"), "b": 3}
+        )
+
+        assert sql == "SELECT 1 WHERE A IN (:ids_0, :ids_1) AND B = :b AND C LIKE '%X%'"
+        assert bound == {"ids_0": "1", "ids_1": "2", "b": 3}
+
+    def test_batch_variables_are_split(self):
+        """Test DECLARE/SET batches become assignments plus one statement"""
+        assignments, statement = split_batch(
+            "DECLARE @F AS DATE, @S AS INT;\nSET @F='2025-09-01';\n"
+            "SET @S=(SELECT SEMANA FROM R_SEMANAS WHERE FECHA=@F)\nSELECT @S"
+        )
+
+        assert assignments == [("F", "'2025-09-01'"), ("S", "(SELECT SEMANA FROM R_SEMANAS WHERE FECHA=@F)")]
+        assert statement.strip() == "SELECT @S"
+
+    def test_tsql_syntax_rewritten(self):
+        """Test database prefixes, CONVERT concatenation and alias assignment"""
+        sql = translate("SELECT CLAVE=GECS+CONVERT(VARCHAR,SEMANA),X FROM MBAFERGUEZ..R_CLIENTES")
+
+        assert sql == "SELECT GECS|| CONVERT_VARCHAR(SEMANA) AS CLAVE,X FROM R_CLIENTES"
+
+
+class TestStrategyEquivalence:
+    """Test every execution path returns the same visit sheet"""
+
+    def test_monolithic_query_runs(self, standin):
+        """Test the Hoja de Visita query file runs unchanged on the stand-in"""
+        rows = mssql_client.execute_hoja_visita_query("001", MONDAY)
+
+        assert rows
+        assert all(row["RUTA"] == "001" and "L" in row["VISITA"] for row in rows)
+        assert any(row["CERVEZA_SACT"] for row in rows)
+
+    @pytest.mark.parametrize("strategy,reference,index", [
+        ("fanout", False, False),
+        ("narrow", False, False),
+        ("fanout", True, True),
+        ("batch", True, False),
+        ("batch", True, True),
+    ])
+    def test_strategies_match_monolithic_query(self, standin, monkeypatch, strategy, reference, index):
+        """Test generated queries and in-memory joins match the original query"""
+        expected = _metrics_by_client(fetch_route_rows("001", MONDAY))
+
+        monkeypatch.setattr(settings, "HOJA_VISITA_STRATEGY", strategy)
+        monkeypatch.setattr(settings, "REFERENCE_CACHE_ENABLED", reference)
+        monkeypatch.setattr(settings, "CLIENT_INDEX_ENABLED", index)
+
+        assert _metrics_by_client(fetch_route_rows("001", MONDAY)) == expected
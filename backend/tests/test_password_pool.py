@@ -0,0 +1,118 @@
+"""
+Password Pool Tests
+
+Tests for the bcrypt process pool, its admission control and shedding.
+"""
+
+import os
+import signal
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from passlib.hash import bcrypt
+
+from app.core import password_pool
+from app.core.config import settings
+from app.core.password_pool import PasswordPoolSaturated, verify_password_pooled
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """One-worker pool, stopped after the test"""
+    monkeypatch.setattr(settings, "PASSWORD_POOL_ENABLED", True)
+    monkeypatch.setattr(settings, "PASSWORD_POOL_WORKERS", 1)
+    password_pool.reset_password_pool_stats()
+    yield
+    password_pool.shutdown_password_pool()
+
+
+class TestPasswordPool:
+    """Test verification in worker processes"""
+
+    def test_verify_in_pool(self, pool):
+        """Test correct and wrong passwords are told apart and timed"""
+        hashed = bcrypt.using(rounds=4).hash("testpass123")
+
+        assert verify_password_pooled("testpass123", hashed) is True
+        assert verify_password_pooled("wrongpass", hashed) is False
+
+        stats = password_pool.password_pool_stats()
+        assert stats["completed"] == 2
+        assert stats["in_flight"] == 0
+        assert stats["hash_ms_p50"] > 0
+
+    def test_full_queue_is_shed(self, pool, monkeypatch):
+        """Test requests beyond workers + queue are rejected immediately"""
+        monkeypatch.setattr(settings, "PASSWORD_POOL_QUEUE_SIZE", 0)
+        monkeypatch.setattr(password_pool, "_admitted", 1)
+
+        with pytest.raises(PasswordPoolSaturated):
+            verify_password_pooled("testpass123", "unused")
+
+        assert password_pool.password_pool_stats()["rejected"] == 1
+
+    def test_wait_is_bounded(self, pool, monkeypatch):
+        """Test a verification slower than the wait bound is shed"""
+        password_pool.start_password_pool()
+        monkeypatch.setattr(settings, "PASSWORD_POOL_MAX_WAIT_SECONDS", 0.01)
+        hashed = bcrypt.using(rounds=12).hash("testpass123")
+
+        with pytest.raises(PasswordPoolSaturated):
+            verify_password_pooled("testpass123", hashed)
+
+        assert password_pool.password_pool_stats()["timeouts"] == 1
+
+    def test_disabled_runs_inline(self, monkeypatch):
+        """Test the pool can be turned off"""
+        monkeypatch.setattr(settings, "PASSWORD_POOL_ENABLED", False)
+        hashed = bcrypt.using(rounds=4).hash("testpass123")
+
+        assert verify_password_pooled("testpass123", hashed) is True
+        assert password_pool._executor is None
+
+    def test_dead_worker_replaces_pool(self, pool):
+        """Test a killed worker sheds its request, is counted, and the next call gets a new pool"""
+        password_pool.start_password_pool()
+        hashed = bcrypt.using(rounds=4).hash("testpass123")
+        broken = password_pool._executor
+
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+        with pytest.raises(PasswordPoolSaturated):
+            verify_password_pooled("testpass123", hashed)
+
+        assert password_pool._executor is None
+        assert verify_password_pooled("testpass123", hashed) is True
+        assert password_pool._executor is not broken
+
+        stats = password_pool.password_pool_stats()
+        assert stats["broken"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_second_failure_keeps_replacement(self, pool, monkeypatch):
+        """Test a failure reported after the broken pool was replaced leaves the new pool running"""
+        password_pool.start_password_pool()
+        replacement = password_pool._executor
+
+        class BrokenExecutor:
+            def submit(self, *args):
+                raise BrokenProcessPool("worker died")
+
+            def shutdown(self, **kwargs):
+                raise AssertionError("replacement already dropped this pool")
+
+        broken = BrokenExecutor()
+        monkeypatch.setattr(password_pool, "_get_executor", lambda: broken)
+
+        with pytest.raises(PasswordPoolSaturated):
+            verify_password_pooled("testpass123", "unused")
+
+        assert password_pool._executor is replacement
+        assert password_pool.password_pool_stats()["broken"] == 1
+        assert password_pool.password_pool_stats()["in_flight"] == 0
+
+    def test_discard_without_pool(self, pool):
+        """Test discarding when no pool was created is a no-op"""
+        password_pool._discard_executor(None)
+
+        assert password_pool._executor is None
@@ -0,0 +1,137 @@
+"""
+Principal Cache Tests
+
+Tests for the authenticated user cache and its use in get_current_user.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.api.dependencies import get_current_active_user, get_current_user
+from app.core import principal_cache
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.firestore_client import create_user, update_user
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def firestore():
+    """Fake Firestore with one active asesor"""
+    fake = FakeFirestoreClient()
+    with install_fakes(fake):
+        create_user("A000001", {
+            "id": "A000001",
+            "nombre": "Asesor",
+            "rol": "asesor",
+            "ruta": "001",
+            "password_hash": "x",
+            "activo": True,
+            "bloqueado": False,
+        })
+        fake.reset_ops()
+        yield fake
+
+
+def _authenticate(user_id="A000001"):
+    token = create_access_token({"sub": user_id})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    async def resolve():
+        return await get_current_active_user(await get_current_user(credentials))
+
+    return asyncio.run(resolve())
+
+
+class TestPrincipalCache:
+    """Test TTL, size bound and invalidation"""
+
+    def setup_method(self):
+        principal_cache.clear_principal_cache()
+
+    def test_entries_expire(self, monkeypatch):
+        """Test entries are dropped after the TTL"""
+        monkeypatch.setattr(settings, "PRINCIPAL_CACHE_TTL_SECONDS", 60)
+        principal_cache.put_principal("A", "user", principal_cache.current_generation("A"))
+        assert principal_cache.get_principal("A") == "user"
+
+        monkeypatch.setattr(principal_cache.time, "monotonic", lambda: 10 ** 9)
+        assert principal_cache.get_principal("A") is None
+
+    def test_least_recently_used_evicted(self, monkeypatch):
+        """Test the cache never holds more than PRINCIPAL_CACHE_SIZE users"""
+        monkeypatch.setattr(settings, "PRINCIPAL_CACHE_SIZE", 2)
+        for user_id in ("A", "B"):
+            principal_cache.put_principal(user_id, user_id, principal_cache.current_generation(user_id))
+        principal_cache.get_principal("A")
+        principal_cache.put_principal("C", "C", principal_cache.current_generation("C"))
+
+        assert principal_cache.get_principal("B") is None
+        assert principal_cache.get_principal("A") == "A"
+        assert principal_cache.principal_cache_stats()["size"] == 2
+
+    def test_load_racing_a_write_is_not_cached(self):
+        """Test a user loaded before an invalidation is not stored"""
+        generation = principal_cache.current_generation("A")
+        principal_cache.invalidate_principal("A")
+        principal_cache.put_principal("A", "stale", generation)
+
+        assert principal_cache.get_principal("A") is None
+
+    def test_write_to_another_user_keeps_load(self):
+        """Test an invalidation of another user doesn't discard a load"""
+        generation = principal_cache.current_generation("A")
+        principal_cache.invalidate_principal("B")
+        principal_cache.put_principal("A", "user", generation)
+
+        assert principal_cache.get_principal("A") == "user"
+
+    def test_dropped_stamps_still_reject_racing_loads(self, monkeypatch):
+        """Test a load racing a write is rejected after the user's stamp is dropped"""
+        monkeypatch.setattr(settings, "PRINCIPAL_CACHE_SIZE", 1)
+        generation = principal_cache.current_generation("A")
+        principal_cache.invalidate_principal("A")
+        principal_cache.invalidate_principal("B")  # Drops A's stamp
+        principal_cache.put_principal("A", "stale", generation)
+
+        assert principal_cache.get_principal("A") is None
+
+    def test_zero_ttl_disables(self, monkeypatch):
+        """Test nothing is cached with a TTL of 0"""
+        monkeypatch.setattr(settings, "PRINCIPAL_CACHE_TTL_SECONDS", 0)
+        principal_cache.put_principal("A", "user", principal_cache.current_generation("A"))
+
+        assert principal_cache.get_principal("A") is None
+
+
+class TestCurrentUser:
+    """Test get_current_user reads Firestore only on a cache miss"""
+
+    def test_repeat_requests_skip_firestore(self, firestore):
+        """Test only the first request reads the user document"""
+        for _ in range(3):
+            assert _authenticate().id == "A000001"
+
+        assert firestore.ops["read"] == 1
+
+    def test_blocking_takes_effect_immediately(self, firestore):
+        """Test update_user invalidates the cached user"""
+        _authenticate()
+        update_user("A000001", {"bloqueado": True})
+
+        with pytest.raises(HTTPException) as exc:
+            _authenticate()
+
+        assert exc.value.status_code == 403
+        assert firestore.ops["read"] == 2
+
+    def test_unknown_user_rejected(self, firestore):
+        """Test a valid token for a missing user is rejected and not cached"""
+        with pytest.raises(HTTPException) as exc:
+            _authenticate("A999999")
+
+        assert exc.value.status_code == 401
+        assert principal_cache.principal_cache_stats()["size"] == 0
@@ -0,0 +1,161 @@
+"""
+Rate Limiting Tests
+
+Tests for the sliding-window and token-bucket limiter, its backends, and
+login lockout on top of it.
+"""
+
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.rate_limit import MemoryBackend, RateLimiter, SQLiteBackend
+from app.services import auth_service
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    """Limiter over each backend"""
+    if request.param == "memory":
+        return RateLimiter(MemoryBackend(max_keys=1000))
+    return RateLimiter(SQLiteBackend(str(tmp_path / "ratelimit.db"), max_keys=1000))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for the limiter"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+class TestSlidingWindow:
+    """Test sliding-window counters"""
+
+    def test_limit_enforced(self, limiter, clock):
+        """Test hits beyond the limit are denied with a retry time"""
+        decisions = [limiter.window_hit("k", limit=3, window=60) for _ in range(4)]
+
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert 0 < decisions[-1].retry_after <= 60
+
+    def test_previous_window_decays(self, limiter, clock):
+        """Test hits from the previous window count by their overlap"""
+        clock[0] = 1_000_020.0  # Start of a 60s window
+        for _ in range(4):
+            limiter.record("k", window=60)
+
+        clock[0] += 90  # Halfway through the next window
+        assert limiter.window_count("k", 60) == pytest.approx(2)
+
+        clock[0] += 60
+        assert limiter.window_count("k", 60) == 0
+
+    def test_reset(self, limiter, clock):
+        """Test a reset key starts over"""
+        limiter.record("k", window=60)
+        limiter.reset("k")
+
+        assert limiter.window_count("k", 60) == 0
+
+
+class TestTokenBucket:
+    """Test token buckets"""
+
+    def test_burst_then_refill(self, limiter, clock):
+        """Test a full bucket allows a burst, then refills at the rate"""
+        assert all(limiter.take_token("k", rate=1, burst=3).allowed for _ in range(3))
+
+        denied = limiter.take_token("k", rate=1, burst=3)
+        assert not denied.allowed
+        assert denied.retry_after == pytest.approx(1)
+
+        clock[0] += 1
+        assert limiter.take_token("k", rate=1, burst=3).allowed
+
+
+class TestLocks:
+    """Test key locks"""
+
+    def test_checking_a_lock_keeps_it(self, limiter):
+        """Test reading a lock doesn't shorten its stored lifetime (real backend TTL)"""
+        limiter.lock("k", 900)
+
+        first = limiter.locked_for("k")
+        time.sleep(1.2)
+        second = limiter.locked_for("k")
+
+        assert 898 < first <= 900
+        assert 897 < second < first
+        assert limiter.locked_for("other") == 0.0
+
+
+class TestEviction:
+    """Test memory stays bounded"""
+
+    def test_memory_backend_bounded(self, clock):
+        """Test least recently used keys are evicted beyond max_keys"""
+        limiter = RateLimiter(MemoryBackend(max_keys=100))
+        for n in range(1000):
+            limiter.record(f"user-{n}", window=60)
+
+        assert limiter.stats() == {"keys": 100, "evictions": 900}
+        assert limiter.window_count("user-999", 60) == 1
+        assert limiter.window_count("user-0", 60) == 0
+
+    def test_sqlite_backend_bounded(self, tmp_path, clock, monkeypatch):
+        """Test the periodic sweep trims the shared table"""
+        monkeypatch.setattr(SQLiteBackend, "SWEEP_EVERY", 50)
+        limiter = RateLimiter(SQLiteBackend(str(tmp_path / "ratelimit.db"), max_keys=100))
+        for n in range(500):
+            limiter.record(f"user-{n}", window=60)
+
+        assert limiter.stats()["keys"] <= 100 + 50
+
+    def test_sqlite_backend_shared(self, tmp_path, clock):
+        """Test two limiters on one file (two workers) share their counts"""
+        path = str(tmp_path / "ratelimit.db")
+        first = RateLimiter(SQLiteBackend(path, max_keys=100))
+        second = RateLimiter(SQLiteBackend(path, max_keys=100))
+
+        first.record("k", window=60)
+        second.record("k", window=60)
+
+        assert first.window_count("k", 60) == 2
+
+
+class TestLoginLockout:
+    """Test login attempt limiting in auth_service"""
+
+    @pytest.fixture(autouse=True)
+    def login_limits(self, monkeypatch):
+        monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+        monkeypatch.setattr(settings, "RATE_LIMIT_PER_MINUTE", 3)
+        monkeypatch.setattr(rate_limit, "_limiter", RateLimiter(MemoryBackend(max_keys=100)))
+
+    def test_lockout_after_failures(self):
+        """Test the account locks once failures reach the limit"""
+        for _ in range(3):
+            auth_service.check_rate_limit("A000001")
+            auth_service.record_failed_attempt("A000001")
+
+        with pytest.raises(HTTPException) as exc:
+            auth_service.check_rate_limit("A000001")
+        assert exc.value.status_code == 429
+        assert exc.value.detail["retryAfter"] == settings.RATE_LIMIT_LOCKOUT_MINUTES * 60
+
+        with pytest.raises(HTTPException) as exc:
+            auth_service.check_rate_limit("A000001")
+        assert "temporalmente" in exc.value.detail["message"]
+
+    def test_success_clears_failures(self):
+        """Test a successful login forgets earlier failures"""
+        for _ in range(2):
+            auth_service.record_failed_attempt("A000001")
+        auth_service.clear_failed_attempts("A000001")
+        auth_service.record_failed_attempt("A000001")
+
+        auth_service.check_rate_limit("A000001")
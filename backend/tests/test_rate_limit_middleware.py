@@ -0,0 +1,113 @@
+"""
+Rate Limit Middleware Tests
+
+Tests for per-user and per-route token buckets on API requests.
+"""
+
+import threading
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.rate_limit import MemoryBackend, RateLimiter, SQLiteBackend
+from app.core.security import create_access_token
+from app.middleware.rate_limit import (
+    RateLimitMiddleware,
+    rate_limit_counters,
+    reset_rate_limit_counters,
+    route_for_path,
+)
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Minimal app behind the middleware with small buckets"""
+    monkeypatch.setattr(settings, "API_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "API_RATE_LIMIT_USER_RATE", 0.001)
+    monkeypatch.setattr(settings, "API_RATE_LIMIT_USER_BURST", 4)
+    monkeypatch.setattr(settings, "API_RATE_LIMIT_ROUTES", {"/api/plan-de-ruta": [0.001, 2]})
+    monkeypatch.setattr(rate_limit, "_limiter", RateLimiter(MemoryBackend(max_keys=100)))
+    reset_rate_limit_counters()
+
+    app = Starlette(routes=[
+        Route("/api/plan-de-ruta", ok),
+        Route("/api/other", ok),
+        Route("/api/health", ok),
+    ])
+    app.add_middleware(RateLimitMiddleware)
+    return TestClient(app)
+
+
+def _headers(user_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user_id})}"}
+
+
+class TestRateLimitMiddleware:
+    """Test token buckets per user and per route"""
+
+    def test_route_bucket(self, client):
+        """Test a hammered route is limited with Retry-After"""
+        statuses = [client.get("/api/plan-de-ruta", headers=_headers("A1")).status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        response = client.get("/api/plan-de-ruta", headers=_headers("A1"))
+        assert response.json()["error"] == "RATE_LIMIT_EXCEEDED"
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # Other routes and other users are unaffected
+        assert client.get("/api/other", headers=_headers("A1")).status_code == 200
+        assert client.get("/api/plan-de-ruta", headers=_headers("A2")).status_code == 200
+
+    def test_user_bucket(self, client):
+        """Test the per-user bucket spans all routes"""
+        statuses = [client.get("/api/other", headers=_headers("A1")).status_code for _ in range(5)]
+
+        assert statuses == [200, 200, 200, 200, 429]
+        assert rate_limit_counters() == {"allowed": 4, "limited:user": 1}
+
+    def test_anonymous_and_exempt_not_limited(self, client):
+        """Test requests without a valid token and exempt paths pass through"""
+        for _ in range(10):
+            assert client.get("/api/other").status_code == 200
+            assert client.get("/api/other", headers={"Authorization": "Bearer bad"}).status_code == 200
+            assert client.get("/api/health", headers=_headers("A1")).status_code == 200
+
+    def test_longest_prefix_wins(self):
+        """Test the most specific route prefix is chosen"""
+        routes = {"/api": [1, 1], "/api/plan-de-ruta": [1, 1]}
+
+        assert route_for_path("/api/plan-de-ruta", routes) == "/api/plan-de-ruta"
+        assert route_for_path("/api/auth/login", routes) == "/api"
+        assert route_for_path("/assets/app.js", routes) is None
+
+    def test_sqlite_backend_off_event_loop(self, client, monkeypatch, tmp_path):
+        """Test sqlite bucket updates run in the threadpool, not on the loop thread"""
+        threads = []
+
+        class RecordingBackend(SQLiteBackend):
+            def update(self, key, func, ttl):
+                threads.append(threading.get_ident())
+                return super().update(key, func, ttl)
+
+        async def loop_thread(request):
+            threads.append(("loop", threading.get_ident()))
+            return PlainTextResponse("ok")
+
+        monkeypatch.setattr(rate_limit, "_limiter", RateLimiter(RecordingBackend(str(tmp_path / "rl.db"), 100)))
+        client.app.router.routes.append(Route("/api/thread", loop_thread))
+
+        assert client.get("/api/thread", headers=_headers("A1")).status_code == 200
+
+        (_, loop_ident), = [t for t in threads if isinstance(t, tuple)]
+        updates = [t for t in threads if not isinstance(t, tuple)]
+        assert len(updates) == 1
+        assert updates[0] != loop_ident
@@ -0,0 +1,116 @@
+"""
+Reference Cache Tests
+
+Tests for the in-memory coolers / HEI / promo lona snapshot.
+"""
+
+import pytest
+from unittest.mock import patch
+from datetime import date
+
+from app.core.config import settings
+from app.db import reference_cache
+from app.db.reference_cache import (
+    COOLERS_QUERY,
+    HEI_SHOPS_QUERY,
+    PROMO_LONA_QUERY,
+    apply_reference_flags,
+    get_reference_snapshot,
+    refresh_reference_snapshot,
+)
+
+
+def fake_execute_query(query, params=None, name=None):
+    """Return canned reference rows for each reference query"""
+    if query == COOLERS_QUERY:
+        return [{"idCliente": 101, "ENFRIADORES": 2}]
+    if query == HEI_SHOPS_QUERY:
+        return [{"CLIENTE_ID": "102"}]
+    if query == PROMO_LONA_QUERY:
+        return [{"ID": "103 "}]
+    raise AssertionError(f"Unexpected query: {query}")
+
+
+@pytest.fixture(autouse=True)
+def reset_snapshot():
+    """Start every test without a loaded snapshot"""
+    reference_cache.clear_reference_snapshot()
+    yield
+    reference_cache.clear_reference_snapshot()
+
+
+class TestReferenceSnapshot:
+    """Test snapshot loading and versioning"""
+
+    def test_snapshot_loaded_on_first_use(self):
+        """Test snapshot is loaded lazily and keyed by normalized CLIENTE_ID"""
+        with patch("app.db.reference_cache.execute_query", side_effect=fake_execute_query) as mock:
+            snapshot = get_reference_snapshot()
+            get_reference_snapshot()
+
+        # Three reference queries, only once
+        assert mock.call_count == 3
+        assert snapshot.version == 1
+        assert snapshot.coolers == {"101": 2}
+        assert snapshot.hei_shops == frozenset({"102"})
+        assert snapshot.promo_lona == frozenset({"103"})
+
+    def test_refresh_bumps_version(self):
+        """Test each refresh publishes a new version"""
+        with patch("app.db.reference_cache.execute_query", side_effect=fake_execute_query):
+            first = refresh_reference_snapshot()
+            second = refresh_reference_snapshot()
+
+        assert second.version == first.version + 1
+        assert get_reference_snapshot() is second
+
+    def test_failed_refresh_keeps_previous_snapshot(self):
+        """Test a failing refresh leaves the last good snapshot in place"""
+        with patch("app.db.reference_cache.execute_query", side_effect=fake_execute_query):
+            good = refresh_reference_snapshot()
+
+        with patch("app.db.reference_cache.execute_query", side_effect=RuntimeError("down")):
+            with pytest.raises(RuntimeError):
+                refresh_reference_snapshot()
+
+        assert get_reference_snapshot() is good
+
+
+class TestApplyReferenceFlags:
+    """Test joining reference flags onto sales rows"""
+
+    def test_flags_match_full_query_columns(self):
+        """Test flags are set like the full Hoja de Visita query would"""
+        with patch("app.db.reference_cache.execute_query", side_effect=fake_execute_query):
+            snapshot = get_reference_snapshot()
+
+        rows = [
+            {"CLIENTE_ID": 101},
+            {"CLIENTE_ID": "102"},
+            {"CLIENTE_ID": "103"},
+            {"CLIENTE_ID": "104"},
+        ]
+        apply_reference_flags(rows, snapshot)
+
+        assert rows[0]["ENFRIADORES"] == 2
+        assert rows[1]["IDSHOP"] == "102"
+        assert rows[2]["DESCLP"] == "PROMLONA"
+        assert rows[3] == {"CLIENTE_ID": "104", "ENFRIADORES": None, "IDSHOP": None, "DESCLP": None}
+
+    def test_route_service_uses_sales_query_when_enabled(self, monkeypatch):
+        """Test the route service joins flags in Python when the cache is enabled"""
+        from app.services.route_service import fetch_route_rows
+
+        monkeypatch.setattr(settings, "REFERENCE_CACHE_ENABLED", True)
+
+        with patch("app.db.reference_cache.execute_query", side_effect=fake_execute_query), \
+             patch("app.services.route_service.execute_hoja_visita_query") as full_query, \
+             patch(
+                 "app.services.route_service.execute_hoja_visita_ventas_query",
+                 return_value=[{"CLIENTE_ID": "102", "CERVEZA_SACT": 10}]
+             ):
+            rows = fetch_route_rows("001", date(2025, 9, 1))
+
+        full_query.assert_not_called()
+        assert rows[0]["IDSHOP"] == "102"
+        assert rows[0]["CERVEZA_SACT"] == 10
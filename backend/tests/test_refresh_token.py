@@ -0,0 +1,212 @@
+"""
+Refresh Token Flow Tests
+
+Tests for the batched refresh path and optional rotation, against the
+in-memory Firestore fake.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.security import (
+    generate_refresh_token,
+    get_refresh_token_expiration,
+    refresh_token_id,
+    verify_token,
+)
+from app.db.firestore_client import (
+    get_refresh_token,
+    list_sessions,
+    revoke_all_sessions,
+    save_refresh_token,
+)
+from app.services import auth_service
+from app.services.auth_service import refresh_user_tokens
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def firestore():
+    """Fake Firestore with one asesor"""
+    fake = FakeFirestoreClient()
+    fake.collection("users").document("A000001").set({
+        "id": "A000001",
+        "nombre": "Asesor",
+        "rol": "asesor",
+        "ruta": "001",
+        "password_hash": "x",
+    })
+    with install_fakes(fake):
+        yield fake
+
+
+def _issue(user_id="A000001", embed=True):
+    token = generate_refresh_token(user_id if embed else None)
+    save_refresh_token(token, user_id, get_refresh_token_expiration())
+    return token
+
+
+class TestRefreshFlow:
+    """Test refresh costs and outcomes"""
+
+    def test_one_batched_read(self, firestore):
+        """Test a refresh reads token and user in one RPC and writes nothing"""
+        token = _issue()
+        firestore.reset_ops()
+
+        access_token, new_refresh_token, _ = refresh_user_tokens(token)
+
+        assert dict(firestore.ops) == {"batch_get": 1}
+        assert new_refresh_token is None
+        assert verify_token(access_token)["ruta"] == "001"
+
+    def test_legacy_token_still_accepted(self, firestore):
+        """Test tokens without an embedded user ID fall back to two reads"""
+        token = _issue(embed=False)
+        firestore.reset_ops()
+
+        refresh_user_tokens(token)
+
+        assert dict(firestore.ops) == {"batch_get": 1, "read": 1}
+
+    def test_owner_mismatch_rejected(self, firestore):
+        """Test a token whose prefix names another user is rejected"""
+        token = _issue()
+        forged = "B000002." + token.partition(".")[2]
+        save_refresh_token(forged, "A000001", get_refresh_token_expiration())
+
+        with pytest.raises(HTTPException) as exc:
+            refresh_user_tokens(forged)
+
+        assert exc.value.status_code == 401
+
+    def test_rotation(self, firestore, monkeypatch):
+        """Test rotation revokes the old token in the same commit"""
+        monkeypatch.setattr(settings, "REFRESH_TOKEN_ROTATION", True)
+        token = _issue()
+        firestore.reset_ops()
+
+        _, new_refresh_token, _ = refresh_user_tokens(token)
+
+        assert dict(firestore.ops) == {"batch_get": 1, "commit": 1}
+        assert get_refresh_token(token)["revoked"] is True
+        assert get_refresh_token(new_refresh_token)["revoked"] is False
+
+        with pytest.raises(HTTPException):
+            refresh_user_tokens(token)
+
+    def test_concurrent_rotations_exchange_once(self, firestore, monkeypatch):
+        """Test two refreshes that both validated the same token can't both rotate it"""
+        monkeypatch.setattr(settings, "REFRESH_TOKEN_ROTATION", True)
+        token = _issue()
+        both_read = threading.Barrier(2)
+        read = auth_service.get_refresh_token_and_user
+
+        def read_then_wait(*args):
+            result = read(*args)
+            both_read.wait(timeout=5)
+            return result
+
+        monkeypatch.setattr(auth_service, "get_refresh_token_and_user", read_then_wait)
+
+        def refresh(_):
+            try:
+                return refresh_user_tokens(token)[1]
+            except HTTPException as e:
+                return e.status_code
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(refresh, range(2)))
+
+        assert results.count(401) == 1
+        issued = [result for result in results if result != 401]
+        assert get_refresh_token(issued[0])["revoked"] is False
+        assert len(list(firestore.collection("refresh_tokens").stream())) == 2
+
+    def test_rotation_with_dotted_user_id(self, firestore, monkeypatch):
+        """Test a user ID containing "." is read back from the token"""
+        monkeypatch.setattr(settings, "REFRESH_TOKEN_ROTATION", True)
+        firestore.collection("users").document("ana.perez").set({
+            "id": "ana.perez",
+            "nombre": "Ana",
+            "rol": "asesor",
+            "ruta": "002",
+            "password_hash": "x",
+        })
+        token = _issue("ana.perez")
+        firestore.reset_ops()
+
+        access_token, new_refresh_token, _ = refresh_user_tokens(token)
+
+        assert dict(firestore.ops) == {"batch_get": 1, "commit": 1}
+        assert verify_token(access_token)["ruta"] == "002"
+        assert new_refresh_token.startswith("ana.perez.")
+
+
+class TestTokenStorage:
+    """Test hashed token IDs and the per-user session index"""
+
+    def test_stored_under_hash(self, firestore):
+        """Test the raw token is never a document ID"""
+        token = _issue()
+        ids = [doc.id for doc in firestore.collection("refresh_tokens").stream()]
+
+        assert ids == [refresh_token_id(token)]
+        assert len(ids[0]) == 64
+        assert token not in ids
+
+    def test_legacy_document_moved(self, firestore):
+        """Test a token stored under its raw ID is found and re-stored hashed"""
+        token = generate_refresh_token("A000001")
+        firestore.collection("refresh_tokens").document(token).set({
+            "user_id": "A000001",
+            "expires_at": get_refresh_token_expiration(),
+            "revoked": False,
+        })
+        firestore.reset_ops()
+
+        refresh_user_tokens(token)
+
+        assert dict(firestore.ops) == {"batch_get": 1, "commit": 1}
+        ids = [doc.id for doc in firestore.collection("refresh_tokens").stream()]
+        assert ids == [refresh_token_id(token)]
+
+        # Later refreshes read only
+        firestore.reset_ops()
+        refresh_user_tokens(token)
+        assert dict(firestore.ops) == {"batch_get": 1}
+
+    def test_legacy_lookup_disabled(self, firestore, monkeypatch):
+        """Test raw-ID documents are ignored once legacy lookup is off"""
+        monkeypatch.setattr(settings, "REFRESH_TOKEN_LEGACY_LOOKUP", False)
+        token = generate_refresh_token("A000001")
+        firestore.collection("refresh_tokens").document(token).set({
+            "user_id": "A000001",
+            "expires_at": get_refresh_token_expiration(),
+            "revoked": False,
+        })
+
+        with pytest.raises(HTTPException):
+            refresh_user_tokens(token)
+
+    def test_sessions_listed_and_revoked_in_one_query(self, firestore):
+        """Test listing and revoke-all use one query each, and one commit"""
+        tokens = [_issue() for _ in range(3)]
+        _issue("B000002")
+        firestore.reset_ops()
+
+        sessions = list_sessions("A000001")
+
+        assert sorted(session["id"] for session in sessions) == sorted(refresh_token_id(t) for t in tokens)
+        assert dict(firestore.ops) == {"query": 1}
+
+        firestore.reset_ops()
+        assert revoke_all_sessions("A000001") == 3
+        assert dict(firestore.ops) == {"query": 1, "commit": 1}
+        assert all(get_refresh_token(token)["revoked"] for token in tokens)
+        assert revoke_all_sessions("A000001") == 0
+        assert not any(session["revoked"] for session in list_sessions("B000002"))
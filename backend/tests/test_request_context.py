@@ -0,0 +1,92 @@
+"""
+Request Context Middleware Tests
+
+Tests for request IDs, the logging context and security headers added by
+the pure-ASGI RequestContextMiddleware.
+"""
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.logging import request_id_var
+from app.middleware.request_context import RequestContextMiddleware
+
+
+def _client(monkeypatch, csp="default-src 'self'", hsts="max-age=60"):
+    monkeypatch.setattr(settings, "SECURITY_CSP", csp)
+    monkeypatch.setattr(settings, "SECURITY_HSTS", hsts)
+    monkeypatch.setattr(settings, "SECURITY_CSP_EXEMPT", ["/docs"])
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/context")
+    async def context():
+        return {"request_id": request_id_var.get()}
+
+    @app.get("/framed")
+    async def framed(response: Response):
+        response.headers["X-Frame-Options"] = "SAMEORIGIN"
+        return {}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for n in range(3):
+                yield f"{n}\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+class TestRequestContext:
+    """Test request IDs and the logging context"""
+
+    def test_request_id_in_context_and_header(self, monkeypatch):
+        """Test the logged request ID is the one returned, and unique per request"""
+        client = _client(monkeypatch)
+
+        first = client.get("/context")
+        second = client.get("/context")
+
+        assert first.json()["request_id"] == first.headers["x-request-id"]
+        assert first.headers["x-request-id"] != second.headers["x-request-id"]
+        assert request_id_var.get() is None
+
+    def test_streaming_passes_through(self, monkeypatch):
+        """Test streamed bodies arrive intact with the headers"""
+        response = _client(monkeypatch).get("/stream")
+
+        assert response.text == "0\n1\n2\n"
+        assert "x-request-id" in response.headers
+        assert response.headers["x-content-type-options"] == "nosniff"
+
+
+class TestSecurityHeaders:
+    """Test security headers on every response"""
+
+    def test_headers_present(self, monkeypatch):
+        """Test CSP and HSTS are sent with the fixed headers"""
+        response = _client(monkeypatch).get("/context")
+
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert response.headers["x-frame-options"] == "DENY"
+        assert response.headers["x-xss-protection"] == "1; mode=block"
+        assert response.headers["content-security-policy"] == "default-src 'self'"
+        assert response.headers["strict-transport-security"] == "max-age=60"
+
+    def test_csp_exempt_paths_and_disable(self, monkeypatch):
+        """Test exempt prefixes skip CSP and empty settings drop CSP / HSTS"""
+        assert "content-security-policy" not in _client(monkeypatch).get("/docs").headers
+
+        response = _client(monkeypatch, csp="", hsts="").get("/context")
+        assert "content-security-policy" not in response.headers
+        assert "strict-transport-security" not in response.headers
+
+    def test_replaces_endpoint_header(self, monkeypatch):
+        """Test a header set by the endpoint is replaced, not duplicated"""
+        response = _client(monkeypatch).get("/framed")
+
+        assert response.headers.get_list("x-frame-options") == ["DENY"]
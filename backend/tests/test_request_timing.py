@@ -0,0 +1,134 @@
+"""
+Request Timing Tests
+
+Tests for request stage spans, the Server-Timing header and the request log
+line written by RequestContextMiddleware.
+"""
+
+import json
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.logging import StructuredFormatter
+from app.core.timing import RequestTimings, add_span, server_timing, span, span_summary, timings_var
+from app.middleware.request_context import RequestContextMiddleware
+
+
+def _parse(header: str) -> dict:
+    entries = {}
+    for entry in header.split(", "):
+        name, _, duration = entry.partition(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+
+def _client(monkeypatch, enabled=True):
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", enabled)
+    monkeypatch.setattr(settings, "CORS_ORIGINS", ["http://localhost:5173"])
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    def blocking_stage():
+        with span("sql"):
+            time.sleep(0.01)
+
+    @app.get("/plan")
+    async def plan():
+        with span("jwt"):
+            pass
+        await run_in_threadpool(blocking_stage)
+        add_span("map", 0.002)
+        add_span("map", 0.003)
+        return {}
+
+    return TestClient(app)
+
+
+class TestSpans:
+    """Test span recording and aggregation"""
+
+    def test_spans_with_same_name_are_summed(self):
+        """Test repeated spans report one total and a count"""
+        timings = RequestTimings()
+        timings.add("map", 0.25)
+        timings.add("recs", 0.5)
+        timings.add("map", 0.25)
+
+        assert timings.spans() == {"map": (0.5, 2), "recs": (0.5, 1)}
+        assert span_summary(timings) == {"map": 500.0, "recs": 500.0}
+
+    def test_header_format(self):
+        """Test one name;dur entry per span, in order, then the total"""
+        timings = RequestTimings()
+        timings.add("jwt", 0.0012)
+        timings.add("sql", 0.0345)
+
+        header = server_timing(timings)
+
+        assert header.startswith("jwt;dur=1.2, sql;dur=34.5, total;dur=")
+
+    def test_span_outside_request_is_noop(self):
+        """Test spans without an active request record nothing and don't fail"""
+        assert timings_var.get() is None
+        with span("sql"):
+            pass
+        add_span("map", 1.0)
+        assert timings_var.get() is None
+
+
+class TestServerTimingHeader:
+    """Test the middleware's Server-Timing header and request log line"""
+
+    def test_header_includes_request_spans(self, monkeypatch):
+        """Test spans from the event loop and the threadpool reach the header"""
+        response = _client(monkeypatch).get("/plan")
+
+        entries = _parse(response.headers["server-timing"])
+        assert list(entries) == ["jwt", "sql", "map", "total"]
+        assert entries["sql"] >= 10
+        assert entries["map"] == 5.0
+        assert entries["total"] >= entries["sql"]
+        assert response.headers["timing-allow-origin"] == "http://localhost:5173"
+        assert timings_var.get() is None
+
+    def test_header_disabled(self, monkeypatch):
+        """Test SERVER_TIMING_ENABLED=False omits the header"""
+        response = _client(monkeypatch, enabled=False).get("/plan")
+
+        assert "server-timing" not in response.headers
+        assert "timing-allow-origin" not in response.headers
+
+    def test_request_log_line(self, monkeypatch):
+        """Test one structured line per request with its request ID, status and spans"""
+        client = _client(monkeypatch, enabled=False)
+        lines = []
+
+        class Capture(logging.Handler):
+            def emit(self, record):
+                lines.append(json.loads(self.format(record)))
+
+        handler = Capture()
+        handler.setFormatter(StructuredFormatter())
+        logger = logging.getLogger("app.middleware.request_context")
+        logger.addHandler(handler)
+        level = logger.level
+        logger.setLevel(logging.INFO)
+        try:
+            response = client.get("/plan")
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+
+        assert len(lines) == 1
+        line = lines[0]
+        assert line["message"].startswith("GET /plan 200 in ")
+        assert line["request_id"] == response.headers["x-request-id"]
+        assert line["context"]["route"] == "/plan"
+        assert line["context"]["status"] == 200
+        assert set(line["context"]["timings"]) == {"jwt", "sql", "map"}
@@ -14,7 +14,8 @@ from app.core.security import (
     create_access_token,
     verify_token,
     generate_refresh_token,
-    get_refresh_token_expiration
+    get_refresh_token_expiration,
+    refresh_token_user_id
 )
 from app.core.config import settings
 
@@ -157,6 +158,15 @@ class TestRefreshTokens:
 
         assert token1 != token2
 
+    def test_refresh_token_carries_user_id(self):
+        """Test tokens issued for a user embed its ID"""
+        token = generate_refresh_token("A012345")
+
+        assert token.startswith("A012345.")
+        assert refresh_token_user_id(token) == "A012345"
+        assert refresh_token_user_id(generate_refresh_token()) is None
+        assert refresh_token_user_id(generate_refresh_token("ana.perez")) == "ana.perez"
+
     def test_refresh_token_expiration(self):
         """Test refresh token expiration calculation"""
         from datetime import datetime
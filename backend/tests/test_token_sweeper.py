@@ -0,0 +1,173 @@
+"""
+Refresh Token Sweeper Tests
+
+Tests for paged, batched deletion of expired refresh tokens and the
+single-runner lease, against the in-memory Firestore fake.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.db import firestore_async, firestore_client
+from app.services import token_sweeper
+from benchmarks.fakes import FakeFirestoreClient, install_fakes
+
+
+@pytest.fixture
+def firestore():
+    """Fake Firestore with 1203 expired and 5 live refresh tokens"""
+    fake = FakeFirestoreClient()
+    tokens = fake.collection("refresh_tokens")
+    now = datetime.utcnow()
+    for n in range(1203):
+        tokens.document(f"expired-{n}").set({"user_id": "A000001", "expires_at": now - timedelta(minutes=n + 1)})
+    for n in range(5):
+        tokens.document(f"live-{n}").set({"user_id": "A000001", "expires_at": now + timedelta(days=1)})
+    with install_fakes(fake):
+        fake.reset_ops()
+        token_sweeper.reset_token_sweeper_stats()
+        yield fake
+
+
+def _remaining(fake):
+    return sorted(doc.id for doc in fake.collection("refresh_tokens").stream())
+
+
+class TestBatchedDelete:
+    """Test expired tokens are deleted a page per commit"""
+
+    def test_sync_pages(self, firestore):
+        """Test the sync layer deletes 500 per commit with cursor paging"""
+        assert firestore_client.delete_expired_tokens() == 1203
+
+        assert dict(firestore.ops) == {"query": 3, "commit": 3}
+        assert _remaining(firestore) == [f"live-{n}" for n in range(5)]
+
+    async def test_async_pages(self, firestore):
+        """Test the async layer with a smaller page size"""
+        assert await firestore_async.delete_expired_tokens(batch_size=400) == 1203
+
+        # 400 + 400 + 400 + 3: the short page ends the sweep
+        assert dict(firestore.ops) == {"query": 4, "commit": 4}
+        assert _remaining(firestore) == [f"live-{n}" for n in range(5)]
+
+    async def test_batch_size_capped(self, firestore):
+        """Test pages never exceed the 500-write commit limit"""
+        await firestore_async.delete_expired_tokens(batch_size=10_000)
+
+        assert firestore.ops["commit"] == 3
+
+
+class TestSweeper:
+    """Test the scheduled sweep"""
+
+    async def test_sweep_records_metrics(self, firestore):
+        """Test a sweep deletes, releases its lease and records counters"""
+        assert await token_sweeper.sweep_expired_tokens() == 1203
+
+        stats = token_sweeper.token_sweeper_stats()
+        assert stats["runs"] == 1
+        assert stats["deleted_total"] == stats["last_deleted"] == 1203
+        assert stats["last_run_at"] is not None
+
+        # Lease released: the next sweep runs (and finds nothing)
+        assert await token_sweeper.sweep_expired_tokens() == 0
+
+    async def test_lease_held_elsewhere_skips(self, firestore):
+        """Test only one process sweeps while the lease is held"""
+        assert await firestore_async.acquire_lease(token_sweeper.LEASE_NAME, "other-host:1", 60)
+
+        assert await token_sweeper.sweep_expired_tokens() is None
+        assert token_sweeper.token_sweeper_stats()["skipped"] == 1
+        assert len(_remaining(firestore)) == 1208
+
+        await firestore_async.release_lease(token_sweeper.LEASE_NAME, "other-host:1")
+        assert await token_sweeper.sweep_expired_tokens() == 1203
+
+    async def test_lease_race(self, firestore):
+        """Test an expired lease goes to one of two racing holders"""
+        assert await firestore_async.acquire_lease("job", "a", 0)
+
+        # Both see the expired lease; the second write fails its precondition
+        results = [
+            await firestore_async.acquire_lease("job", "b", 60),
+            await firestore_async.acquire_lease("job", "c", 60),
+        ]
+
+        assert results == [True, False]
+
+    async def test_overlapping_sweeps_in_process(self, firestore):
+        """Test a sweep started while another runs here is skipped"""
+        firestore.latency_ms = 1
+
+        results = await asyncio.gather(token_sweeper.sweep_expired_tokens(), token_sweeper.sweep_expired_tokens())
+
+        assert sorted(results, key=str) == [1203, None]
+        assert token_sweeper.token_sweeper_stats()["skipped"] == 1
+
+    async def test_lease_renewed_between_pages(self, firestore, monkeypatch):
+        """Test a sweep outliving half its lease renews it before the next page"""
+        monkeypatch.setattr(settings, "TOKEN_SWEEP_BATCH_SIZE", 100)
+        monkeypatch.setattr(settings, "TOKEN_SWEEP_LEASE_SECONDS", 0)
+        acquire = firestore_async.acquire_lease
+        calls = []
+
+        async def counted(*args):
+            calls.append(args[1])
+            return await acquire(*args)
+
+        monkeypatch.setattr(firestore_async, "acquire_lease", counted)
+
+        assert await token_sweeper.sweep_expired_tokens() == 1203
+        # The first acquire, then one renewal before each of the 12 later pages
+        assert len(calls) == 13
+
+    async def test_lost_lease_stops_sweep(self, firestore, monkeypatch):
+        """Test a sweep whose lease was taken over stops at the next page"""
+        monkeypatch.setattr(settings, "TOKEN_SWEEP_BATCH_SIZE", 100)
+        monkeypatch.setattr(settings, "TOKEN_SWEEP_LEASE_SECONDS", 0)
+        acquire = firestore_async.acquire_lease
+
+        async def taken_over(name, holder, seconds):
+            if await acquire(name, holder, seconds):
+                # The lease expires at once: another process takes it
+                await acquire(name, "other-host:1", 60)
+                return True
+            return False
+
+        monkeypatch.setattr(firestore_async, "acquire_lease", taken_over)
+
+        assert await token_sweeper.sweep_expired_tokens() == 100
+        assert len(_remaining(firestore)) == 1108
+        # Still held by the other process
+        assert not await acquire(token_sweeper.LEASE_NAME, "third-host:1", 60)
+
+    def test_sync_lease(self, firestore):
+        """Test the sync layer takes, refuses and releases the same lease"""
+        assert firestore_client.acquire_lease("job", "a", 60)
+        assert not firestore_client.acquire_lease("job", "b", 60)
+        assert firestore_client.acquire_lease("job", "a", 60)
+
+        firestore_client.release_lease("job", "b")
+        assert not firestore_client.acquire_lease("job", "b", 60)
+
+        firestore_client.release_lease("job", "a")
+        assert firestore_client.acquire_lease("job", "b", 60)
+
+    def test_jitter_bounds(self):
+        """Test delays stay within interval .. interval + jitter"""
+        delays = [token_sweeper.next_delay(3600, 300) for _ in range(200)]
+
+        assert all(3600 <= delay <= 3900 for delay in delays)
+        assert len(set(delays)) > 1
+        assert token_sweeper.next_delay(60, 0) == 60
+
+    async def test_batch_size_setting_used(self, firestore, monkeypatch):
+        """Test TOKEN_SWEEP_BATCH_SIZE sets the page size"""
+        monkeypatch.setattr(settings, "TOKEN_SWEEP_BATCH_SIZE", 100)
+
+        assert await token_sweeper.sweep_expired_tokens() == 1203
+        assert firestore.ops["commit"] == 13
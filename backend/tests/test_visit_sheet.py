@@ -0,0 +1,216 @@
+"""
+Visit Sheet Tests
+
+Tests for the metric registry, the fan-out / narrow Hoja de Visita
+strategies and the SQL Server connection pool.
+"""
+
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import date
+
+from app.core.config import settings
+from app.db import mssql_client, reference_cache
+from app.db.metric_registry import (
+    BLOCKS,
+    METRICS,
+    build_block_query,
+    build_visit_sheet_query,
+    group_by_block,
+    resolve_metrics,
+)
+from app.db.visit_sheet import (
+    ROUTE_CLIENTS_QUERY,
+    WEEK_QUERY,
+    build_block_params,
+    execute_visit_sheet,
+)
+
+
+MONDAY = date(2025, 9, 1)
+
+ROUTE_ROWS = [
+    {"CLIENTE_ID": "C001", "NOMBRE_CLIENTE": "Tienda Uno", "RUTA": "001", "GECS": "ORO",
+     "LUNES": 1, "MARTES": 0, "MIERCOLES": 0, "JUEVES": 0, "VIERNES": 0, "SABADO": 0},
+    {"CLIENTE_ID": "C002", "NOMBRE_CLIENTE": "Tienda Dos", "RUTA": "001", "GECS": "PLATA",
+     "LUNES": 1, "MARTES": 0, "MIERCOLES": 0, "JUEVES": 0, "VIERNES": 0, "SABADO": 0},
+]
+
+
+def fake_execute_query(query, params=None, name=None):
+    """Answer each fan-out query with canned rows"""
+    if query == ROUTE_CLIENTS_QUERY:
+        return ROUTE_ROWS
+    if query == WEEK_QUERY:
+        return [{"SEMANA": 36}]
+    if "vwVentasFerguez" in query and "SEMANA IN" in query:
+        assert params["clientes"] == ("C001", "C002")
+        return [{"CLIENTE_ID": "C001", "CERVEZA_SANT3": 1, "CERVEZA_SANT2": 2,
+                 "CERVEZA_SANT": 100, "CERVEZA_SACT": 50}]
+    if "R_HEISHOP" in query:
+        return [{"CLIENTE_ID": "C002", "IDSHOP": "C002"}]
+    return []
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test without loaded caches"""
+    reference_cache.clear_reference_snapshot()
+    yield
+    reference_cache.clear_reference_snapshot()
+
+
+class TestMetricRegistry:
+    """Test metric resolution and query generation"""
+
+    def test_unknown_metric_rejected(self):
+        """Test consumers cannot request metrics the registry does not define"""
+        with pytest.raises(ValueError):
+            resolve_metrics(["CERVEZA_SACT", "NO_EXISTE"])
+
+    def test_route_plan_metrics_registered(self):
+        """Test the route service only declares registered metrics"""
+        from app.services.route_service import ROUTE_PLAN_METRICS
+
+        assert len(resolve_metrics(ROUTE_PLAN_METRICS)) == len(ROUTE_PLAN_METRICS)
+
+    def test_identity_columns_ignored(self):
+        """Test identity columns are always available and need no block"""
+        assert resolve_metrics(["CLIENTE_ID", "NOMBRE_CLIENTE"]) == []
+
+    def test_only_needed_blocks_and_columns(self):
+        """Test unused metrics cost neither a block nor a select column"""
+        blocks = group_by_block(resolve_metrics(["CERVEZA_SACT", "MILLER"]))
+
+        assert [block.name for block, _ in blocks] == ["weekly_beer", "brands"]
+
+        query = build_visit_sheet_query(blocks)
+        assert "CERVEZA_SACT" in query
+        assert "MILLER" in query
+        for unused in ("CERVEZA_SANT3", "CERVEZA_SANT2", "BRUME_SACT", "INDIOM", "OBJETIVOXSEMANA", "R_HEISHOP"):
+            assert unused not in query
+
+    def test_week_range_follows_metrics(self):
+        """Test weekly metrics only scan the weeks they need"""
+        params = build_block_params(MONDAY, 36, ["C001"], resolve_metrics(["CERVEZA_SANT", "CERVEZA_SACT"]))
+        assert params["semanas"] == (35, 36)
+
+        params = build_block_params(MONDAY, None, ["C001"], resolve_metrics(["CERVEZA_SACT"]))
+        assert params["semanas"] == (None,)
+
+    def test_every_metric_has_a_block(self):
+        """Test all registered metrics generate a valid block query"""
+        for block, metrics in group_by_block(list(METRICS.values())):
+            query = build_block_query(block, metrics)
+            assert query.startswith("SELECT ")
+            assert "%(clientes)s" in query
+        assert set(BLOCKS) == {metric.block for metric in METRICS.values()}
+
+
+class TestExecution:
+    """Test per-block execution and hash join"""
+
+    def test_block_params(self):
+        """Test shared parameters cover the month of the plan date"""
+        params = build_block_params(date(2024, 2, 10), 6, ["C001"], [])
+
+        assert params["mes_inicio"] == "2024-02-01"
+        assert params["mes_fin"] == "2024-02-29"
+        assert params["anio"] == 2024
+        assert params["semana"] == 6
+        assert params["clientes"] == ("C001",)
+
+    def test_fanout_joins_blocks_by_cliente_id(self):
+        """Test block rows are joined onto every client, LEFT JOIN style"""
+        with patch("app.db.visit_sheet.execute_query", side_effect=fake_execute_query):
+            rows = execute_visit_sheet("001", MONDAY)
+
+        assert [row["CLIENTE_ID"] for row in rows] == ["C001", "C002"]
+        assert rows[0]["CERVEZA_SANT"] == 100
+        assert rows[0]["IDSHOP"] is None
+        assert rows[1]["CERVEZA_SANT"] is None
+        assert rows[1]["IDSHOP"] == "C002"
+
+        # Every metric column is present on every row
+        for name in METRICS:
+            assert name in rows[1]
+
+    def test_only_requested_metrics_returned(self):
+        """Test a consumer only gets (and only pays for) what it declares"""
+        with patch("app.db.visit_sheet.execute_query", side_effect=fake_execute_query) as mock:
+            rows = execute_visit_sheet("001", MONDAY, ["CERVEZA_SACT"])
+
+        # Clients, week, and a single block
+        assert mock.call_count == 3
+        assert rows[0]["CERVEZA_SACT"] == 50
+        assert "CERVEZA_SANT3" not in rows[0]
+        assert "IDSHOP" not in rows[0]
+
+    def test_narrow_runs_one_statement(self):
+        """Test the narrow strategy sends one generated statement"""
+        with patch("app.db.visit_sheet.execute_query", side_effect=fake_execute_query) as mock:
+            execute_visit_sheet("001", MONDAY, ["CERVEZA_SACT", "MILLER", "IDSHOP"], strategy="narrow")
+
+        assert mock.call_count == 3
+        narrow_query = mock.call_args_list[-1].args[0]
+        assert narrow_query.count("LEFT JOIN (") == 3
+
+    def test_reference_blocks_replicated_with_cache(self, monkeypatch):
+        """Test coolers/HEI/promo come from the snapshot when it is enabled"""
+        monkeypatch.setattr(settings, "REFERENCE_CACHE_ENABLED", True)
+        executed = []
+
+        def recording_execute_query(query, params=None, name=None):
+            executed.append(query)
+            return fake_execute_query(query, params)
+
+        with patch("app.db.visit_sheet.execute_query", side_effect=recording_execute_query), \
+             patch("app.db.reference_cache.execute_query", return_value=[]):
+            rows = execute_visit_sheet("001", MONDAY)
+
+        assert not any("bdenf" in query or "R_HEISHOP" in query or "ClienteEsquema" in query for query in executed)
+        assert rows[1]["IDSHOP"] is None
+        assert rows[1]["DESCLP"] is None
+
+    def test_no_clients_skips_blocks(self):
+        """Test an empty day does not run any metric block"""
+        with patch("app.db.visit_sheet.execute_query", return_value=[]) as mock:
+            rows = execute_visit_sheet("001", MONDAY)
+
+        assert rows == []
+        assert mock.call_count == 1
+
+
+class TestConnectionPool:
+    """Test pooled SQL Server connections"""
+
+    @pytest.fixture(autouse=True)
+    def empty_pool(self):
+        mssql_client.close_pool()
+        yield
+        mssql_client.close_pool()
+
+    def test_connections_are_reused(self):
+        """Test a returned connection is handed out again"""
+        connection = MagicMock()
+        with patch("app.db.mssql_client.get_connection", return_value=connection) as connect:
+            with mssql_client.pooled_connection() as first:
+                pass
+            with mssql_client.pooled_connection() as second:
+                pass
+
+        assert first is second
+        assert connect.call_count == 1
+
+    def test_failed_connection_is_discarded(self):
+        """Test a connection that raised is closed, not returned to the pool"""
+        broken, fresh = MagicMock(), MagicMock()
+        with patch("app.db.mssql_client.get_connection", side_effect=[broken, fresh]):
+            with pytest.raises(RuntimeError):
+                with mssql_client.pooled_connection():
+                    raise RuntimeError("query failed")
+            with mssql_client.pooled_connection() as connection:
+                pass
+
+        broken.close.assert_called_once()
+        assert connection is fresh
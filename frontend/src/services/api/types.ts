@@ -34,6 +34,7 @@ export interface RefreshTokenRequest {
 export interface RefreshTokenResponse {
   token: string;
   expiresIn: number;
+  refreshToken?: string; // Only when the server rotates refresh tokens
 }
 
 // ============================================================================
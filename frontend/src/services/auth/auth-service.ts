@@ -285,6 +285,7 @@ class AuthService {
       this.currentSession = {
         ...this.currentSession,
         token: response.token,
+        refreshToken: response.refreshToken ?? this.currentSession.refreshToken,
         expiresAt,
       };
 